@@ -0,0 +1,16 @@
+"""
+benchmarks - standalone micro-benchmarks for mecha's hot paths
+
+Each module is a script, run from the repository root as::
+
+    python -m benchmarks.bench_<topic>
+
+These are not collected by pytest, and need neither IRC, the API nor a database.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
@@ -0,0 +1,122 @@
+"""
+bench_api_codec.py - cost of decoding and encoding websocket API frames
+
+Structures the recorded API responses under ``tests/unit/api/v3_tests`` into the API models with
+the global ``cattr`` converter, as the interface did before, and with ``api_converter``.  Decodes
+them with ``json.loads`` and with the codec, once per installed JSON backend.  Then encodes a
+rescue creation request both ways.  Reports microseconds per frame.
+
+Usage::
+
+    python -m benchmarks.bench_api_codec [--repeat N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import importlib
+import json
+import time
+import typing
+from importlib import resources
+
+import attr
+import cattr
+from loguru import logger
+
+from src.packages.fuelrats_api.v3.converters import api_converter
+from src.packages.fuelrats_api.v3.models.v1.nickname import Nickname
+from src.packages.fuelrats_api.v3.models.v1.rats import Rat as ApiRat
+from src.packages.fuelrats_api.v3.models.v1.rescue import Rescue as ApiRescue
+from src.packages.fuelrats_api.v3.websocket import codec
+from src.packages.fuelrats_api.v3.websocket.protocol import Request
+from src.packages.rescue import Rescue
+from src.packages.utils import Platforms
+from tests.unit.api import v3_tests
+
+FIXTURES = (
+    ("raw_rescue_enumerate_response.json", typing.List[ApiRescue]),
+    ("raw_nickname_response.json", typing.List[Nickname]),
+    ("raw_rat_response.json", ApiRat),
+)
+
+
+def _per_call(function: typing.Callable[[], typing.Any], repeat: int, rounds: int = 5) -> float:
+    """ seconds per call of *function*, in the best of *rounds*, other work only slows it down """
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return best / repeat
+
+
+def _report(fixture: str, stage: str, old: float, new: float):
+    print(f"{fixture:<38} {stage:>16} {old * 1e6:>10.1f} {new * 1e6:>9.1f} {old / new:>7.1f}x")
+
+
+def _old_request(body: typing.Dict) -> str:
+    """ Request.serialize, as it was before the codec """
+    request = Request(endpoint=["rescues", "create"], body=body)
+    return json.dumps(cattr.unstructure([request.state, request.endpoint, request.query, body]))
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args(argv)
+    logger.remove()
+
+    backends = []
+    for name in codec.JSON_BACKENDS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            print(f"{name} is not installed, skipping it")
+        else:
+            backends.append(name)
+
+    print(f"{'fixture':<38} {'stage':>16} {'before us':>10} {'after us':>9} {'speedup':>8}")
+    for name, kind in FIXTURES:
+        raw = resources.read_text(v3_tests, name)
+        data = json.loads(raw)["data"]
+        assert api_converter.structure(data, kind) == cattr.structure(
+            data, kind
+        ), "the converters disagree"
+        old = _per_call(lambda: cattr.structure(data, kind), args.repeat)
+        new = _per_call(lambda: api_converter.structure(data, kind), args.repeat)
+        _report(name, "structure", old, new)
+
+        old = _per_call(lambda: json.loads(raw), args.repeat)
+        for backend in backends:
+            codec.use_backend(backend)
+            new = _per_call(lambda: codec.loads(raw), args.repeat)
+            _report(name, f"loads {backend}", old, new)
+
+    rescue = Rescue(client="some_client", system="sol", platform=Platforms.PC, board_index=4)
+    for number in range(20):
+        rescue.add_quote(f"[{number}] client is in open, fuel at {number}%", "some_rat")
+    api_rescue = ApiRescue.from_internal(rescue)
+    old = _per_call(
+        lambda: _old_request({"data": attr.asdict(api_rescue, recurse=True)}), args.repeat
+    )
+    for backend in backends:
+        codec.use_backend(backend)
+        new = _per_call(
+            lambda: Request(
+                endpoint=["rescues", "create"],
+                body={"data": api_converter.unstructure(api_rescue)},
+            ).serialize(),
+            args.repeat,
+        )
+        _report("rescues.create, 20 quotes", f"encode {backend}", old, new)
+    codec.use_backend("json")
+
+
+if __name__ == "__main__":
+    main()
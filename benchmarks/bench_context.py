@@ -0,0 +1,177 @@
+"""
+bench_context.py - per-message cost of building contexts in on_message
+
+Replays a synthetic busy-channel log, mostly chatter with the odd fact and command, through
+``MechaClient.on_message`` and reports messages per second and the memory allocated per
+message, traced with ``tracemalloc``.  The log is replayed twice: with contexts built as
+``Context.from_message`` does now (lazy ``words_eol`` and user), and as it did before, with
+every ``words_eol`` entry joined up front, the user looked up and evolved and the words
+validated one by one.
+
+Usage::
+
+    python -m benchmarks.bench_context [--messages N] [--nicks N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+import typing
+
+import attr
+import cattr
+from loguru import logger
+
+from src.config import PLUGIN_MANAGER, load_config
+from src.config.datamodel import ConfigRoot
+from src.mechaclient import MechaClient
+from src.packages.context import Context
+from src.packages.fact_manager import Fact
+from src.packages.user import User
+
+CHATTER = (
+    "o7 anyone around", "jumping now", "thanks rats", "fuel is at 12 percent", "in open now",
+    "friend request sent", "wing invite incoming", "beacon is lit", "going to instance",
+    "how far out are you", "i think i see the client", "lol", "client is in solo, asking",
+    "gg everyone", "back to the carrier", "anyone got a good exploration build",
+)
+FACTS = ("prep", "pcquit", "beacon", "wing", "fr")
+WORDS = tuple(" ".join(CHATTER).split())
+
+
+class _WarmFactManager:
+    """ answers from a dict, like FactManager does with a warm cache """
+
+    def __init__(self, names: typing.Iterable[str]):
+        self._facts = {
+            (name, "en"): Fact(name=name, lang="en", message=f"{name} fact", aliases=[],
+                               author="bench", editedby="bench", mfd=False, edited=None)
+            for name in names
+        }
+
+    async def exists(self, name: str, lang: str) -> bool:
+        return (name, lang) in self._facts
+
+    async def find(self, name: str, lang: str) -> typing.Optional[Fact]:
+        return self._facts.get((name, lang))
+
+
+class _BenchClient(MechaClient):
+    """ a client that never connects, its replies are only counted """
+
+    sent = 0
+
+    async def message(self, target: str, message: str, priority=None):
+        self.sent += 1
+
+
+_EAGER_VALIDATOR = attr.validators.deep_iterable(
+    member_validator=attr.validators.instance_of(str),
+    iterable_validator=attr.validators.instance_of(list),
+)
+
+
+async def _eager_from_message(cls, bot, channel: str, sender: str, message: str) -> Context:
+    """ Context.from_message as it was before contexts were built lazily """
+    prefixed = message.startswith(cls.PREFIX)
+    if prefixed:
+        message = message[len(cls.PREFIX):]
+    words = message.split()
+    words_eol = [" ".join(words[i:]) for i, _ in enumerate(words)]
+    data = bot.users.get(sender.casefold(), None)
+    user = None
+    if data:
+        user = User(**data)
+        user = attr.evolve(inst=user, hostname=User.process_vhost(user.hostname))
+    _EAGER_VALIDATOR(None, None, words)
+    _EAGER_VALIDATOR(None, None, words_eol)
+    return cls(bot, user, channel, words, words_eol, prefixed=prefixed)
+
+
+def _log(picker: random.Random, count: int, nicks: typing.List[str]):
+    """ (nick, message) lines of a busy channel """
+    lines = []
+    for _ in range(count):
+        roll = picker.random()
+        if roll < 0.05:
+            message = f"!{picker.choice(FACTS)} {picker.choice(nicks)}"
+        elif roll < 0.08:
+            message = f"!{picker.choice(WORDS)}"
+        elif roll < 0.2:
+            # the occasional wall of text
+            message = " ".join(picker.choices(WORDS, k=picker.randrange(20, 60)))
+        else:
+            message = picker.choice(CHATTER)
+        lines.append((picker.choice(nicks), message))
+    return lines
+
+
+async def _replay(bot: MechaClient, lines) -> typing.Tuple[float, float]:
+    """ seconds per message, and bytes allocated at peak per message """
+    start = time.perf_counter()
+    for nick, message in lines:
+        await bot.on_message("#ratchat", nick, message)
+    elapsed = (time.perf_counter() - start) / len(lines)
+
+    tracemalloc.start()
+    peak = 0
+    for nick, message in lines:
+        # clearing the traces resets the peak, so each message is measured on its own
+        tracemalloc.clear_traces()
+        await bot.on_message("#ratchat", nick, message)
+        peak += tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / len(lines)
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--nicks", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # the loggers would dominate the timings otherwise
+    logger.remove()
+    # setup() would set logging up again, the plugins only need the configuration
+    config = cattr.structure(load_config("testing.toml")[0], ConfigRoot)
+    PLUGIN_MANAGER.hook.rehash_handler(data=config)  # pylint: disable=no-member
+    picker = random.Random(args.seed)
+
+    bot = _BenchClient(nickname=config.irc.nickname, mecha_config=config)
+    bot._fact_manager = _WarmFactManager(FACTS)
+    nicks = [f"rat_{number}[PC]" for number in range(args.nicks)]
+    for nick in nicks:
+        bot.users[nick.casefold()] = {
+            "nickname": nick, "username": nick, "hostname": f"{nick}@{nick}.rat.fuelrats.com",
+            "away": False, "away_message": None, "account": nick, "identified": True,
+            "realname": nick,
+        }
+    lines = _log(picker, args.messages, nicks)
+
+    lazy = asyncio.run(_replay(bot, lines))
+    lazy_from_message = Context.__dict__["from_message"]
+    Context.from_message = classmethod(_eager_from_message)
+    try:
+        eager = asyncio.run(_replay(bot, lines))
+    finally:
+        Context.from_message = lazy_from_message
+
+    print(f"messages:  {len(lines)} from {len(nicks)} nicks, {bot.sent} replies sent")
+    print(f"{'contexts':>9} {'messages/s':>12} {'us/message':>11} {'peak KiB/message':>17}")
+    for label, (elapsed, allocated) in (("eager", eager), ("lazy", lazy)):
+        print(
+            f"{label:>9} {1 / elapsed:>12.0f} {elapsed * 1e6:>11.1f} {allocated / 1024:>17.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+bench_fact_trigger.py - fact invocation micro-benchmark
+
+Times the per-message cost of recognising a fact invocation, both in isolation (the
+precompiled tokenizer against the pyparsing grammar it replaced) and end to end through
+``trigger`` -> ``handle_fact`` with a warm, in-memory fact manager.
+
+Usage::
+
+    python -m benchmarks.bench_fact_trigger [--iterations N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import asyncio
+import time
+import typing
+
+import pyparsing
+from pyparsing import Word, Suppress, alphanums, alphas, ZeroOrMore
+
+from src.packages.commands.rat_command import parse_fact_invocation, trigger
+from src.packages.context import Context
+from src.packages.fact_manager import Fact
+from src.packages.user import User
+
+MESSAGES = [
+    "prep",
+    "prep-ru some_client",
+    "pcquit [PC]Some_Client|afk other_client",
+    "xwing-de",
+    "notafact with some words after it",
+    "beacon client_one client_two client_three",
+]
+
+
+def _legacy_parse(message: str):
+    """ the grammar handle_fact used to build on every call """
+    pattern = (
+        Word(alphanums).setResultsName("name")
+        + pyparsing.Optional(Suppress("-") + Word(alphas).setResultsName("lang"))
+        + ZeroOrMore(Word(alphanums + "_[]|?.<>{}-=")).setResultsName("subjects")
+    )
+    try:
+        result = pattern.parseString(message)
+    except pyparsing.ParseException:
+        return None
+    return (
+        result.name,
+        result.lang if result.lang else "en",
+        result.subjects.asList() if result.subjects else [],
+    )
+
+
+class _WarmFactManager:
+    """ answers from a dict, like FactManager does with a warm cache """
+
+    def __init__(self, names: typing.Iterable[str]):
+        self._facts = {
+            (name, "en"): Fact(name=name, lang="en", message=f"{name} fact", aliases=[],
+                               author="bench", editedby="bench", mfd=False, edited=None)
+            for name in names
+        }
+
+    async def exists(self, name: str, lang: str) -> bool:
+        return (name, lang) in self._facts
+
+    async def find(self, name: str, lang: str) -> typing.Optional[Fact]:
+        return self._facts.get((name, lang))
+
+
+class _BenchBot:
+    """ the slice of MechaClient trigger/handle_fact touch """
+
+    def __init__(self):
+        self.fact_manager = _WarmFactManager(["prep", "pcquit", "beacon"])
+        self.sent = 0
+
+    @staticmethod
+    def is_channel(target: str) -> bool:
+        return target.startswith("#")
+
+    async def message(self, target: str, message: str, priority=None):
+        self.sent += 1
+
+
+def _time_sync(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in MESSAGES:
+            func(message)
+    return (time.perf_counter() - start) / (iterations * len(MESSAGES))
+
+
+async def _time_trigger(iterations: int) -> float:
+    bot = _BenchBot()
+    user = User(False, None, True, "bench", "bench", "bench", "bench.rats.fuelrats.com", "bench")
+    contexts = []
+    for message in MESSAGES:
+        words = message.split()
+        words_eol = [" ".join(words[i:]) for i in range(len(words))]
+        contexts.append(Context(bot, user, "#bench", words, words_eol, prefixed=True))
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for ctx in contexts:
+            await trigger(ctx)
+    return (time.perf_counter() - start) / (iterations * len(contexts))
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    # the loggers would dominate the timings otherwise
+    from loguru import logger
+    logger.remove()
+
+    for message in MESSAGES:
+        assert parse_fact_invocation(message) == _legacy_parse(message), message
+
+    legacy = _time_sync(_legacy_parse, args.iterations)
+    current = _time_sync(parse_fact_invocation, args.iterations)
+    end_to_end = asyncio.run(_time_trigger(args.iterations))
+
+    print(f"pyparsing grammar per message : {legacy * 1e6:8.2f} us")
+    print(f"precompiled tokenizer         : {current * 1e6:8.2f} us ({legacy / current:.1f}x)")
+    print(f"trigger -> handle_fact        : {end_to_end * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+bench_galaxy_snapshot.py - local galaxy snapshot build, open, memory and query costs
+
+Generates a dump of procedurally named systems, builds a snapshot from it with
+``tools/build_galaxy_snapshot.py`` and reports the snapshot's size, how long opening it takes,
+how much resident memory it costs, heap and mapped file pages apart (against the same systems
+loaded into a dict) and the latency of exact and fuzzy lookups.
+
+Usage::
+
+    python -m benchmarks.bench_galaxy_snapshot [--systems N] [--iterations N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+import typing
+
+from loguru import logger
+
+from src.packages.galaxy.snapshot import GalaxySnapshot
+from tools.build_galaxy_snapshot import main as build_snapshot, read_dump
+
+SECTOR_WORDS = ("Eorld", "Pri", "Prae", "Flyi", "Byeia", "Thaa", "Synuefe", "Col", "Hypiae",
+                "Phoi", "Aunt", "Dryau", "Ausms", "Bleia", "Oochost", "Swoilz", "Wregoe", "Blu")
+
+
+def _rss_kib() -> typing.Tuple[int, int]:
+    """ anonymous and file-backed resident memory of this process, from procfs """
+    sizes = {}
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                sizes[line.split(":")[0]] = int(line.split()[1])
+    return sizes.get("RssAnon", 0), sizes.get("RssFile", 0)
+
+
+def _system_name(picker: random.Random) -> str:
+    sector = " ".join(picker.sample(SECTOR_WORDS, 2))
+    letters = "".join(picker.choices(string.ascii_uppercase, k=2))
+    return (
+        f"{sector} {letters}-{picker.choice(string.ascii_uppercase)} "
+        f"{picker.choice('abcdefgh')}{picker.randrange(30)}-{picker.randrange(5000)}"
+    )
+
+
+def _write_dump(path: str, count: int, picker: random.Random) -> typing.List[str]:
+    names = []
+    with open(path, "w", encoding="utf8") as dump:
+        for id64 in range(count):
+            name = _system_name(picker)
+            names.append(name)
+            coords = {axis: picker.uniform(-40000, 65000) for axis in "xyz"}
+            dump.write(json.dumps({"id64": id64, "name": name, "coords": coords}) + "\n")
+    return names
+
+
+def _per_call(func, arguments: typing.List) -> float:
+    start = time.perf_counter()
+    for argument in arguments:
+        func(argument)
+    return (time.perf_counter() - start) / len(arguments)
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--systems", type=int, default=500_000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    logger.remove()
+    picker = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        dump_path = os.path.join(directory, "systems.jsonl")
+        snapshot_path = os.path.join(directory, "galaxy.snapshot")
+        names = _write_dump(dump_path, args.systems, picker)
+
+        start = time.perf_counter()
+        build_snapshot([dump_path, snapshot_path])
+        build_time = time.perf_counter() - start
+
+        rss_before = _rss_kib()
+        start = time.perf_counter()
+        snapshot = GalaxySnapshot(snapshot_path)
+        open_time = time.perf_counter() - start
+
+        exact = [picker.choice(names).upper() for _ in range(args.iterations)]
+        # fuzzy queries: drop the last character and swap the case, as typed on IRC
+        fuzzy = [picker.choice(names)[:-1].swapcase() for _ in range(args.iterations)]
+        exact_time = _per_call(snapshot.find, exact)
+        fuzzy_time = _per_call(snapshot.search, fuzzy)
+        found = sum(snapshot.find(name) is not None for name in exact)
+        rss_after = _rss_kib()
+        anon_snapshot = rss_after[0] - rss_before[0]
+        file_snapshot = rss_after[1] - rss_before[1]
+        snapshot.close()
+
+        rss_before = _rss_kib()
+        in_heap = {name.upper(): (name, x, y, z) for _, name, x, y, z in read_dump(dump_path)}
+        anon_dict = _rss_kib()[0] - rss_before[0]
+
+        print(f"systems:              {args.systems}")
+        print(f"build:                {build_time:.1f} s")
+        print(f"snapshot size:        {os.path.getsize(snapshot_path) / 2 ** 20:.1f} MiB")
+        print(f"open:                 {open_time * 1e6:.0f} us")
+        # mapped pages are page cache the kernel can drop again, heap is ours to keep
+        print(
+            f"RSS, snapshot:        +{anon_snapshot / 1024:.1f} MiB heap, "
+            f"+{file_snapshot / 1024:.1f} MiB mapped after all queries"
+        )
+        print(f"RSS, same in a dict:  +{anon_dict / 1024:.1f} MiB heap ({len(in_heap)} entries)")
+        print(f"exact lookup:         {exact_time * 1e6:.1f} us ({found}/{len(exact)} found)")
+        print(f"fuzzy search:         {fuzzy_time * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+bench_landmarks.py - local landmark index against the Systems API round trip
+
+Serves a random set of landmarks from a local aiohttp stub of the Systems API ``landmark``
+endpoint, then times ``Galaxy.find_nearest_landmark`` answering from the API (with its cache
+cleared, as for a fresh ratsignal) and from the in-process landmark index.  A stub on the
+loopback interface is a lower bound for the remote path, the real API is further away.
+
+Usage::
+
+    python -m benchmarks.bench_landmarks [--landmarks N] [--iterations N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import asyncio
+import random
+import time
+import typing
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from loguru import logger
+
+from src.packages.galaxy import Galaxy, StarSystem
+from src.packages.utils import Vector
+
+
+def _random_systems(picker: random.Random, prefix: str, count: int) -> typing.List[StarSystem]:
+    # roughly the shape of the galaxy: wide, long and flat
+    return [
+        StarSystem(
+            f"{prefix} {number}",
+            Vector(
+                picker.uniform(-40000, 40000),
+                picker.uniform(-2000, 2000),
+                picker.uniform(-20000, 65000),
+            ),
+        )
+        for number in range(count)
+    ]
+
+
+def _stub_api(landmarks: typing.List[StarSystem], systems: typing.Dict[str, StarSystem]):
+    async def landmark(request: web.Request):
+        position = systems[request.query["name"]].position
+        nearest = min(landmarks, key=lambda candidate: candidate.position.distance(position))
+        return web.json_response(
+            {"landmarks": [{"name": nearest.name, "distance": nearest.position.distance(position)}]}
+        )
+
+    app = web.Application()
+    app.router.add_get("/landmark", landmark)
+    return TestServer(app)
+
+
+async def _run(args):
+    picker = random.Random(args.seed)
+    landmarks = _random_systems(picker, "Landmark", args.landmarks)
+    queries = _random_systems(picker, "System", args.iterations)
+    systems = {system.name: system for system in queries}
+
+    async with _stub_api(landmarks, systems) as server:
+        galaxy = Galaxy(str(server.make_url("/")))
+
+        start = time.perf_counter()
+        remote = []
+        for system in queries:
+            galaxy.clear_cache()
+            remote.append(await galaxy.find_nearest_landmark(StarSystem(system.name)))
+        remote_time = (time.perf_counter() - start) / len(queries)
+        await galaxy.close()
+
+    start = time.perf_counter()
+    galaxy.load_landmarks(landmarks)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    local = [await galaxy.find_nearest_landmark(system) for system in queries]
+    local_time = (time.perf_counter() - start) / len(queries)
+
+    agree = sum(
+        ours[0].name == theirs[0].name and ours[1] == theirs[1]
+        for ours, theirs in zip(local, remote)
+    )
+    print(f"landmarks:         {args.landmarks}")
+    print(f"index build:       {build_time * 1e3:.2f} ms")
+    print(f"remote (stub):     {remote_time * 1e6:9.1f} us per lookup")
+    print(f"local index:       {local_time * 1e6:9.1f} us per lookup")
+    print(f"speedup:           {remote_time / local_time:9.1f}x")
+    print(f"agreement:         {agree}/{len(queries)}")
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--landmarks", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    logger.remove()
+
+    asyncio.get_event_loop().run_until_complete(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+bench_list_render.py - cost of rendering ``!list`` for a busy board
+
+Fills a board with ``--rescues`` rescues and renders the list of them ``--lists`` times, the way
+``!list`` does: uncached, filtering the board and rendering every rescue each time, and through
+the render cache.  Every ``--churn`` lists one rescue is modified first, which makes the board
+render its list again, though only that rescue's fragment.  Reports microseconds per list.
+
+Usage::
+
+    python -m benchmarks.bench_list_render [--rescues N] [--lists N] [--churn N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import asyncio
+import functools
+import itertools
+import random
+import time
+import typing
+
+from loguru import logger
+
+from src.commands.case_management import _rescue_filter
+from src.packages.board import RatBoard
+from src.packages.utils import Platforms
+from src.templates import RescueRenderFlags, render_cache, template_environment
+
+FLAGS = (RescueRenderFlags(), RescueRenderFlags.from_word("-rs"), RescueRenderFlags.from_word("-a"))
+
+
+def _rescues(board: RatBoard, flags: RescueRenderFlags):
+    return list(itertools.filterfalse(
+        functools.partial(_rescue_filter, flags, None), iter(board.values())
+    ))
+
+
+async def _uncached(board: RatBoard, flags: RescueRenderFlags) -> str:
+    return await template_environment.get_template("list.jinja2").render_async(
+        rescues=_rescues(board, flags), flags=flags
+    )
+
+
+async def _cached(board: RatBoard, flags: RescueRenderFlags) -> str:
+    output = render_cache.rendered("list.jinja2", board, (flags, None))
+    if output is None:
+        output = await render_cache.render(
+            "list.jinja2", board, flags, key=(flags, None), rescues=_rescues(board, flags)
+        )
+    return output
+
+
+async def _run(render, board: RatBoard, lists: int, churn: int, seed: int) -> float:
+    """ seconds per list """
+    picker = random.Random(seed)
+    elapsed = 0.0
+    for number in range(lists):
+        if number % churn == 0:
+            async with board.modify_rescue(picker.choice(list(board))) as rescue:
+                rescue.system = f"system {number}"
+        start = time.perf_counter()
+        await render(board, FLAGS[number % len(FLAGS)])
+        elapsed += time.perf_counter() - start
+    return elapsed / lists
+
+
+async def _main(args) -> typing.Tuple[float, float]:
+    board = RatBoard(offline=True)
+    picker = random.Random(args.seed)
+    for number in range(args.rescues):
+        await board.create_rescue(
+            client=f"client_{number}",
+            platform=picker.choice([Platforms.PC, Platforms.XB, Platforms.PS]),
+            system=f"system {number}",
+            active=picker.random() > 0.2,
+        )
+
+    uncached = await _run(_uncached, board, args.lists, args.churn, args.seed)
+    render_cache.clear()
+    cached = await _run(_cached, board, args.lists, args.churn, args.seed)
+    board.snapshot.flush()
+    return uncached, cached
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rescues", type=int, default=30)
+    parser.add_argument("--lists", type=int, default=5_000)
+    parser.add_argument("--churn", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    uncached, cached = asyncio.run(_main(args))
+
+    print(f"lists:     {args.lists} of {args.rescues} rescues, a change every {args.churn}")
+    print(f"{'renders':>9} {'us/list':>11} {'speedup':>8}")
+    print(f"{'uncached':>9} {uncached * 1e6:>11.2f}")
+    print(f"{'cached':>9} {cached * 1e6:>11.2f} {uncached / cached:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
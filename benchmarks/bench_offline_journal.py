@@ -0,0 +1,110 @@
+"""
+bench_offline_journal.py - offline journal size and replay throughput
+
+Journals a burst of offline activity (every rescue created, modified a number of times and
+closed) to disk, then replays it to a mock API answering after a fixed latency.  Reports the
+journal's size, how fast changes are recorded and how fast they are replayed.
+
+Usage::
+
+    python -m benchmarks.bench_offline_journal [--rescues N] [--modifications N] [--latency S]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import typing
+
+from loguru import logger
+
+from src.packages.board.journal import OfflineJournal, JournalEvent
+from src.packages.rescue import Rescue
+
+
+class _MockApi:
+    """ answers every request after *latency* seconds """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+
+    async def _answer(self):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+
+    async def create_rescue(self, rescue, impersonating=None):
+        await self._answer()
+        return rescue
+
+    async def update_rescue(self, rescue, impersonating=None):
+        await self._answer()
+
+    async def get_rescue(self, key, impersonation=None):
+        await self._answer()
+
+
+def _record(journal: OfflineJournal, rescues: int, modifications: int) -> int:
+    users = ("some_rat", "some_ov")
+    changes = 0
+    for index in range(rescues):
+        rescue = Rescue(client=f"client{index}", irc_nickname=f"client{index}")
+        journal.record(JournalEvent.CREATE, rescue)
+        for modification in range(modifications):
+            rescue.system = f"sol-{modification}"
+            rescue.add_quote(f"quote {modification}", "some_rat")
+            journal.record(JournalEvent.UPDATE, rescue, users[modification * 2 // modifications])
+        journal.record(JournalEvent.CLOSE, rescue, users[-1])
+        changes += modifications + 2
+    return changes
+
+
+async def _run(args, path: str):
+    journal = OfflineJournal(path)
+    start = time.perf_counter()
+    changes = _record(journal, args.rescues, args.modifications)
+    recorded = time.perf_counter() - start
+    journal.close()
+    size = os.path.getsize(path)
+
+    start = time.perf_counter()
+    journal = OfflineJournal(path)
+    loaded = time.perf_counter() - start
+
+    api = _MockApi(args.latency)
+    start = time.perf_counter()
+    applied = await journal.replay(api)
+    replayed = time.perf_counter() - start
+
+    print(f"changes journaled:  {changes} ({args.rescues} rescues)")
+    print(f"journal size:       {size / 1024:.1f} KiB ({size / changes:.0f} B per change)")
+    print(f"record:             {recorded / changes * 1e6:.1f} us per change")
+    print(f"load:               {loaded * 1e3:.1f} ms")
+    print(f"API requests:       {api.requests} for {applied} coalesced changes")
+    print(f"replay:             {replayed * 1e3:.1f} ms, {changes / replayed:.0f} changes/s")
+    print(f"journal left:       {len(journal)} changes, {os.path.getsize(path)} B")
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rescues", type=int, default=200)
+    parser.add_argument("--modifications", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="mock API latency, seconds")
+    args = parser.parse_args(argv)
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.get_event_loop().run_until_complete(
+            _run(args, os.path.join(directory, "journal.bin"))
+        )
+
+
+if __name__ == "__main__":
+    main()
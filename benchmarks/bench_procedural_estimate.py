@@ -0,0 +1,126 @@
+"""
+bench_procedural_estimate.py - accuracy and throughput of procedural system position estimates
+
+Places systems at random in random grid-aligned sectors, names them procedurally, teaches a
+``ProceduralEstimator`` each sector from one of its systems and estimates every system's position
+from its name alone, singly and in bulk.  Reports how far off the estimates are, by mass code,
+and whether every system lies within the error radius its estimate claims.  A few real systems
+with known coordinates are checked the same way.
+
+Usage::
+
+    python -m benchmarks.bench_procedural_estimate [--sectors N] [--systems N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import collections
+import random
+import statistics
+import time
+import typing
+
+from loguru import logger
+
+from src.packages.utils import ProceduralEstimator, ProceduralName, Vector
+from src.packages.utils.procedural import GALAXY_ORIGIN, SECTOR_SIZE
+
+KNOWN_SYSTEMS = [
+    ("Eorld Pri QI-Z d1-4302", Vector(-320.0, -49.46875, 19636.6875)),
+    ("Prae Flyi RO-I b29-113", Vector(-586.125, -112.0625, 39248.5)),
+    ("Chua Eohn CT-F d12-2", Vector(-995.5, -162.59375, 58857.0)),
+]
+""" real systems and their coordinates, as in the Systems API test fixtures """
+
+# most systems are small, so the fine mass codes are far more common.
+MASS_CODE_WEIGHTS = {"a": 30, "b": 25, "c": 18, "d": 12, "e": 8, "f": 4, "g": 2, "h": 1}
+
+
+def _fixture(
+    picker: random.Random, sectors: int, systems: int
+) -> typing.List[typing.Tuple[str, str, Vector]]:
+    """ (sector, name, position) of *systems* systems, spread over *sectors* sectors """
+    origins = {
+        f"Sector{number} Bench": GALAXY_ORIGIN + Vector(
+            picker.randrange(80) * SECTOR_SIZE,
+            picker.randrange(64) * SECTOR_SIZE,
+            picker.randrange(100) * SECTOR_SIZE,
+        )
+        for number in range(sectors)
+    }
+    fixture = []
+    for _ in range(systems):
+        sector = picker.choice(list(origins))
+        mass_code = picker.choices(list(MASS_CODE_WEIGHTS), list(MASS_CODE_WEIGHTS.values()))[0]
+        # systems sit on a 1/32 ly grid
+        offset = [picker.randrange(SECTOR_SIZE * 32) / 32 for _ in range(3)]
+        width = 10 << "abcdefgh".index(mass_code)
+        boxel = tuple(int(value // width) for value in offset)
+        name = str(ProceduralName(sector.upper(), mass_code, boxel, picker.randrange(5000)))
+        fixture.append((sector, name, origins[sector] + Vector(*offset)))
+    return fixture
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sectors", type=int, default=500)
+    parser.add_argument("--systems", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    logger.remove()
+    picker = random.Random(args.seed)
+
+    fixture = _fixture(picker, args.sectors, args.systems)
+    estimator = ProceduralEstimator()
+    taught = set()
+    for sector, name, position in fixture:
+        if sector not in taught:
+            taught.add(sector)
+            estimator.learn(name, position)
+    names = [name for _, name, _ in fixture]
+
+    start = time.perf_counter()
+    single = [estimator.estimate(name) for name in names]
+    single_time = (time.perf_counter() - start) / len(names)
+    start = time.perf_counter()
+    bulk = estimator.estimate_many(names)
+    bulk_time = (time.perf_counter() - start) / len(names)
+    assert single == bulk
+
+    off_by = collections.defaultdict(list)
+    outside = 0
+    for (_, name, position), estimate in zip(fixture, bulk):
+        distance = estimate.position.distance(position)
+        off_by[ProceduralName.parse(name).mass_code].append((distance, estimate.error))
+        outside += distance > estimate.error + 1e-6
+
+    print(f"systems:            {len(names)} in {len(taught)} sectors")
+    print(f"estimate:           {single_time * 1e6:.1f} us per name")
+    print(f"estimate_many:      {bulk_time * 1e6:.1f} us per name")
+    print(f"outside the error:  {outside}")
+    print("mass code    systems    mean off    max off    error radius")
+    for mass_code in sorted(off_by):
+        distances = [distance for distance, _ in off_by[mass_code]]
+        print(
+            f"{mass_code:>9} {len(distances):>10} {statistics.mean(distances):>11.1f}"
+            f" {max(distances):>10.1f} {off_by[mass_code][0][1]:>15.1f}"
+        )
+
+    print("known systems, each sector taught by its own system:")
+    for name, position in KNOWN_SYSTEMS:
+        sibling = ProceduralEstimator()
+        sibling.learn(name, position)
+        estimate = sibling.estimate(name)
+        print(
+            f"  {name:<26} {estimate.position.distance(position):6.1f} ly off,"
+            f" error radius {estimate.error:.1f} ly"
+        )
+
+
+if __name__ == "__main__":
+    main()
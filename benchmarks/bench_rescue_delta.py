@@ -0,0 +1,105 @@
+"""
+bench_rescue_delta.py - cost of encoding rescue updates for the API
+
+Encodes the update of a rescue with 0, 50 and 500 quotes into the websocket request sent to the
+API, for a ``!sys`` edit (only the system changed) and for an edit of the quotes.  Each is done
+the way ``update_rescue`` did before (``Rescue.from_internal(rescue).to_delta(changes)``, built
+on ``attr.asdict`` of the whole rescue) and with ``encode_delta``.  Reports microseconds per
+request and the size of the serialised request.
+
+Usage::
+
+    python -m benchmarks.bench_rescue_delta [--repeat N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import time
+import typing
+
+import attr
+from loguru import logger
+
+from src.packages.fuelrats_api.v3.models.v1.rescue import Rescue as ApiRescue, encode_delta
+from src.packages.fuelrats_api.v3.websocket.protocol import Request
+from src.packages.rescue import Rescue
+from src.packages.utils import Platforms
+
+QUOTES = (0, 50, 500)
+
+_FIELD_MAP = {
+    "client": "client",
+    "system": "system",
+    "irc_nick": "clientNick",
+    "unidentified_rats": "unidentifiedRats",
+    "quotes": "quotes",
+    "title": "title",
+    "board_index": "commandIdentifier",
+    "lang_id": "clientLanguage",
+    "status": "status",
+    "code_red": "codeRed",
+    "platform": "platform",
+}
+
+
+def _asdict_delta(rescue: Rescue, changes: typing.Set[str]) -> typing.Dict:
+    """ update_rescue's payload as it was built before encode_delta """
+    api_rescue = ApiRescue.from_internal(rescue)
+    keep = {_FIELD_MAP[field] for field in changes}
+    data = attr.asdict(api_rescue, recurse=True)
+    data["attributes"] = {
+        key: value for key, value in data["attributes"].items() if key in keep
+    }
+    del data["links"]
+    del data["relationships"]
+    return data
+
+
+def _rescue(quotes: int) -> Rescue:
+    rescue = Rescue(client="some_client", system="sol", platform=Platforms.PC, board_index=4)
+    for number in range(quotes):
+        rescue.add_quote(f"[{number}] client is in open, fuel at {number % 100}%", "some_rat")
+    return rescue
+
+
+def _measure(
+    encode: typing.Callable[[Rescue, typing.Set[str]], typing.Dict],
+    rescue: Rescue,
+    changes: typing.Set[str],
+    repeat: int,
+) -> typing.Tuple[float, int]:
+    """ seconds per request, and its size in bytes """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        frame = Request(endpoint=["rescues", "update"], body={"data": encode(rescue, changes)})
+        serialized = frame.serialize()
+    return (time.perf_counter() - start) / repeat, len(serialized.encode("utf8"))
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+    logger.remove()
+
+    print(f"{'quotes':>6} {'edit':>7} {'asdict us':>10} {'delta us':>9} {'speedup':>8}"
+          f" {'bytes':>8}")
+    for quotes in QUOTES:
+        rescue = _rescue(quotes)
+        for label, changes in (("!sys", {"system"}), ("!quote", {"system", "quotes"})):
+            old, old_size = _measure(_asdict_delta, rescue, changes, args.repeat)
+            new, new_size = _measure(encode_delta, rescue, changes, args.repeat)
+            assert old_size == new_size, "the encoders disagree"
+            print(
+                f"{quotes:>6} {label:>7} {old * 1e6:>10.1f} {new * 1e6:>9.1f}"
+                f" {old / new:>7.1f}x {new_size:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+bench_rule_dispatch.py - rule dispatch micro-benchmark
+
+Registers increasing numbers of rules and times ``get_rule`` against the linear scan it
+replaced, for a message no rule matches (the common case for channel chatter) and for one
+matched by the last registered rule.
+
+Usage::
+
+    python -m benchmarks.bench_rule_dispatch [--iterations N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import time
+import typing
+
+from src.packages.rules.rules import rule, clear_rules, get_rule, _rules
+
+RULE_COUNTS = (10, 100, 250, 500)
+
+
+def _linear_scan(words: typing.List[str], words_eol: typing.List[str]):
+    """ get_rule as it was before rules were compiled into a dispatcher """
+    for rule_ in _rules:
+        subject = words_eol[0] if rule_.full_message else words[0]
+        match = rule_.pattern.match(subject)
+        if match is not None:
+            return rule_.underlying, (match,) if rule_.pass_match else ()
+    return None, ()
+
+
+def _register(count: int):
+    clear_rules()
+    for index in range(count):
+        # a mix of the shapes mecha's own rules take
+        if index % 3 == 0:
+            rule(rf"^signal{index}\b", full_message=True)(object())
+        elif index % 3 == 1:
+            rule(rf"cmd{index}(-\w+)?$", pass_match=True)(object())
+        else:
+            rule(rf"^Word{index}", case_sensitive=True)(object())
+
+
+def _time(func, words, words_eol, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(words, words_eol, prefixless=False) if func is get_rule else func(words, words_eol)
+    return (time.perf_counter() - start) / iterations
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    from loguru import logger
+    logger.remove()
+
+    miss = (["ratsignal", "hello", "there"], ["ratsignal hello there", "hello there", "there"])
+    print(f"{'rules':>6} {'case':>5} {'linear us':>10} {'dispatch us':>12}")
+    for count in RULE_COUNTS:
+        _register(count)
+        last = count - 1
+        last_word = f"cmd{last}" if last % 3 == 1 else f"Word{last}" if last % 3 else f"signal{last}"
+        hit = ([last_word, "x"], [f"{last_word} x", "x"])
+
+        for label, (words, words_eol) in (("miss", miss), ("last", hit)):
+            assert get_rule(words, words_eol, False)[0] is _linear_scan(words, words_eol)[0]
+            linear = _time(_linear_scan, words, words_eol, args.iterations)
+            dispatch = _time(get_rule, words, words_eol, args.iterations)
+            print(f"{count:>6} {label:>5} {linear * 1e6:>10.2f} {dispatch * 1e6:>12.2f}")
+    clear_rules()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+bench_user_cache.py - per-message cost of resolving the sender and their permission
+
+Replays messages from a busy channel the way a command sees them: a context is built with
+``Context.from_message``, its user looked up and checked for a permission.  This is done with the
+user cache, and the way it was done before: ``User.lookup`` building the user from pydle's record
+and ``has_required_permission`` resolving their vhost, for every message.  One message in
+``--churn`` changes its sender's host first, as pydle would record it, which drops them from the
+cache.  Reports microseconds per message.
+
+Usage::
+
+    python -m benchmarks.bench_user_cache [--messages N] [--nicks N] [--churn N]
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import asyncio
+import random
+import time
+import typing
+
+import cattr
+from loguru import logger
+
+from src.config import PLUGIN_MANAGER, load_config
+from src.config.datamodel import ConfigRoot
+from src.mechaclient import MechaClient
+from src.packages.context import Context
+from src.packages.permissions import RAT, has_required_permission, sender_has_permission
+from src.packages.user import User
+
+ROLES = ("recruit", "rat", "overseer", "techrat")
+
+
+async def _cached(bot: MechaClient, lines) -> float:
+    """ seconds per message, with the user cache """
+    start = time.perf_counter()
+    for nick, host in lines:
+        if host is not None:
+            bot._sync_user(nick, {"hostname": host})
+        context = await Context.from_message(bot, "#ratchat", nick, "!grab some_rat")
+        _ = context.user
+        sender_has_permission(context, RAT)
+    return (time.perf_counter() - start) / len(lines)
+
+
+async def _uncached(bot: MechaClient, lines) -> float:
+    """ seconds per message, building the user and resolving their vhost every time """
+    start = time.perf_counter()
+    for nick, host in lines:
+        if host is not None:
+            bot._sync_user(nick, {"hostname": host})
+        context = await Context.from_message(bot, "#ratchat", nick, "!grab some_rat")
+        user = User.lookup(bot, context.sender)
+        has_required_permission(user, RAT)
+    return (time.perf_counter() - start) / len(lines)
+
+
+def main(argv: typing.Optional[typing.List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--nicks", type=int, default=200)
+    parser.add_argument("--churn", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    config = cattr.structure(load_config("testing.toml")[0], ConfigRoot)
+    PLUGIN_MANAGER.hook.rehash_handler(data=config)  # pylint: disable=no-member
+    picker = random.Random(args.seed)
+
+    bot = MechaClient(nickname=config.irc.nickname, mecha_config=config)
+    nicks = [f"rat_{number}[PC]" for number in range(args.nicks)]
+    for nick in nicks:
+        bot.users[nick.casefold()] = {
+            "nickname": nick, "username": nick,
+            "hostname": f"{nick}@{nick}.{picker.choice(ROLES)}.fuelrats.com",
+            "away": False, "away_message": None, "account": nick, "identified": True,
+            "realname": nick,
+        }
+    lines = []
+    for number in range(args.messages):
+        nick = picker.choice(nicks).casefold()
+        host = None
+        if number % args.churn == 0:
+            host = f"{nick}@{nick}.{picker.choice(ROLES)}.fuelrats.com"
+        lines.append((nick, host))
+
+    uncached = asyncio.run(_uncached(bot, lines))
+    bot.user_cache.clear()
+    cached = asyncio.run(_cached(bot, lines))
+
+    print(f"messages:  {len(lines)} from {len(nicks)} nicks, a host change every {args.churn}")
+    print(f"{'users':>9} {'us/message':>11} {'speedup':>8}")
+    print(f"{'uncached':>9} {uncached * 1e6:>11.2f}")
+    print(f"{'cached':>9} {cached * 1e6:>11.2f} {uncached / cached:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -76,6 +76,10 @@ async def start():
         raise ValueError(f"unknown authentication mechanism {auth_method}")
 
     client = MechaClient(**client_args, mecha_config=config)
+    # cases open when we went down are back before anyone asks, the API catches up meanwhile.
+    logger.info("restored {} rescues from the board snapshot", await client.board.restore())
+    if config.api.online_mode:
+        asyncio.ensure_future(client.hydrate_board())
 
     logger.info("connecting to irc...")
     await client.connect(hostname=config.irc.server,
@@ -19,6 +19,7 @@ from ..config import setup
 from ..packages.cli_manager import cli_manager
 from ..packages.commands import command
 from ..packages.context import Context
+from ..packages.outbound import Priority
 from ..packages.permissions import TECHRAT, RECRUIT
 
 
@@ -51,6 +52,8 @@ async def cmd_rehash(context: Context):
 @command("version", require_permission=RECRUIT)
 async def cmd_version(ctx: Context):
     try:
-        return await ctx.reply(f"SPARK version {metadata.version('pipsqueak3')}")
+        return await ctx.reply(
+            f"SPARK version {metadata.version('pipsqueak3')}", priority=Priority.LOW
+        )
     except metadata.PackageNotFoundError:
-        return await ctx.reply("SPARK version ?.?.? (dirty)")
+        return await ctx.reply("SPARK version ?.?.? (dirty)", priority=Priority.LOW)
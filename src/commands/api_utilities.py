@@ -24,9 +24,7 @@ async def cmd_ratid(context: Context):
         return await context.reply("Usage: !ratid <irc_nickname>")
     tokens = RATID_PATTERN.parseString(context.words_eol[0])
 
-    results = await context.bot.api_handler.get_rat(
-        key=tokens.subject[0], impersonation=context.user.account
-    )
+    results = await context.bot.rat_cache.get_rats(tokens.subject[0])
 
     if not results:
         return await context.reply(f"no rats found for {tokens.subject[0]!r}.")
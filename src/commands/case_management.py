@@ -8,6 +8,7 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE.md
 """
+import asyncio
 import functools
 import io
 import itertools
@@ -20,7 +21,7 @@ import humanfriendly
 import pyparsing
 from loguru import logger
 
-from ..templates import RescueRenderFlags, template_environment
+from ..templates import RescueRenderFlags, render_cache, template_environment
 from ..packages.commands import command
 from ..packages.context.context import Context
 from ..packages.parsing_rules import (
@@ -37,6 +38,7 @@ from ..packages.permissions.permissions import (
     OVERSEER,
 )
 from ..packages.quotation.rat_quotation import Quotation
+from ..packages.outbound import Priority
 from ..packages.rat import Rat
 from ..packages.rescue import Rescue
 from ..packages.utils import Platforms, Status, color, bold, Colors
@@ -46,6 +48,11 @@ _TIME_RE = re.compile(r"(\d+)[: ](\d+)")
 Regex matcher used to find a time within a string. Used to determine
 if a newly-submitted case is code red or not.
 """
+IDENTIFY_TIMEOUT = 2.0
+"""
+Seconds !assign waits for a rat to be identified, rats taking longer are assigned unidentified.
+Looking rats up waits for the API to connect, which can take a while when it is unreachable.
+"""
 ASSIGN_PATTERN = (
     suppress_first_word
     + rescue_identifier.setResultsName("subject")
@@ -70,7 +77,11 @@ CMDR_PATTERN = (
     + rest_of_line.setResultsName("new_cmdr")
 )
 
-GRAB_PATTERN = suppress_first_word + rescue_identifier.setResultsName("subject")
+GRAB_PATTERN = (
+    suppress_first_word
+    + rescue_identifier.setResultsName("subject")
+    + pyparsing.Optional(pyparsing.Word(pyparsing.nums)).setResultsName("back")
+)
 
 IRC_NICK_PATTERN = (
     suppress_first_word
@@ -180,13 +191,21 @@ async def cmd_case_management_assign(ctx: Context):
     # Get client's IRC nick, otherwise use client name as entered
     rescue_client = rescue.irc_nickname if rescue.irc_nickname else rescue.client
 
+    identified = await _identify_rats(ctx, rat_list, rescue.platform)
+
     async with ctx.bot.board.modify_rescue(rescue.board_index) as case:
         logger.debug("assigning {!r} to case {}", rat_list, rescue.board_index)
         for name in rat_list:
-            rat = Rat(name=name.casefold(), uuid=None)
+            found = identified.get(name.casefold())
+            # rats stay known by the nickname they were assigned as, for !unassign
+            rat = Rat(
+                name=name.casefold(),
+                uuid=found.uuid if found else None,
+                platform=found.platform if found else None,
+            )
             await case.add_rat(rat)
 
-            if rat.name in case.unidentified_rats and not ctx.DRILL_MODE:
+            if rat.unidentified and not ctx.DRILL_MODE:
                 await ctx.reply(f"Warning: {name!r} is NOT identified.")
 
     await ctx.reply(
@@ -195,6 +214,33 @@ async def cmd_case_management_assign(ctx: Context):
     )
 
 
+async def _identify_rats(
+    ctx: Context, names: typing.Iterable[str], platform: typing.Optional[Platforms]
+) -> typing.Dict[str, Rat]:
+    """
+    The rats of *names* identified within :data:`IDENTIFY_TIMEOUT`, by casefolded name.
+
+    Every rat is looked up at once, those seen recently don't even cost an API call.
+    """
+    keys = list(dict.fromkeys(name.casefold() for name in names))
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(ctx.bot.rat_cache.get_rat_by_name(key, platform), IDENTIFY_TIMEOUT)
+            for key in keys
+        ),
+        return_exceptions=True,
+    )
+    identified = {}
+    for key, result in zip(keys, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning("gave up identifying rat {!r}, the API took too long", key)
+        elif isinstance(result, Exception):
+            logger.opt(exception=result).error("unable to identify rat {!r}", key)
+        elif result is not None:
+            identified[key] = result
+    return identified
+
+
 @command("clear", "close", require_permission=RAT, require_channel=True)
 async def cmd_case_management_clear(ctx: Context):
     if not CLEAR_PATTERN.matches(ctx.words_eol[0]):
@@ -274,10 +320,14 @@ async def cmd_case_management_codered(ctx: Context):
             notifiers = {name for name in case.rats.keys()}
             notifiers.update({name for name in case.unidentified_rats.keys()})
             await ctx.reply(
-                f"Code Red! {case.client} is on {bold(color('Emergency Oxygen!', Colors.RED))}"
+                f"Code Red! {case.client} is on {bold(color('Emergency Oxygen!', Colors.RED))}",
+                priority=Priority.URGENT,
             )
             if notifiers:
-                await ctx.reply(f"{', '.join(notifiers)} this is {bold('YOUR')} case!")
+                await ctx.reply(
+                    f"{', '.join(notifiers)} this is {bold('YOUR')} case!",
+                    priority=Priority.URGENT,
+                )
         else:
             await ctx.reply(f"{case.client} is no longer a Code Red.")
 
@@ -318,15 +368,18 @@ async def cmd_case_management_epic(ctx: Context):
 @command("grab", require_channel=True, require_permission=RAT)
 async def cmd_case_management_grab(ctx: Context):
     if not GRAB_PATTERN.matches(ctx.words_eol[0]):
-        await ctx.reply("Usage: !grab <Client Name>")
+        await ctx.reply("Usage: !grab <Client Name> [lines back]")
         return
     tokens = GRAB_PATTERN.parseString(ctx.words_eol[0])
+    # how many lines back to grab from, the last one unless told otherwise
+    back = int(tokens.back[0]) if tokens.back else 1
+    history = ctx.bot.message_history
     # Pass case to validator, return a case if found or None
     rescue: Rescue = ctx.bot.board.get(tokens.subject[0])
 
     subject = rescue.irc_nickname.casefold() if rescue else ctx.words[1].casefold()
-    logger.debug("checking for last message of irc nick {!r}...", subject)
-    last_message = ctx.bot.last_user_message.get(subject)
+    logger.debug("checking for line {} back of irc nick {!r}...", back, subject)
+    last_message = history.line(subject, back)
     logger.debug("last_message = {!r}", last_message)
     if not last_message:
         return await ctx.reply(f"Cannot comply: {ctx.words[1]} has not spoken recently.")
@@ -337,11 +390,11 @@ async def cmd_case_management_grab(ctx: Context):
             f"Please first create one with '!inject {tokens.subject[0]} [CR] [PC/PS/XB]'"
         )
 
-    if ctx.words[1].casefold() in ctx.bot.last_user_message:
-        last_message = ctx.bot.last_user_message[ctx.words[1].casefold()]
+    if ctx.words[1].casefold() in history:
+        last_message = history.line(ctx.words[1], back)
     elif int(ctx.words[1]) in ctx.bot.board:
-        if rescue.client.casefold() in ctx.bot.last_user_message:
-            last_message = ctx.bot.last_user_message[rescue.client.casefold()]
+        if rescue.client.casefold() in history:
+            last_message = history.line(rescue.client, back)
 
         else:
             await ctx.reply("Nothing to grab from that client.")
@@ -349,6 +402,9 @@ async def cmd_case_management_grab(ctx: Context):
     else:
         await ctx.reply("Nothing to grab from that client.")
         return
+    if last_message is None:
+        await ctx.reply("Nothing to grab from that client.")
+        return
 
     async with ctx.bot.board.modify_rescue(rescue) as case:
         case.add_quote(last_message, ctx.words[1].casefold())
@@ -396,11 +452,14 @@ async def cmd_case_management_inject(ctx: Context):
                 case.code_red = True
 
             await ctx.reply(
-                f"{case.client}'s case opened with: " f"{ctx.words_eol[0]}  (Case {case.board_index})"
+                f"{case.client}'s case opened with: {ctx.words_eol[0]}  (Case {case.board_index})",
+                priority=Priority.URGENT,
             )
 
             if case.code_red:
-                await ctx.reply(f"Code Red! {case.client} is on Emergency Oxygen!")
+                await ctx.reply(
+                    f"Code Red! {case.client} is on Emergency Oxygen!", priority=Priority.URGENT
+                )
 
             return
 
@@ -719,11 +778,20 @@ async def cmd_list(ctx: Context):
     if(len(flags.unused_flags) > 0):
         return await _list_show_correct_usage(ctx, f"Unused remaining flags: {flags.unused_flags}")
 
-    rescues = list(itertools.filterfalse(
-        functools.partial(_rescue_filter, flags, platform_filter),
-        iter(ctx.bot.board.values())
-    ))
-    logger.debug("{} matching rescues, rescues :={!r}", len(rescues), rescues)
+    # the board didn't change since this list was last asked for, nothing needs filtering
+    output = render_cache.rendered("list.jinja2", ctx.bot.board, (flags, platform_filter))
+    if output is None:
+        rescues = list(itertools.filterfalse(
+            functools.partial(_rescue_filter, flags, platform_filter),
+            iter(ctx.bot.board.values())
+        ))
+        logger.debug("{} matching rescues, rescues :={!r}", len(rescues), rescues)
+        output = await render_cache.render(
+            "list.jinja2", ctx.bot.board, flags, key=(flags, platform_filter), rescues=rescues
+        )
+
+    if output:
+        return await ctx.reply(output.rstrip("\n"))
 
     if (
         (flags.filter_active_rescues ^ flags.filter_inactive_rescues)
@@ -734,13 +802,6 @@ async def cmd_list(ctx: Context):
     else:
         matching_filter = ""
 
-    output = await template_environment.get_template("list.jinja2").render_async(
-        rescues=rescues, flags=flags
-    )
-
-    if rescues:
-        return await ctx.reply(output.rstrip("\n"))
-
     await ctx.reply(f"No open rescues{matching_filter}.")
 
 
@@ -819,7 +880,7 @@ async def cmd_reopen(context: Context):
             logger.debug(
                 "board index collision, reassigning re-opened case's index to avoid conflict."
             )
-            rescue.board_index = context.bot.board.free_case_number
+            rescue.board_index = context.bot.board.acquire_case_number()
         logger.trace("appending reopened rescue to board")
 
         await context.bot.board.append(rescue)
@@ -19,10 +19,13 @@ from src.config import PLUGIN_MANAGER
 from src.packages.commands import command
 from src.packages.context.context import Context
 from src.packages.fuelrats_api.v3 import UnauthorizedImpersonation
+from src.packages.outbound import Priority
 from src.packages.permissions.permissions import TECHRAT
 
 
-@command("debug-whois", require_channel=True, require_permission=TECHRAT)
+@command(
+    "debug-whois", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_debug_whois(context):
     """A debug command for running a WHOIS command.
 
@@ -34,7 +37,9 @@ async def cmd_debug_whois(context):
     await context.reply(f"{data}")
 
 
-@command("debug-userinfo", require_channel=True, require_permission=TECHRAT)
+@command(
+    "debug-userinfo", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_debug_userinfo(context: Context):
     """
     A debug command for getting information about a user.
@@ -46,7 +51,9 @@ async def cmd_debug_userinfo(context: Context):
     )
 
 
-@command("getConfigPlugins", require_channel=True, require_permission=TECHRAT)
+@command(
+    "getConfigPlugins", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_get_plugins(context: Context):
     """Lists configuration plugins"""
     await context.reply(f"getting plugins...")
@@ -56,7 +63,9 @@ async def cmd_get_plugins(context: Context):
     await context.reply(",".join(names))
 
 
-@command("get_nickname_api", require_channel=True, require_permission=TECHRAT)
+@command(
+    "get_nickname_api", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_get_nickname(context: Context):
     await context.reply("fetching....")
     result = await context.bot.api_handler.get_rat(
@@ -66,7 +75,9 @@ async def cmd_get_nickname(context: Context):
     logger.debug("got nickname result {!r}", result)
 
 
-@command("debug_ratid", require_channel=True, require_permission=TECHRAT)
+@command(
+    "debug_ratid", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_ratid(context: Context):
     target = context.words[-1]
     await context.reply(f"acquiring ratids for {target!r}...")
@@ -76,7 +87,9 @@ async def cmd_ratid(context: Context):
     await context.reply(",".join([f"{rat.uuid}" for rat in api_rats]))
 
 
-@command("debug_get_rat", require_channel=True, require_permission=TECHRAT)
+@command(
+    "debug_get_rat", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_debug_get_rat(context: Context):
     target = context.words[-1]
     try:
@@ -88,7 +101,9 @@ async def cmd_debug_get_rat(context: Context):
     await context.reply(f"identified rats: {','.join(repr(obj.name) for obj in subject)}")
 
 
-@command("debug_summoncase", require_channel=True, require_permission=TECHRAT)
+@command(
+    "debug_summoncase", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_debug_summoncase(context: Context):
     await context.reply("summoning case....")
     rescue = await context.bot.board.create_rescue(client="some_client")
@@ -96,7 +111,9 @@ async def cmd_debug_summoncase(context: Context):
     await context.reply("done.")
 
 
-@command("debug_fbr", require_channel=True, require_permission=TECHRAT)
+@command(
+    "debug_fbr", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_debug_fetch(context: Context):
     await context.reply("flushing my board and fetching...")
     keys = context.bot.board.keys()
@@ -115,7 +132,9 @@ async def cmd_debug_fetch(context: Context):
         await context.bot.board.append(rescue)
 
 
-@command("debug_fetch_rescue", require_channel=True, require_permission=TECHRAT)
+@command(
+    "debug_fetch_rescue", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_debug_fetch_single(context: Context):
     uid = UUID(context.words[-1])
     await context.reply(f"fetching @{uid}...")
@@ -126,7 +145,12 @@ async def cmd_debug_fetch_single(context: Context):
         await context.reply("go fish.")
 
 
-@command("debug_update_rescue", require_channel=True, require_permission=TECHRAT)
+@command(
+    "debug_update_rescue",
+    require_channel=True,
+    require_permission=TECHRAT,
+    reply_priority=Priority.LOW,
+)
 async def cmd_update_rescue(context: Context):
     uid = UUID(context.words[-1])
     if uid not in context.bot.board:
@@ -144,7 +168,9 @@ async def cmd_update_rescue(context: Context):
     await context.reply("done.")
 
 
-@command("debug_go_online", require_channel=True, require_permission=TECHRAT)
+@command(
+    "debug_go_online", require_channel=True, require_permission=TECHRAT, reply_priority=Priority.LOW
+)
 async def cmd_debug_go_online(context: Context):
     await context.reply("going online...")
     context.bot.board.api_handler = context.bot.api_handler
@@ -0,0 +1,31 @@
+"""
+Validators shared by the configuration datamodels
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import typing
+
+import attr
+
+
+def non_negative_number(instance, attribute: attr.Attribute, value: typing.Any):
+    """
+    Validate *value* is a number that isn't negative.
+
+    Whole numbers are accepted as well, TOML reads ``delay = 1`` as an int.
+
+    Raises:
+        TypeError: *value* isn't a number
+        ValueError: *value* is negative
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(
+            f"{attribute.name!r} must be a number (got {value!r} that is a {type(value)!r})."
+        )
+    if value < 0:
+        raise ValueError(f"{attribute.name!r} must not be negative (got {value!r}).")
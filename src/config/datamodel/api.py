@@ -10,10 +10,12 @@ See LICENSE.md
 """
 
 
-from typing import Optional
+from typing import Dict, Optional
 
 import attr
 
+from ._validators import non_negative_number
+
 
 @attr.dataclass
 class FuelratsApiConfigRoot:
@@ -25,6 +27,21 @@ class FuelratsApiConfigRoot:
         ),
         default=None,
     )
+    request_timeout: float = attr.ib(validator=non_negative_number, default=10.0)
+    endpoint_timeouts: Dict[str, float] = attr.ib(
+        validator=attr.validators.deep_mapping(
+            key_validator=attr.validators.instance_of(str),
+            value_validator=non_negative_number,
+        ),
+        factory=dict,
+    )
+    max_in_flight: int = attr.ib(validator=attr.validators.instance_of(int), default=16)
+    json_backend: str = attr.ib(
+        validator=attr.validators.in_(("json", "orjson", "ujson")), default="json"
+    )
+    rat_cache_size: int = attr.ib(validator=attr.validators.instance_of(int), default=1024)
+    rat_cache_ttl: float = attr.ib(validator=non_negative_number, default=900.0)
+    rat_negative_cache_ttl: float = attr.ib(validator=non_negative_number, default=60.0)
 
 
 @attr.dataclass
@@ -32,3 +49,12 @@ class StarsystemApiConfigRoot:
     url: str = attr.ib(
         validator=attr.validators.instance_of(str), default="https://system.api.fuelrats.com/"
     )
+    max_connections: int = attr.ib(validator=attr.validators.instance_of(int), default=10)
+    keepalive_timeout: float = attr.ib(validator=non_negative_number, default=30.0)
+    dns_cache_ttl: int = attr.ib(validator=attr.validators.instance_of(int), default=300)
+    cache_size: int = attr.ib(validator=attr.validators.instance_of(int), default=1024)
+    cache_ttl: float = attr.ib(validator=non_negative_number, default=3600.0)
+    negative_cache_ttl: float = attr.ib(validator=non_negative_number, default=60.0)
+    landmarks_file: str = attr.ib(validator=attr.validators.instance_of(str), default="")
+    landmarks_refresh: float = attr.ib(validator=non_negative_number, default=3600.0)
+    snapshot_file: str = attr.ib(validator=attr.validators.instance_of(str), default="")
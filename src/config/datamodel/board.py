@@ -12,7 +12,13 @@ See LICENSE.md
 
 import attr
 
+from ._validators import non_negative_number
+
 
 @attr.dataclass
 class BoardConfigRoot:
     cycle_at: int = attr.ib(validator=attr.validators.instance_of(int))
+    update_delay: float = attr.ib(validator=non_negative_number, default=0.5)
+    journal_path: str = attr.ib(validator=attr.validators.instance_of(str), default="")
+    snapshot_path: str = attr.ib(validator=attr.validators.instance_of(str), default="")
+    snapshot_delay: float = attr.ib(validator=non_negative_number, default=1.0)
@@ -0,0 +1,23 @@
+"""
+Message history configuration datamodel
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+
+
+import attr
+
+from ._validators import non_negative_number
+
+
+@attr.dataclass
+class MessageHistoryConfigRoot:
+    max_users: int = attr.ib(validator=attr.validators.instance_of(int), default=10_000)
+    lines_per_user: int = attr.ib(validator=attr.validators.instance_of(int), default=5)
+    ttl: float = attr.ib(validator=non_negative_number, default=43200.0)
+    memory_budget: int = attr.ib(validator=attr.validators.instance_of(int), default=16_777_216)
@@ -0,0 +1,25 @@
+"""
+Outbound message scheduling configuration datamodel
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+
+
+import attr
+
+from ._validators import non_negative_number
+
+
+@attr.dataclass
+class OutboundConfigRoot:
+    rate: float = attr.ib(validator=non_negative_number, default=1.0)
+    burst: int = attr.ib(validator=attr.validators.instance_of(int), default=5)
+    connection_rate: float = attr.ib(validator=non_negative_number, default=2.0)
+    connection_burst: int = attr.ib(validator=attr.validators.instance_of(int), default=10)
+    line_bytes: int = attr.ib(validator=attr.validators.instance_of(int), default=350)
+    coalesce_below: int = attr.ib(validator=attr.validators.instance_of(int), default=80)
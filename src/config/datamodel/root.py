@@ -18,6 +18,8 @@ from .board import BoardConfigRoot
 from .permissions import PermissionsConfigRoot
 from .irc import IRCConfigRoot
 from .gelf import LoggingConfigRoot
+from .history import MessageHistoryConfigRoot
+from .outbound import OutboundConfigRoot
 from .database import DatabaseConfigRoot
 from .commands import CommandsConfigRoot
 from .api import FuelratsApiConfigRoot, StarsystemApiConfigRoot
@@ -40,3 +42,5 @@ class ConfigRoot:
     system_api: StarsystemApiConfigRoot
     ratsignal_parser: RatmamaConfigRoot
     telemetry: TelemetryConfigRoot = attr.ib(factory=TelemetryConfigRoot)
+    message_history: MessageHistoryConfigRoot = attr.ib(factory=MessageHistoryConfigRoot)
+    outbound: OutboundConfigRoot = attr.ib(factory=OutboundConfigRoot)
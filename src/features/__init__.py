@@ -0,0 +1,18 @@
+"""
+__init__.py
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from src.config import PLUGIN_MANAGER
+from .message_history import MessageHistory, MessageHistoryClient
+from .user_cache import UserCache, UserCacheClient
+
+__all__ = ["MessageHistory", "MessageHistoryClient", "UserCache", "UserCacheClient"]
+
+PLUGIN_MANAGER.register(MessageHistoryClient, "message_history")
+PLUGIN_MANAGER.register(UserCacheClient, "user_cache")
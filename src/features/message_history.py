@@ -1,24 +1,265 @@
+"""
+message_history.py - Bounded history of what users said recently
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import sys
+import time
 import typing
+import weakref
+from collections import OrderedDict, deque
 
+import prometheus_client
 from pydle.features.rfc1459.client import RFC1459Support
 
+from src.config import CONFIG_MARKER
+from src.config.datamodel import ConfigRoot
+from src.packages.utils import gauge_total
+
+HISTORY_USERS = prometheus_client.Gauge(
+    namespace="message_history",
+    name="users",
+    documentation="users whose recent lines are kept",
+)
+HISTORY_LINES = prometheus_client.Gauge(
+    namespace="message_history",
+    name="lines",
+    documentation="lines kept in the message history",
+)
+HISTORY_BYTES = prometheus_client.Gauge(
+    namespace="message_history",
+    name="size",
+    unit="bytes",
+    documentation="memory taken by the lines kept in the message history",
+)
+
+_Line = typing.Tuple[float, str, str]
+""" when a line was said, the channel it was said in and the line itself """
+
+
+class MessageHistory(typing.MutableMapping[str, str]):
+    """
+    The last few lines each user said, by case-insensitive nickname.
+
+    As a mapping, a nickname maps to the last line the user said.  Users are forgotten least
+    recently active first once there are more than *max_users* of them, or their lines take
+    more than *memory_budget* bytes.  Lines are forgotten once they are *ttl* seconds old, or
+    the user said another *lines_per_user* lines since.
+
+    Examples:
+        >>> history = MessageHistory(max_users=2, lines_per_user=2, ttl=60.0)
+        >>> history.record("Some_Rat", "o7", channel="#FuelRats")
+        >>> history.record("some_rat", "jumping now", channel="#ratchat")
+        >>> history.record("some_rat", "client in sight", channel="#ratchat")
+        >>> history["SOME_RAT"], history.lines("some_rat")
+        ('client in sight', ['jumping now', 'client in sight'])
+        >>> history.line("some_rat", back=2), history.last_in("#fuelrats", "some_rat")
+        ('jumping now', None)
+    """
+
+    __slots__ = ["max_users", "lines_per_user", "ttl", "memory_budget", "_users", "_lines",
+                 "_bytes"]
+
+    def __init__(
+        self,
+        max_users: int = 10_000,
+        lines_per_user: int = 5,
+        ttl: float = 43200.0,
+        memory_budget: int = 16_777_216,
+    ):
+        self.max_users = max_users
+        """ maximum number of users whose lines are kept """
+        self.lines_per_user = lines_per_user
+        """ lines kept per user """
+        self.ttl = ttl
+        """ seconds a line is kept for """
+        self.memory_budget = memory_budget
+        """ bytes the kept lines may take at most """
+        self._users: typing.MutableMapping[str, typing.Deque[_Line]] = OrderedDict()
+        """ lines by casefolded nickname, least recently active user first """
+        self._lines = 0
+        self._bytes = 0
+
+    @property
+    def line_count(self) -> int:
+        """ number of lines kept """
+        return self._lines
+
+    @property
+    def nbytes(self) -> int:
+        """ memory taken by the lines kept """
+        return self._bytes
+
+    def configure(self, max_users: int, lines_per_user: int, ttl: float, memory_budget: int):
+        """
+        Apply new limits, keeping whatever lines still fit them.
+        """
+        self.max_users, self.ttl, self.memory_budget = max_users, ttl, memory_budget
+        if lines_per_user != self.lines_per_user:
+            self.lines_per_user = lines_per_user
+            for key, lines in self._users.items():
+                self._users[key] = deque(lines, maxlen=max(lines_per_user, 0))
+            self._recount()
+        self._trim(time.monotonic())
+
+    def clear(self):
+        """ Forget everything """
+        self._users.clear()
+        self._lines = self._bytes = 0
+
+    def _recount(self):
+        self._lines = sum(len(lines) for lines in self._users.values())
+        self._bytes = sum(
+            sys.getsizeof(line[2]) for lines in self._users.values() for line in lines
+        )
+
+    def _forget(self, lines: typing.Deque[_Line]):
+        self._lines -= len(lines)
+        self._bytes -= sum(sys.getsizeof(message) for _, _, message in lines)
+
+    def _trim(self, now: float):
+        # users are in order of activity, so the first one's lines are the oldest
+        oldest = now - self.ttl
+        while self._users:
+            key, lines = next(iter(self._users.items()))
+            if (
+                len(self._users) <= self.max_users
+                and self._bytes <= self.memory_budget
+                and lines[-1][0] > oldest
+            ):
+                return
+            del self._users[key]
+            self._forget(lines)
+
+    def record(self, nickname: str, message: str, channel: str = ""):
+        """
+        Remember that *nickname* just said *message*, in *channel* if it was said in one.
+        """
+        if self.lines_per_user <= 0 or self.max_users <= 0 or self.ttl <= 0:
+            return
+        now = time.monotonic()
+        key = nickname.casefold()
+        lines = self._users.get(key)
+        if lines is None:
+            lines = self._users[key] = deque(maxlen=self.lines_per_user)
+        else:
+            self._users.move_to_end(key)
+            if len(lines) == lines.maxlen:
+                # the oldest line is about to drop out
+                self._lines -= 1
+                self._bytes -= sys.getsizeof(lines[0][2])
+        lines.append((now, channel.casefold(), message))
+        self._lines += 1
+        self._bytes += sys.getsizeof(message)
+        self._trim(now)
+
+    def _recent(self, nickname: str) -> typing.List[_Line]:
+        lines = self._users.get(nickname.casefold())
+        if not lines:
+            return []
+        oldest = time.monotonic() - self.ttl
+        return [line for line in lines if line[0] > oldest]
+
+    def lines(self, nickname: str) -> typing.List[str]:
+        """
+        The lines *nickname* said recently, oldest first.
+        """
+        return [message for _, _, message in self._recent(nickname)]
+
+    def line(self, nickname: str, back: int = 1) -> typing.Optional[str]:
+        """
+        The line *nickname* said *back* lines ago, ``1`` being the last one, if it's still kept.
+        """
+        recent = self._recent(nickname)
+        if not 0 < back <= len(recent):
+            return None
+        return recent[-back][2]
+
+    def last_in(self, channel: str, nickname: str) -> typing.Optional[str]:
+        """
+        The last line *nickname* said in *channel*, if it's still kept.
+        """
+        channel = channel.casefold()
+        for _, said_in, message in reversed(self._recent(nickname)):
+            if said_in == channel:
+                return message
+        return None
+
+    def __getitem__(self, nickname: str) -> str:
+        message = self.line(nickname)
+        if message is None:
+            raise KeyError(nickname)
+        return message
+
+    def __setitem__(self, nickname: str, message: str):
+        self.record(nickname, message)
+
+    def __delitem__(self, nickname: str):
+        self._forget(self._users.pop(nickname.casefold()))
+
+    def __iter__(self) -> typing.Iterator[str]:
+        self._trim(time.monotonic())
+        return iter(list(self._users))
+
+    def __len__(self) -> int:
+        self._trim(time.monotonic())
+        return len(self._users)
+
 
 class MessageHistoryClient(RFC1459Support):
-    __slots__ = [
-        "__channel_history"
-    ]
+    _instances: typing.ClassVar[typing.MutableSet["MessageHistoryClient"]] = weakref.WeakSet()
+
+    MAX_USERS = 10_000
+    "The maximum number of users whose recent lines are kept."
+
+    LINES_PER_USER = 5
+    "Lines kept per user."
+
+    TTL = 43200.0
+    "Seconds a line is kept for."
+
+    MEMORY_BUDGET = 16_777_216
+    "Bytes the kept lines may take at most."
+
+    @classmethod
+    @CONFIG_MARKER
+    def rehash_handler(cls, data: ConfigRoot):
+        """
+        Apply new configuration data
+
+        Args:
+            data (ConfigRoot): new configuration data to apply.
+        """
+        cls.MAX_USERS = data.message_history.max_users
+        cls.LINES_PER_USER = data.message_history.lines_per_user
+        cls.TTL = data.message_history.ttl
+        cls.MEMORY_BUDGET = data.message_history.memory_budget
+        for client in list(cls._instances):
+            client.message_history.configure(*cls._limits())
+
+    @classmethod
+    def _limits(cls) -> typing.Tuple[int, int, float, int]:
+        return cls.MAX_USERS, cls.LINES_PER_USER, cls.TTL, cls.MEMORY_BUDGET
 
     def __init__(self, nickname, fallback_nicknames=[], username=None, realname=None, eventloop=None,
                  **kwargs):
         super().__init__(nickname, fallback_nicknames, username, realname, eventloop, **kwargs)
-        self.__channel_history: typing.Dict[str, typing.Dict[str, str]] = {}
+        self.__history = MessageHistory(*self._limits())
+        # not self._instances, other features' clients keep sets of the same name
+        MessageHistoryClient._instances.add(self)
+
+    @property
+    def message_history(self) -> MessageHistory:
+        """ What users said recently """
+        return self.__history
 
     async def on_message(self, target: str, by: str, message: str):
-        target = target.casefold()
-        # ensure target exists in tracking
-        if target not in self.__channel_history:
-            self.__channel_history[target] = {}
-        self.__channel_history[target][by] = message
+        self.__history.record(by, message, channel=target)
 
         return await super().on_message(target, by, message)
 
@@ -26,5 +267,13 @@ class MessageHistoryClient(RFC1459Support):
         """
         Fetches the last thing a specified user said in a specified channel the bot could see.
         """
-        users = self.__channel_history.get(channel, {})
-        return users.get(user)
+        return self.__history.last_in(channel, user)
+
+
+gauge_total(HISTORY_USERS, MessageHistoryClient._instances, lambda client: len(client.message_history))
+gauge_total(
+    HISTORY_LINES, MessageHistoryClient._instances, lambda client: client.message_history.line_count
+)
+gauge_total(
+    HISTORY_BYTES, MessageHistoryClient._instances, lambda client: client.message_history.nbytes
+)
@@ -0,0 +1,172 @@
+"""
+user_cache.py - Users the client knows, resolved once per change
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import typing
+import weakref
+
+import prometheus_client
+from pydle.features.rfc1459.client import RFC1459Support
+
+from src.config import CONFIG_MARKER
+from src.config.datamodel import ConfigRoot
+from src.packages.permissions import Permission, effective_permission
+from src.packages.utils import gauge_total
+from src.packages.user import User
+
+CACHED_USERS = prometheus_client.Gauge(
+    namespace="user_cache",
+    name="users",
+    documentation="users whose User and permission are resolved",
+)
+
+_Entry = typing.Tuple[User, typing.Optional[Permission]]
+""" a user, and the permission their vhost grants """
+
+
+class UserCache:
+    """
+    The users a client knows and their effective permission, by case-insensitive nickname.
+
+    Users are resolved from pydle's record of them on first use.  :class:`UserCacheClient` drops
+    a user whenever pydle's record of them changes, so what the cache answers with is always what
+    :meth:`User.lookup` would build.  Nicknames pydle knows nothing about are not remembered.
+    """
+
+    __slots__ = ["_client", "_entries"]
+
+    def __init__(self, client):
+        self._client = client
+        self._entries: typing.Dict[str, _Entry] = {}
+
+    def _entry(self, nickname: str) -> typing.Optional[_Entry]:
+        entry = self._entries.get(nickname.casefold())
+        if entry is None:
+            user = User.lookup(self._client, nickname)
+            if user is None:
+                return None
+            entry = self._entries[nickname.casefold()] = (user, effective_permission(user))
+        return entry
+
+    def user(self, nickname: str) -> typing.Optional[User]:
+        """
+        The user known by *nickname*
+
+        Returns:
+            User: found user
+            None: user not found
+        """
+        entry = self._entry(nickname)
+        return entry[0] if entry is not None else None
+
+    def permission(self, nickname: str) -> typing.Optional[Permission]:
+        """
+        The permission the vhost of the user known by *nickname* grants
+
+        Returns:
+            Permission: effective permission
+            None: user not found, or their vhost grants no permission
+        """
+        entry = self._entry(nickname)
+        return entry[1] if entry is not None else None
+
+    def invalidate(self, nickname: str):
+        """ forget the user known by *nickname*, they are resolved again on next use """
+        self._entries.pop(nickname.casefold(), None)
+
+    def rebuild(self):
+        """ resolve every user's permission again, the vhosts' permissions changed """
+        self._entries = {
+            key: (user, effective_permission(user)) for key, (user, _) in self._entries.items()
+        }
+
+    def clear(self):
+        """ forget every user """
+        self._entries.clear()
+
+    def __contains__(self, nickname: str) -> bool:
+        return nickname.casefold() in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class UserCacheClient(RFC1459Support):
+    """
+    Keeps a :class:`UserCache` of the client's users in step with pydle's records of them.
+
+    pydle changes what it knows about a user in ``_sync_user`` (account, CHGHOST, WHOIS and the
+    source of every message), ``_rename_user`` (nick changes) and ``_destroy_user`` (parts, kicks
+    and quits), and AWAY notifications are applied in place.  Each of them drops the user from
+    the cache, the host we are given with a 396 is recorded as our own.
+
+    This must come before pydle's client in the bases, some of pydle's features don't defer to
+    the implementations after them.
+    """
+    _instances: typing.ClassVar[typing.MutableSet["UserCacheClient"]] = weakref.WeakSet()
+
+    @classmethod
+    @CONFIG_MARKER(trylast=True)
+    def rehash_handler(cls, data: ConfigRoot):  # pylint: disable=unused-argument
+        """
+        Apply new configuration data, once the permissions have applied theirs
+
+        Args:
+            data (ConfigRoot): new configuration data to apply.
+        """
+        for client in list(cls._instances):
+            client.user_cache.rebuild()
+
+    def __init__(self, nickname, fallback_nicknames=[], username=None, realname=None,
+                 eventloop=None, **kwargs):
+        # pydle resets its users while it is constructed, the cache has to exist by then
+        self.__cache = UserCache(self)
+        super().__init__(nickname, fallback_nicknames, username, realname, eventloop, **kwargs)
+        # not self._instances, other features' clients keep sets of the same name
+        UserCacheClient._instances.add(self)
+
+    @property
+    def user_cache(self) -> UserCache:
+        """ Users the client knows, and their effective permission """
+        return self.__cache
+
+    def _reset_attributes(self):
+        super()._reset_attributes()
+        self.__cache.clear()
+
+    def _sync_user(self, nick, metadata):
+        known = self.users.get(nick)
+        if known is None or any(known.get(key) != value for key, value in metadata.items()):
+            self.__cache.invalidate(nick)
+        super()._sync_user(nick, metadata)
+
+    def _rename_user(self, user, new):
+        self.__cache.invalidate(user)
+        self.__cache.invalidate(new)
+        super()._rename_user(user, new)
+
+    def _destroy_user(self, nickname, *args, **kwargs):
+        super()._destroy_user(nickname, *args, **kwargs)
+        # parting one of several shared channels leaves pydle's record of the user as it was
+        if nickname not in self.users:
+            self.__cache.invalidate(nickname)
+
+    async def on_raw_away(self, message):
+        await super().on_raw_away(message)
+        nick, _ = self._parse_user(message.source)
+        self.__cache.invalidate(nick)
+
+    async def on_raw_396(self, message):
+        """
+        Handle an IRC 396 message, our host was masked.  pydle doesn't record it by itself.
+        """
+        self._sync_user(self.nickname, {"hostname": message.params[1]})
+
+
+gauge_total(CACHED_USERS, UserCacheClient._instances, lambda client: len(client.user_cache))
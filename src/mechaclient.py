@@ -11,6 +11,7 @@ See LICENSE.md
 This module is built on top of the Pydle system.
 
 """
+import asyncio
 import functools
 
 from typing import Optional
@@ -22,6 +23,7 @@ from pydle import Client
 
 from .config.datamodel import ConfigRoot
 from .packages.board import RatBoard
+from .packages.cache import RatCache
 from .packages.commands import trigger
 from .packages.fuelrats_api.v3.interface import ApiV300WSS
 from .packages.permissions import require_permission, TECHRAT
@@ -29,10 +31,12 @@ from .packages.context.context import Context
 from .packages.fact_manager.fact_manager import FactManager
 from .packages.galaxy import Galaxy
 from .packages.graceful_errors import graceful_errors
+from .packages.outbound import OutboundScheduler, Priority
 from .packages.utils import sanitize
 from .features.message_history import MessageHistoryClient
+from .features.user_cache import UserCacheClient
 
-from typing import Dict
+from typing import MutableMapping
 import prometheus_client
 from prometheus_async.aio import time as aio_time
 import pendulum
@@ -42,11 +46,6 @@ ON_MESSAGE_TIME = prometheus_client.Histogram(
     documentation="time in on_message",
     unit="seconds"
 )
-TRACKED_MESSAGES = prometheus_client.Gauge(
-    namespace="client",
-    name="tracked_messages",
-    documentation="number of last messages tracked"
-)
 IGNORED_MESSAGES = prometheus_client.Counter(
     name="ignored_messages",
     namespace="client",
@@ -58,13 +57,18 @@ ERRORS = prometheus_client.Counter(
     documentation="errors detected during message handling"
 )
 
+HYDRATE_RETRY_DELAY = 1
+""" seconds waited before fetching the open rescues again, doubled every failure """
+HYDRATE_RETRY_MAX_DELAY = 60
+""" the most seconds waited between fetches of the open rescues """
+
 
 @require_permission(TECHRAT)
 async def _on_invite(ctx: Context):
     await ctx.bot.join(ctx.channel)
 
 
-class MechaClient(Client, MessageHistoryClient):
+class MechaClient(UserCacheClient, Client, MessageHistoryClient):
     """
     MechaSqueak v3_tests
     """
@@ -84,14 +88,14 @@ class MechaClient(Client, MessageHistoryClient):
         """
         self._api_handler: Optional[ApiV300WSS] = None
         self._fact_manager = None  # Instantiate Global Fact Manager
-        self._last_user_message: Dict[str, str] = {}  # Holds last message from user, by irc nick
-        self._rat_cache = None  # TODO: replace with ratcache once it exists
+        self._rat_cache: Optional[RatCache] = None
         self._rat_board = None  # Instantiate Rat Board
         self._config = mecha_config
         self._galaxy = None
+        self._hydrating = False
         self._start_time = pendulum.now()
+        self._outbound = OutboundScheduler(self._send_line)
         self._on_invite = require_permission(TECHRAT)(functools.partial(self._on_invite))
-        TRACKED_MESSAGES.set_function(lambda: len(self._last_user_message))
         super().__init__(*args, **kwargs)
 
     async def on_connect(self):
@@ -109,6 +113,18 @@ class MechaClient(Client, MessageHistoryClient):
         # call the super
         await super().on_connect()
 
+    async def on_disconnect(self, expected):
+        """
+        Called upon disconnection from the IRC server
+        """
+        if expected and self._galaxy is not None:
+            # shutting down, so let go of our Systems API connections.
+            await self._galaxy.close()
+        if expected and self._rat_board is not None:
+            # don't lose the last changes to the board
+            self._rat_board.snapshot.flush()
+        await super().on_disconnect(expected)
+
     #
     # def on_join(self, channel, user):
     #     super().on_join(channel, user)
@@ -133,8 +149,10 @@ class MechaClient(Client, MessageHistoryClient):
         :param message: message body
         :return:
         """
-        await super().on_message(channel, user, message)
-        logger.debug(f"{channel}: <{user}> {message}")
+        # sanitize input string headed to command executor, and to the message history
+        sanitized_message = sanitize(message)
+        await super().on_message(channel, user, sanitized_message)
+        logger.debug("{}: <{}> {}", channel, user, message)
 
         if user == self._config.irc.nickname:
             # don't do this and the bot can get int o an infinite
@@ -143,11 +161,8 @@ class MechaClient(Client, MessageHistoryClient):
             IGNORED_MESSAGES.inc()
             return None
         # await command execution
-        # sanitize input string headed to command executor
-        sanitized_message = sanitize(message)
-        logger.debug(f"Sanitized {sanitized_message}, Original: {message}")
+        logger.debug("Sanitized {}, Original: {}", sanitized_message, message)
         try:
-            self._last_user_message[user.casefold()] = sanitized_message  # Store sanitized message
             ctx = await Context.from_message(
                 self,
                 channel=channel,
@@ -171,19 +186,44 @@ class MechaClient(Client, MessageHistoryClient):
             # and report it to the user
             await self.message(channel, error_message)
 
+    async def message(self, target: str, message: str, priority: Priority = Priority.NORMAL):
+        """
+        Message a channel or user, once the outbound scheduler lets the message through.
+        """
+        await self._outbound.send("PRIVMSG", target, message, priority)
+
+    async def notice(self, target: str, message: str, priority: Priority = Priority.NORMAL):
+        """
+        Notice a channel or user, once the outbound scheduler lets the notice through.
+        """
+        await self._outbound.send("NOTICE", target, message, priority)
+
+    async def _send_line(self, command: str, target: str, line: str):
+        if command == "NOTICE":
+            await super().notice(target, line)
+        else:
+            await super().message(target, line)
+
     # Vhost Handler
     async def on_raw_396(self, message):
         """
         Handle an IRC 396 message. This message is sent upon successful application of a host mask
         via usermode +x.
         """
+        await super().on_raw_396(message)
         logger.info(f"{message.params[0]}@{message.params[1]} {message.params[2]}.")
 
     @property
-    def rat_cache(self) -> object:
+    def rat_cache(self) -> RatCache:
         """
         Rat Cache
+
+        This is initialized in a lazy way, and only looks rats up through the API when online.
         """
+        if self._rat_cache is None:
+            self._rat_cache = RatCache()
+            if self._config.api.online_mode:
+                self._rat_cache.api_handler = self.api_handler
         return self._rat_cache
 
     @property
@@ -226,8 +266,38 @@ class MechaClient(Client, MessageHistoryClient):
         if self._api_handler is None:
             self._api_handler = ApiV300WSS(config=self._config.api)
             self.board.api_handler = self._api_handler
+            self._api_handler.subscribe(self.board.apply_remote)
+            # changes made whilst the connection was down were never announced
+            self._api_handler.subscribe_connections(self.hydrate_board)
         return self._api_handler
 
+    async def hydrate_board(self):
+        """
+        Bring the board, as restored from its snapshot, in step with the API's open rescues,
+        and again every time the API reconnects.
+
+        Fetching the rescues is retried, waiting longer after every failure, until the API
+        answers.
+        """
+        if self._hydrating:
+            # the fetch underway is retried until the API answers, which is soon enough
+            return
+        self._hydrating = True
+        delay = HYDRATE_RETRY_DELAY
+        try:
+            while True:
+                try:
+                    rescues = await self.api_handler.get_rescues(impersonate=None)
+                    break
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("unable to fetch open rescues, retrying in {}s", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, HYDRATE_RETRY_MAX_DELAY)
+        finally:
+            self._hydrating = False
+        await self.board.reconcile(rescues)
+        logger.info("board reconciled with {} open rescues from the API", len(rescues))
+
     @property
     def board(self) -> RatBoard:
         """
@@ -291,8 +361,11 @@ class MechaClient(Client, MessageHistoryClient):
         self._galaxy = None
 
     @property
-    def last_user_message(self) -> Dict[str, str]:
-        return self._last_user_message
+    def last_user_message(self) -> MutableMapping[str, str]:
+        """
+        Last thing each user said, by casefolded nickname, see :attr:`message_history`
+        """
+        return self.message_history
 
     @property
     def start_time(self) -> pendulum.DateTime:
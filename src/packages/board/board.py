@@ -11,20 +11,27 @@ See LICENSE.md
 """
 from __future__ import annotations
 
+import heapq
 import itertools
 import typing
+import weakref
 from asyncio import Lock
-from collections import abc
+from collections import OrderedDict, abc
 from contextlib import asynccontextmanager
 from typing import Optional
 from uuid import UUID
 
+import prometheus_client
 from loguru import logger
 
 from src.config import CONFIG_MARKER
 from ..fuelrats_api import FuelratsApiABC, ApiException, Impersonation
 
+from .journal import JournalEvent, OfflineJournal
+from .snapshot import BoardSnapshot
+from .update_queue import RescueUpdateQueue, FailureCallback
 from ..rescue import Rescue
+from ..utils import Status
 from ...config.datamodel import ConfigRoot
 
 import pendulum
@@ -37,11 +44,64 @@ Notes:
     to keep assigned case numbers below this value whenever possible.
 """
 
+update_delay = 0.5
+"""
+Seconds rescue modifications are held back for, so that bursts of them are sent to the API as one
+"""
+
+journal_path = ""
+"""
+File changes made in offline mode are journaled to, kept in memory only if empty
+"""
+
+snapshot_path = ""
+"""
+File the board is snapshotted to, so a restart doesn't empty it. Not snapshotted if empty
+"""
+
+snapshot_delay = 1.0
+"""
+Seconds changes to the board are gathered for before snapshotting it
+"""
+
 api_url = ""
 """
 Fuelrats API location
 """
 
+REMOTE_CHANGES = prometheus_client.Counter(
+    namespace="board",
+    name="remote_changes",
+    documentation="rescue changes made elsewhere and announced by the API, by what became of them",
+    labelnames=["outcome"],
+)
+
+_SYNCED_FIELDS = (
+    "client",
+    "system",
+    "irc_nickname",
+    "title",
+    "board_index",
+    "lang_id",
+    "platform",
+    "code_red",
+    "status",
+    "first_limpet",
+    "marked_for_deletion",
+    "quotes",
+    "unidentified_rats",
+)
+""" rescue fields changes made elsewhere are copied into the board's rescues """
+_NULLABLE_FIELDS = frozenset({"title"})
+""" synced fields the API may clear, for the others None means it didn't say """
+_REMEMBERED_REMOVALS = 1024
+""" removed rescues remembered, so late changes to them don't bring them back """
+
+_versions = itertools.count(1)
+"""
+Versions of the boards, drawn from one sequence so no two states of any boards share one
+"""
+
 _KEY_TYPE = typing.Union[str, int, UUID]  # pylint: disable=invalid-name
 BoardKey = typing.TypeVar("BoardKey", _KEY_TYPE, Rescue)
 
@@ -64,6 +124,18 @@ def validate_config(data: typing.Dict):  # pylint: disable=unused-argument
     if data["board"]["cycle_at"] <= 0:
         raise ValueError("constraint cycle_at must be non-zero and positive")
 
+    if data["board"].get("update_delay", 0) < 0:
+        raise ValueError("constraint update_delay must not be negative")
+
+    if not isinstance(data["board"].get("journal_path", ""), str):
+        raise ValueError("constraint journal_path must be a string")
+
+    if not isinstance(data["board"].get("snapshot_path", ""), str):
+        raise ValueError("constraint snapshot_path must be a string")
+
+    if data["board"].get("snapshot_delay", 0) < 0:
+        raise ValueError("constraint snapshot_delay must not be negative")
+
     if data["board"]["api_url"] == "":
         raise ValueError("constraint api_url must not be empty.")
 
@@ -78,8 +150,84 @@ def rehash_handler(data: ConfigRoot):  # pylint: disable=unused-argument
         data (typing.Dict): new configuration data to apply.
 
     """
-    global cycle_at
+    global cycle_at, update_delay, journal_path, snapshot_path, snapshot_delay
     cycle_at = data.board.cycle_at
+    update_delay = data.board.update_delay
+    journal_path = data.board.journal_path
+    snapshot_path = data.board.snapshot_path
+    snapshot_delay = data.board.snapshot_delay
+
+
+class _IndexAllocator:
+    """
+    Hands out free board indexes, round-robin below :obj:`cycle_at`.
+
+    A cursor advances through the indexes below :obj:`cycle_at`, so a case number that was just
+    freed isn't handed straight to the next case.  Once the cursor reaches :obj:`cycle_at` it
+    starts over at the smallest free index, which is found on a min-heap of the indexes released
+    below the high-water mark; everything at or above it has never been handed out.  Acquiring
+    costs at most :obj:`cycle_at` probes plus O(log n) in the number of released indexes.
+
+    Heap entries are validated lazily: an index that was taken by other means (such as a rescue
+    appended with an explicit index) is simply skipped when popped.
+    """
+
+    __slots__ = ["_in_use", "_released", "_high_water", "_reserved", "_cursor"]
+
+    def __init__(self, in_use: typing.Container[int]):
+        self._in_use = in_use
+        """ indexes currently on the board """
+        self._released: typing.List[int] = []
+        """ min-heap of indexes released below the high-water mark """
+        self._high_water = 0
+        """ lowest index never handed out """
+        self._reserved: typing.Set[int] = set()
+        """ indexes handed out that aren't on the board (yet) """
+        self._cursor = 0
+        """ index the next round-robin search starts at """
+
+    def _taken(self, index: int) -> bool:
+        return index in self._in_use or index in self._reserved
+
+    def _smallest_free(self) -> int:
+        while self._released:
+            index = heapq.heappop(self._released)
+            if not self._taken(index):
+                return index
+        while self._taken(self._high_water):
+            self._high_water += 1
+        return self._high_water
+
+    def acquire(self) -> int:
+        """
+        Reserve and return the next free index after the cursor, or once it passed
+        :obj:`cycle_at`, the smallest free index.
+        """
+        index = next(
+            (index for index in range(self._cursor, cycle_at) if not self._taken(index)),
+            None,
+        )
+        if index is None:
+            index = self._smallest_free()
+
+        self._cursor = index + 1
+        self._high_water = max(self._high_water, index + 1)
+        self._reserved.add(index)
+        return index
+
+    def claim(self, index: int):
+        """
+        Mark a reserved *index* as now being tracked by the board itself.
+        """
+        self._reserved.discard(index)
+
+    def release(self, index: int):
+        """
+        Return *index* to the pool of free indexes.
+        """
+        self._reserved.discard(index)
+        if index < self._high_water:
+            heapq.heappush(self._released, index)
 
 
 class RatBoard(abc.Mapping):
@@ -92,14 +240,29 @@ class RatBoard(abc.Mapping):
         "_storage_by_client",
         "_handler",
         "_storage_by_index",
-        "_index_counter",
+        "_index_allocator",
         "_offline",
         "_modification_lock",
+        "_rescue_locks",
+        "_update_queue",
+        "_journal",
         "_datetime_last_case",
+        "_removed",
+        "_snapshot",
+        "_restored",
+        "_version",
+        "_revisions",
         "__weakref__",
     ]
 
-    def __init__(self, api_handler: typing.Optional[FuelratsApiABC] = None, offline: bool = True):
+    def __init__(
+        self,
+        api_handler: typing.Optional[FuelratsApiABC] = None,
+        offline: bool = True,
+        on_update_failure: typing.Optional[FailureCallback] = None,
+        journal: typing.Optional[OfflineJournal] = None,
+        snapshot: typing.Optional[BoardSnapshot] = None,
+    ):
         self._handler: typing.Optional[FuelratsApiABC] = api_handler
         """
         fuelrats.com API handler
@@ -116,9 +279,9 @@ class RatBoard(abc.Mapping):
         """
         internal rescue storage keyed by board index
         """
-        self._index_counter = itertools.count()
+        self._index_allocator = _IndexAllocator(self._storage_by_index)
         """
-        Internal counter for tracking used indexes
+        Internal allocator for free board indexes
         """
         self._offline = offline
 
@@ -126,12 +289,45 @@ class RatBoard(abc.Mapping):
         """
         Modification lock to prevent concurrent modification of the board.
         """
+        self._rescue_locks: typing.MutableMapping[UUID, Lock] = weakref.WeakValueDictionary()
+        """
+        Per-rescue locks to prevent concurrent modification of a single rescue.
+        """
+        self._update_queue = RescueUpdateQueue(self._send_update, on_failure=on_update_failure)
+        """
+        Write-behind queue for emitting rescue modifications to the API.
+        """
+        self._journal = journal if journal is not None else OfflineJournal(journal_path)
+        """
+        Journal of changes made in offline mode, replayed to the API once online.
+        """
 
         self._datetime_last_case = None
         """
         Field used to calculate the time since the last case was created
         """
 
+        self._removed: typing.MutableMapping[UUID, pendulum.DateTime] = OrderedDict()
+        """
+        API ids of the rescues most recently removed from the board and when, oldest first
+        """
+        self._snapshot = snapshot if snapshot is not None else BoardSnapshot(snapshot_path)
+        """
+        Snapshot of the board on disk, restored from on startup.
+        """
+        self._restored: typing.Set[UUID] = set()
+        """
+        API ids of the rescues restored from the snapshot that the API hasn't confirmed yet
+        """
+        self._version: int = next(_versions)
+        """
+        Version of the board, changes whenever the board or one of its rescues does
+        """
+        self._revisions: typing.Dict[UUID, int] = {}
+        """
+        Version of the board each rescue last changed at, keyed by API id
+        """
+
         super(RatBoard, self).__init__()
 
     @property
@@ -153,7 +349,7 @@ class RatBoard(abc.Mapping):
         logger.info("Rescue board online.")
         self._offline = False
         # TODO get API version from remote and log it
-        # TODO emit canned offline events to API
+        await self.replay_journal()
 
     async def on_offline(self):
         logger.warning("Rescue board now offline.")
@@ -178,43 +374,30 @@ class RatBoard(abc.Mapping):
     def __iter__(self) -> typing.Iterator[UUID]:
         return iter(self._storage_by_uuid)
 
-    @property
-    def _free_case_number(self) -> int:
-        """
-        returns the next unused index in the series.
-
-        Returns:
-            int: next free board index
+    def acquire_case_number(self) -> int:
         """
-        # this line is so magical it gets its own method.
-        # basically, this returns the next index from self._index_counter'
-        # that is not already in use (contains & filterfalse)
-        return next(itertools.filterfalse(self.__contains__, self._index_counter))
+        Reserve an unused case number
 
-    @property
-    def free_case_number(self) -> int:
-        """
-        Returns a unused case number
+        The number stays reserved until a rescue with it is appended to the board, and must be
+        given back with :meth:`release_case_number` if it ends up unused.  A failed
+        :meth:`append` gives it back by itself.
 
         Returns:
             int: unused case number
 
         Notes:
-            This method will attempt to return values smaller than the defined
-            :obj:`CYCLE_AT` whenever possible, though will return values
-            in excess of :obj:`CYCLE_AT` as necessary.
+            Case numbers are handed out in turn up to :obj:`CYCLE_AT`, so one that was just freed
+            isn't reused straight away.  Once :obj:`CYCLE_AT` is reached the smallest unused
+            value is returned, which is only in excess of :obj:`CYCLE_AT` as necessary.
         """
-        next_free = self._free_case_number
+        return self._index_allocator.acquire()
 
-        # if we are larger or equal to the CYCLE_AT point, reset the counter
-        overflow = next_free >= cycle_at
-        if overflow:
-            self._index_counter = itertools.count()
-            # get the next free index from the underlying magic
-            return self._free_case_number
-
-        # return the next index from the magic
-        return next_free
+    def release_case_number(self, index: int):
+        """
+        Give back a case number reserved with :meth:`acquire_case_number` that went unused.
+        """
+        if index not in self._storage_by_index:
+            self._index_allocator.release(index)
 
     async def append(self, rescue: Rescue, overwrite: bool = False) -> None:
         """
@@ -230,15 +413,19 @@ class RatBoard(abc.Mapping):
         async with self._modification_lock:
             # ensure the rescue has a board index, because if this is null it breaks all the things.
             if rescue.board_index is None:
-                rescue.board_index = self.free_case_number
+                rescue.board_index = self.acquire_case_number()
             logger.trace("acquired modification lock.")
             if (rescue.api_id in self or rescue.board_index in self) and not overwrite:
+                # it won't be used, so don't leak it if it was reserved for this rescue.
+                self.release_case_number(rescue.board_index)
                 raise ValueError("Attempted to append a rescue that already exists to the board")
+            self._index_allocator.claim(rescue.board_index)
             self._storage_by_uuid[rescue.api_id] = rescue
             self._storage_by_index[rescue.board_index] = rescue
 
             if rescue.irc_nickname:
                 self._storage_by_client[rescue.irc_nickname.casefold()] = rescue
+            self._changed(rescue)
         logger.trace("released modification lock.")
 
     @property
@@ -265,6 +452,76 @@ class RatBoard(abc.Mapping):
         del self._storage_by_index[target.board_index]
         if target.irc_nickname and target.irc_nickname.casefold() in self._storage_by_client:
             del self._storage_by_client[target.irc_nickname.casefold()]
+        self._index_allocator.release(target.board_index)
+        self._revisions.pop(target.api_id, None)
+        self._changed()
+
+    def _changed(self, rescue: typing.Optional[Rescue] = None):
+        """ Move the board to a new version and have it snapshotted, it or *rescue* changed """
+        self._version = next(_versions)
+        if rescue is not None:
+            self._revisions[rescue.api_id] = self._version
+        self._snapshot.schedule(self._storage_by_uuid.values, delay=snapshot_delay)
+
+    @property
+    def version(self) -> int:
+        """
+        Version of the board, a new one whenever a rescue is added, modified or removed.
+
+        Versions are never reused, not even by other boards.  Rescues must be modified through
+        :meth:`modify_rescue` for the board to notice.
+        """
+        return self._version
+
+    def revision(self, rescue: Rescue) -> typing.Optional[int]:
+        """
+        Version of the board *rescue* last changed at, None if it isn't on the board.
+        """
+        if self._storage_by_uuid.get(rescue.api_id) is not rescue:
+            return None
+        return self._revisions.get(rescue.api_id)
+
+    def _rescue_lock(self, rescue: Rescue) -> Lock:
+        """
+        Lock serialising modifications of a single rescue.
+
+        Locks are only kept alive by whoever is holding or waiting on them, so they don't
+        outlive the rescue's modifications.
+        """
+        lock = self._rescue_locks.get(rescue.api_id)
+        if lock is None:
+            lock = self._rescue_locks[rescue.api_id] = Lock()
+        return lock
+
+    def _reindex(self, target: Rescue, old_index: int, old_nickname: typing.Optional[str]):
+        """
+        Bring the index and client lookups up to date after *target* was modified.
+
+        Must be called with the modification lock held.
+
+        Raises:
+            ValueError: the rescue's new board index is taken by another rescue, the rescue
+                keeps its old index.
+        """
+        if target.board_index is None:
+            target.board_index = self.acquire_case_number()
+
+        if target.board_index != old_index:
+            if target.board_index in self._storage_by_index:
+                new_index = target.board_index
+                target.board_index = old_index
+                raise ValueError(f"board index {new_index} is already in use")
+
+            del self._storage_by_index[old_index]
+            self._index_allocator.release(old_index)
+            self._index_allocator.claim(target.board_index)
+            self._storage_by_index[target.board_index] = target
+
+        if target.irc_nickname != old_nickname:
+            if old_nickname and self._storage_by_client.get(old_nickname.casefold()) is target:
+                del self._storage_by_client[old_nickname.casefold()]
+            if target.irc_nickname:
+                self._storage_by_client[target.irc_nickname.casefold()] = target
 
     @asynccontextmanager
     async def modify_rescue(
@@ -273,44 +530,92 @@ class RatBoard(abc.Mapping):
         """
         Context manager to modify a Rescue
 
+        Modifications are serialised per rescue, so edits to different rescues proceed
+        concurrently.  The rescue stays on the board throughout, the board-wide lock is only held
+        to update the lookups afterwards.
+
+        In online mode the modification is queued for the API rather than awaited, see
+        :meth:`flush_updates`.
+
         Args:
             impersonation: User account this modification was issued by
             key ():
 
         Yields:
             Rescue: rescue to modify based on its `key`
-        """
-        logger.trace("acquiring modification lock...")
-        async with self._modification_lock:
-            logger.trace("acquired modification lock.")
-            if isinstance(key, Rescue):
-                key = key.board_index
 
-            target = self[key]
+        Raises:
+            KeyError: no such rescue, or it was removed whilst waiting to modify it.
+        """
+        if isinstance(key, Rescue):
+            key = key.board_index
 
-            # most tracked attributes may be modified in here, so we pop the rescue
-            # from tracking and append it after
+        target = self[key]
 
-            del self[key]
+        logger.trace("acquiring rescue lock...")
+        async with self._rescue_lock(target):
+            logger.trace("acquired rescue lock.")
+            if self._storage_by_uuid.get(target.api_id) is not target:
+                # it was removed whilst we waited our turn
+                raise KeyError(key)
 
-            self._modification_lock.release()
+            # most tracked attributes may be modified in here, so remember the current ones
+            old_index, old_nickname = target.board_index, target.irc_nickname
             try:
                 # Yield so the caller can modify the rescue
                 yield target
 
             finally:
-                # we need to be sure to re-append the rescue upon completion
-                # (so errors don't drop cases)
-                await self.append(target)
-                # append will reacquire the lock, so don;t reacquire it ourselves (damn no rlocks),
-                # but the context manger is gunna freak out if we don't re-acquire it though.
-                await self._modification_lock.acquire()
-            # If we are in online mode, emit update event to API.
+                # we need to be sure to re-index the rescue upon completion
+                # (so errors don't leave stale lookups behind)
+                async with self._modification_lock:
+                    self._reindex(target, old_index, old_nickname)
+                    self._changed(target)
+
+            # If we are in online mode, queue an update event for the API.
             if self.online:
-                logger.trace("updating API...")
-                await self._handler.update_rescue(target, impersonating=impersonation)
+                logger.trace("queueing API update...")
+                self._update_queue.schedule(target, impersonation, delay=update_delay)
+            else:
+                self._journal.record(JournalEvent.UPDATE, target, impersonation)
 
-        logger.trace("released modification lock.")
+        logger.trace("released rescue lock.")
+
+    async def _send_update(self, rescue: Rescue, impersonation: typing.Optional[Impersonation]):
+        """ Emit a (coalesced) update of *rescue* to the API, used by the update queue """
+        if not self.online:
+            logger.warning("journaling update of rescue @{}, board went offline.", rescue.api_id)
+            self._journal.record(JournalEvent.UPDATE, rescue, impersonation)
+            return
+        logger.trace("updating API...")
+        await self._handler.update_rescue(rescue, impersonating=impersonation)
+
+    async def replay_journal(self) -> int:
+        """
+        Replay the changes made in offline mode to the API, does nothing whilst offline.
+
+        Returns:
+            number of (coalesced) changes the API applied
+        """
+        if not self.online:
+            return 0
+        return await self._journal.replay(self._handler)
+
+    @property
+    def journal(self) -> OfflineJournal:
+        """ Journal of changes made in offline mode """
+        return self._journal
+
+    @property
+    def snapshot(self) -> BoardSnapshot:
+        """ Snapshot of the board on disk """
+        return self._snapshot
+
+    async def flush_updates(self):
+        """
+        Wait for every queued rescue update to be emitted to the API.
+        """
+        await self._update_queue.drain()
 
     async def create_rescue(self, *args, ovewrite=False, **kwargs) -> Rescue:
         """
@@ -331,13 +636,18 @@ class RatBoard(abc.Mapping):
         Raises:
             ApiError: Something went wrong in API creation, rescue has been created locally.
         """
-        index = self.free_case_number
+        index = self.acquire_case_number()
         logger.trace("instantiating local rescue object...")
-        rescue = Rescue(*args, board_index=index, **kwargs)
+        try:
+            rescue = Rescue(*args, board_index=index, **kwargs)
+        except Exception:
+            self.release_case_number(index)
+            raise
 
         try:
             if not self.online:
                 logger.warning("creating case in offline mode...")
+                self._journal.record(JournalEvent.CREATE, rescue)
             else:
                 logger.trace("creating rescue on API...")
                 rescue = await self._handler.create_rescue(rescue, impersonating=None)
@@ -350,6 +660,10 @@ class RatBoard(abc.Mapping):
         finally:
             rescue.board_index = index
             self._datetime_last_case = pendulum.now()
+            if not ovewrite and rescue.api_id in self._storage_by_uuid:
+                # the API announced the rescue before answering us, ours replaces that copy.
+                async with self._modification_lock:
+                    del self[rescue.api_id]
             # Always append it to ourselves, regardless of API errors
             await self.append(rescue, overwrite=ovewrite)
 
@@ -359,12 +673,169 @@ class RatBoard(abc.Mapping):
         """ removes a rescue from active tracking """
         if isinstance(target, Rescue):
             target = target.board_index
-        logger.trace("Acquiring modification lock...")
-        async with self._modification_lock:
-            logger.trace("Acquired modification lock.")
-            # TODO: add to internal deck in offline mode so we can push to the API when we eventually
-            del self[target]
-        logger.trace("Released modification lock.")
+        rescue = self[target]
+        # let any in-progress modification of this rescue finish first, its index may change
+        async with self._rescue_lock(rescue):
+            logger.trace("Acquiring modification lock...")
+            async with self._modification_lock:
+                logger.trace("Acquired modification lock.")
+                del self[rescue.api_id]
+                self._forget(rescue)
+            if not self.online:
+                self._journal.record(JournalEvent.CLOSE, rescue)
+            logger.trace("Released modification lock.")
+
+    def _forget(self, rescue: Rescue, removed_at: Optional[pendulum.DateTime] = None):
+        """
+        Remember *rescue* was removed at *removed_at*, so changes made to it elsewhere before then
+        don't bring it back.
+
+        Removals made here default to the last change of *rescue* we know of, the API's clock
+        stamps the changes they are compared with, not ours.
+        """
+        self._removed[rescue.api_id] = removed_at if removed_at else rescue.updated_at
+        while len(self._removed) > _REMEMBERED_REMOVALS:
+            self._removed.popitem(last=False)
+
+    async def apply_remote(self, remote: Rescue) -> bool:
+        """
+        Bring the board in step with a rescue created or changed elsewhere, such as on the
+        website or by another instance of mecha.
+
+        Only the fields that differ from the board's copy are patched, and the API isn't told
+        about them again.  Changes no newer than the board's copy are stale (or echoes of the
+        board's own updates) and dropped, as are changes to a rescue whose local modifications
+        are still waiting to be sent to the API, which would otherwise be undone.  Open rescues
+        the board doesn't have are added to it, unless it removed them after they last changed,
+        and closed ones removed from it.
+
+        Args:
+            remote: the rescue as the API has it now
+
+        Returns:
+            whether the board changed
+        """
+        target = self._storage_by_uuid.get(remote.api_id)
+        if target is None:
+            removed_at = self._removed.get(remote.api_id)
+            if remote.status is Status.CLOSED or (
+                removed_at is not None and remote.updated_at <= removed_at
+            ):
+                REMOTE_CHANGES.labels(outcome="ignored").inc()
+                return False
+            if remote.board_index in self._storage_by_index:
+                # another case has its index here, it gets a free one instead
+                remote.board_index = None
+            try:
+                await self.append(remote)
+            except ValueError:
+                # it was created here whilst we waited for the lock
+                REMOTE_CHANGES.labels(outcome="ignored").inc()
+                return False
+            remote.modified.clear()
+            # reopened since it was removed
+            self._removed.pop(remote.api_id, None)
+            REMOTE_CHANGES.labels(outcome="created").inc()
+            return True
+
+        async with self._rescue_lock(target):
+            if self._storage_by_uuid.get(target.api_id) is not target:
+                # it was removed whilst we waited our turn
+                REMOTE_CHANGES.labels(outcome="ignored").inc()
+                return False
+            if remote.updated_at <= target.updated_at:
+                REMOTE_CHANGES.labels(outcome="stale").inc()
+                return False
+            if target.api_id in self._update_queue:
+                REMOTE_CHANGES.labels(outcome="pending").inc()
+                return False
+
+            if remote.status is Status.CLOSED:
+                async with self._modification_lock:
+                    del self[target.api_id]
+                    self._forget(target, remote.updated_at)
+                REMOTE_CHANGES.labels(outcome="closed").inc()
+                return True
+
+            old_index, old_nickname = target.board_index, target.irc_nickname
+            local_changes = set(target.modified)
+            changed = False
+            for field in _SYNCED_FIELDS:
+                value = getattr(remote, field)
+                if value is None and field not in _NULLABLE_FIELDS:
+                    continue
+                if getattr(target, field) != value:
+                    if field == "unidentified_rats":
+                        # its setter adds to the rats the rescue already has
+                        target.unidentified_rats.clear()
+                    setattr(target, field, value)
+                    changed = True
+            target.updated_at = remote.updated_at
+
+            if changed:
+                async with self._modification_lock:
+                    try:
+                        self._reindex(target, old_index, old_nickname)
+                    except ValueError:
+                        logger.warning(
+                            "rescue @{} keeps index {}, the API's is taken", target.api_id,
+                            old_index
+                        )
+                    self._changed(target)
+            # these came from the API, they don't need sending back to it.
+            target.modified &= local_changes
+        REMOTE_CHANGES.labels(outcome="applied" if changed else "unchanged").inc()
+        return changed
+
+    async def restore(self) -> int:
+        """
+        Put the rescues of the last snapshot back on the board, without involving the API.
+
+        Rescues already on the board are left alone, and restored rescues whose index has been
+        taken in the meantime get a free one.  Until :meth:`reconcile` is given the API's open
+        rescues, the restored ones may be out of date or even closed.
+
+        Returns:
+            number of rescues restored
+        """
+        rescues = [
+            rescue for rescue in self._snapshot.load() if rescue.api_id not in self._storage_by_uuid
+        ]
+        # rescues keeping their index go first, so the others can't take it from them
+        displaced = [rescue for rescue in rescues if rescue.board_index in self._storage_by_index]
+        for rescue in displaced:
+            logger.warning("restored rescue @{} gets a new board index", rescue.api_id)
+            rescue.board_index = None
+        for rescue in sorted(rescues, key=lambda obj: obj.board_index is None):
+            await self.append(rescue)
+            self._restored.add(rescue.api_id)
+        return len(rescues)
+
+    async def reconcile(self, rescues: typing.Iterable[Rescue]):
+        """
+        Bring the board in step with *rescues*, the API's open rescues.
+
+        They are applied as :meth:`apply_remote` does.  Rescues restored from the snapshot
+        that aren't among them were closed whilst we were away, and are removed, unless they
+        were created offline and are waiting in the journal to be sent to the API.
+        """
+        open_ids = set()
+        for rescue in rescues:
+            open_ids.add(rescue.api_id)
+            await self.apply_remote(rescue)
+
+        journaled = {entry.rescue.api_id for entry in self._journal.entries()}
+        restored, self._restored = self._restored, set()
+        for key in restored - open_ids - journaled:
+            rescue = self._storage_by_uuid.get(key)
+            if rescue is None:
+                continue
+            async with self._rescue_lock(rescue):
+                async with self._modification_lock:
+                    if self._storage_by_uuid.get(key) is rescue:
+                        logger.info("rescue @{} was closed whilst we were away", key)
+                        del self[key]
+                        self._forget(rescue)
 
     @property
     def last_case_datetime(self) -> Optional[pendulum.DateTime]:
@@ -0,0 +1,369 @@
+"""
+journal.py - durable journal of rescue changes made whilst offline
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from __future__ import annotations
+
+import asyncio
+import enum
+import json
+import os
+import typing
+import uuid
+from uuid import UUID
+
+import attr
+import prometheus_client
+from loguru import logger
+
+from ..fuelrats_api import FuelratsApiABC, Impersonation
+from ..fuelrats_api.v3.converters import api_converter
+from ..fuelrats_api.v3.models.v1.rescue import Rescue as ApiRescue
+from ..rescue import Rescue
+
+JOURNAL_ENTRIES = prometheus_client.Gauge(
+    namespace="board",
+    name="journal_entries",
+    documentation="offline rescue changes waiting to be replayed to the API",
+)
+JOURNAL_SIZE = prometheus_client.Gauge(
+    namespace="board",
+    name="journal_size",
+    unit="bytes",
+    documentation="size of the offline journal",
+)
+JOURNAL_REPLAYED = prometheus_client.Counter(
+    namespace="board",
+    name="journal_replayed",
+    documentation="journaled rescue changes acknowledged by the API",
+)
+JOURNAL_REPLAY_FAILURES = prometheus_client.Counter(
+    namespace="board",
+    name="journal_replay_failures",
+    documentation="coalesced journal entries the API failed to apply",
+)
+JOURNAL_REPLAY_TIME = prometheus_client.Histogram(
+    namespace="board",
+    name="journal_replay",
+    unit="seconds",
+    documentation="time spent replaying the offline journal",
+)
+
+_VERSION = 1
+""" version of the journal's records, records of other versions are skipped """
+
+_ENTRY = "entry"
+_ACK = "ack"
+
+
+class JournalEvent(enum.Enum):
+    """ Kind of rescue change recorded in the journal """
+
+    CREATE = "create"
+    """ rescue was created """
+    UPDATE = "update"
+    """ rescue was modified """
+    CLOSE = "close"
+    """ rescue was removed from the board """
+
+
+@attr.dataclass
+class JournalEntry:
+    """
+    One or more consecutive journaled changes of a rescue, as they will be sent to the API
+    """
+
+    event: JournalEvent
+    rescue: Rescue
+    """ snapshot of the rescue as of the latest change """
+    impersonation: typing.Optional[Impersonation]
+    keys: typing.List[UUID] = attr.ib(factory=list)
+    """ idempotency keys of every change this entry covers """
+
+    def absorb(self, other: JournalEntry) -> bool:
+        """
+        Merge the later change *other* into this one, if both were made by the same user.
+
+        The latest snapshot carries every earlier change, since modified fields accumulate, so
+        only the event kind needs care: a creation stays a creation.
+        """
+        if other.impersonation != self.impersonation:
+            return False
+        if self.event is not JournalEvent.CREATE:
+            self.event = other.event
+        self.rescue = other.rescue
+        self.keys.extend(other.keys)
+        return True
+
+
+class OfflineJournal:
+    """
+    Append-only journal of rescue creations, modifications and closures made in offline mode.
+
+    Every change is snapshotted when recorded and tagged with a unique idempotency key.  With a
+    *path*, records are appended to that file as they are made, so they survive a restart; the
+    file is read back on construction.  Without one the journal is kept in memory only.
+
+    Records are versioned JSON documents, one per line.  Rescues are kept as the API's resource
+    of them, along with which of their fields were modified, that being all a replay sends.
+    Records that can't be read back are logged and skipped, rather than failing the board.
+
+    :meth:`replay` sends the journal to the API in bulk.  Changes are coalesced per rescue and
+    user, rescues are replayed concurrently but each rescue's changes strictly in order.  Every
+    acknowledged change has its key appended to the journal, so changes are never sent twice,
+    even if the bot dies mid-replay.  Once replayed the file is compacted to whatever is left.
+    """
+
+    __slots__ = ["_path", "_file", "_records", "_uncertain", "_size", "_replay_lock"]
+
+    REPLAY_CONCURRENCY = 8
+    """ Maximum number of rescues replayed at once """
+
+    def __init__(self, path: typing.Optional[str] = None):
+        self._path = path or None
+        """ journal file, if the journal is durable """
+        self._file: typing.Optional[typing.BinaryIO] = None
+        """ journal file handle, opened on first write """
+        self._records: typing.Dict[UUID, bytes] = {}
+        """ encoded, unacknowledged entries keyed by idempotency key, oldest first """
+        self._uncertain: typing.Set[UUID] = set()
+        """ keys of entries that may have reached the API without being acknowledged """
+        self._size = 0
+        """ bytes written to the journal since it was last compacted """
+        self._replay_lock = asyncio.Lock()
+
+        if self._path and os.path.exists(self._path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def size(self) -> int:
+        """ Size of the journal in bytes """
+        return self._size
+
+    def _load(self):
+        acknowledged = set()
+        with open(self._path, "rb") as journal:
+            lines = journal.read().split(b"\n")
+
+        if lines[-1]:
+            logger.warning("discarding torn record at the end of journal {!r}", self._path)
+        for number, line in enumerate(lines[:-1], start=1):
+            try:
+                record = _decode(line)
+                if record["kind"] == _ENTRY:
+                    _entry(record)
+                    # a key seen twice (say, a journal copied over itself) is the same change.
+                    self._records.setdefault(UUID(record["key"]), line + b"\n")
+                else:
+                    acknowledged.update(UUID(key) for key in record["keys"])
+            except Exception:  # pylint: disable=broad-except
+                logger.exception(
+                    "skipping unreadable record {} of journal {!r}", number, self._path
+                )
+
+        for key in acknowledged:
+            self._records.pop(key, None)
+        # whatever happened to these before we went down, we can't know.
+        self._uncertain.update(self._records)
+        logger.info("loaded {} offline changes from journal {!r}", len(self), self._path)
+        self._compact()
+
+    def _write(self, frame: bytes):
+        self._size += len(frame)
+        JOURNAL_SIZE.set(self._size)
+        if not self._path:
+            return
+        if self._file is None:
+            self._file = open(self._path, "ab")
+        self._file.write(frame)
+        self._file.flush()
+
+    def _compact(self):
+        """ Rewrite the journal file to only contain unacknowledged entries """
+        self._size = sum(len(frame) for frame in self._records.values())
+        JOURNAL_SIZE.set(self._size)
+        JOURNAL_ENTRIES.set(len(self))
+        if not self._path:
+            return
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        temporary = f"{self._path}.tmp"
+        with open(temporary, "wb") as journal:
+            journal.writelines(self._records.values())
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temporary, self._path)
+
+    def record(
+        self,
+        event: JournalEvent,
+        rescue: Rescue,
+        impersonation: typing.Optional[Impersonation] = None,
+    ) -> UUID:
+        """
+        Append a change of *rescue* to the journal.
+
+        Args:
+            event: kind of change
+            rescue: the changed rescue, it is snapshotted as it is right now
+            impersonation: who the change was made on behalf of
+
+        Returns:
+            the change's idempotency key
+        """
+        key = uuid.uuid4()
+        try:
+            resource = api_converter.unstructure(ApiRescue.from_internal(rescue))
+        except (TypeError, ValueError):
+            # the API couldn't be sent it either, there's nothing a replay could do with it.
+            logger.exception("unable to journal {} of rescue @{}", event.value, rescue.api_id)
+            return key
+        frame = _encode(
+            kind=_ENTRY,
+            event=event.value,
+            key=f"{key}",
+            impersonation=f"{impersonation}" if impersonation is not None else None,
+            rescue=resource,
+            modified=sorted(rescue.modified),
+        )
+        self._records[key] = frame
+        self._write(frame)
+        JOURNAL_ENTRIES.set(len(self))
+        return key
+
+    def _acknowledge(self, keys: typing.List[UUID]):
+        for key in keys:
+            self._records.pop(key, None)
+            self._uncertain.discard(key)
+        self._write(_encode(kind=_ACK, keys=[f"{key}" for key in keys]))
+        JOURNAL_REPLAYED.inc(len(keys))
+        JOURNAL_ENTRIES.set(len(self))
+
+    def _chains(self) -> typing.Dict[UUID, typing.List[JournalEntry]]:
+        """ Unacknowledged changes, coalesced per rescue and user, keyed by rescue """
+        chains: typing.Dict[UUID, typing.List[JournalEntry]] = {}
+        for key, frame in list(self._records.items()):
+            try:
+                entry = _entry(_decode(frame))
+            except Exception:  # pylint: disable=broad-except
+                # it can never be replayed, keeping it would only fail every replay.
+                logger.exception("dropping unreadable journaled change {}", key)
+                del self._records[key]
+                self._uncertain.discard(key)
+                continue
+            chain = chains.setdefault(entry.rescue.api_id, [])
+            if not chain or not chain[-1].absorb(entry):
+                chain.append(entry)
+        return chains
+
+    def entries(self) -> typing.List[JournalEntry]:
+        """
+        Unacknowledged changes, coalesced per rescue and user, in the order they were made.
+        """
+        return [entry for chain in self._chains().values() for entry in chain]
+
+    async def _send(self, handler: FuelratsApiABC, entry: JournalEntry):
+        if entry.event is JournalEvent.CREATE:
+            if self._uncertain.intersection(entry.keys) and await handler.get_rescue(
+                entry.rescue.api_id, entry.impersonation
+            ):
+                # it made it to the API last time round, so just bring it up to date.
+                return await handler.update_rescue(entry.rescue, impersonating=entry.impersonation)
+            return await handler.create_rescue(entry.rescue, impersonating=entry.impersonation)
+        return await handler.update_rescue(entry.rescue, impersonating=entry.impersonation)
+
+    async def _replay_chain(
+        self, handler: FuelratsApiABC, chain: typing.List[JournalEntry], limit: asyncio.Semaphore
+    ) -> int:
+        async with limit:
+            for sent, entry in enumerate(chain):
+                try:
+                    await self._send(handler, entry)
+                except Exception:  # pylint: disable=broad-except
+                    JOURNAL_REPLAY_FAILURES.inc()
+                    # the API may or may not have applied it
+                    self._uncertain.update(entry.keys)
+                    logger.exception(
+                        "unable to replay journaled {} of rescue @{}, will retry when next online",
+                        entry.event.value,
+                        entry.rescue.api_id,
+                    )
+                    # later changes of this rescue must wait for this one.
+                    return sent
+                self._acknowledge(entry.keys)
+            return len(chain)
+
+    async def replay(self, handler: FuelratsApiABC) -> int:
+        """
+        Send every unacknowledged change to the API.
+
+        Changes the API fails to apply stay in the journal, along with any later changes of the
+        same rescue, for the next replay.
+
+        Args:
+            handler: API to replay the journal to
+
+        Returns:
+            number of (coalesced) changes the API applied
+        """
+        async with self._replay_lock:
+            if not self._records:
+                return 0
+            with JOURNAL_REPLAY_TIME.time():
+                chains = self._chains()
+                logger.info(
+                    "replaying {} offline changes of {} rescues to the API...",
+                    len(self),
+                    len(chains),
+                )
+                limit = asyncio.Semaphore(self.REPLAY_CONCURRENCY)
+                results = await asyncio.gather(
+                    *(self._replay_chain(handler, chain, limit) for chain in chains.values())
+                )
+                self._compact()
+            logger.info("replayed {} changes, {} left in the journal.", sum(results), len(self))
+            return sum(results)
+
+    def close(self):
+        """ Close the journal file, if it is open """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _encode(**record) -> bytes:
+    """ a journal record, as the line it is written as """
+    return json.dumps({"version": _VERSION, **record}).encode("utf8") + b"\n"
+
+
+def _decode(line: bytes) -> typing.Dict[str, typing.Any]:
+    """
+    the journal record *line* was written for
+
+    Raises:
+        ValueError: *line* isn't a record of this version of the journal
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict) or record.get("version") != _VERSION:
+        raise ValueError(f"not a version {_VERSION} journal record")
+    return record
+
+
+def _entry(record: typing.Dict[str, typing.Any]) -> JournalEntry:
+    """ the change an entry *record* journaled """
+    rescue = api_converter.structure(record["rescue"], ApiRescue).into_internal()
+    rescue.modified = set(record["modified"])
+    return JournalEntry(
+        JournalEvent(record["event"]), rescue, record["impersonation"], [UUID(record["key"])]
+    )
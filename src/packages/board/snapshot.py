@@ -0,0 +1,195 @@
+"""
+snapshot.py - on-disk snapshot of the rescue board, so a restart doesn't empty it
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+import typing
+
+import prometheus_client
+from loguru import logger
+
+from ..fuelrats_api.v3.converters import api_converter
+from ..fuelrats_api.v3.models.v1.rescue import Rescue as ApiRescue
+from ..rat import Rat
+from ..rescue import Rescue
+
+SNAPSHOT_SIZE = prometheus_client.Gauge(
+    namespace="board",
+    name="snapshot_size",
+    unit="bytes",
+    documentation="size of the last board snapshot written",
+)
+SNAPSHOT_WRITE_TIME = prometheus_client.Histogram(
+    namespace="board",
+    name="snapshot_write",
+    unit="seconds",
+    documentation="time spent writing board snapshots",
+)
+
+_MAGIC = "board-snapshot"
+_VERSION = 2
+""" version of the snapshot format, snapshots of other versions are discarded """
+
+Rescues = typing.Callable[[], typing.Iterable[Rescue]]
+
+
+class BoardSnapshot:
+    """
+    The rescues on the board, as of the last time it changed, kept in a single file.
+
+    Rescues are written as JSON lines, as the API has them (like the offline journal), along with
+    what only mecha knows about them, after a line saying what the file is.  Rescues that can't be
+    read back are skipped.
+
+    Changes are saved with :meth:`schedule`, which writes the board after a delay so a burst of
+    changes is written once.  Files are replaced atomically, so a crash mid-write leaves the
+    previous snapshot intact.  Without a *path* nothing is ever written or read.
+    """
+
+    __slots__ = ["_path", "_pending", "_writer"]
+
+    def __init__(self, path: typing.Optional[str] = None):
+        self._path = path or None
+        """ snapshot file, if snapshots are kept """
+        self._pending: typing.Optional[Rescues] = None
+        """ the rescues to write once the writer's delay is up """
+        self._writer: typing.Optional[asyncio.Future] = None
+        """ task writing the snapshot after a delay """
+
+    @property
+    def enabled(self) -> bool:
+        """ Whether snapshots are kept at all """
+        return self._path is not None
+
+    def load(self) -> typing.List[Rescue]:
+        """
+        The rescues of the last snapshot written, if there is one.
+        """
+        if not self._path or not os.path.exists(self._path):
+            return []
+        try:
+            with open(self._path, "rb") as snapshot:
+                header, *lines = snapshot.read().splitlines()
+            header = json.loads(header)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("discarding unreadable board snapshot {!r}", self._path)
+            return []
+        if (
+            not isinstance(header, dict)
+            or header.get("magic") != _MAGIC
+            or header.get("version") != _VERSION
+        ):
+            logger.warning("discarding board snapshot {!r} of unknown format", self._path)
+            return []
+
+        rescues = []
+        for line in lines:
+            try:
+                rescues.append(_decode(line))
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("skipping unreadable rescue of board snapshot {!r}", self._path)
+        logger.info(
+            "loaded {} rescues from board snapshot {!r}, {:.0f}s old",
+            len(rescues),
+            self._path,
+            time.time() - header["saved_at"],
+        )
+        return rescues
+
+    def save(self, rescues: typing.Iterable[Rescue]):
+        """
+        Write *rescues* to the snapshot file right away.
+        """
+        if not self._path:
+            return
+        with SNAPSHOT_WRITE_TIME.time():
+            lines = [_line({"magic": _MAGIC, "version": _VERSION, "saved_at": time.time()})]
+            for rescue in rescues:
+                try:
+                    lines.append(_encode(rescue))
+                except (TypeError, ValueError):
+                    # the API model can't hold it, so neither can the snapshot
+                    logger.exception("unable to snapshot rescue @{}", rescue.api_id)
+            payload = b"".join(lines)
+            temporary = f"{self._path}.tmp"
+            with open(temporary, "wb") as snapshot:
+                snapshot.write(payload)
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temporary, self._path)
+        SNAPSHOT_SIZE.set(len(payload))
+
+    def schedule(self, rescues: Rescues, delay: float):
+        """
+        Write the board after *delay* seconds, unless a write is already due.
+
+        Args:
+            rescues: returns the rescues on the board, called when the snapshot is written
+            delay: seconds changes are gathered for before writing them
+        """
+        if not self._path:
+            return
+        self._pending = rescues
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.ensure_future(self._write_later(delay))
+
+    async def _write_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self._writer = None
+        self.flush()
+
+    def flush(self):
+        """
+        Write the board now, if it changed since the last snapshot.
+        """
+        if self._writer is not None:
+            # the write that was due has nothing left to write, don't leave it pending.
+            self._writer.cancel()
+            self._writer = None
+        rescues, self._pending = self._pending, None
+        if rescues is None:
+            return
+        try:
+            self.save(rescues())
+        except Exception:  # pylint: disable=broad-except
+            # the next change will try again, the board is fine either way.
+            logger.exception("unable to write board snapshot {!r}", self._path)
+
+
+def _line(record: typing.Dict[str, typing.Any]) -> bytes:
+    return json.dumps(record).encode("utf8") + b"\n"
+
+
+def _encode(rescue: Rescue) -> bytes:
+    """ *rescue*, as the line it is written as """
+    return _line(
+        {
+            "rescue": api_converter.unstructure(ApiRescue.from_internal(rescue)),
+            # local only, or relationships the API model doesn't carry
+            "rats": [api_converter.unstructure(rat) for rat in rescue.rats.values()],
+            "modified": sorted(rescue.modified),
+        }
+    )
+
+
+def _decode(line: bytes) -> Rescue:
+    """ the rescue *line* was written for """
+    record = json.loads(line)
+    rescue = api_converter.structure(record["rescue"], ApiRescue).into_internal()
+    rescue.rats = {
+        rat.name.casefold(): rat
+        for rat in (api_converter.structure(data, Rat) for data in record["rats"])
+    }
+    rescue.modified = set(record["modified"])
+    return rescue
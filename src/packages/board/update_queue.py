@@ -0,0 +1,137 @@
+"""
+update_queue.py - write-behind queue for rescue updates
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import typing
+from collections import deque
+from uuid import UUID
+
+import prometheus_client
+from loguru import logger
+
+from ..fuelrats_api import Impersonation
+from ..rescue import Rescue
+
+UPDATES_QUEUED = prometheus_client.Counter(
+    namespace="board",
+    name="updates_queued",
+    documentation="rescue modifications handed to the write-behind queue",
+)
+UPDATES_SENT = prometheus_client.Counter(
+    namespace="board",
+    name="updates_sent",
+    documentation="coalesced rescue updates successfully sent to the API",
+)
+UPDATE_FAILURES = prometheus_client.Counter(
+    namespace="board",
+    name="update_failures",
+    documentation="coalesced rescue updates the API failed to apply",
+)
+UPDATES_PENDING = prometheus_client.Gauge(
+    namespace="board",
+    name="updates_pending",
+    documentation="rescues with updates waiting to be sent to the API",
+)
+
+Sender = typing.Callable[[Rescue, Impersonation], typing.Awaitable[typing.Any]]
+FailureCallback = typing.Callable[[Rescue, Exception], typing.Any]
+
+
+class RescueUpdateQueue:
+    """
+    Write-behind queue for rescue updates.
+
+    Modifications are scheduled per rescue and sent after a short delay, so a burst of commands
+    against one rescue results in a single update.  Since the rescue's `modified` set accumulates
+    every changed field, the update sent carries the union of all coalesced changes.
+
+    Every rescue has at most one worker sending its updates, which keeps them in order.  Updates
+    made on behalf of different users are never merged into one another.
+
+    Failures are logged, counted and passed to *on_failure*, which may be a plain function or a
+    coroutine function.
+    """
+
+    __slots__ = ["_send", "_on_failure", "_pending", "_workers"]
+
+    def __init__(self, send: Sender, on_failure: typing.Optional[FailureCallback] = None):
+        self._send = send
+        """ coroutine function actually sending an update """
+        self._on_failure = on_failure
+        """ called with the rescue and exception when an update fails """
+        self._pending: typing.Dict[
+            UUID, typing.Deque[typing.Tuple[Rescue, Impersonation]]
+        ] = {}
+        """ per rescue, updates waiting to be sent, oldest first """
+        self._workers: typing.Dict[UUID, asyncio.Future] = {}
+        """ per rescue, the task sending its updates """
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, key: UUID) -> bool:
+        """ whether updates of the rescue with API id *key* are waiting or being sent """
+        return key in self._pending or key in self._workers
+
+    def schedule(self, rescue: Rescue, impersonation: Impersonation, delay: float) -> None:
+        """
+        Queue an update of *rescue*, to be sent after *delay* seconds at the latest.
+
+        Args:
+            rescue: the modified rescue
+            impersonation: who the modification was made on behalf of
+            delay: coalescing window, in seconds
+        """
+        UPDATES_QUEUED.inc()
+        pending = self._pending.setdefault(rescue.api_id, deque())
+        if pending and pending[-1][1] == impersonation:
+            # coalesce with the update still waiting to be sent
+            pending[-1] = (rescue, impersonation)
+        else:
+            pending.append((rescue, impersonation))
+        UPDATES_PENDING.set(len(self._pending))
+
+        if rescue.api_id not in self._workers:
+            self._workers[rescue.api_id] = asyncio.ensure_future(
+                self._worker(rescue.api_id, delay)
+            )
+
+    async def _worker(self, key: UUID, delay: float):
+        try:
+            await asyncio.sleep(delay)
+            # anything scheduled whilst a send is in flight gets coalesced into the next one.
+            while self._pending.get(key):
+                rescue, impersonation = self._pending[key].popleft()
+                try:
+                    await self._send(rescue, impersonation)
+                except Exception as error:  # pylint: disable=broad-except
+                    UPDATE_FAILURES.inc()
+                    logger.exception("unable to update rescue @{} on the API", key)
+                    if self._on_failure is not None:
+                        result = self._on_failure(rescue, error)
+                        if inspect.isawaitable(result):
+                            await result
+                else:
+                    UPDATES_SENT.inc()
+        finally:
+            if not self._pending.get(key):
+                self._pending.pop(key, None)
+            del self._workers[key]
+            UPDATES_PENDING.set(len(self._pending))
+
+    async def drain(self):
+        """
+        Wait until every queued update has been sent (or failed).
+        """
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
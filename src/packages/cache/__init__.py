@@ -9,6 +9,9 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 
+from src.config import PLUGIN_MANAGER
 from .rat_cache import RatCache
 
 __all__ = ["RatCache"]
+
+PLUGIN_MANAGER.register(RatCache, "rat_cache")
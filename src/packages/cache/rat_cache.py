@@ -12,20 +12,78 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 from __future__ import annotations
-from typing import Dict, Optional, TYPE_CHECKING
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple, TYPE_CHECKING
 from uuid import UUID
 
+import prometheus_client
+
+from src.config import CONFIG_MARKER
 from src.packages.utils import Platforms, Singleton
+from ...config.datamodel import ConfigRoot
 
 if TYPE_CHECKING:
     from src.packages.rat.rat import Rat
 
+CACHE_HITS = prometheus_client.Counter(
+    namespace="rat_cache",
+    name="hits",
+    documentation="rat lookups answered from cache",
+)
+CACHE_MISSES = prometheus_client.Counter(
+    namespace="rat_cache",
+    name="misses",
+    documentation="rat lookups that had to query the API",
+)
+CACHE_COALESCED = prometheus_client.Counter(
+    namespace="rat_cache",
+    name="coalesced",
+    documentation="rat lookups that waited on an identical lookup already in flight",
+)
+CACHE_SIZE = prometheus_client.Gauge(
+    namespace="rat_cache",
+    name="size",
+    documentation="rat lookup results currently cached",
+)
+
 
 class RatCache(Singleton):
     """
     A cache of rat objects
+
+    Rats are looked up by IRC nickname or UUID through the API handler, if there is one.  What a
+    lookup found, or that it found nothing, is remembered for a while so repeated lookups, such
+    as every rat of an ``!assign``, cost no API calls.  The least recently used lookups are
+    forgotten once there are too many, and concurrent lookups of the same key share one request.
     """
 
+    MAX_SIZE = 1024
+    "The maximum number of lookups remembered."
+
+    TTL = 900.0
+    "Seconds the rats a lookup found are remembered for."
+
+    NEGATIVE_TTL = 60.0
+    "Seconds a lookup that found no rats is remembered for, rats may register at any time."
+
+    @classmethod
+    @CONFIG_MARKER
+    def rehash_handler(cls, data: ConfigRoot):
+        """
+        Apply new configuration data
+
+        Args:
+            data (ConfigRoot): new configuration data to apply.
+        """
+        cls.MAX_SIZE = data.api.rat_cache_size
+        cls.TTL = data.api.rat_cache_ttl
+        cls.NEGATIVE_TTL = data.api.rat_negative_cache_ttl
+        if cls._instance is not None:
+            cls._instance._trim()
+
     def __init__(self, api_handler=None):
         """
         Creates the ratcache
@@ -35,6 +93,10 @@ class RatCache(Singleton):
             self._cache_by_id: Dict[UUID, 'Rat'] = {}
             self._cache_by_name: Dict[str, 'Rat'] = {}
             self._api_handler = api_handler
+            self._lookups: OrderedDict[Hashable, Tuple[float, Tuple['Rat', ...]]] = OrderedDict()
+            """ expiry time and rats found by casefolded nickname or UUID, least recent first """
+            self._in_flight: Dict[Hashable, asyncio.Future] = {}
+            """ lookups currently waiting for the API, by key """
 
     @property
     def api_handler(self):
@@ -92,14 +154,89 @@ class RatCache(Singleton):
             raise TypeError(f"expected a dict, got {type(value)}")
         self._cache_by_name = value
 
+    def _trim(self):
+        while len(self._lookups) > self.MAX_SIZE:
+            self._forget(next(iter(self._lookups)))
+
+    def _forget(self, key: Hashable):
+        """ drop the lookup of *key*, and the rats only it knew of """
+        _, rats = self._lookups.pop(key)
+        for rat in rats:
+            if self.by_uuid.get(rat.uuid) is rat:
+                del self.by_uuid[rat.uuid]
+            if self.by_name.get(rat.name.casefold()) is rat:
+                del self.by_name[rat.name.casefold()]
+
+    def _store(self, key: Hashable, rats: Iterable['Rat']):
+        rats = tuple(rats)
+        ttl = self.TTL if rats else self.NEGATIVE_TTL
+        if key in self._lookups:
+            self._forget(key)
+        if ttl <= 0 or self.MAX_SIZE <= 0:
+            return
+        self._lookups[key] = (time.monotonic() + ttl, rats)
+        for rat in rats:
+            if rat.uuid:
+                self.by_uuid[rat.uuid] = rat
+            self.by_name[rat.name.casefold()] = rat
+        self._trim()
+
+    async def _fetch(self, key: Hashable) -> Tuple['Rat', ...]:
+        try:
+            rats = tuple(await self.api_handler.get_rat(key, None))
+            self._store(key, rats)
+            return rats
+        finally:
+            del self._in_flight[key]
+
+    async def _lookup(self, key: Hashable) -> Tuple['Rat', ...]:
+        """
+        The rats the API has for *key*, a casefolded nickname or a UUID, as recently looked up.
+        """
+        entry = self._lookups.get(key)
+        if entry is not None:
+            expires, rats = entry
+            if expires > time.monotonic():
+                CACHE_HITS.inc()
+                self._lookups.move_to_end(key)
+                return rats
+            self._forget(key)
+
+        if self.api_handler is None:
+            return ()
+
+        future = self._in_flight.get(key)
+        if future is None:
+            CACHE_MISSES.inc()
+            future = self._in_flight[key] = asyncio.ensure_future(self._fetch(key))
+            # everyone waiting may have been cancelled, don't complain about unretrieved errors
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        else:
+            CACHE_COALESCED.inc()
+        return await asyncio.shield(future)
+
+    async def get_rats(self, nickname: str) -> List['Rat']:
+        """
+        Finds all rats of the account *nickname* belongs to.
+
+        Args:
+            nickname (str): IRC nickname to look up
+
+        Returns:
+            List[Rat]: the account's rats, if there is such an account
+        """
+        if not isinstance(nickname, str):
+            raise TypeError("invalid types given.")
+        return list(await self._lookup(nickname.casefold()))
+
     async def get_rat_by_name(self, name: str,
                               platform: Optional[Platforms] = None,
                               ) -> 'Rat' or None:
         """
         Finds a rat by name and optionally by platform
 
-        Will also accept both, and only return if the rat name matches its
-        uuid entry.
+        A rat called *name* is preferred, failing that any rat of the account the nickname *name*
+        belongs to will do.
 
         Args:
             name (str): name to search for
@@ -113,20 +250,28 @@ class RatCache(Singleton):
                                                        Platforms) and platform is not None:
             raise TypeError("invalid types given.")
 
-        # initialize before use
-        found = None
+        key = name.casefold()
+        rats = [rat for rat in await self._lookup(key)
+                if rat.platform == platform or platform is None]
+        for rat in rats:
+            if rat.name.casefold() == key:
+                return rat
+        return rats[0] if rats else None
+
+    async def get_rats_by_name(self, names: Iterable[str],
+                               platform: Optional[Platforms] = None,
+                               ) -> Dict[str, Optional['Rat']]:
+        """
+        Finds the rats of several names at once, see :meth:`get_rat_by_name`.
 
-        try:
-            found = self.by_name[name]
-        except KeyError:
-            # no such rat in cache
-            if self.api_handler is not None:
-                found = await self.api_handler.someApiCall(name=name)  # pragma: no cover
-                # FIXME: replace SomeApiCall with the actual call once we have the interface
-            return found
-        else:
-            # we found a rat
-            return found if (found.platform == platform or platform is None) else None
+        The names not cached are looked up concurrently, each only once.
+
+        Returns:
+            Dict[str, Optional[Rat]]: found rat, if any, by casefolded name
+        """
+        keys = list(dict.fromkeys(name.casefold() for name in names))
+        found = await asyncio.gather(*(self.get_rat_by_name(key, platform) for key in keys))
+        return dict(zip(keys, found))
 
     async def get_rat_by_uuid(self, uuid: UUID) -> Optional['Rat']:
         """
@@ -143,14 +288,12 @@ class RatCache(Singleton):
         """
         if not isinstance(uuid, UUID):
             raise TypeError
-        else:
-            found = None
-            if uuid in self.by_uuid:
-                found = self.by_uuid[uuid]
-            elif self.api_handler is not None:  # pragma: no cover
-                found = await self.api_handler.get_rat_by_id(id=uuid)
-
-            return found
+        # a rat's UUID always refers to the same rat, so these never go stale.
+        if uuid in self.by_uuid:
+            CACHE_HITS.inc()
+            return self.by_uuid[uuid]
+        rats = await self._lookup(uuid)
+        return rats[0] if rats else None
 
     def flush(self) -> None:
         """
@@ -161,10 +304,19 @@ class RatCache(Singleton):
         """
         self.by_name.clear()
         self.by_uuid.clear()
+        self._lookups.clear()
 
     def append(self, rat: Rat):
         if not rat.uuid or not rat.name:
             raise ValueError(rat)
 
-        self.by_uuid[rat.uuid] = rat
-        self.by_name[rat.name] = rat
+        self._store(rat.name.casefold(), (rat,))
+
+
+def _cached_lookups() -> int:
+    cache = RatCache._instance
+    return len(cache._lookups) if cache is not None else 0
+
+
+# set once for the class, RatCache.__init__ runs for every RatCache() call
+CACHE_SIZE.set_function(_cached_lookups)
@@ -12,20 +12,20 @@ This module is built on top of the Pydle system.
 
 """
 
+import re
 import typing
-from typing import Any, Callable, Tuple, Optional
+from typing import Any, Callable, Tuple, Optional, List
 
 import attr
 import prometheus_client
 import psycopg2
-import pyparsing
 from loguru import logger
 from prometheus_async.aio import time as aio_time
-from pyparsing import Word, Suppress, alphanums, alphas, ZeroOrMore
 
-from src.packages.permissions import Permission, has_required_permission
+from src.packages.permissions import Permission, sender_has_permission
 from src.packages.rules.rules import get_rule
 from ..context import Context
+from ..outbound import Priority
 from ..ratmama.ratmama_parser import handle_ratmama_announcement
 
 TRIGGER_TIME = prometheus_client.Histogram(
@@ -61,6 +61,17 @@ TIME_IN_PREXECUTE = prometheus_client.Histogram(
     labelnames=["command"],
 )
 
+# Fact invocations: ``name[-lang] [subject ...]``.
+# Mirrors the pyparsing grammar this replaced token for token, including its quirks:
+# whitespace is allowed around the ``-``, tokens need no separating whitespace, and
+# anything after the first character that can't start a subject is ignored.
+_FACT_WS = r"[ \t\r\n]*"
+FACT_INVOCATION_REGEX = re.compile(
+    rf"{_FACT_WS}(?P<name>[A-Za-z0-9]+)"
+    rf"(?:{_FACT_WS}-{_FACT_WS}(?P<lang>[A-Za-z]+))?"
+    rf"(?P<subjects>(?:{_FACT_WS}[A-Za-z0-9_\[\]|?.<>{{}}\-=]+)*)"
+)
+
 # set the logger for rat_command
 
 
@@ -121,15 +132,20 @@ class Command:
         validator=attr.validators.optional(truthy_validator), default=None
     )
     func: typing.Optional[typing.Callable] = attr.ib(default=None)
+    reply_priority: typing.Optional[Priority] = attr.ib(
+        validator=attr.validators.optional(attr.validators.instance_of(Priority)), default=None
+    )
 
     async def __call__(self, context: Context, *args, **kwargs):
+        if self.reply_priority is not None:
+            context.reply_priority = self.reply_priority
         # TODO: pre-execution hooks would go here
         with logger.contextualize(
             invoking_nick=context.user.nickname, invoking_account=context.user.account
         ):
             with TIME_IN_PREXECUTE.labels(command=self.aliases[0]).time():
                 if self.require_permission:
-                    if not has_required_permission(context.user, self.require_permission):
+                    if not sender_has_permission(context, self.require_permission):
                         logger.warning("A user tried to invoke a command they aren't allowed.")
                         return await context.reply(
                             self.override_permission_message
@@ -207,7 +223,33 @@ async def trigger(ctx) -> Any:
         result = await handle_fact(ctx)
     if not result:
         TRIGGER_MISS.inc()
-        logger.debug(f"Ignoring message '{ctx.words_eol[0]}'. Not a command or rule.")
+        logger.debug("Ignoring message '{}'. Not a command or rule.", ctx.words_eol[0])
+
+
+def parse_fact_invocation(message: str) -> Optional[Tuple[str, str, List[str]]]:
+    """
+    Split a potential fact invocation into its name, language and subjects
+
+    Args:
+        message (str): message to parse, sans prefix
+
+    Returns:
+        (str, str, list of str): name, language (defaulting to ``en``) and subjects,
+            or None if *message* can't be a fact invocation.
+
+    Examples:
+        >>> parse_fact_invocation("prep-ru some_client other_client")
+        ('prep', 'ru', ['some_client', 'other_client'])
+        >>> parse_fact_invocation("prep")
+        ('prep', 'en', [])
+        >>> parse_fact_invocation("#nope") is None
+        True
+    """
+    match = FACT_INVOCATION_REGEX.match(message)
+    if match is None:
+        return None
+    name, lang, subjects = match.group("name", "lang", "subjects")
+    return name, lang or "en", subjects.split()
 
 
 @aio_time(FACT_TIME)
@@ -216,21 +258,13 @@ async def handle_fact(context: Context):
     Handles potential facts
     """
     logger.trace("entering fact handler")
-    pattern = (
-        Word(alphanums).setResultsName("name")
-        + pyparsing.Optional(Suppress("-") + Word(alphas).setResultsName("lang"))
-        + ZeroOrMore(Word(alphanums + "_[]|?.<>{}-=")).setResultsName("subjects")
-    )
     logger.debug("parsing {!r} for facts...", context.words_eol[0])
-    try:
-        result = pattern.parseString(context.words_eol[0])
-    except pyparsing.ParseException:
+    result = parse_fact_invocation(context.words_eol[0])
+    if result is None:
         logger.debug("failed to parse {!r} as a fact", context.words_eol[0])
         return
 
-    fact = result.name
-    lang = result.lang if result.lang else "en"
-    users = result.subjects.asList() if result.subjects else []
+    fact, lang, users = result
     try:
         # don't do anything if the fact doesn't exist
         if not await context.bot.fact_manager.exists(fact.casefold(), lang.casefold()):
@@ -239,7 +273,9 @@ async def handle_fact(context: Context):
 
         logger.debug("fact exists, retrieving and returning!")
         fact = await context.bot.fact_manager.find(fact.casefold(), lang.casefold())
-        await context.reply(f"{', '.join(users)}{': ' if users else ''}{fact.message}")
+        await context.reply(
+            f"{', '.join(users)}{': ' if users else ''}{fact.message}", priority=Priority.LOW
+        )
         return True
     except psycopg2.Error:
         logger.exception("failed to fetch fact")
@@ -282,6 +318,7 @@ def command(
     override_channel_message: Optional[str] = None,
     require_channel: bool = False,
     require_direct_message: bool = False,
+    reply_priority: Optional[Priority] = None,
     **kwargs,
 ):
     """
@@ -294,6 +331,7 @@ def command(
         require_permission: permission level required to invoke this command.
         require_channel: require this command to be invoked in a channel
         require_direct_message: require this command to be invoked via a direct message
+        reply_priority: priority the command's replies go out at, unless they are given one
         *aliases ([str]): aliases to register
 
     """
@@ -319,6 +357,7 @@ def command(
             override_permission_message=require_permission_message,
             override_dm_message=override_dm_message,
             override_channel_message=override_channel_message,
+            reply_priority=reply_priority,
             **kwargs,
         )
         if not _register(cmd, aliases):
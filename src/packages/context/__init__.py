@@ -10,8 +10,8 @@ See LICENSE.md
 """
 from src.config import PLUGIN_MANAGER
 from . import context
-from .context import Context
+from .context import Context, WordsEol
 
-__all__ = ["Context"]
+__all__ = ["Context", "WordsEol"]
 
 PLUGIN_MANAGER.register(context, "context")
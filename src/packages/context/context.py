@@ -12,6 +12,7 @@ See LICENSE.md
 """
 from __future__ import annotations  # for forward references standard in >=3.8
 
+import itertools
 import typing
 from typing import List, ClassVar
 
@@ -19,6 +20,7 @@ import attr
 from loguru import logger
 
 from src.config import CONFIG_MARKER
+from ..outbound import Priority
 from ..user import User
 from ...config.datamodel import ConfigRoot
 
@@ -51,31 +53,105 @@ def rehash_handler(data: ConfigRoot):
     logger.debug(f"in rehash handler, using new prefix {Context.PREFIX}")
 
 
+class WordsEol(typing.Sequence[str]):
+    """
+    The words_eol of a message, each word including everything up to the end of the message.
+
+    The words are joined once, every entry is sliced from that on demand, so building one costs
+    the same however many words there are and entries nobody looks at are never built.
+
+    Examples:
+        >>> words_eol = WordsEol(["pink", "fluffy", "unicorns"])
+        >>> words_eol[0], words_eol[-1]
+        ('pink fluffy unicorns', 'unicorns')
+        >>> words_eol == ['pink fluffy unicorns', 'fluffy unicorns', 'unicorns']
+        True
+    """
+
+    __slots__ = ["_line", "_words", "_offsets"]
+
+    def __init__(self, words: typing.List[str]):
+        self._words = words
+        self._line = " ".join(words)
+        self._offsets: typing.Optional[typing.List[int]] = None
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[item] for item in range(*index.indices(len(self._words)))]
+        count = len(self._words)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("words_eol index out of range")
+        if index == 0:
+            return self._line
+        if self._offsets is None:
+            # where each word after the first starts in the joined line
+            self._offsets = list(itertools.accumulate(len(word) + 1 for word in self._words))
+        return self._line[self._offsets[index - 1]:]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, WordsEol):
+            return self._words == other._words
+        if isinstance(other, (list, tuple)):
+            return len(other) == len(self._words) and all(
+                mine == theirs for mine, theirs in zip(self, other)
+            )
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
 @attr.dataclass
 class Context:
     """
     Command context, stores the context of a command's invocation
+
+    Contexts built by :meth:`from_message` only look their user up the first time
+    :attr:`user` is used, most messages never need it.
     """
 
     bot: MechaClient
-    user: User = attr.ib(validator=attr.validators.instance_of(User))
-    target: str = attr.ib(validator=attr.validators.instance_of(str))
-    words: List[str] = attr.ib(
-        validator=attr.validators.deep_iterable(
-            member_validator=attr.validators.instance_of(str),
-            iterable_validator=attr.validators.instance_of(list),
-        )
+    _user: typing.Optional[User] = attr.ib(
+        validator=attr.validators.optional(attr.validators.instance_of(User))
     )
-    words_eol: List[str] = attr.ib(
-        validator=attr.validators.deep_iterable(
-            member_validator=attr.validators.instance_of(str),
-            iterable_validator=attr.validators.instance_of(list),
-        )
+    target: str = attr.ib(validator=attr.validators.instance_of(str))
+    # the elements are str by construction, checking each of them costs more than the split.
+    words: List[str] = attr.ib(validator=attr.validators.instance_of(list))
+    words_eol: typing.Sequence[str] = attr.ib(
+        validator=attr.validators.instance_of((list, WordsEol))
     )
     prefixed: bool = attr.ib(validator=attr.validators.instance_of(bool), default=False)
+    sender: typing.Optional[str] = attr.ib(default=None)
+    """ nickname :attr:`user` is looked up by, when the context was built without one """
+    reply_priority: Priority = attr.ib(
+        validator=attr.validators.instance_of(Priority), default=Priority.NORMAL
+    )
+    """ priority replies go out at, unless they are given one """
     PREFIX: ClassVar[str] = "<!!NOTSET!!>"
     DRILL_MODE: ClassVar[bool] = False
 
+    @property
+    def user(self) -> User:
+        """
+        The user that sent the message, looked up on first use.
+
+        Raises:
+            LookupError: the bot knows no user by the sender's nickname
+        """
+        if self._user is None:
+            if self.sender is not None:
+                self._user = self.bot.user_cache.user(self.sender)
+            if self._user is None:
+                raise LookupError(f"no such user {self.sender!r}")
+        return self._user
+
     @property
     def channel(self) -> typing.Optional[str]:
         """
@@ -106,34 +182,40 @@ class Context:
 
         # build the words and words_eol lists
         words, words_eol = _split_message(message)
-        # get the user from a WHOIS query
-        user = await User.from_pydle(bot, sender)
 
-        # return a built context object
-        return cls(bot, user, channel, words, words_eol, prefixed=prefixed)
+        # return a built context object, its user is looked up once something needs it
+        return cls(bot, None, channel, words, words_eol, prefixed=prefixed, sender=sender)
 
-    async def reply(self, msg: str):
+    async def reply(self, msg: str, priority: typing.Optional[Priority] = None):
         """
         Sends a message in the same channel or query window as the command was sent.
 
         Arguments:
             msg (str): Message to send.
+            priority (Priority): how urgently it needs to go out, :attr:`reply_priority` if
+                not given
         """
+        if priority is None:
+            priority = self.reply_priority
         if self.channel is not None:
-            await self.bot.message(self.channel, msg)
+            await self.bot.message(self.channel, msg, priority=priority)
         else:
-            await self.bot.message(self.user.nickname, msg)
+            await self.bot.message(self.user.nickname, msg, priority=priority)
 
-    async def reply_notice(self, msg: str):
+    async def reply_notice(self, msg: str, priority: typing.Optional[Priority] = None):
         """
         Sends a message as a NOTICE to the user that send the command.
         Arguments:
             msg (str): Message to send.
+            priority (Priority): how urgently it needs to go out, :attr:`reply_priority` if
+                not given
         """
-        await self.bot.notice(self.user.nickname, msg)
+        if priority is None:
+            priority = self.reply_priority
+        await self.bot.notice(self.user.nickname, msg, priority=priority)
 
 
-def _split_message(string: str) -> typing.Tuple[typing.List[str], typing.List[str]]:
+def _split_message(string: str) -> typing.Tuple[typing.List[str], WordsEol]:
     """
     Split up a string into words and words_eol
 
@@ -141,10 +223,10 @@ def _split_message(string: str) -> typing.Tuple[typing.List[str], typing.List[st
         string: Any string.
 
     Returns:
-        (list of str, list of str):
+        (list of str, WordsEol):
             A 2-tuple of (words, words_eol), where words is a list of the words of *string*,
-            seperated by whitespace, and words_eol is a list of the same length, with each element
-            including the word and everything up to the end of *string*
+            seperated by whitespace, and words_eol is a sequence of the same length, with each
+            element including the word and everything up to the end of *string*
 
     Example:
         >>> _split_message("pink fluffy unicorns")
@@ -153,7 +235,4 @@ def _split_message(string: str) -> typing.Tuple[typing.List[str], typing.List[st
     # get the words
     words = string.split()
 
-    # reconstruct the original phrase EOL style, through clever usage of slice
-    words_eol = [" ".join(words[i:]) for i, _ in enumerate(words)]
-
-    return words, words_eol
+    return words, WordsEol(words)
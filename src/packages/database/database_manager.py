@@ -7,7 +7,12 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 
+import asyncio
+import time
 import typing
+from concurrent.futures import ThreadPoolExecutor
+
+import prometheus_client
 import psycopg2
 from loguru import logger
 from psycopg2 import sql, pool
@@ -15,6 +20,24 @@ from psycopg2 import sql, pool
 from src.config import CONFIG_MARKER
 from src.config.datamodel import ConfigRoot
 
+POOL_WAIT_TIME = prometheus_client.Histogram(
+    namespace="database",
+    name="pool_wait",
+    unit="seconds",
+    documentation="time spent waiting for a pooled database connection",
+)
+QUERY_TIME = prometheus_client.Histogram(
+    namespace="database",
+    name="query",
+    unit="seconds",
+    documentation="time spent executing a query on a pooled connection",
+)
+QUERIES_IN_FLIGHT = prometheus_client.Gauge(
+    namespace="database",
+    name="queries_in_flight",
+    documentation="number of queries submitted to the connection pool and not yet completed",
+)
+
 
 class DatabaseManager:
     """
@@ -35,9 +58,13 @@ class DatabaseManager:
         Instantiation of the DBM is not intended to be done per method, but rather once as a
         class property, and the DatabaseManage.query() method used to perform a query.
 
-        Connections are managed by a SimpleConnectionPool, keeping a minimum of 5 and a maximum
+        Connections are managed by a ThreadedConnectionPool, keeping a minimum of 5 and a maximum
         of 10 connections, able to dynamically open/close ports as needed.
 
+        psycopg2 is a blocking driver, so every query is run on a bounded thread pool with one
+        worker per pooled connection.  The event loop is never blocked by a database round trip;
+        excess queries queue up on the executor until a connection frees up.
+
         Performing A Query:
         .query() does not accept a direct string.  You must use a psycopg2 composed SQL (sql.SQL)
         object, with appropriate substitutions.
@@ -54,6 +81,12 @@ class DatabaseManager:
 
     _config: typing.ClassVar[typing.Dict] = {}
 
+    POOL_MIN_CONNECTIONS = 5
+    "Number of connections the pool keeps open at all times."
+
+    POOL_MAX_CONNECTIONS = 10
+    "Upper bound on open connections, and on the number of concurrently executing queries."
+
     @classmethod
     @CONFIG_MARKER
     def rehash_handler(cls, data: ConfigRoot):
@@ -134,9 +167,9 @@ class DatabaseManager:
 
         # Create Database Connections Pool
         try:
-            self._dbpool = psycopg2.pool.SimpleConnectionPool(
-                5,
-                10,
+            self._dbpool = psycopg2.pool.ThreadedConnectionPool(
+                self.POOL_MIN_CONNECTIONS,
+                self.POOL_MAX_CONNECTIONS,
                 host=self._dbhost,
                 port=self._dbport,
                 dbname=self._dbname,
@@ -148,21 +181,36 @@ class DatabaseManager:
             logger.exception("Unable to connect to database!")
             raise error
 
+        # One worker per connection, so a worker never waits on the pool itself.
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.POOL_MAX_CONNECTIONS, thread_name_prefix="database"
+        )
+
     async def is_connected(self) -> bool:
         """
         Private method.  Verifies the isolation level as an alternative to
         an actual query to check if the connection is still alive and valid.
         """
+        loop = asyncio.get_event_loop()
         try:
-            with self._dbpool.getconn() as connection:
-                heartbeat = connection.isolation_level
-                self._dbpool.putconn(connection)
+            await loop.run_in_executor(self._executor, self._heartbeat)
         except psycopg2.OperationalError:
             logger.warning("Potential Connectivity issues with database!")
             return False
 
         return True
 
+    def _heartbeat(self):
+        """
+        Blocking half of :meth:`is_connected`, runs on the executor.
+        """
+        connection = self._dbpool.getconn()
+        try:
+            with connection:
+                _ = connection.isolation_level
+        finally:
+            self._dbpool.putconn(connection)
+
     async def query(
         self, query: sql.SQL, values: typing.Union[typing.Tuple, typing.Dict]
     ) -> typing.List:
@@ -185,26 +233,53 @@ class DatabaseManager:
         if not isinstance(values, (dict, tuple)):
             raise TypeError(f"Expected tuple or dict for query values.")
 
+        loop = asyncio.get_event_loop()
+        with QUERIES_IN_FLIGHT.track_inprogress():
+            # Hand the blocking work off to the executor, so the event loop keeps running.
+            return await loop.run_in_executor(
+                self._executor, self._execute, query, values, time.perf_counter()
+            )
+
+    def _execute(
+        self,
+        query: sql.SQL,
+        values: typing.Union[typing.Tuple, typing.Dict],
+        submitted_at: float,
+    ) -> typing.List:
+        """
+        Blocking half of :meth:`query`, runs on the executor.
+
+        Args:
+            query: composed SQL query object
+            values: tuple or dict of values for query
+            submitted_at: :func:`time.perf_counter` timestamp the query was submitted at
+
+        Returns:
+            List of rows matching query.
+        """
         # Pull a connection from the pool, and create a cursor from it.
-        with self._dbpool.getconn() as connection:
-            # If we could set these at connection time, we would,
-            # but they must be set outside the pool.
-            connection.autocommit = True
-            connection.set_client_encoding("utf-8")
-            # Create cursor, and execute the query.
-            with connection.cursor() as cursor:
-                if __debug__:
-                    logger.debug("executing query {}", query)  # noinspection PyUnreachableCode
-                cursor.execute(query, values)
-                # Check if cursor.description is NONE - meaning no results returned.
-                if cursor.description:
-                    result = cursor.fetchall()
-                else:
-                    # Return a blank tuple if there are no results, since we are
-                    # forcing this to a list.
-                    result = ()
-
-        # Release connection back to the pool.
-        self._dbpool.putconn(connection)
+        connection = self._dbpool.getconn()
+        POOL_WAIT_TIME.observe(time.perf_counter() - submitted_at)
+        try:
+            with connection, QUERY_TIME.time():
+                # If we could set these at connection time, we would,
+                # but they must be set outside the pool.
+                connection.autocommit = True
+                connection.set_client_encoding("utf-8")
+                # Create cursor, and execute the query.
+                with connection.cursor() as cursor:
+                    if __debug__:
+                        logger.debug("executing query {}", query)  # noinspection PyUnreachableCode
+                    cursor.execute(query, values)
+                    # Check if cursor.description is NONE - meaning no results returned.
+                    if cursor.description:
+                        result = cursor.fetchall()
+                    else:
+                        # Return a blank tuple if there are no results, since we are
+                        # forcing this to a list.
+                        result = ()
+        finally:
+            # Release connection back to the pool, even if the query blew up.
+            self._dbpool.putconn(connection)
 
         return list(result)
@@ -11,6 +11,10 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE.md
 """
+import asyncio
+import weakref
+
+import prometheus_client
 import psycopg2
 import pendulum
 import typing
@@ -18,15 +22,39 @@ from psycopg2 import sql, pool
 from loguru import logger
 from .fact import Fact
 from ..database import DatabaseManager
+from ..utils import gauge_total
 from src.config import CONFIG_MARKER
 from ...config.datamodel import ConfigRoot
 
+FACT_CACHE_HITS = prometheus_client.Counter(
+    namespace="fact_manager",
+    name="cache_hits",
+    documentation="fact lookups answered from the in-process cache",
+)
+FACT_CACHE_MISSES = prometheus_client.Counter(
+    namespace="fact_manager",
+    name="cache_misses",
+    documentation="fact lookups that had to query the database",
+)
+FACT_CACHE_SIZE = prometheus_client.Gauge(
+    namespace="fact_manager",
+    name="cache_size",
+    documentation="number of (name, lang) entries held by the fact cache, including misses",
+)
+
+_FactKey = typing.Tuple[str, str]
+_FactRow = typing.Tuple
+
 
 class FactManager(DatabaseManager):
     """
     Fact Manager class inherits DatabaseManager to provide methods for interfacing with Fact objects
     stored in a fact table.
 
+    Lookups via :meth:`exists` and :meth:`find` are served from an in-process cache keyed by
+    (name, lang).  The cache is bulk loaded from the fact table on first use, remembers misses,
+    and is invalidated by every write this class performs.
+
     Args:
         fact_table: (Optional) defaults to "fact2", name of fact table.
         fact_log: (Optional) defaults ot "fact_transaction", name of transaction log table.
@@ -35,6 +63,10 @@ class FactManager(DatabaseManager):
         Nothing
     """
     _config: typing.ClassVar[typing.Dict]
+    _instances: typing.ClassVar[typing.MutableSet["FactManager"]] = weakref.WeakSet()
+
+    NEGATIVE_CACHE_LIMIT: typing.ClassVar[int] = 1024
+    "Maximum number of remembered misses, oldest are evicted first."
 
     @classmethod
     @CONFIG_MARKER
@@ -61,10 +93,103 @@ class FactManager(DatabaseManager):
         if not isinstance(self._fact_log, str):
             raise TypeError("Fact log table name must be a string")
 
+        # (name, lang) -> row, for facts known to exist
+        self._cache: typing.Dict[_FactKey, _FactRow] = {}
+        # (name, lang) of facts known not to exist, in insertion order
+        self._missing: typing.Dict[_FactKey, None] = {}
+        # bumped on every invalidation, so in-flight lookups don't store stale rows
+        self._generation = 0
+        self._preloaded = False
+        self._preload_lock = asyncio.Lock()
+        self._instances.add(self)
+
         # Proclaim loudly into the void that we are loaded.
         super().__init__()
         logger.info("Fact Manager Initialized.")
 
+    async def preload(self):
+        """
+        Bulk load every fact into the cache, replacing its current contents.
+
+        Raises:
+            psycopg2.DatabaseError: On any connectivity issue or no database available.
+        """
+        query = sql.SQL(f"SELECT name, lang, message, aliases, author, edited, editedby, mfd "
+                        f"FROM {self._fact_table}")
+        generation = self._generation
+        rows = await self.query(query, ())
+
+        if generation != self._generation:
+            # something was written whilst we loaded, our snapshot may be stale.
+            logger.debug("fact cache preload raced a write, discarding it.")
+            return
+
+        self._cache = {(row[0], row[1]): row for row in rows}
+        self._missing.clear()
+        self._preloaded = True
+        logger.info(f"Fact cache preloaded with {len(self._cache)} facts.")
+
+    def clear_cache(self):
+        """
+        Drop every cached fact and miss.  The next lookup reloads the cache.
+        """
+        self._generation += 1
+        self._cache.clear()
+        self._missing.clear()
+        self._preloaded = False
+
+    def _invalidate(self, name: str, lang: str):
+        """
+        Forget whatever is cached for a single (name, lang) pair.
+        """
+        self._generation += 1
+        self._cache.pop((name, lang), None)
+        self._missing.pop((name, lang), None)
+
+    def _remember(self, key: _FactKey, row: typing.Optional[_FactRow]):
+        if row is not None:
+            self._cache[key] = row
+            return
+
+        self._missing[key] = None
+        if len(self._missing) > self.NEGATIVE_CACHE_LIMIT:
+            # dicts preserve insertion order, so the first key is the oldest miss.
+            del self._missing[next(iter(self._missing))]
+
+    async def _lookup(self, name: str, lang: str) -> typing.Optional[_FactRow]:
+        """
+        Fetch the raw row for a fact, from the cache if possible.
+
+        Returns:
+            the fact's row, or None if no such fact exists.
+        """
+        if not self._preloaded:
+            async with self._preload_lock:
+                if not self._preloaded:
+                    try:
+                        await self.preload()
+                    except psycopg2.Error:
+                        logger.exception("Unable to preload fact cache, falling back to lookups.")
+
+        key = (name, lang)
+        if key in self._cache:
+            FACT_CACHE_HITS.inc()
+            return self._cache[key]
+        if key in self._missing:
+            FACT_CACHE_HITS.inc()
+            return None
+
+        FACT_CACHE_MISSES.inc()
+        query = sql.SQL(f"SELECT name, lang, message, aliases, author, edited, editedby, mfd from "
+                        f"{self._fact_table} where name=%s AND lang=%s")
+        generation = self._generation
+        rows = await self.query(query, key)
+        row = rows[0] if rows else None
+
+        if generation == self._generation:
+            self._remember(key, row)
+        return row
+
     async def add(self, fact: Fact):
         """
         Adds a new fact to the database.  This will result in a ProgrammingError being thrown
@@ -99,6 +224,7 @@ class FactManager(DatabaseManager):
 
             # run INSERT query
             await self.query(add_query, add_values)
+            self._invalidate(fact.name, fact.lang)
 
         except (psycopg2.DatabaseError, psycopg2.IntegrityError) as error:
             # Database is not available, or fact already exists and wasn't checked.
@@ -120,6 +246,7 @@ class FactManager(DatabaseManager):
         del_query = sql.SQL(f"DELETE FROM {self._fact_table} WHERE name=%s AND lang=%s")
 
         await self.query(del_query, (name, lang))
+        self._invalidate(name, lang)
 
     async def delete(self, name: str, lang: str):
         """
@@ -178,6 +305,7 @@ class FactManager(DatabaseManager):
             logger.debug(f"query_values = {query_values}")
 
             await self.query(edit_query, query_values)
+            self._invalidate(name, lang)
         except (psycopg2.ProgrammingError, psycopg2.DatabaseError) as error:
             logger.exception(f"Editing fact '{name}-{lang}' failed.")
             raise error
@@ -195,11 +323,8 @@ class FactManager(DatabaseManager):
 
         Returns: True/False, if already exists.
         """
-        query = sql.SQL(f"SELECT COUNT(*) message FROM "
-                        f"{self._fact_table} WHERE name=%s AND lang=%s")
-
         try:
-            result = await self.query(query, (name, lang))
+            row = await self._lookup(name, lang)
         except (psycopg2.ProgrammingError, psycopg2.DatabaseError, psycopg2.pool.PoolError) as error:
             # Check for offline database
             if isinstance(error, psycopg2.pool.PoolError):
@@ -214,9 +339,7 @@ class FactManager(DatabaseManager):
                 logger.exception("Database Access issue - verify fact table.", backtrace=True)
                 raise
 
-        # We are only getting a single integer as a response, so we can unpack it by index.
-        # it will always return a single integer.
-        return result[0][0]
+        return row is not None
 
     async def fact_history(self, fact_name: str, fact_lang: str) -> list:
         """
@@ -255,21 +378,17 @@ class FactManager(DatabaseManager):
 
         Returns: Fact()
         """
-        # Build SQL Object for our query
-        query = sql.SQL(f"SELECT name, lang, message, aliases, author, edited, editedby, mfd from "
-                        f"{self._fact_table} where name=%s AND lang=%s")
-        # await our raw result from query
+        # fetch our raw row, from the cache or the database
         try:
-            rows = await self.query(query, (name, lang))
+            result = await self._lookup(name, lang)
         except (psycopg2.DatabaseError, psycopg2.ProgrammingError) as error:
             # Check for offline database, or query errors
             logger.exception("Unable to find fact due to exception.")
             raise error
 
-        # unpack query into a fact object, or return None if there is no result.
-
-        if rows:
-            result = rows[0]
+        # unpack row into a fact object, or return None if there is no result.
+        # A fresh Fact is built every time, so callers can't mutate the cached copy.
+        if result:
             return Fact(name=result[0],
                         lang=result[1],
                         message=result[2],
@@ -339,6 +458,7 @@ class FactManager(DatabaseManager):
             # Invert MFD field value, and set it again.
             mfd_value = not result[0][0]
             await self.query(mfd_query, (mfd_value, name, lang))
+            self._invalidate(name, lang)
 
         except (psycopg2.ProgrammingError, psycopg2.DatabaseError) as error:
             # ProgrammingError is a query failure, DatabaseError is database unavailable.
@@ -371,3 +491,10 @@ class FactManager(DatabaseManager):
             result = [f"{item[0]}-{item[1]}" for item in raw_results]
 
         return result
+
+
+def _cached_facts(manager: FactManager) -> int:
+    return len(manager._cache) + len(manager._missing)  # pylint: disable=protected-access
+
+
+gauge_total(FACT_CACHE_SIZE, FactManager._instances, _cached_facts)
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import datetime
 import json
 
+import attr
 import pendulum
-from typing import Union, Any
+from typing import Any, Callable, Dict, List, Optional, Union
 from uuid import UUID
 
+from cattr.gen import make_dict_structure_fn
 from loguru import logger
 
 from src.packages.utils import Platforms
@@ -26,6 +29,26 @@ def to_datetime(raw: Union[str, pendulum.DateTime]) -> pendulum.DateTime:
     # step 0, if its already a pendulum.DateTime do nothing.
     if isinstance(raw, pendulum.DateTime):
         return raw
+    # step 1, the API sends UTC timestamps such as 2020-07-05T23:02:58.000Z, which the standard
+    # library parses several times faster than pendulum.
+    if raw[-1:] == "Z":
+        try:
+            parsed = datetime.datetime.fromisoformat(raw[:-1])
+        except ValueError:
+            pass
+        else:
+            if parsed.tzinfo is None:
+                return pendulum.DateTime(
+                    parsed.year,
+                    parsed.month,
+                    parsed.day,
+                    parsed.hour,
+                    parsed.minute,
+                    parsed.second,
+                    parsed.microsecond,
+                    tzinfo=pendulum.tz.UTC,
+                )
+    # step 2, anything else is left to pendulum
     return pendulum.parse(raw)
 
 
@@ -54,13 +77,108 @@ thus we need to define a second one that uses tuples instead.
 """
 
 
+api_converter = cattr.GenConverter()
+"""
+converter for the API's models, the websocket's requests and responses.
+
+Where the global converter looks up how to convert every attribute of an attrs class each time it
+sees one, this one generates a function (un)structuring the class, with
+:func:`cattr.gen.make_dict_structure_fn` and :func:`cattr.gen.make_dict_unstructure_fn`, the
+first time it converts one, and registers it as the class' hook.
+"""
+
+Hook = Callable[[Any], Any]
+
+_AS_DECODED = frozenset((str, int, float, bool, dict, Dict, Any))
+""" attribute types JSON decodes values as already, the models validate them """
+
+_VALUE_HOOKS: Dict[Any, Hook] = {
+    UUID: to_uuid,
+    pendulum.DateTime: to_datetime,
+    Platforms: to_platform,
+}
+""" how attributes of the types JSON has no notion of are structured """
+
+
+class _AttributeHooks:
+    """
+    What the structuring functions generated for ``api_converter`` structure attributes with.
+
+    :func:`cattr.gen.make_dict_structure_fn` generates functions handing every attribute to the
+    converter's ``structure``.  Its dispatch hashes the attribute's type each time, which for
+    typing constructs such as ``Optional[str]`` costs more than structuring the value, and then
+    dispatches again on what the ``Optional`` holds.  Here every type is resolved to a function
+    once, or to nothing for the types JSON decodes values as already, and told apart by identity.
+    """
+
+    __slots__ = ["_converter", "_hooks", "_kinds"]
+
+    def __init__(self, converter: cattr.Converter):
+        self._converter = converter
+        self._hooks: Dict[int, Optional[Hook]] = {}
+        """ per attribute type, by identity, the function structuring its values """
+        self._kinds: List[Any] = []
+        """ the types resolved, kept alive so their identities aren't reused """
+
+    def structure(self, value, kind):
+        try:
+            hook = self._hooks[id(kind)]
+        except KeyError:
+            hook = self._hooks[id(kind)] = self._resolve(kind)
+            self._kinds.append(kind)
+        return value if hook is None else hook(value)
+
+    def _resolve(self, kind) -> Optional[Hook]:
+        """ the function structuring values of *kind*, None if they are taken as they are """
+        if kind in _AS_DECODED:
+            return None
+        if kind in _VALUE_HOOKS:
+            return _VALUE_HOOKS[kind]
+        origin = getattr(kind, "__origin__", None)
+        arguments = getattr(kind, "__args__", ())
+        if origin is Union and len(arguments) == 2 and type(None) in arguments:
+            inner = self._resolve(arguments[0] if arguments[1] is type(None) else arguments[1])
+            if inner is None:
+                return None
+            return lambda value: None if value is None else inner(value)
+        if origin is list and arguments:
+            inner = self._resolve(arguments[0])
+            if inner is None:
+                return None
+            return lambda values: [inner(value) for value in values]
+        if origin is dict and arguments and arguments[0] is str:
+            inner = self._resolve(arguments[1])
+            if inner is None:
+                return None
+            return lambda mapping: {key: inner(value) for key, value in mapping.items()}
+        # attrs classes and the like, whose hooks may be registered later
+        structure = self._converter.structure
+        return lambda value: structure(value, kind)
+
+
+_attribute_hooks = _AttributeHooks(api_converter)
+
+
+def structurer(cls: type) -> Callable[..., Any]:
+    """
+    Generate the function structuring a dictionary as the attrs class *cls*, and register it as
+    the class' ``api_converter`` hook.
+    """
+    structure = make_dict_structure_fn(cls, _attribute_hooks)
+    api_converter.register_structure_hook(cls, structure)
+    return structure
+
+
+api_converter.register_structure_hook_func(attr.has, lambda data, cls: structurer(cls)(data))
+
+
 def structure_uuid(data: str, *args) -> UUID:
     logger.debug(f"structuring {data} as uuid...")
     return UUID(data)
 
 
 # Doing this in a loop so both converters get it without duplication...
-for converter in (cattr, event_converter):
+for converter in (cattr, event_converter, api_converter):
     # UUID doesn't have a builtin de/structure hook, provide our own
     converter.register_structure_hook(UUID, structure_uuid)
     converter.register_unstructure_hook(UUID, lambda data: f"{data}")
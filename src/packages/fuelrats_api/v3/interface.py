@@ -5,16 +5,18 @@ from uuid import UUID
 
 import aiohttp
 import attr
-import cattr
 import websockets
 from loguru import logger
 from prometheus_client import Histogram
 
+from .converters import api_converter
 from .models.v1.nickname import Nickname
 from .models.v1.rats import Rat as ApiRat, RAT_TYPE
-from .models.v1.rescue import Rescue as ApiRescue
+from .models.v1.rescue import Rescue as ApiRescue, encode_delta
 from .models.jsonapi.resource import Resource
+from .websocket import codec
 from .websocket.client import Connection, Hardfail
+from .websocket.events import RescueCreate, RescueUpdate
 from .websocket.protocol import Request, Response
 from .._base import FuelratsApiABC, Impersonation
 from ...rat import Rat as InternalRat
@@ -31,11 +33,19 @@ NICKNAME_TIME = Histogram(
 )
 
 
+RescueListener = typing.Callable[[Rescue], typing.Awaitable[typing.Any]]
+ConnectionListener = typing.Callable[[], typing.Awaitable[typing.Any]]
+
+
 @attr.dataclass(eq=False)
 class ApiV300WSS(FuelratsApiABC):
     connection: Optional[Connection] = attr.ib(default=None)
     """ underlying websocket """
     connected_event: asyncio.Event = attr.ib(factory=asyncio.Event)
+    rescue_listeners: List[RescueListener] = attr.ib(factory=list)
+    """ called with rescues created or changed elsewhere, as the API announces them """
+    connection_listeners: List[ConnectionListener] = attr.ib(factory=list)
+    """ called every time the websocket connects """
 
     def __attrs_post_init__(self):
         PLUGIN_MANAGER.register(self)
@@ -57,6 +67,7 @@ class ApiV300WSS(FuelratsApiABC):
 
         # apply new configuration
         self.config = new_configuration
+        codec.use_backend(new_configuration.json_backend)
 
         # If we don't have a connection (startup rehash) OR the configuration changed.
         if not self.connection or original != new_configuration:
@@ -92,11 +103,40 @@ class ApiV300WSS(FuelratsApiABC):
             subprotocols=("FR-JSONAPI-WS",),
         ) as soc:
             logger.info("created.")
-            self.connection = Connection(socket=soc)
+            self.connection = Connection(
+                socket=soc,
+                timeout=self.config.request_timeout,
+                endpoint_timeouts=self.config.endpoint_timeouts,
+                max_in_flight=self.config.max_in_flight,
+                on_event=self.on_event,
+            )
             self.connected_event.set()
+            for listener in self.connection_listeners:
+                asyncio.create_task(listener())
             logger.info("pending shutdown event...")
             await self.connection.shutdown.wait()
 
+    def subscribe(self, listener: RescueListener):
+        """
+        Have *listener* called with every rescue created or changed elsewhere.
+        """
+        self.rescue_listeners.append(listener)
+
+    def subscribe_connections(self, listener: ConnectionListener):
+        """
+        Have *listener* called, as a task of its own, every time the websocket connects.
+        """
+        self.connection_listeners.append(listener)
+
+    async def on_event(self, event):
+        """ Hand rescues the API announces changes to over to the listeners """
+        if not isinstance(event, (RescueUpdate, RescueCreate)):
+            return
+        rescue: ApiRescue = api_converter.structure(event.data["data"], ApiRescue)
+        internal = rescue.into_internal()
+        for listener in self.rescue_listeners:
+            await listener(internal)
+
     async def get_rescues(self, impersonate: Impersonation) -> List[Rescue]:
         return [obj.into_internal() for obj in await self._get_open_rescues(impersonate=impersonate)]
 
@@ -104,12 +144,9 @@ class ApiV300WSS(FuelratsApiABC):
         await self.ensure_connection()
         if not rescue.api_id:
             raise ValueError("Rescue cannot have a null API ID at this point.")
-        payload = {
-            "data": ApiRescue.from_internal(rescue).to_delta(rescue.modified.copy()),
-        }
-        # Purge attributes we are not supposed to send.
-        del payload["data"]["links"]
-        del payload["data"]["relationships"]
+        # fields changed from here on weren't sent, they are left modified for the next update
+        sent, rescue.modified = rescue.modified, set()
+        payload = {"data": encode_delta(rescue, sent)}
         work = Request(
             endpoint=["rescues", "update"],
             body=payload,
@@ -117,7 +154,11 @@ class ApiV300WSS(FuelratsApiABC):
         )
         if not Impersonation:
             del work.query["representing"]
-        response = await self.execute(work)
+        try:
+            response = await self.execute(work)
+        except BaseException:
+            rescue.modified |= sent
+            raise
         return response
 
     async def _get_rescue(self, key: UUID, impersonation: Impersonation) -> Optional[ApiRescue]:
@@ -126,7 +167,7 @@ class ApiV300WSS(FuelratsApiABC):
             endpoint=["rescues", "read"], query={"id": f"{key}", "representing": impersonation}
         )
         response = await self.execute(work)
-        return cattr.structure(response.body["data"], Optional[ApiRescue])
+        return api_converter.structure(response.body["data"], Optional[ApiRescue])
 
     async def get_rescue(self, key: UUID, impersonation: Impersonation) -> typing.Optional[Rescue]:
         rescue = await self._get_rescue(key=key, impersonation=impersonation)
@@ -146,18 +187,18 @@ class ApiV300WSS(FuelratsApiABC):
         work = Request(
             endpoint=["rescues", "create"],
             query={"representing": impersonating},
-            body={"data": attr.asdict(ApiRescue.from_internal(rescue), recurse=True)},
+            body={"data": api_converter.unstructure(ApiRescue.from_internal(rescue))},
         )
         result = await self.execute(work)
         # if we get this far, we got a OK response; which means the data field contains our rescue.
-        payload: ApiRescue = cattr.structure(result.body["data"], ApiRescue)
+        payload: ApiRescue = api_converter.structure(result.body["data"], ApiRescue)
         return payload.into_internal()
 
     async def get_rat(self, key: Union[UUID, str], impersonation: Impersonation) -> List[InternalRat]:
         await self.ensure_connection()
         if isinstance(key, UUID):
             results = await self._get_rat_uuid(key, impersonation=None)
-            rat: ApiRat = cattr.structure(results.body["data"], ApiRat)
+            rat: ApiRat = api_converter.structure(results.body["data"], ApiRat)
             return [rat.into_internal()]
         if isinstance(key, str):
             results = await self._get_rats_from_nickname(key, impersonation=impersonation)
@@ -192,7 +233,7 @@ class ApiV300WSS(FuelratsApiABC):
         logger.trace("requesting open rescues...")
         results = await self.execute(work)
         # Iterators are less expensive than comprehensions (differed compute).
-        structured_data = cattr.structure(results.body["data"], List[ApiRescue])
+        structured_data = api_converter.structure(results.body["data"], List[ApiRescue])
         return structured_data
 
     async def _get_rats_from_nickname(self, key: str, impersonation: Impersonation) -> List[ApiRat]:
@@ -203,13 +244,17 @@ class ApiV300WSS(FuelratsApiABC):
         # Its not actually a type, but a string the API uses to represent one.
         # meaning the below is just a string equality operation; nothing untoward here.
         rats = [
-            cattr.structure(obj, ApiRat) for obj in raw.body["included"] if obj["type"] == RAT_TYPE
+            api_converter.structure(obj, ApiRat)
+            for obj in raw.body["included"]
+            if obj["type"] == RAT_TYPE
         ]
         logger.debug("filtered Rats from nickname result: {!r}", rats)
 
         return rats
 
-    async def execute(self, work: Request, retry: bool = False) -> Response:
+    async def execute(
+        self, work: Request, retry: bool = False, timeout: Optional[float] = None
+    ) -> Response:
         """
         Attempts to execute the work item against the underlying connection.
 
@@ -220,18 +265,20 @@ class ApiV300WSS(FuelratsApiABC):
         Args:
             work: work item
             retry: is this call a retry attempt?
+            timeout: seconds to wait for the answer, instead of the endpoint's timeout
 
         Returns:
             Response object
 
         Raises:
             Hardfail from underlying API error, if connection is still dead after a retry.
+            RequestTimeout if the API did not answer in time.
         """
         await self.ensure_connection()
 
         try:
             # attempt to invoke the underlying connection work item
-            return await self.connection.execute(work=work)
+            return await self.connection.execute(work=work, timeout=timeout)
         # If this fails hard, spark needs to attempt to reconnect (unless its already tried.)
         except Hardfail:
             # unconditionally kill the connection.
@@ -243,5 +290,5 @@ class ApiV300WSS(FuelratsApiABC):
                 # re-create the run_task, which creates a new connection.
                 asyncio.create_task(self.run_task())
                 # recursively call this routine, as its possible to fail more than once.
-                return await self.execute(work=work, retry=True)
+                return await self.execute(work=work, retry=True, timeout=timeout)
             raise
@@ -3,6 +3,7 @@ import typing
 import attr
 
 from .resource_identifier import ObjectIdentifier
+from ...converters import api_converter
 
 import cattr
 
@@ -22,7 +23,8 @@ class Link:
         return cls(**payload)
 
 
-cattr.register_structure_hook(Link, lambda data, _: Link.from_dict(data))
+for converter in (cattr, api_converter):
+    converter.register_structure_hook(Link, lambda data, _: Link.from_dict(data))
 
 
 Links = typing.Dict[str, Link]
@@ -1,5 +1,4 @@
 import typing
-from typing import List
 
 import attr
 import cattr
@@ -7,6 +6,9 @@ from loguru import logger
 
 from .link import ResourceLinkage, Links, Link
 from .resource_identifier import ObjectIdentifier
+from ...converters import api_converter, structurer
+
+_structure_identifier = structurer(ObjectIdentifier)
 
 
 @attr.dataclass
@@ -28,10 +30,10 @@ class Relationship:
         data = payload["data"]
         if isinstance(data, list):
             # list of identifiers
-            kwargs["data"] = cattr.structure(data, List[ObjectIdentifier])
+            kwargs["data"] = [_structure_identifier(identifier) for identifier in data]
         elif isinstance(data, dict):
             # single identifier
-            kwargs["data"] = cattr.structure(data, ObjectIdentifier)
+            kwargs["data"] = _structure_identifier(data)
         elif data is None:
             # null is permissible here
             kwargs["data"] = None
@@ -40,4 +42,7 @@ class Relationship:
         return cls(**kwargs)
 
 
-cattr.register_structure_hook(Relationship, lambda data, _: Relationship.from_dict(data))
+for converter in (cattr, api_converter):
+    converter.register_structure_hook(
+        Relationship, lambda data, _: Relationship.from_dict(data)
+    )
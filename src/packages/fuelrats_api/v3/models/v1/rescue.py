@@ -1,16 +1,18 @@
 import typing
-from typing import Optional, Dict, List, Set
+from operator import attrgetter
+from typing import Any, Callable, Optional, Dict, List, Set, Tuple
 
 import attr
 import cattr
 from ..jsonapi.relationship import Relationship
 from ..jsonapi.resource import Resource
 from ..jsonapi.document import Document
+from .....rat import Rat as InternalRat
 from .....rescue import Rescue as InternalRescue
 from .....mark_for_deletion import MarkForDeletion
-from src.packages.fuelrats_api.v3.converters import to_datetime
+from src.packages.fuelrats_api.v3.converters import from_datetime
 from .quotation import Quotation
-from .....utils import Platforms
+from .....utils import Platforms, Status
 import pendulum
 
 
@@ -44,10 +46,10 @@ class RescueAttributes:
         )
     )
     createdAt: pendulum.DateTime = attr.ib(
-        validator=attr.validators.instance_of(pendulum.DateTime), converter=to_datetime
+        validator=attr.validators.instance_of(pendulum.DateTime)
     )
     updatedAt: pendulum.DateTime = attr.ib(
-        validator=attr.validators.instance_of(pendulum.DateTime), converter=to_datetime
+        validator=attr.validators.instance_of(pendulum.DateTime)
     )
     status: str = attr.ib(validator=attr.validators.instance_of(str))
     outcome: Optional[str] = attr.ib(
@@ -117,7 +119,11 @@ class Rescue(Resource):
             irc_nickname=self.attributes.clientNick,
             created_at=self.attributes.createdAt,
             updated_at=self.attributes.updatedAt,
-            unidentified_rats=self.attributes.unidentifiedRats,
+            unidentified_rats={
+                name.casefold(): InternalRat(
+                    uuid=None, name=name, platform=self.attributes.platform
+                ) for name in self.attributes.unidentifiedRats
+            },
             quotes=[quote.into_internal() for quote in self.attributes.quotes],
             title=self.attributes.title,
             first_limpet=self.relationships.firstLimpet.data.id
@@ -131,6 +137,9 @@ class Rescue(Resource):
                 reason=self.attributes.notes if self.attributes.notes else None,
             ),
             platform=self.attributes.platform,
+            code_red=self.attributes.codeRed,
+            # the API knows statuses mecha doesn't, such as queued, those are open to us.
+            status=Status.__members__.get(self.attributes.status.upper(), Status.OPEN),
         )
 
     @classmethod
@@ -143,7 +152,7 @@ class Rescue(Resource):
         an internal rescue object. `changes` should contain only attribute names on the **internal**
         rescue object.
 
-
+        Only the changed attributes are visited and unstructured, see :func:`encode_delta`.
 
         Args:
             changes: set of changed InternalRescue attributes
@@ -151,32 +160,96 @@ class Rescue(Resource):
         Returns:
             json blob of API Rescue
         """
-        field_map = {
-            "client": "client",
-            "system": "system",
-            "irc_nick": "clientNick",
-            "unidentified_rats": "unidentifiedRats",
-            "quotes": "quotes",
-            "title": "title",
-            "board_index": "commandIdentifier",
-            "lang_id": "clientLanguage",
-            "status": "status",
-            "code_red": "codeRed",
-            "platform": "platform",
-        }
-        # translate internal datamodel names to the APIs datamodel names
-        keep = {field_map[field] for field in changes if field != "mark_for_deletion"}
-
-        if "mark_for_deletion" in changes:
-            keep |= {"outcome"}
-            self.attributes.outcome = "purge"
-        # serialize API rescue object
-        data = attr.asdict(self, recurse=True)
-        # figure out which keys we need to keep (only send the ones modified internally)
-        kept_attribs = {key: value for key, value in data["attributes"].items() if key in keep}
-        # and patch the object.
-        data["attributes"] = kept_attribs
-        return data
+        attributes = {}
+        for field in changes:
+            if field in _DELTA_FIELDS:
+                name = _DELTA_FIELDS[field][0]
+                attributes[name] = _unstructurer(name)(getattr(self.attributes, name))
+        return {"id": f"{self.id}", "type": self.type, "attributes": attributes}
+
+
+def _unstructure_quotation(quote: Quotation) -> Dict:
+    return {
+        "message": quote.message,
+        "author": quote.author,
+        "lastAuthor": quote.lastAuthor,
+        "createdAt": from_datetime(quote.createdAt),
+        "updatedAt": from_datetime(quote.updatedAt),
+    }
+
+
+def _unstructure_platform(platform: Optional[Platforms]) -> Optional[str]:
+    return platform.value.casefold() if platform is not None else None
+
+
+_UNSTRUCTURE_BY_TYPE: Dict[Any, Callable[[Any], Any]] = {
+    pendulum.DateTime: from_datetime,
+    Optional[Platforms]: _unstructure_platform,
+    List[Quotation]: lambda quotes: [_unstructure_quotation(quote) for quote in quotes],
+}
+""" how attributes of types JSON has no notion of are unstructured """
+
+_UNSTRUCTURERS: Dict[str, Callable[[Any], Any]] = {}
+""" per RescueAttributes attribute, the function unstructuring it """
+
+
+def _unstructurer(name: str) -> Callable[[Any], Any]:
+    """ the function unstructuring the RescueAttributes attribute *name*, looked up once """
+    unstructure = _UNSTRUCTURERS.get(name)
+    if unstructure is None:
+        kind = attr.fields_dict(RescueAttributes)[name].type
+        unstructure = _UNSTRUCTURERS[name] = _UNSTRUCTURE_BY_TYPE.get(kind, lambda value: value)
+    return unstructure
+
+
+def _unidentified_rats(rescue: InternalRescue) -> List[str]:
+    return [obj.name for obj in rescue.unidentified_rats.values()]
+
+
+_DELTA_FIELDS: Dict[str, Tuple[str, Callable[[InternalRescue], Any]]] = {
+    "client": ("client", attrgetter("client")),
+    "system": ("system", attrgetter("system")),
+    "irc_nick": ("clientNick", attrgetter("irc_nickname")),
+    "unidentified_rats": ("unidentifiedRats", _unidentified_rats),
+    "quotes": ("quotes", lambda rescue: [Quotation.from_internal(obj) for obj in rescue.quotes]),
+    "title": ("title", attrgetter("title")),
+    "board_index": ("commandIdentifier", attrgetter("board_index")),
+    "lang_id": ("clientLanguage", attrgetter("lang_id")),
+    "status": ("status", lambda rescue: rescue.status.name.lower()),
+    "code_red": ("codeRed", attrgetter("code_red")),
+    "platform": ("platform", attrgetter("platform")),
+    # MFD translates to `purge` outcome, all other outcomes are not set by Mecha.
+    "mark_for_deletion": (
+        "outcome",
+        lambda rescue: "purge" if rescue.marked_for_deletion.marked else None,
+    ),
+}
+"""
+Per internal rescue field the API has an attribute for, the attribute's name and how it is
+taken from an internal rescue.  Other fields, such as rats, are relationships or local only.
+"""
+
+
+def encode_delta(rescue: InternalRescue, changes: Set[str]) -> Dict:
+    """
+    The JSON:API resource of *rescue* with only the attributes of its changed fields.
+
+    Unlike ``Rescue.from_internal(rescue).to_delta(changes)``, the unchanged fields aren't even
+    looked at, so a rescue's quotes are only converted when they changed.
+
+    Args:
+        rescue: the internal rescue to encode
+        changes: names of the fields of *rescue* that changed, as in its `modified`
+
+    Returns:
+        the resource, ready to be serialised as JSON
+    """
+    attributes = {}
+    for field in changes:
+        if field in _DELTA_FIELDS:
+            name, get = _DELTA_FIELDS[field]
+            attributes[name] = _unstructurer(name)(get(rescue))
+    return {"id": f"{rescue.api_id}", "type": "rescues", "attributes": attributes}
 
 
 @attr.dataclass
@@ -1,23 +1,57 @@
 import asyncio
-import json
-from typing import Dict, Union
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from uuid import UUID
 
-import cattr
+import prometheus_client
 from loguru import logger
 from src.packages.utils.ratlib import try_parse_uuid
 from websockets.client import WebSocketClientProtocol
 
+from . import codec
 from .protocol import Response, Request
 from .events import RescueUpdate, CLS_FOR_EVENT
 from .. import event_converter
 from ..models.v1.apierror import APIException, ApiError, UnauthorizedImpersonation
 from ..._base import ApiException
 
+IN_FLIGHT = prometheus_client.Gauge(
+    namespace="api",
+    name="requests_in_flight",
+    documentation="requests sent to the API and not answered yet",
+)
+QUEUE_DEPTH = prometheus_client.Gauge(
+    namespace="api",
+    name="request_queue_depth",
+    documentation="requests waiting to be sent to the API",
+)
+ROUND_TRIP = prometheus_client.Histogram(
+    namespace="api",
+    name="request_round_trip",
+    unit="seconds",
+    documentation="time from queueing a request to the API to its answer",
+    labelnames=["endpoint"],
+)
+TIMEOUTS = prometheus_client.Counter(
+    namespace="api",
+    name="request_timeouts",
+    documentation="requests the API did not answer in time",
+    labelnames=["endpoint"],
+)
+
 
 class Hardfail(ApiException):
     """ API Hard failure. the underlying transport is in an unrecoverable fail state. """
 
 
+class RequestTimeout(ApiException):
+    """ The API did not answer a request before its deadline. """
+
+
+EventHandler = Callable[[Any], Awaitable[Any]]
+
+
 class Connection:
     __slots__ = [
         "_socket",
@@ -27,13 +61,40 @@ class Connection:
         "_rx_worker",
         "_tx_worker",
         "_fail_worker",
+        "_slots",
+        "_abandoned",
+        "timeout",
+        "endpoint_timeouts",
+        "on_event",
     ]
 
-    def __init__(self, socket, spawn_workers: bool = True):
+    ABANDONED_STATES = 1024
+    """ timed out requests remembered, so their late answers can be recognised """
+
+    def __init__(
+        self,
+        socket,
+        spawn_workers: bool = True,
+        timeout: float = 10.0,
+        endpoint_timeouts: Optional[Dict[str, float]] = None,
+        max_in_flight: int = 16,
+        on_event: Optional[EventHandler] = None,
+    ):
         self._socket: WebSocketClientProtocol = socket
-        self._futures: Dict[str, asyncio.Future] = {}
+        self._futures: Dict[UUID, asyncio.Future] = {}
         self.shutdown = asyncio.Event()
-        self._work: asyncio.Queue[Request] = asyncio.Queue()
+        # a request holds a slot from being queued until it is answered, so there are never
+        # more than max_in_flight requests queued or sent.
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._work: asyncio.Queue[Request] = asyncio.Queue(maxsize=max_in_flight)
+        self._abandoned: Dict[UUID, None] = OrderedDict()
+        """ states of requests that timed out, oldest first """
+        self.timeout = timeout
+        """ seconds a request may take, from being made to being answered """
+        self.endpoint_timeouts: Dict[str, float] = endpoint_timeouts or {}
+        """ seconds requests to a dotted endpoint, such as ``rescues.search``, may take instead """
+        self.on_event = on_event
+        """ coroutine function events the API pushes are handed to """
 
         if spawn_workers:
             # spawn worker tasks
@@ -44,20 +105,23 @@ class Connection:
     async def _handle_response(self, response: Response):
         logger.debug("parsed response:= {!r}", response)
         # check if we had a future for this, if so complete it.
-        if response.state in self._futures:
+        # Watchers have their own handle to it, and drop it from active monitoring once done.
+        future = self._futures.get(response.state)
+        if future is not None:
+            if future.done():
+                # its caller already stopped waiting for it.
+                return
             # if its an error return, then set the exception so the consumer raises.
             if response.status < 200 or response.status >= 300:
                 the_error = ApiError.from_dict(response.body["errors"][0])
                 if the_error.code == 401 and the_error.source.parameter == "representing":
-                    return self._futures[response.state].set_exception(
-                        UnauthorizedImpersonation(the_error)
-                    )
-                return self._futures[response.state].set_exception(APIException(the_error))
-
-            self._futures[response.state].set_result(response)
-            # Watchers have their own handle to this, and we are done with it.
-            # Drop handle from active monitoring.
-            del self._futures[response.state]
+                    return future.set_exception(UnauthorizedImpersonation(the_error))
+                return future.set_exception(APIException(the_error))
+
+            future.set_result(response)
+        elif response.state in self._abandoned:
+            # the answer to a request that timed out, whatever it says nobody is listening.
+            logger.warning("got late response {!r}", response)
         else:
             if response.status != 200:
                 raise APIException(ApiError.from_dict(response.body["errors"][0]))
@@ -65,6 +129,13 @@ class Connection:
 
     async def _handle_event(self, event: RescueUpdate):
         logger.debug("recv'ed API event {!r}", event)
+        if self.on_event is None:
+            return
+        try:
+            await self.on_event(event)
+        except Exception:  # pylint: disable=broad-except
+            # a bad event must not take the receiving worker down with it
+            logger.exception("unable to handle API event {!r}", event)
 
     async def rx_worker(self):
         """ worker that receives messages from the websocket """
@@ -75,7 +146,7 @@ class Connection:
 
     async def on_rx_raw(self, raw: str):
         """ underlying implementation that handles websocket data """
-        raw_data = json.loads(raw)
+        raw_data = codec.loads(raw)
         event_or_uid = raw_data[0]
         if try_parse_uuid(event_or_uid):
             response = Response(*raw_data)
@@ -123,6 +194,11 @@ class Connection:
         while not self.shutdown.is_set():
             # async blocking get work
             work = await self._work.get()
+            QUEUE_DEPTH.dec()
+            if work.state not in self._futures:
+                # it timed out waiting its turn, no point sending it now.
+                logger.debug("dropping abandoned request {}", work.state)
+                continue
             await self._do_work_transmit(work)
 
     async def _do_work_transmit(self, work):
@@ -134,19 +210,64 @@ class Connection:
                 del work.query["representing"]
             await self._socket.send(work.serialize())
 
-    async def execute(self, work: Request) -> Response:
-        await self.check_fail()
+    def timeout_for(self, work: Request) -> float:
+        """ seconds *work* may take, from being made to being answered """
+        return self.endpoint_timeouts.get(".".join(work.endpoint), self.timeout)
 
-        # create a future, representing the Response that will satisfy this work item
-        loop = asyncio.get_event_loop()
-        future = loop.create_future()
-        self._futures[work.state] = future
-        # submit the item to the queue, for the tx_worker to pick up
-        self._work.put_nowait(work)
+    async def execute(self, work: Request, timeout: Optional[float] = None) -> Response:
+        """
+        Send *work* to the API and wait for its answer.
+
+        Once as many requests as the connection allows are in flight, this waits for one of
+        them to be answered before sending *work*.
 
+        Args:
+            work: work item
+            timeout: seconds to wait for the answer, waiting to send included. Defaults to the
+                timeout for the endpoint, see :meth:`timeout_for`.
+
+        Raises:
+            RequestTimeout: *work* was not answered in time
+            Hardfail: the underlying transport failed
+        """
         await self.check_fail()
-        # await the future to complete in another task.
-        result = await future
+        if timeout is None:
+            timeout = self.timeout_for(work)
+
+        endpoint = ".".join(work.endpoint)
+        try:
+            return await asyncio.wait_for(self._round_trip(work, endpoint), timeout=timeout)
+        except asyncio.TimeoutError:
+            TIMEOUTS.labels(endpoint=endpoint).inc()
+            self._abandoned[work.state] = None
+            while len(self._abandoned) > self.ABANDONED_STATES:
+                self._abandoned.popitem(last=False)
+            raise RequestTimeout(f"no answer to {endpoint} within {timeout}s") from None
+
+    async def _round_trip(self, work: Request, endpoint: str) -> Response:
+        async with self._slots:
+            # create a future, representing the Response that will satisfy this work item
+            loop = asyncio.get_event_loop()
+            future = loop.create_future()
+            self._futures[work.state] = future
+            IN_FLIGHT.inc()
+            try:
+                # submit the item to the queue, for the tx_worker to pick up
+                await self._work.put(work)
+                QUEUE_DEPTH.inc()
+                start = time.monotonic()
+
+                await self.check_fail()
+                # await the future to complete in another task.
+                try:
+                    result = await future
+                finally:
+                    if future.done() and not future.cancelled():
+                        ROUND_TRIP.labels(endpoint=endpoint).observe(time.monotonic() - start)
+            finally:
+                # answered, failed or abandoned, the future is done with either way.
+                del self._futures[work.state]
+                IN_FLIGHT.dec()
 
         await self.check_fail()
 
@@ -0,0 +1,67 @@
+"""
+codec.py - JSON encoding of the websocket's frames
+
+The standard library's :mod:`json` is always available.  `orjson` and `ujson` encode and decode
+several times faster, and are used instead when configured and installed.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import importlib
+import json
+import typing
+
+from loguru import logger
+
+JSON_BACKENDS = ("json", "orjson", "ujson")
+""" modules frames may be encoded with """
+
+backend: str = "json"
+""" name of the module frames are encoded with """
+
+_dumps: typing.Callable[[typing.Any], str] = json.dumps
+_loads: typing.Callable[[typing.Union[str, bytes]], typing.Any] = json.loads
+
+
+def use_backend(name: str) -> str:
+    """
+    Encode and decode frames with the JSON module *name* from now on.
+
+    Falls back to the standard library's :mod:`json` if *name* isn't installed.
+
+    Returns:
+        name of the module actually used
+    """
+    global backend, _dumps, _loads
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"unknown JSON backend {name!r}, expected one of {JSON_BACKENDS}")
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        logger.warning("JSON backend {} is not installed, using json instead", name)
+        name, module = "json", json
+
+    if name == "orjson":
+        # orjson encodes to bytes, the websocket sends text frames.
+        def _dumps(obj: typing.Any) -> str:
+            return module.dumps(obj).decode("utf8")
+    else:
+        _dumps = module.dumps
+    _loads = module.loads
+    backend = name
+    logger.debug("encoding API frames with {}", name)
+    return name
+
+
+def dumps(obj: typing.Any) -> str:
+    """ encode *obj*, made of JSON types only, as a JSON document """
+    return _dumps(obj)
+
+
+def loads(raw: typing.Union[str, bytes]) -> typing.Any:
+    """ decode the JSON document *raw* """
+    return _loads(raw)
@@ -1,11 +1,9 @@
-import json
 import uuid
 from typing import Dict, Any, List
 from uuid import UUID
 
-import cattr
-
-from ..converters import to_uuid
+from . import codec
+from ..converters import to_uuid, api_converter
 
 from loguru import logger
 import attr
@@ -44,7 +42,7 @@ class Request:
     def serialize(self) -> str:
         """ serializes this request into the form the websocket expects"""
         frame = [self.state, self.endpoint, self.query, self.body]
-        return json.dumps(cattr.unstructure(frame))
+        return codec.dumps(api_converter.unstructure(frame))
 
 
 @attr.dataclass
@@ -64,7 +62,7 @@ class Response:
         Returns:
             Response object
         """
-        state, status, body, *erroneous = json.loads(raw)
+        state, status, body, *erroneous = codec.loads(raw)
         if erroneous:
             logger.error("Failed to parse API response!")
         return cls(state=state, status=status, body=body)
@@ -0,0 +1,151 @@
+"""
+cache.py - Bounded, expiring cache for Systems API lookups.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+
+import asyncio
+import functools
+import time
+import typing
+import weakref
+from collections import OrderedDict
+
+import prometheus_client
+
+CACHE_HITS = prometheus_client.Counter(
+    namespace="galaxy",
+    name="cache_hits",
+    documentation="Systems API lookups answered from cache",
+    labelnames=["lookup"],
+)
+CACHE_MISSES = prometheus_client.Counter(
+    namespace="galaxy",
+    name="cache_misses",
+    documentation="Systems API lookups that had to query the API",
+    labelnames=["lookup"],
+)
+CACHE_COALESCED = prometheus_client.Counter(
+    namespace="galaxy",
+    name="cache_coalesced",
+    documentation="Systems API lookups that waited on an identical lookup already in flight",
+    labelnames=["lookup"],
+)
+CACHE_SIZE = prometheus_client.Gauge(
+    namespace="galaxy",
+    name="cache_size",
+    documentation="Systems API lookup results currently cached",
+    labelnames=["lookup"],
+)
+
+Key = typing.Hashable
+Value = typing.TypeVar("Value")
+
+_caches: typing.MutableSet["LookupCache"] = weakref.WeakSet()
+""" every live cache, so each lookup's size covers all of its caches """
+
+
+def _cached(name: str) -> int:
+    return sum(len(cache) for cache in _caches if cache.name == name)
+
+
+class LookupCache(typing.Generic[Value]):
+    """
+    Least-recently-used cache of lookup results, each expiring after a while.
+
+    Empty results (``None``) expire sooner than others, so a system that just wasn't known yet
+    doesn't stay missing for long.  Concurrent lookups of the same key share one fetch, which
+    carries on even if the lookup that started it is cancelled.  Failed fetches aren't cached.
+    """
+
+    __slots__ = [
+        "name", "maxsize", "ttl", "negative_ttl", "_entries", "_in_flight", "__weakref__"
+    ]
+
+    def __init__(self, name: str, maxsize: int, ttl: float, negative_ttl: float):
+        self.name = name
+        """ name of the lookup, used to label metrics """
+        self.maxsize = maxsize
+        """ maximum number of results kept """
+        self.ttl = ttl
+        """ seconds a result is kept for """
+        self.negative_ttl = negative_ttl
+        """ seconds an empty result is kept for """
+        self._entries: typing.MutableMapping[Key, typing.Tuple[float, Value]] = OrderedDict()
+        """ expiry time and result by key, least recently used first """
+        self._in_flight: typing.Dict[Key, asyncio.Future] = {}
+        """ fetches currently in progress, by key """
+        _caches.add(self)
+        # counts every cache of the lookup, not just this one
+        CACHE_SIZE.labels(lookup=name).set_function(functools.partial(_cached, name))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def configure(self, maxsize: int, ttl: float, negative_ttl: float):
+        """
+        Apply new limits, keeping whatever cached results still fit them.
+        """
+        self.maxsize, self.ttl, self.negative_ttl = maxsize, ttl, negative_ttl
+        self._trim()
+
+    def clear(self):
+        """ Forget every cached result """
+        self._entries.clear()
+
+    def _trim(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _store(self, key: Key, value: Value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        self._trim()
+
+    def peek(self, key: Key) -> typing.Optional[Value]:
+        """
+        The cached result for *key*, if there is one, without looking it up otherwise.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    async def _fetch(self, key: Key, fetch: typing.Callable[[], typing.Awaitable[Value]]) -> Value:
+        try:
+            value = await fetch()
+            self._store(key, value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    async def get(self, key: Key, fetch: typing.Callable[[], typing.Awaitable[Value]]) -> Value:
+        """
+        Return the cached result for *key*, calling *fetch* to look it up if necessary.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                CACHE_HITS.labels(lookup=self.name).inc()
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+
+        future = self._in_flight.get(key)
+        if future is None:
+            CACHE_MISSES.labels(lookup=self.name).inc()
+            future = self._in_flight[key] = asyncio.ensure_future(self._fetch(key, fetch))
+            # everyone waiting may have been cancelled, don't complain about unretrieved errors
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        else:
+            CACHE_COALESCED.labels(lookup=self.name).inc()
+        return await asyncio.shield(future)
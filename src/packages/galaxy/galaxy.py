@@ -11,25 +11,80 @@ See LICENSE.md
 """
 
 import asyncio
+import collections
 import json
+import os
+import time
 import typing
+import weakref
 from urllib.parse import urlencode
 
 import aiohttp
-from async_lru import alru_cache
+import prometheus_client
 from loguru import logger
 
 from src.config import CONFIG_MARKER
+from .cache import LookupCache
+from .landmarks import LandmarkIndex
+from .snapshot import GalaxySnapshot
 from .star_system import StarSystem
-from ..utils import Vector
+from ..utils import Vector, ProceduralEstimator, PositionEstimate
 from ...config.datamodel import ConfigRoot
 
+REQUEST_TIME = prometheus_client.Histogram(
+    namespace="galaxy",
+    name="request",
+    unit="seconds",
+    documentation="time spent on Systems API requests, including retries",
+)
+CONNECTIONS_OPENED = prometheus_client.Counter(
+    namespace="galaxy",
+    name="connections_opened",
+    documentation="connections opened to the Systems API",
+)
+CONNECTIONS_REUSED = prometheus_client.Counter(
+    namespace="galaxy",
+    name="connections_reused",
+    documentation="Systems API requests sent over a kept-alive connection",
+)
+SNAPSHOT_LOOKUPS = prometheus_client.Counter(
+    namespace="galaxy",
+    name="snapshot_lookups",
+    documentation="lookups answered (hit) or not (miss) by the local galaxy snapshot",
+    labelnames=["lookup", "result"],
+)
+POSITION_ESTIMATES = prometheus_client.Counter(
+    namespace="galaxy",
+    name="position_estimates",
+    documentation="procedural system positions estimated from their names, or not",
+    labelnames=["result"],
+)
+LANDMARK_LOOKUPS = prometheus_client.Counter(
+    namespace="galaxy",
+    name="landmark_lookups",
+    documentation="nearest landmark lookups, by where they were answered",
+    labelnames=["source"],
+)
+
+
+async def _on_connection_create_end(session, context, params):  # pylint: disable=unused-argument
+    CONNECTIONS_OPENED.inc()
+
+
+async def _on_connection_reuseconn(session, context, params):  # pylint: disable=unused-argument
+    CONNECTIONS_REUSED.inc()
+
 
 class Galaxy:
     """
     Worker class to interface with the Fuel Rats Systems API.
+
+    Requests share one HTTP session per Galaxy, so connections to the Systems API are kept alive
+    between lookups.  The session is opened on first use, replaced on rehash and closed by
+    :meth:`close`.
     """
     _config: typing.ClassVar[typing.Dict]
+    _instances: typing.ClassVar[typing.MutableSet["Galaxy"]] = weakref.WeakSet()
 
     @classmethod
     @CONFIG_MARKER
@@ -42,6 +97,23 @@ class Galaxy:
 
         """
         cls._config = data
+        cls.MAX_CONNECTIONS = data.system_api.max_connections
+        cls.KEEPALIVE_TIMEOUT = data.system_api.keepalive_timeout
+        cls.DNS_CACHE_TTL = data.system_api.dns_cache_ttl
+        cls.CACHE_SIZE = data.system_api.cache_size
+        cls.CACHE_TTL = data.system_api.cache_ttl
+        cls.NEGATIVE_CACHE_TTL = data.system_api.negative_cache_ttl
+        cls.LANDMARKS_FILE = data.system_api.landmarks_file
+        cls.LANDMARKS_REFRESH = data.system_api.landmarks_refresh
+        cls.SNAPSHOT_FILE = data.system_api.snapshot_file
+        for galaxy in list(cls._instances):
+            # check the landmarks file again on next use
+            galaxy._landmarks_checked_at = None
+            # connection settings may have changed, so start afresh.
+            galaxy._retire_session()
+            # whereas cached lookups are still good.
+            for cache in galaxy._caches:
+                cache.configure(cls.CACHE_SIZE, cls.CACHE_TTL, cls.NEGATIVE_CACHE_TTL)
 
     MAX_PLOT_DISTANCE = 20000
 
@@ -51,10 +123,139 @@ class Galaxy:
     TIMEOUT = aiohttp.ClientTimeout(total=10)
     "A ClientTimeout object representing the total time an HTTP request can take before failing."
 
+    MAX_CONNECTIONS = 10
+    "The maximum number of simultaneous connections to the Systems API."
+
+    KEEPALIVE_TIMEOUT = 30.0
+    "Seconds an idle connection to the Systems API is kept open for."
+
+    DNS_CACHE_TTL = 300
+    "Seconds the Systems API's address is cached for."
+
+    CACHE_SIZE = 1024
+    "The maximum number of results kept per kind of lookup."
+
+    CACHE_TTL = 3600.0
+    "Seconds a lookup result is kept for."
+
+    NEGATIVE_CACHE_TTL = 60.0
+    "Seconds a lookup that found nothing is remembered for."
+
+    LANDMARKS_FILE = ""
+    "JSON file of landmark systems to answer nearest-landmark lookups locally from, if any."
+
+    LANDMARKS_REFRESH = 3600.0
+    "Seconds between checks of the landmarks file for changes."
+
+    SNAPSHOT_FILE = ""
+    "Local galaxy snapshot consulted before the Systems API, if any."
+
     def __init__(self, url: str = None):
         self.url = url or self._config.system_api.url
+        self._session: typing.Optional[aiohttp.ClientSession] = None
+        self._session_loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        self._requests_in_flight: typing.Counter[aiohttp.ClientSession] = collections.Counter()
+        self._system_by_name_cache = self._cache("find_system_by_name")
+        self._system_by_id_cache = self._cache("find_system_by_id")
+        self._landmark_cache = self._cache("find_nearest_landmark")
+        self._search_cache = self._cache("search_systems_by_name")
+        self._landmark_index: typing.Optional[LandmarkIndex] = None
+        self._landmarks_checked_at: typing.Optional[float] = None
+        self._landmarks_mtime: typing.Optional[float] = None
+        self._local_snapshot: typing.Optional[GalaxySnapshot] = None
+        self._snapshot_path: typing.Optional[str] = None
+        self._estimator = ProceduralEstimator(self._sector_systems)
+        self._instances.add(self)
+
+    def _cache(self, lookup: str) -> LookupCache:
+        return LookupCache(lookup, self.CACHE_SIZE, self.CACHE_TTL, self.NEGATIVE_CACHE_TTL)
+
+    @property
+    def _caches(self) -> typing.Tuple[LookupCache, ...]:
+        return (
+            self._system_by_name_cache,
+            self._system_by_id_cache,
+            self._landmark_cache,
+            self._search_cache,
+        )
+
+    def clear_cache(self):
+        """
+        Forget every cached lookup result.
+        """
+        for cache in self._caches:
+            cache.clear()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        The shared HTTP session, opened on first use.
+        """
+        loop = asyncio.get_event_loop()
+        if self._session_loop is not loop:
+            # a session can't outlive its event loop, nor be closed once the loop has gone.
+            self._session = None
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_end.append(_on_connection_create_end)
+            trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+            connector = aiohttp.TCPConnector(
+                limit=self.MAX_CONNECTIONS,
+                keepalive_timeout=self.KEEPALIVE_TIMEOUT,
+                use_dns_cache=True,
+                ttl_dns_cache=self.DNS_CACHE_TTL,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                raise_for_status=True,
+                timeout=self.TIMEOUT,
+                trace_configs=[trace_config],
+            )
+            self._session_loop = loop
+        return self._session
+
+    def _retire_session(self):
+        """
+        Stop using the current session, closing it once its in-flight requests are done.
+        """
+        session, self._session = self._session, None
+        if session is None or session.closed or self._session_loop is not asyncio.get_event_loop():
+            return
+        if not self._requests_in_flight[session]:
+            asyncio.ensure_future(session.close())
+
+    def _snapshot(self) -> typing.Optional[GalaxySnapshot]:
+        """
+        The local galaxy snapshot, opened on first use (or after the configured file changed).
+        """
+        if self._snapshot_path != self.SNAPSHOT_FILE:
+            self._close_snapshot()
+            self._snapshot_path = self.SNAPSHOT_FILE
+            # sectors the old snapshot didn't know of, the new one might.
+            self._estimator.forget_unresolved()
+            if self.SNAPSHOT_FILE:
+                try:
+                    self._local_snapshot = GalaxySnapshot(self.SNAPSHOT_FILE)
+                    logger.info("opened galaxy snapshot {!r} of {} systems",
+                                self.SNAPSHOT_FILE, len(self._local_snapshot))
+                except (OSError, ValueError):
+                    # not retried until the configuration changes, the API covers us.
+                    logger.exception("unable to open galaxy snapshot {!r}", self.SNAPSHOT_FILE)
+        return self._local_snapshot
+
+    def _close_snapshot(self):
+        if self._local_snapshot is not None:
+            self._local_snapshot.close()
+        self._local_snapshot = self._snapshot_path = None
+
+    async def close(self):
+        """
+        Close the shared session and the galaxy snapshot, they are reopened on demand.
+        """
+        self._close_snapshot()
+        session, self._session = self._session, None
+        if session is not None and self._session_loop is asyncio.get_event_loop():
+            await session.close()
 
-    @alru_cache()
     async def find_system_by_name(self,
                                   name: str,
                                   full_details: bool = False) -> typing.Optional[StarSystem]:
@@ -70,7 +271,25 @@ class Galaxy:
         Returns:
             A ``StarSystem`` object representing the found system, or ``None`` if none was found.
         """
-
+        if not full_details:
+            # the snapshot knows positions, but not spectral classes.
+            snapshot = self._snapshot()
+            if snapshot is not None:
+                system = snapshot.find(name)
+                SNAPSHOT_LOOKUPS.labels(
+                    lookup="find_system_by_name", result="miss" if system is None else "hit"
+                ).inc()
+                if system is not None:
+                    return system
+
+        return await self._system_by_name_cache.get(
+            (name.casefold(), full_details),
+            lambda: self._find_system_by_name(name, full_details),
+        )
+
+    async def _find_system_by_name(self,
+                                   name: str,
+                                   full_details: bool) -> typing.Optional[StarSystem]:
         data = await self._call("api/systems", {
             "filter[name:ilike]": name,
             "sort": "name",
@@ -83,7 +302,6 @@ class Galaxy:
             else:
                 return StarSystem(name=data['data'][0]['attributes']['name'])
 
-    @alru_cache()
     async def find_system_by_id(self, system_id: int) -> typing.Optional[StarSystem]:
         """
         Finds a single system by its ID and returns its StarSystem object.
@@ -94,15 +312,21 @@ class Galaxy:
         Returns:
             A ``StarSystem`` object representing the found system, or ``None`` if none was found.
         """
+        return await self._system_by_id_cache.get(
+            str(system_id), lambda: self._find_system_by_id(system_id)
+        )
 
+    async def _find_system_by_id(self, system_id: int) -> typing.Optional[StarSystem]:
         data = await self._call(f"api/systems/{system_id}")
         if 'data' in data and data['data']:
             sys = data['data']['attributes']
             main_star = await self._find_main_star(system_id)
             sys['spectral_class'] = main_star['spectral_class'] if main_star is not None else None
-            return StarSystem(position=Vector(**sys['coords']),
-                              name=sys['name'],
-                              spectral_class=sys['spectral_class'])
+            system = StarSystem(position=Vector(**sys['coords']),
+                                name=sys['name'],
+                                spectral_class=sys['spectral_class'])
+            self._estimator.learn(system.name, system.position)
+            return system
 
     async def _find_main_star(self, system_id: int) -> typing.Optional[typing.Dict]:
         """
@@ -125,12 +349,60 @@ class Galaxy:
                 result['spectral_class'] = star['attributes']['subType'][0]
                 return result
 
+    def load_landmarks(self, landmarks: typing.Iterable[StarSystem]):
+        """
+        Answer nearest-landmark lookups locally from *landmarks*, which must have positions.
+        """
+        self._landmark_index = LandmarkIndex(landmarks)
+        self._landmarks_checked_at = time.monotonic()
+        logger.info("indexed {} landmarks", len(self._landmark_index))
+
+    def _landmarks(self) -> typing.Optional[LandmarkIndex]:
+        """
+        The local landmark index, (re)loading the landmarks file if it is due a check.
+        """
+        now = time.monotonic()
+        if not self.LANDMARKS_FILE or (
+            self._landmarks_checked_at is not None
+            and now - self._landmarks_checked_at < self.LANDMARKS_REFRESH
+        ):
+            return self._landmark_index
+
+        self._landmarks_checked_at = now
+        try:
+            mtime = os.path.getmtime(self.LANDMARKS_FILE)
+            if mtime != self._landmarks_mtime or self._landmark_index is None:
+                self._landmark_index = LandmarkIndex.from_json(self.LANDMARKS_FILE)
+                self._landmarks_mtime = mtime
+                logger.info("loaded {} landmarks from {!r}",
+                            len(self._landmark_index), self.LANDMARKS_FILE)
+        except (OSError, ValueError, KeyError, TypeError):
+            # keep whatever we had, the remote lookup covers us regardless.
+            logger.exception("unable to load landmarks from {!r}", self.LANDMARKS_FILE)
+        return self._landmark_index
+
+    def _known_position(self, system: StarSystem) -> typing.Optional[Vector]:
+        """
+        The position of *system*, if it is actually known.
+
+        Systems only found by name sit at the origin, which only Sol really does.  If such a
+        system's full details happen to be cached, its position is taken from there.
+        """
+        if system.position != Vector.zero() or system.name.casefold() == "sol":
+            return system.position
+        detailed = self._system_by_name_cache.peek((system.name.casefold(), True))
+        return detailed.position if detailed is not None else None
+
     async def find_nearest_landmark(self,
                                     system: StarSystem
                                     ) -> typing.Optional[typing.Tuple[StarSystem, float]]:
         """
         Find the nearest "landmark" system to the one provided.
 
+        Answered from the local landmark index if there is one and the system's position is
+        known, such as for systems from :meth:`find_system_by_id`.  Otherwise, the Systems API
+        is asked.
+
         Args:
             system (StarSystem): The system to center the search around.
 
@@ -140,7 +412,99 @@ class Galaxy:
             May return None if the provided system is not found, or
             in the case of an API failure.
         """
+        index = self._landmarks()
+        if index:
+            position = self._known_position(system)
+            if position is not None:
+                LANDMARK_LOOKUPS.labels(source="local").inc()
+                return index.nearest(position)
+
+        LANDMARK_LOOKUPS.labels(source="remote").inc()
+        return await self._landmark_cache.get(
+            system.name.casefold(), lambda: self._find_nearest_landmark(system)
+        )
+
+    def find_landmarks_within(self,
+                              system: StarSystem,
+                              radius: float
+                              ) -> typing.Optional[typing.List[typing.Tuple[StarSystem, float]]]:
+        """
+        Find every landmark within *radius* light years of the system provided, closest first.
+
+        Returns:
+            A list of landmark StarSystems and their distances to the one provided, or ``None``
+            if there is no local landmark index or the system's position isn't known.
+        """
+        index = self._landmarks()
+        position = self._known_position(system)
+        if index is None or position is None:
+            return None
+        return index.within(position, radius)
+
+    def _sector_systems(self, sector: str) -> typing.Iterator[typing.Tuple[str, Vector]]:
+        """
+        Known systems of *sector*, for the position estimator to learn the sector's origin from.
+        """
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            for system in snapshot.starting_with(f"{sector} "):
+                yield system.name, system.position
+
+    def estimate_position(self, name: str) -> typing.Optional[PositionEstimate]:
+        """
+        Estimate the position of a procedurally named system from its name, without asking the
+        Systems API.
+
+        The sector's origin has to be known, either from the galaxy snapshot or from a system
+        in the same sector looked up in full earlier.
+
+        Returns:
+            The estimated position and how far off it may be, or ``None`` if the name isn't
+            procedural or its sector unknown.
+        """
+        estimate = self._estimator.estimate(name)
+        POSITION_ESTIMATES.labels(result="unknown" if estimate is None else "estimated").inc()
+        return estimate
 
+    def estimate_positions(self,
+                           names: typing.Iterable[str]
+                           ) -> typing.List[typing.Optional[PositionEstimate]]:
+        """
+        :meth:`estimate_position` for many systems at once, resolving every sector only once.
+        """
+        estimates = self._estimator.estimate_many(names)
+        found = sum(estimate is not None for estimate in estimates)
+        POSITION_ESTIMATES.labels(result="estimated").inc(found)
+        POSITION_ESTIMATES.labels(result="unknown").inc(len(estimates) - found)
+        return estimates
+
+    def estimate_nearest_landmark(self,
+                                  system: StarSystem
+                                  ) -> typing.Optional[typing.Tuple[StarSystem, float, float]]:
+        """
+        Find the nearest landmark to a system locally, estimating the system's position from
+        its name if it isn't known.
+
+        Returns:
+            A tuple of the landmark StarSystem closest to the one provided, the distance between
+            the two and how far off that distance may be, both in light years.  ``None`` if there
+            is no local landmark index or the system can't be placed.
+        """
+        index = self._landmarks()
+        if not index:
+            return None
+        position, error = self._known_position(system), 0.0
+        if position is None:
+            estimate = self.estimate_position(system.name)
+            if estimate is None:
+                return None
+            position, error = estimate.position, round(estimate.error, 2)
+        landmark, distance = index.nearest(position)
+        return landmark, distance, error
+
+    async def _find_nearest_landmark(self,
+                                     system: StarSystem
+                                     ) -> typing.Optional[typing.Tuple[StarSystem, float]]:
         data = await self._call("landmark", {"name": system.name})
         if 'landmarks' in data and data['landmarks']:
             landmark = StarSystem(name=data['landmarks'][0]['name'])
@@ -157,7 +521,22 @@ class Galaxy:
             A list of up to 5 system names that closest match ``name``, or ``None`` if
             none could be found.
         """
-
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            matches = snapshot.search(name)
+            SNAPSHOT_LOOKUPS.labels(
+                lookup="search_systems_by_name", result="hit" if matches else "miss"
+            ).inc()
+            if matches:
+                return matches
+
+        matches = await self._search_cache.get(
+            name.upper(), lambda: self._search_systems_by_name(name)
+        )
+        # callers get their own copy, so the cached one stays as it was.
+        return list(matches) if matches is not None else None
+
+    async def _search_systems_by_name(self, name: str) -> typing.Optional[typing.List[str]]:
         matches = await self._call("mecha", {"name": name.upper()})
         # Check to ensure the data set is not missing or empty.
         if 'data' in matches and matches['data']:
@@ -191,15 +570,27 @@ class Galaxy:
                 [(key, value) for key, value in params.items()]
             )
         url = f"{base_url}{endpoint}?{param_string}"
+        session = self._get_session()
+        self._requests_in_flight[session] += 1
+        try:
+            with REQUEST_TIME.time():
+                return await self._get(session, url)
+        finally:
+            self._requests_in_flight[session] -= 1
+            if not self._requests_in_flight[session]:
+                del self._requests_in_flight[session]
+                if session is not self._session:
+                    # retired whilst we were using it
+                    await session.close()
+
+    async def _get(self, session: aiohttp.ClientSession, url: str) -> typing.Union[dict, list]:
         for retry in range(self.MAX_RETRIES):
             try:
-                async with aiohttp.ClientSession(raise_for_status=True,
-                                                 timeout=self.TIMEOUT) as session:
-                    logger.debug("CALL < {} >", url)
-                    async with session.get(url) as response:
-                        data = json.loads(await response.text())
-                        logger.trace("done with call")
-                        return data
+                logger.debug("CALL < {} >", url)
+                async with session.get(url) as response:
+                    data = json.loads(await response.text())
+                    logger.trace("done with call")
+                    return data
             except aiohttp.ClientError:
                 # If we've used our last retry, re-raise the offending exception.
                 if retry == (self.MAX_RETRIES - 1):
@@ -0,0 +1,140 @@
+"""
+landmarks.py - In-process spatial index of landmark systems.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+
+import json
+import typing
+from math import sqrt
+
+from .star_system import StarSystem
+from ..utils import Vector
+
+# a node is (landmark index, split axis, lower subtree, upper subtree)
+_Node = typing.Optional[typing.Tuple[int, int, typing.Any, typing.Any]]
+
+
+class LandmarkIndex:
+    """
+    k-d tree over landmark systems, answering nearest-landmark and within-radius queries.
+
+    Examples:
+        >>> index = LandmarkIndex([
+        ...     StarSystem("Sol", Vector(0, 0, 0)),
+        ...     StarSystem("Fuelum", Vector(52, -52.65625, 49.8125)),
+        ... ])
+        >>> landmark, distance = index.nearest(Vector(61.65625, -42.4375, 53.59375))
+        >>> landmark.name, distance
+        ('Fuelum', 14.56)
+        >>> [landmark.name for landmark, _ in index.within(Vector(1, 1, 1), 10)]
+        ['Sol']
+    """
+
+    __slots__ = ["_landmarks", "_points", "_root"]
+
+    def __init__(self, landmarks: typing.Iterable[StarSystem]):
+        self._landmarks: typing.List[StarSystem] = list(landmarks)
+        self._points: typing.List[typing.Tuple[float, float, float]] = [
+            (landmark.position.x, landmark.position.y, landmark.position.z)
+            for landmark in self._landmarks
+        ]
+        self._root: _Node = self._build(list(range(len(self._points))))
+
+    @classmethod
+    def from_json(cls, path: str) -> "LandmarkIndex":
+        """
+        Load landmarks from a JSON file, a list of objects shaped like the Systems API's system
+        attributes: ``{"name": "Fuelum", "coords": {"x": 52.0, "y": -52.65625, "z": 49.8125}}``
+        """
+        with open(path, encoding="utf8") as file:
+            data = json.load(file)
+        return cls(
+            StarSystem(name=entry["name"], position=Vector(**entry["coords"])) for entry in data
+        )
+
+    def __len__(self) -> int:
+        return len(self._landmarks)
+
+    def _build(self, indexes: typing.List[int]) -> _Node:
+        if not indexes:
+            return None
+        # split along the widest axis, the galaxy is a lot flatter than it is wide.
+        axis = max(range(3), key=lambda axis: self._spread(indexes, axis))
+        indexes.sort(key=lambda index: self._points[index][axis])
+        middle = len(indexes) // 2
+        return (
+            indexes[middle],
+            axis,
+            self._build(indexes[:middle]),
+            self._build(indexes[middle + 1:]),
+        )
+
+    def _spread(self, indexes: typing.List[int], axis: int) -> float:
+        values = [self._points[index][axis] for index in indexes]
+        return max(values) - min(values)
+
+    def nearest(self, position: Vector) -> typing.Optional[typing.Tuple[StarSystem, float]]:
+        """
+        Find the landmark closest to *position*.
+
+        Returns:
+            The landmark and its distance in light years rounded like the Systems API does, or
+            None if there are no landmarks.
+        """
+        if self._root is None:
+            return None
+        target = x, y, z = position.x, position.y, position.z
+        best_index, best = -1, float("inf")
+        points = self._points
+        # entries carry a lower bound on the squared distance of anything below them
+        stack = [(0.0, self._root)]
+        while stack:
+            bound, node = stack.pop()
+            if bound >= best:
+                continue
+            index, axis, lower, upper = node
+            point = points[index]
+            dx, dy, dz = point[0] - x, point[1] - y, point[2] - z
+            squared = dx * dx + dy * dy + dz * dz
+            if squared < best:
+                best_index, best = index, squared
+            offset = target[axis] - point[axis]
+            near, far = (lower, upper) if offset < 0 else (upper, lower)
+            # the far side is only worth a look if the splitting plane is closer than our best
+            if far is not None:
+                stack.append((max(bound, offset * offset), far))
+            if near is not None:
+                stack.append((bound, near))
+        return self._landmarks[best_index], round(sqrt(best), 2)
+
+    def within(
+        self, position: Vector, radius: float
+    ) -> typing.List[typing.Tuple[StarSystem, float]]:
+        """
+        Find every landmark within *radius* light years of *position*, closest first.
+        """
+        target = x, y, z = position.x, position.y, position.z
+        limit = radius * radius
+        points = self._points
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            index, axis, lower, upper = stack.pop()
+            point = points[index]
+            dx, dy, dz = point[0] - x, point[1] - y, point[2] - z
+            squared = dx * dx + dy * dy + dz * dz
+            if squared <= limit:
+                found.append((squared, index))
+            offset = target[axis] - point[axis]
+            if lower is not None and (offset < 0 or offset * offset <= limit):
+                stack.append(lower)
+            if upper is not None and (offset >= 0 or offset * offset <= limit):
+                stack.append(upper)
+        found.sort()
+        return [(self._landmarks[index], round(sqrt(squared), 2)) for squared, index in found]
@@ -0,0 +1,303 @@
+"""
+snapshot.py - Memory-mapped local snapshot of star systems.
+
+A snapshot is a single file, built from a systems dump by ``tools/build_galaxy_snapshot.py``.
+All integers are little-endian:
+
+- a header (:data:`_HEADER`) with the section offsets,
+- one fixed-size record (:data:`_RECORD`) per system, sorted by upper-cased name,
+- the UTF-8 names the records point into,
+- a table of trigrams (:data:`_TRIGRAM`), sorted, each pointing at a run of postings,
+- the postings: 32 bit record numbers of the systems containing each trigram.
+
+The file is memory-mapped and searched in place, so only the pages a lookup touches are ever
+read, and none of it lives on the Python heap.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+
+import array
+import collections
+import heapq
+import mmap
+import os
+import struct
+import sys
+import typing
+
+from .star_system import StarSystem
+from ..utils import Vector
+
+MAGIC = b"MSQGALAX"
+VERSION = 1
+
+_HEADER = struct.Struct("<8sIIIIQQQQ")
+""" magic, version, systems, trigrams, reserved, records, names, trigrams and postings offsets """
+_RECORD = struct.Struct("<QIH2xfff")
+""" id64, name offset, name length, padding, x, y, z """
+_TRIGRAM = struct.Struct("<III")
+""" trigram, first posting, number of postings """
+_POSTING_SIZE = 4
+
+SystemTuple = typing.Tuple[int, str, float, float, float]
+""" id64, name and coordinates of a system """
+
+
+def trigrams(name: str) -> typing.Set[int]:
+    """
+    The trigrams of the upper-cased, UTF-8 encoded *name*, each packed into an integer.
+
+    The name is padded so its start and end count for more.
+
+    Examples:
+        >>> sorted(trigrams("Sol")) == sorted(
+        ...     int.from_bytes(gram, "big") for gram in (b"  S", b" SO", b"SOL", b"OL ")
+        ... )
+        True
+    """
+    data = b"  " + name.upper().encode("utf8") + b" "
+    return {
+        data[index] << 16 | data[index + 1] << 8 | data[index + 2]
+        for index in range(len(data) - 2)
+    }
+
+
+def write_snapshot(systems: typing.Iterable[SystemTuple], path: str) -> int:
+    """
+    Write a snapshot of *systems* to *path*, replacing it atomically.
+
+    Systems sharing a name (ignoring case) are only written once.
+
+    Returns:
+        the number of systems written
+    """
+    ordered = sorted(systems, key=lambda system: system[1].upper())
+
+    records = bytearray()
+    names = bytearray()
+    postings: typing.Dict[int, array.array] = collections.defaultdict(lambda: array.array("I"))
+    previous = None
+    count = 0
+    for id64, name, x, y, z in ordered:
+        key = name.upper()
+        if key == previous:
+            continue
+        previous = key
+        encoded = name.encode("utf8")
+        records += _RECORD.pack(id64, len(names), len(encoded), x, y, z)
+        names += encoded
+        for gram in trigrams(name):
+            postings[gram].append(count)
+        count += 1
+
+    table = bytearray()
+    posting_data = array.array("I")
+    for gram in sorted(postings):
+        table += _TRIGRAM.pack(gram, len(posting_data), len(postings[gram]))
+        posting_data.extend(postings[gram])
+    if sys.byteorder != "little":
+        posting_data.byteswap()
+
+    records_offset = _HEADER.size
+    names_offset = records_offset + len(records)
+    table_offset = names_offset + len(names)
+    postings_offset = table_offset + len(table)
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(
+            _HEADER.pack(
+                MAGIC,
+                VERSION,
+                count,
+                len(postings),
+                0,
+                records_offset,
+                names_offset,
+                table_offset,
+                postings_offset,
+            )
+        )
+        file.write(records)
+        file.write(names)
+        file.write(table)
+        file.write(posting_data.tobytes())
+    os.replace(temporary, path)
+    return count
+
+
+class GalaxySnapshot:
+    """
+    Read-only, memory-mapped view of a star system snapshot.
+
+    Raises:
+        ValueError: the file isn't a snapshot this version understands.
+    """
+
+    __slots__ = [
+        "path",
+        "_file",
+        "_map",
+        "_count",
+        "_trigram_count",
+        "_records",
+        "_names",
+        "_table",
+        "_postings",
+    ]
+
+    MAX_POSTINGS = 10_000
+    """ Postings read per fuzzy search at most, rarest trigrams first """
+
+    MAX_CANDIDATES = 200
+    """ Candidates per fuzzy search that are scored in full """
+
+    MIN_SIMILARITY = 0.3
+    """ Trigram similarity a fuzzy match needs at least """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(self._map) < _HEADER.size:
+                raise ValueError(f"{path!r} is not a galaxy snapshot")
+            (
+                magic,
+                version,
+                self._count,
+                self._trigram_count,
+                _,
+                self._records,
+                self._names,
+                self._table,
+                self._postings,
+            ) = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path!r} is not a version {VERSION} galaxy snapshot")
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        """ Release the mapping and the file """
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _record(self, number: int) -> typing.Tuple[int, int, int, float, float, float]:
+        return _RECORD.unpack_from(self._map, self._records + number * _RECORD.size)
+
+    def _name(self, number: int) -> str:
+        _, offset, length, *_ = self._record(number)
+        start = self._names + offset
+        return self._map[start:start + length].decode("utf8")
+
+    def system(self, number: int) -> typing.Tuple[int, StarSystem]:
+        """
+        The id64 and system stored as record *number*.
+        """
+        id64, offset, length, x, y, z = self._record(number)
+        start = self._names + offset
+        name = self._map[start:start + length].decode("utf8")
+        return id64, StarSystem(name=name, position=Vector(x, y, z))
+
+    def _first_from(self, key: str) -> int:
+        """ number of the first record whose upper-cased name sorts at or after *key* """
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._name(middle).upper() < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, name: str) -> typing.Optional[StarSystem]:
+        """
+        Find a system by its exact name, ignoring case.
+        """
+        key = name.upper()
+        number = self._first_from(key)
+        if number < self._count and self._name(number).upper() == key:
+            return self.system(number)[1]
+        return None
+
+    def starting_with(self, prefix: str) -> typing.Iterator[StarSystem]:
+        """
+        The systems whose names start with *prefix*, ignoring case, in name order.
+        """
+        key = prefix.upper()
+        for number in range(self._first_from(key), self._count):
+            if not self._name(number).upper().startswith(key):
+                return
+            yield self.system(number)[1]
+
+    def _trigram_postings(self, gram: int) -> typing.Optional[typing.Tuple[int, int]]:
+        low, high = 0, self._trigram_count
+        while low < high:
+            middle = (low + high) // 2
+            found, start, count = _TRIGRAM.unpack_from(
+                self._map, self._table + middle * _TRIGRAM.size
+            )
+            if found == gram:
+                return start, count
+            if found < gram:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _read_postings(self, start: int, count: int) -> array.array:
+        offset = self._postings + start * _POSTING_SIZE
+        postings = array.array("I", self._map[offset:offset + count * _POSTING_SIZE])
+        if sys.byteorder != "little":
+            postings.byteswap()
+        return postings
+
+    def search(self, name: str, limit: int = 5) -> typing.List[str]:
+        """
+        Fuzzy search for systems named like *name*, by trigram similarity.
+
+        Returns:
+            up to *limit* system names, best match first.
+        """
+        query = trigrams(name)
+        runs = sorted(
+            filter(None, (self._trigram_postings(gram) for gram in query)),
+            key=lambda run: run[1],
+        )
+        # candidates come from the rarest trigrams, common ones would mean reading millions
+        shared = collections.Counter()
+        read = 0
+        for start, count in runs:
+            if shared and read + count > self.MAX_POSTINGS:
+                break
+            shared.update(self._read_postings(start, count))
+            read += count
+
+        if not shared:
+            return []
+        # only the candidates sharing about as many trigrams as the best one are worth scoring
+        threshold = max(shared.values()) // 2
+        candidates = [number for number, count in shared.items() if count > threshold]
+        if len(candidates) > self.MAX_CANDIDATES:
+            candidates = heapq.nlargest(self.MAX_CANDIDATES, candidates, key=shared.__getitem__)
+
+        scored = []
+        for number in candidates:
+            candidate = self._name(number)
+            grams = trigrams(candidate)
+            similarity = len(query & grams) / len(query | grams)
+            if similarity >= self.MIN_SIMILARITY:
+                scored.append((-similarity, len(candidate), candidate))
+        return [candidate for *_, candidate in sorted(scored)[:limit]]
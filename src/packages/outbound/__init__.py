@@ -0,0 +1,22 @@
+"""
+__init__.py
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+
+from .scheduler import OutboundScheduler, Priority, split_line
+from . import scheduler as _scheduler
+
+from src.config import PLUGIN_MANAGER
+
+PLUGIN_MANAGER.register(_scheduler, "Outbound Scheduler")
+__all__ = [
+    "OutboundScheduler",
+    "Priority",
+    "split_line",
+]
@@ -0,0 +1,351 @@
+"""
+scheduler.py - Prioritised, rate limited queue of outbound IRC messages
+
+Every line mecha sends goes through an :class:`OutboundScheduler`, which sends them in order of
+:class:`Priority` at a pace the IRC server's flood protection tolerates: each target, and the
+connection as a whole, has a token bucket of lines it may send.  Whilst lines wait their turn,
+short ones to the same target are merged into one, and lines too long for a single IRC message
+are split between words before they are queued.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+from __future__ import annotations
+
+import asyncio
+import enum
+import time
+import typing
+
+import prometheus_client
+from loguru import logger
+
+from src.config import CONFIG_MARKER
+from ...config.datamodel import ConfigRoot
+
+QUEUE_DEPTH = prometheus_client.Gauge(
+    namespace="outbound",
+    name="queue_depth",
+    documentation="lines waiting to be sent to IRC",
+    labelnames=["priority"],
+)
+SEND_LATENCY = prometheus_client.Histogram(
+    namespace="outbound",
+    name="send_latency",
+    unit="seconds",
+    documentation="time from queueing a line to sending it to IRC",
+    labelnames=["priority"],
+)
+LINES_COALESCED = prometheus_client.Counter(
+    namespace="outbound",
+    name="lines_coalesced",
+    documentation="short lines merged into the line before them",
+)
+LINES_SPLIT = prometheus_client.Counter(
+    namespace="outbound",
+    name="lines_split",
+    documentation="lines too long for one IRC message, split in several",
+)
+
+rate: float = 1.0
+""" lines per second each target gets, once its burst is spent """
+burst: int = 5
+""" lines each target may be sent in quick succession """
+connection_rate: float = 2.0
+""" lines per second the connection gets, once its burst is spent """
+connection_burst: int = 10
+""" lines the connection may send in quick succession """
+line_bytes: int = 350
+""" longest line sent, in UTF-8 encoded bytes """
+coalesce_below: int = 80
+""" waiting lines shorter than this many characters may be merged """
+
+COALESCE_SEPARATOR = " | "
+
+
+@CONFIG_MARKER
+def validate_config(data: typing.Dict):
+    """
+    Validate the outbound section of the configuration
+
+    Args:
+        data(typing.Dict): configuration object
+    """
+    outbound = data.get("outbound", {})
+    for key in ("rate", "burst", "connection_rate", "connection_burst", "line_bytes"):
+        if outbound.get(key, 1) <= 0:
+            raise ValueError(f"constraint outbound.{key} must be positive")
+    # the widest UTF-8 encoded character must fit a line
+    if outbound.get("line_bytes", 4) < 4:
+        raise ValueError("constraint outbound.line_bytes must be at least 4")
+
+
+@CONFIG_MARKER
+def rehash_handler(data: ConfigRoot):
+    """
+    Apply the new outbound limits, to queued lines as well
+
+    Args:
+        data (ConfigRoot): configuration object
+    """
+    global rate, burst, connection_rate, connection_burst, line_bytes, coalesce_below
+    rate = data.outbound.rate
+    burst = data.outbound.burst
+    connection_rate = data.outbound.connection_rate
+    connection_burst = data.outbound.connection_burst
+    line_bytes = data.outbound.line_bytes
+    coalesce_below = data.outbound.coalesce_below
+
+
+class Priority(enum.IntEnum):
+    """ How urgently a message needs to go out, lower goes first """
+
+    URGENT = 0
+    """ ratsignals and case announcements """
+    NORMAL = 1
+    """ command replies """
+    LOW = 2
+    """ facts and diagnostics """
+
+
+def split_line(line: str, limit: int) -> typing.List[str]:
+    """
+    Split *line* into parts of at most *limit* UTF-8 encoded bytes.
+
+    Lines are split between words where possible and never within a character, a character
+    wider than *limit* is a part of its own.
+
+    Examples:
+        >>> split_line("pink fluffy unicorns", 12)
+        ['pink fluffy', 'unicorns']
+        >>> split_line("ünïcörns", 6)
+        ['ünïc', 'örns']
+        >>> split_line("ünï", 1)
+        ['ü', 'n', 'ï']
+    """
+    parts = []
+    while len(line.encode("utf8")) > limit:
+        # the longest prefix that fits, counted in characters
+        fits = len(line.encode("utf8")[:limit].decode("utf8", errors="ignore"))
+        cut = line.rfind(" ", 0, fits + 1)
+        if cut <= 0:
+            cut = max(fits, 1)
+        parts.append(line[:cut].rstrip())
+        line = line[cut:].lstrip()
+    # nothing may be left of the line once its last part was cut
+    if line or not parts:
+        parts.append(line)
+    return parts
+
+
+class _TokenBucket:
+    __slots__ = ["rate", "burst", "_tokens", "_updated"]
+
+    def __init__(self, rate_: float, burst_: int, now: float):
+        self.rate = rate_
+        self.burst = burst_
+        self._tokens = float(burst_)
+        self._updated = now
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self._tokens >= self.burst
+
+    def wait(self, now: float) -> float:
+        """ seconds until a token is available """
+        self._refill(now)
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+    def take(self, now: float):
+        self._refill(now)
+        self._tokens -= 1
+
+
+class _Line:
+    __slots__ = ["command", "target", "text", "priority", "queued_at", "futures"]
+
+    def __init__(self, command: str, target: str, text: str, priority: Priority, now: float):
+        self.command = command
+        self.target = target
+        self.text = text
+        self.priority = priority
+        self.queued_at = now
+        self.futures: typing.List[asyncio.Future] = [asyncio.get_event_loop().create_future()]
+
+
+Sender = typing.Callable[[str, str, str], typing.Awaitable[typing.Any]]
+
+
+class OutboundScheduler:
+    """
+    Sends IRC messages through *send*, most urgent first and no faster than the server allows.
+
+    *send* is called with the IRC command (``PRIVMSG`` or ``NOTICE``), the target and a single
+    line short enough for one IRC message.  Lines to one target at one priority are sent in the
+    order they were queued.
+    """
+
+    __slots__ = ["_send", "_queues", "_buckets", "_connection", "_wakeup", "_worker"]
+
+    def __init__(self, send: Sender):
+        self._send = send
+        """ coroutine function actually sending a line """
+        self._queues: typing.Dict[Priority, typing.List[_Line]] = {
+            priority: [] for priority in Priority
+        }
+        """ lines waiting to be sent, by priority, oldest first """
+        self._buckets: typing.Dict[str, _TokenBucket] = {}
+        """ per casefolded target, lines it may be sent """
+        self._connection: typing.Optional[_TokenBucket] = None
+        """ lines the connection may send """
+        self._wakeup: typing.Optional[asyncio.Event] = None
+        self._worker: typing.Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def send(
+        self, command: str, target: str, message: str, priority: Priority = Priority.NORMAL
+    ):
+        """
+        Queue *message* to *target*, and wait until all of it has been sent.
+
+        Raises:
+            whatever *send* raised sending any of its lines
+        """
+        now = time.monotonic()
+        lines = []
+        for line in message.replace("\r", "").split("\n"):
+            parts = split_line(line, line_bytes)
+            if len(parts) > 1:
+                LINES_SPLIT.inc()
+            # some IRC servers answer empty messages with "412 :No text to send"
+            lines.extend(_Line(command, target, part or " ", priority, now) for part in parts)
+        self._queues[priority].extend(lines)
+        QUEUE_DEPTH.labels(priority=priority.name).inc(len(lines))
+
+        loop = asyncio.get_event_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._work())
+        self._wakeup.set()
+
+        for line in lines:
+            # the line goes out even if whoever queued it stops waiting for it
+            await asyncio.shield(line.futures[0])
+
+    def _bucket(self, target: str, now: float) -> _TokenBucket:
+        bucket = self._buckets.get(target)
+        if bucket is None:
+            bucket = self._buckets[target] = _TokenBucket(rate, burst, now)
+        else:
+            bucket.rate, bucket.burst = rate, burst
+        return bucket
+
+    def _next(self, now: float) -> typing.Union[_Line, float]:
+        """ the next line to send, or how long to wait for one to become sendable """
+        if self._connection is None:
+            self._connection = _TokenBucket(connection_rate, connection_burst, now)
+        self._connection.rate = connection_rate
+        self._connection.burst = connection_burst
+        wait = self._connection.wait(now)
+        if wait > 0:
+            return wait
+
+        wait = float("inf")
+        for queue in self._queues.values():
+            throttled = set()
+            for index, line in enumerate(queue):
+                target = line.target.casefold()
+                if target in throttled:
+                    continue
+                bucket = self._bucket(target, now)
+                target_wait = bucket.wait(now)
+                if target_wait > 0:
+                    throttled.add(target)
+                    wait = min(wait, target_wait)
+                    continue
+                del queue[index]
+                self._coalesce(line, queue, index)
+                bucket.take(now)
+                self._connection.take(now)
+                return line
+        return wait
+
+    @staticmethod
+    def _coalesce(line: _Line, queue: typing.List[_Line], start: int):
+        """ merge the short lines to *line*'s target waiting behind it into it """
+        target = line.target.casefold()
+        index = start
+        while index < len(queue):
+            waiting = queue[index]
+            if waiting.target.casefold() != target:
+                index += 1
+                continue
+            merged = f"{line.text}{COALESCE_SEPARATOR}{waiting.text}"
+            if (
+                waiting.command != line.command
+                or len(line.text) >= coalesce_below
+                or len(waiting.text) >= coalesce_below
+                or len(merged.encode("utf8")) > line_bytes
+            ):
+                return
+            del queue[index]
+            QUEUE_DEPTH.labels(priority=waiting.priority.name).dec()
+            SEND_LATENCY.labels(priority=waiting.priority.name).observe(
+                time.monotonic() - waiting.queued_at
+            )
+            LINES_COALESCED.inc()
+            line.text = merged
+            line.futures.extend(waiting.futures)
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            line = self._next(now)
+            if not isinstance(line, _Line):
+                if line == float("inf"):
+                    # nothing left to send. Idle targets' buckets are full, so can go too.
+                    for target in [key for key, bucket in self._buckets.items()
+                                   if bucket.full(now)]:
+                        del self._buckets[target]
+                    return
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=line)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            QUEUE_DEPTH.labels(priority=line.priority.name).dec()
+            SEND_LATENCY.labels(priority=line.priority.name).observe(
+                time.monotonic() - line.queued_at
+            )
+            try:
+                await self._send(line.command, line.target, line.text)
+            except Exception as error:  # pylint: disable=broad-except
+                logger.exception("unable to send {!r} to {}", line.text, line.target)
+                for future in line.futures:
+                    if not future.done():
+                        future.set_exception(error)
+                        # it's the caller's to handle, if it's still waiting for it
+                        future.add_done_callback(lambda done: done.exception())
+            else:
+                for future in line.futures:
+                    if not future.done():
+                        future.set_result(None)
+
+    async def drain(self):
+        """
+        Wait until every queued line has been sent (or failed).
+        """
+        while self._worker is not None and not self._worker.done():
+            await asyncio.shield(self._worker)
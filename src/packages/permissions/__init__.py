@@ -18,11 +18,14 @@ __all__ = [
     "RECRUIT",
     "OVERSEER",
     "ADMIN",
-    "has_required_permission"
+    "has_required_permission",
+    "effective_permission",
+    "sender_has_permission",
 ]
 from src.config import PLUGIN_MANAGER
 from .permissions import Permission, require_permission, require_dm, require_channel, RAT, \
-    TECHRAT, RECRUIT, OVERSEER, ADMIN, has_required_permission
+    TECHRAT, RECRUIT, OVERSEER, ADMIN, has_required_permission, effective_permission, \
+    sender_has_permission
 from . import permissions
 
 PLUGIN_MANAGER.register(permissions)
@@ -14,7 +14,7 @@ This module is built on top of the Pydle system.
 import cattr
 from loguru import logger
 from functools import wraps
-from typing import Any, Union, Callable, Dict, Set, TYPE_CHECKING
+from typing import Any, Union, Callable, Dict, Optional, Set, TYPE_CHECKING
 
 from src.config import CONFIG_MARKER
 from ..context import Context
@@ -295,7 +295,7 @@ def require_permission(permission: Permission,
 
         @wraps(func)
         async def guarded(context: Context, *args):
-            if has_required_permission(context.user, permission):
+            if sender_has_permission(context, permission):
                 return await func(context, *args)
 
             await context.reply(override_message if override_message else permission.denied_message)
@@ -305,9 +305,29 @@ def require_permission(permission: Permission,
     return real_decorator
 
 
+def effective_permission(user: User) -> Optional[Permission]:
+    """ the permission *user*'s vhost grants, None if it grants none """
+    return _by_vhost.get(user.hostname)
+
+
 def has_required_permission(user: User, permission: Permission):
     """ asserts whether the user specified in Context"""
-    effective_permissions = _by_vhost.get(user.hostname)
+    effective_permissions = effective_permission(user)
+    if not effective_permissions:
+        return False
+    return effective_permissions >= permission
+
+
+def sender_has_permission(context: Context, permission: Permission) -> bool:
+    """
+    Whether the user that sent *context*'s message holds *permission*.
+
+    Contexts built from a message look their sender's permission up in the bot's user cache,
+    other contexts resolve it from their user's vhost.
+    """
+    if context.sender is None:
+        return has_required_permission(context.user, permission)
+    effective_permissions = context.bot.user_cache.permission(context.sender)
     if not effective_permissions:
         return False
     return effective_permissions >= permission
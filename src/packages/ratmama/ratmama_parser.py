@@ -12,13 +12,17 @@ See LICENSE.md
 """
 import asyncio
 import re
+import time
 
 import aiohttp
+import prometheus_client
 from loguru import logger
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set, Tuple
 from src.config import CONFIG_MARKER
 from io import StringIO
 from ..context import Context
+from ..galaxy import Galaxy, StarSystem
+from ..outbound import Priority
 from ..rescue import Rescue
 from ..rules import rule
 from ..user import User
@@ -32,6 +36,28 @@ from ...config.datamodel.ratmamma import RatmamaConfigRoot
 
 _config: RatmamaConfigRoot
 
+SIGNAL_LATENCY = prometheus_client.Histogram(
+    namespace="ratsignal",
+    name="latency",
+    unit="seconds",
+    documentation="time from a signal arriving to its announcement, or to the follow-up saying "
+    "where the client's system is",
+    labelnames=["stage"],
+)
+LOCATIONS_SHARED = prometheus_client.Counter(
+    namespace="ratsignal",
+    name="locations_shared",
+    documentation="signals whose system was already being looked up for another signal",
+)
+
+LOOKUP_TIMEOUT = 5
+""" Seconds each of the system and landmark lookups after a signal may take """
+
+# system lookups in flight, by galaxy and casefolded system name, shared between signals
+_locating: Dict[Tuple[Galaxy, str], "asyncio.Future[str]"] = {}
+# follow-ups in flight, kept here so they aren't garbage collected halfway through
+_follow_ups: Set["asyncio.Future[None]"] = set()
+
 
 @CONFIG_MARKER
 def rehash_handler(data: ConfigRoot):
@@ -46,6 +72,112 @@ def rehash_handler(data: ConfigRoot):
     _config = data.ratsignal_parser
 
 
+async def _locate(galaxy: Galaxy, system_name: str) -> str:
+    """
+    Describe where *system_name* is, for a signal's follow-up.
+    """
+    try:
+        system = await asyncio.wait_for(
+            galaxy.find_system_by_name(system_name), timeout=LOOKUP_TIMEOUT
+        )
+        if not system:
+            # procedurally named systems can be placed by their name alone
+            estimate = galaxy.estimate_nearest_landmark(StarSystem(system_name))
+            if estimate:
+                landmark, distance, error = estimate
+                return (
+                    f"not found in the galaxy DB, going by its name about "
+                    f"{distance}ly (give or take {error}ly) from {landmark.name}"
+                )
+            return "not found in the galaxy DB"
+
+        landmark_info = await asyncio.wait_for(
+            galaxy.find_nearest_landmark(system), timeout=LOOKUP_TIMEOUT
+        )
+    except (asyncio.TimeoutError, aiohttp.ServerTimeoutError):
+        return "<timeout requesting system data>"
+    except aiohttp.ClientError:
+        logger.exception("unable to look up {!r}", system_name)
+        return "<error requesting system data>"
+
+    if not landmark_info:
+        return f"no landmark found for system {system.name}"
+    landmark, distance = landmark_info
+    if system.name != landmark.name:
+        return f"{distance}ly from {landmark.name}"
+    return "landmark"
+
+
+def locate(galaxy: Galaxy, system_name: str) -> "asyncio.Future[str]":
+    """
+    Describe where *system_name* is, sharing the lookups with any other signal from the same
+    system that is still being looked up.
+    """
+    key = (galaxy, system_name.casefold())
+    located = _locating.get(key)
+    if located is not None and located.get_loop() is asyncio.get_event_loop():
+        LOCATIONS_SHARED.inc()
+        return located
+
+    located = _locating[key] = asyncio.ensure_future(_locate(galaxy, system_name))
+
+    def done(future: asyncio.Future):
+        if _locating.get(key) is future:
+            del _locating[key]
+
+    located.add_done_callback(done)
+    return located
+
+
+async def _follow_up(
+    ctx: Context, rescue: Rescue, reported: str, system_name: str, signalled_at: float
+):
+    """
+    Look up where a freshly announced rescue's system is, note it on the rescue and tell IRC.
+    """
+    # shielded: other signals may be waiting on the same lookup.
+    location = await asyncio.shield(locate(ctx.bot.galaxy, system_name))
+
+    # dispatch may have corrected the system, or closed the case, whilst we were looking
+    if rescue.system != reported or ctx.bot.board.get(rescue.api_id) is not rescue:
+        return
+    rescue.location = location
+    await ctx.reply(
+        f"Case #{rescue.board_index} ({rescue.client}) - Reported System: {reported}"
+        f" ({location})",
+        priority=Priority.URGENT,
+    )
+    SIGNAL_LATENCY.labels(stage="located").observe(time.monotonic() - signalled_at)
+
+
+def _start_follow_up(ctx: Context, rescue: Rescue, system_name: str, signalled_at: float):
+    follow_up = asyncio.ensure_future(
+        _follow_up(ctx, rescue, rescue.system, system_name, signalled_at)
+    )
+    _follow_ups.add(follow_up)
+
+    def done(future: asyncio.Future):
+        _follow_ups.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.opt(exception=future.exception()).error(
+                "follow-up of case #{} failed", rescue.board_index
+            )
+
+    follow_up.add_done_callback(done)
+
+
+async def flush_follow_ups():
+    """
+    Wait for every signal's follow-up still in flight.
+    """
+    loop = asyncio.get_event_loop()
+    while True:
+        pending = [follow_up for follow_up in _follow_ups if follow_up.get_loop() is loop]
+        if not pending:
+            return
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
 RATMAMA_REGEX = re.compile(
     r"""(?x)
     # The above makes whitespace and comments in the pattern ignored.
@@ -95,7 +227,8 @@ async def handle_ratmama_announcement(ctx: Context) -> None:
     """
     Handles the Announcement made by RatMama.
     Details are extracted, wrapped in a Rescue object and appended to the Rescue board.
-    An appropriate answer will be sent to IRC.
+    An appropriate answer will be sent to IRC straight away, followed by where the client's
+    system is once it has been looked up.
 
     Args:
         ctx: Context of the announcement
@@ -104,6 +237,7 @@ async def handle_ratmama_announcement(ctx: Context) -> None:
 
     """
 
+    signalled_at = time.monotonic()
     # If the user isn't one that is allowed to trigger this code,
     if ctx.user.nickname.casefold() not in _config.announcer_nicks:
         return  # then SKIP!
@@ -124,12 +258,14 @@ async def handle_ratmama_announcement(ctx: Context) -> None:
         "bot.fuelrats.com",
     ):
         return await ctx.reply(
-            "Signal attempted to create rescue for a service. " "Dispatch: please inject this case."
+            "Signal attempted to create rescue for a service. Dispatch: please inject this case.",
+            priority=Priority.URGENT,
         )
     # Sanity check.
     if client_name.casefold() == _config.trigger_keyword.casefold():
         return await ctx.reply(
-            "Cannot comply: refusing to create rescue for the signal keyword."
+            "Cannot comply: refusing to create rescue for the signal keyword.",
+            priority=Priority.URGENT,
         )
 
     exist_rescue: Optional[Rescue] = (
@@ -139,7 +275,8 @@ async def handle_ratmama_announcement(ctx: Context) -> None:
     if exist_rescue:
         # we got a case already!
         await ctx.reply(
-            f"{client_name} has reconnected! Case #{exist_rescue.board_index} " f"(RETURN_SIGNAL)"
+            f"{client_name} has reconnected! Case #{exist_rescue.board_index} " f"(RETURN_SIGNAL)",
+            priority=Priority.URGENT,
         )
         # now let's make it more visible if stuff changed
         changed = []
@@ -173,7 +310,9 @@ async def handle_ratmama_announcement(ctx: Context) -> None:
         if changed:
             # SPARK-46: Warn when a client reconnects with different settings, but differ to dispatch
             # to overwrite existing data instead of doing it ourselves.
-            await ctx.reply(f"{message}{', '.join(changed)}{cr_message}")
+            await ctx.reply(
+                f"{message}{', '.join(changed)}{cr_message}", priority=Priority.URGENT
+            )
         return
 
     platform = None
@@ -198,32 +337,19 @@ async def handle_ratmama_announcement(ctx: Context) -> None:
     if ctx.DRILL_MODE:
         platform_signal = ""
 
-    distance_str = "not found in the galaxy DB"
-    try:
-        system = await asyncio.wait_for(ctx.bot.galaxy.find_system_by_name(system_name), timeout=2)
-        if system:
-            landmark_info = await asyncio.wait_for(
-                ctx.bot.galaxy.find_nearest_landmark(system), timeout=2,
-            )
-            if landmark_info:
-                landmark, distance = landmark_info
-                if system.name != landmark.name:
-                    distance_str = f"{distance}ly from {landmark.name}"
-                else:
-                    distance_str = "landmark"
-            else:
-                distance_str = f"no landmark found for system {system.name}"
-    except (asyncio.TimeoutError, aiohttp.ServerTimeoutError):
-        distance_str = "<timeout requesting system data>"
-
+    # the signal goes out first, where the system is follows once it has been looked up.
     await ctx.reply(
         f"{_config.trigger_keyword.upper()} - CMDR {rescue.client} - "
-        f"Reported System: {rescue.system} ({distance_str}) - "
+        f"Reported System: {rescue.system} - "
         f"Platform: {rescue.platform.value if rescue.platform else ''} - "
         f"O2: {'NOT OK' if rescue.code_red else 'OK'} - "
         f"Language: {result.group('full_language')}"
-        f" (Case #{rescue.board_index}) {platform_signal}"
+        f" (Case #{rescue.board_index}) {platform_signal}",
+        priority=Priority.URGENT,
     )
+    SIGNAL_LATENCY.labels(stage="announced").observe(time.monotonic() - signalled_at)
+    if rescue.system:
+        _start_follow_up(ctx, rescue, system_name, signalled_at)
 
 
 @rule(
@@ -255,7 +381,8 @@ async def handle_ratsignal(ctx: Context) -> None:
     if ctx.user.nickname.casefold() in ctx.bot.board:
         await ctx.reply(
             f"{ctx.user.nickname}: You already sent a Signal! Please stand by,"
-            f" someone will help you soon!"
+            f" someone will help you soon!",
+            priority=Priority.URGENT,
         )
         return
 
@@ -306,7 +433,8 @@ async def handle_ratsignal(ctx: Context) -> None:
         )
         await ctx.reply(
             f"Case #{rescue.board_index} created for {ctx.user.nickname!r},"
-            f" Dispatch please set details"
+            f" Dispatch please set details",
+            priority=Priority.URGENT,
         )
         return
 
@@ -324,5 +452,6 @@ async def handle_ratsignal(ctx: Context) -> None:
         f"Case created for {rescue.client}"
         f" on {rescue.platform.name if rescue.platform else '<unknown platform>'} in {rescue.system}. "
         f"{'O2 status is okay' if not code_red else 'This is a CR!'} "
-        f"- {platform_signal}"  # FIXME signal not rendering...
+        f"- {platform_signal}",  # FIXME signal not rendering...
+        priority=Priority.URGENT,
     )
@@ -110,7 +110,12 @@ class Rescue:  # pylint: disable=too-many-public-methods
         self._lang_id = lang_id
         self._status = status
         self._hash = None
-        self.active: bool = active
+        if status is Status.OPEN:
+            # an inactive rescue is still open, any other status says more than `active` does
+            self.active: bool = active
+        # local only, the API has no notion of it.
+        self.location: Optional[str] = None
+        """ where the client's system is, relative to a landmark, once it has been looked up """
 
     def __eq__(self, other) -> bool:
         """
@@ -847,6 +852,8 @@ class Rescue:  # pylint: disable=too-many-public-methods
 
         if show_system and self.system:
             buffer.write(f"in {self.system!r}, ")
+            if self.location:
+                buffer.write(f"{self.location}, ")
 
         if self.code_red:
             base = '(CR '
@@ -13,12 +13,29 @@ See LICENSE.md
 
 import re
 from loguru import logger
-from typing import Callable, NamedTuple, Pattern, List, Tuple, Optional
+from typing import Callable, NamedTuple, Pattern, List, Tuple, Optional, Dict, Match, Set
+
+try:
+    # Python 3.11 moved the regular expression parser into the re package
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_constants
+    import sre_parse
 
 
 _rules: List["Rule"] = []
 _prefixless_rules: List["Rule"] = []
 
+# compiled dispatchers for the above, keyed by `prefixless`. Dropped whenever a rule list changes.
+_dispatchers: Dict[bool, "_Dispatcher"] = {}
+
+# bounds on the literal prefixes a single rule is indexed under
+_MAX_PREFIXES = 64
+_MAX_PREFIX_LENGTH = 32
+
+# non-ASCII characters an IGNORECASE pattern considers equal to an ASCII letter
+_FOLD_TO_ASCII = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"})
+
 
 class Rule(NamedTuple):
     """
@@ -117,6 +134,7 @@ def rule(regex: str, *, case_sensitive: bool = False, full_message: bool = False
                 target.insert(target.index(after) + 1, tuple_)
             except ValueError:
                 raise RuleNotPresentException(after)
+        _dispatchers.pop(prefixless, None)
 
         logger.info(f"New rule matching '{regex}' "
                     f"case-{'' if case_sensitive else 'in'} sensitively was created.")
@@ -125,6 +143,140 @@ def rule(regex: str, *, case_sensitive: bool = False, full_message: bool = False
     return decorator
 
 
+def _literal_prefixes(items) -> Tuple[Set[str], bool]:
+    """
+    Compute literal prefixes for a parsed pattern, such that everything it matches starts with one
+    of them.
+
+    Args:
+        items: parsed pattern, as produced by :func:`sre_parse.parse`
+
+    Returns:
+        (set of str, bool): the prefixes, and whether they are the *entire* possible matches
+    """
+    prefixes = {""}
+    for opcode, argument in items:
+        complete = True
+        if opcode is sre_constants.AT:
+            # zero width assertions only ever narrow what matches
+            continue
+        if opcode is sre_constants.LITERAL:
+            step = {chr(argument)}
+        elif opcode is sre_constants.IN:
+            step = _charset(argument)
+            if step is None:
+                return prefixes, False
+        elif opcode is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, subpattern = argument
+            if add_flags or del_flags:
+                return prefixes, False
+            step, complete = _literal_prefixes(subpattern)
+        elif opcode is sre_constants.BRANCH:
+            step = set()
+            for alternative in argument[1]:
+                alternative_step, alternative_complete = _literal_prefixes(alternative)
+                step |= alternative_step
+                complete = complete and alternative_complete
+        else:
+            return prefixes, False
+
+        if "" in step:
+            return prefixes, False
+        extended = {prefix + suffix for prefix in prefixes for suffix in step}
+        if len(extended) > _MAX_PREFIXES or any(
+            len(prefix) > _MAX_PREFIX_LENGTH for prefix in extended
+        ):
+            return prefixes, False
+        prefixes = extended
+        if not complete:
+            return prefixes, False
+    return prefixes, True
+
+
+def _charset(items) -> Optional[Set[str]]:
+    """ characters a small, positive character class can match, or None """
+    chars = set()
+    for opcode, argument in items:
+        if opcode is sre_constants.LITERAL:
+            chars.add(chr(argument))
+        elif opcode is sre_constants.RANGE and argument[1] - argument[0] < _MAX_PREFIXES:
+            chars.update(chr(code) for code in range(argument[0], argument[1] + 1))
+        else:
+            return None
+    return chars
+
+
+def _fold(text: str) -> str:
+    """
+    Case fold *text* the way an IGNORECASE pattern would compare it, as far as ASCII goes.
+    """
+    return text.translate(_FOLD_TO_ASCII).lower()
+
+
+class _Dispatcher:
+    """
+    Compiled form of a rule list.
+
+    Every rule's pattern is analysed once for the literal text its matches must start with, and
+    the rule is indexed under each of those prefixes.  Looking up the prefixes of an incoming
+    message then yields the handful of rules that could possibly match it, and only those are
+    tried, in registration order, so ``after=`` ordering is preserved.  Rules without a usable
+    literal prefix are tried for every message.
+    """
+
+    __slots__ = ["_rules", "_unindexed", "_exact", "_folded", "_exact_lengths", "_folded_lengths"]
+
+    def __init__(self, rules: List[Rule]):
+        self._rules: Tuple[Rule, ...] = tuple(rules)
+        self._unindexed: List[int] = []
+        self._exact: Dict[str, List[int]] = {}
+        self._folded: Dict[str, List[int]] = {}
+
+        for index, rule_ in enumerate(self._rules):
+            ignorecase = bool(rule_.pattern.flags & re.IGNORECASE)
+            prefixes, _ = _literal_prefixes(
+                sre_parse.parse(rule_.pattern.pattern, rule_.pattern.flags)
+            )
+            if "" in prefixes or (ignorecase and not all(prefix.isascii() for prefix in prefixes)):
+                self._unindexed.append(index)
+                continue
+
+            index_ = self._folded if ignorecase else self._exact
+            for prefix in {_fold(prefix) for prefix in prefixes} if ignorecase else prefixes:
+                index_.setdefault(prefix, []).append(index)
+
+        self._exact_lengths = sorted({len(prefix) for prefix in self._exact})
+        self._folded_lengths = sorted({len(prefix) for prefix in self._folded})
+
+    def dispatch(self, word: str, eol: str) -> Tuple[Optional[Rule], Optional[Match]]:
+        """
+        Find the first rule matching a message.
+
+        Args:
+            word: first word of the message
+            eol: the full message
+
+        Returns:
+            (Rule or None, Match or None): the matching rule and its match object
+        """
+        # `eol` always starts with `word`, so its prefixes cover both kinds of rule
+        candidates = set(self._unindexed)
+        for length in self._exact_lengths:
+            candidates.update(self._exact.get(eol[:length], ()))
+        if self._folded_lengths:
+            folded = _fold(eol[:self._folded_lengths[-1]])
+            for length in self._folded_lengths:
+                candidates.update(self._folded.get(folded[:length], ()))
+
+        for index in sorted(candidates):
+            rule_ = self._rules[index]
+            match = rule_.pattern.match(eol if rule_.full_message else word)
+            if match is not None:
+                return rule_, match
+
+        return None, None
+
+
 def get_rule(words: List[str], words_eol: List[str],
              prefixless: bool) -> Tuple[Optional[Callable], tuple]:
     """
@@ -140,19 +292,19 @@ def get_rule(words: List[str], words_eol: List[str],
             2-tuple of the command function and the extra args that it should
             be called with.
     """
-    for rule in _prefixless_rules if prefixless else _rules:
-        if rule.full_message:
-            match = rule.pattern.match(words_eol[0])
-        else:
-            match = rule.pattern.match(words[0])
+    dispatcher = _dispatchers.get(prefixless)
+    if dispatcher is None:
+        dispatcher = _Dispatcher(_prefixless_rules if prefixless else _rules)
+        _dispatchers[prefixless] = dispatcher
 
-        if match is not None:
-            if rule.pass_match:
-                return rule.underlying, (match,)
+    rule, match = dispatcher.dispatch(words[0], words_eol[0])
+    if rule is None:
+        return None, ()
 
-            return rule.underlying, ()
+    if rule.pass_match:
+        return rule.underlying, (match,)
 
-    return None, ()
+    return rule.underlying, ()
 
 
 def clear_rules():
@@ -162,3 +314,4 @@ def clear_rules():
 
     _prefixless_rules.clear()
     _rules.clear()
+    _dispatchers.clear()
@@ -38,6 +38,21 @@ class User:
         """
         Returns a user object from pydle's backend
 
+        Args:
+            bot (BasicClient): Mechaclient instance
+            nickname (str): nickname of user
+
+        Returns:
+            User: found user
+            None: user not found
+        """
+        return cls.lookup(bot, nickname)
+
+    @classmethod
+    def lookup(cls, bot: BasicClient, nickname: str) -> Optional[User]:
+        """
+        Synchronous :meth:`from_pydle`, pydle already holds what it knows about its users.
+
         Args:
             bot (BasicClient): Mechaclient instance
             nickname (str): nickname of user
@@ -51,15 +66,9 @@ class User:
 
         # if we got a object back
         if data:
-            result = cls(**data)
-
-            # This needs to be an evolve as the cls is frozen.
-            # That and wanting to avoid a converter on the class itself.
-
-            # Inspection false-positive. suppress.
-            # noinspection PyDataclass
-            result = attr.evolve(inst=result, hostname=cls.process_vhost(result.hostname))
-            return result
+            # refine the vhost up front, the class is frozen and has no converter for it.
+            return cls(**{**data, "hostname": cls.process_vhost(data.get("hostname"))})
+        return None
 
     @classmethod
     def process_vhost(cls, vhost: Union[str, None]) -> Optional[str]:
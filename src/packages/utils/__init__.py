@@ -10,11 +10,18 @@ See LICENSE.md
 """
 
 from .autocorrect import correct_system_name
+from .metrics import gauge_total
+from .procedural import ProceduralEstimator, ProceduralName, PositionEstimate
 from .ratlib import sanitize, Vector, Colors, color, bold, underline, italic, reverse, Platforms, \
     Singleton, Status, Formatting
 
 __all__ = [
     "autocorrect",
+    "gauge_total",
+    "procedural",
+    "ProceduralEstimator",
+    "ProceduralName",
+    "PositionEstimate",
     "ratlib",
     "Vector",
     "Colors",
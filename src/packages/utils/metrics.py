@@ -0,0 +1,35 @@
+"""
+metrics.py - helpers for prometheus metrics
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import typing
+
+import prometheus_client
+
+Instance = typing.TypeVar("Instance")
+
+
+def gauge_total(
+    gauge: prometheus_client.Gauge,
+    instances: typing.Iterable[Instance],
+    measure: typing.Callable[[Instance], float],
+) -> None:
+    """
+    Have *gauge* report the total of *measure* over *instances*, as they are when it's collected.
+
+    Call it once, with a collection the instances add themselves to (such as a
+    :class:`weakref.WeakSet`).  A gauge only keeps the last function it was given, so one set by
+    each instance would report just the newest of them.
+
+    Args:
+        gauge: gauge to report the total
+        instances: live instances to measure
+        measure: the instance's contribution to the total
+    """
+    gauge.set_function(lambda: sum(measure(instance) for instance in list(instances)))
@@ -0,0 +1,300 @@
+"""
+procedural.py - Estimate where procedurally named systems are from their names alone.
+
+Procedurally generated systems are named ``<Sector> <L1><L2>-<L3> <mass code><N1>-<N2>``.  The
+letters and ``N1`` number the cube ("boxel") of the sector the system is in, and the mass code
+says how big those cubes are, from ``a`` (10 ly) to ``h`` (1280 ly, a whole sector).  So once a
+sector's origin is known, any system in it can be placed to within its boxel.
+
+Sectors themselves are 1280 ly cubes on a grid anchored at :data:`GALAXY_ORIGIN`.  Rather than
+decode sector names, the origin of a sector is learned from any system in it with a known
+position.
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+
+import re
+import typing
+from math import floor, sqrt
+
+import attr
+
+from .autocorrect import correct_system_name
+from .ratlib import Vector
+
+GALAXY_ORIGIN = Vector(-49985, -40985, -24105)
+""" the corner of the sector grid """
+
+SECTOR_SIZE = 1280
+""" width of a sector, in light years """
+
+_BOXELS_PER_ROW = 128
+""" boxels are numbered as if every mass code had as many per row as mass code ``a`` """
+
+_PROCEDURAL_NAME = re.compile(
+    r"^(?P<sector>.+) (?P<l1>[A-Z])(?P<l2>[A-Z])-(?P<l3>[A-Z]) "
+    r"(?P<mass_code>[A-H])(?:(?P<n1>[0-9]+)-)?(?P<n2>[0-9]+)$"
+)
+
+_Decoded = typing.Tuple[str, str, int, int]
+""" sector, mass code, boxel index and number of a procedural name """
+
+SectorLookup = typing.Callable[[str], typing.Iterable[typing.Tuple[str, Vector]]]
+""" given an upper-cased sector name, yields names and positions of known systems in it """
+
+
+def _decode(name: str) -> typing.Optional[_Decoded]:
+    name = name.strip()
+    # names are mostly spelled right, correcting them costs more than the rest of this.
+    matched = _PROCEDURAL_NAME.match(name.upper()) or _PROCEDURAL_NAME.match(
+        correct_system_name(name)
+    )
+    if not matched:
+        return None
+    sector, l1, l2, l3, mass_code, n1, n2 = matched.groups()
+    index = (
+        (ord(l1) - 65) + (ord(l2) - 65) * 26 + (ord(l3) - 65) * 26 ** 2 + int(n1 or 0) * 26 ** 3
+    )
+    return sector, mass_code.lower(), index, int(n2)
+
+
+def _width(mass_code: str) -> int:
+    return 10 << (ord(mass_code) - ord("a"))
+
+
+@attr.dataclass(frozen=True)
+class ProceduralName:
+    """
+    A procedural system name, decoded.
+
+    Examples:
+        >>> name = ProceduralName.parse("Eorld Pri QI-Z d1-4302")
+        >>> name.sector, name.mass_code, name.boxel, name.number
+        ('EORLD PRI', 'd', (12, 15, 2), 4302)
+        >>> name.width
+        80
+        >>> str(name)
+        'EORLD PRI QI-Z d1-4302'
+    """
+
+    sector: str = attr.ib(validator=attr.validators.instance_of(str))
+    """ upper-cased sector name """
+    mass_code: str = attr.ib(validator=attr.validators.in_("abcdefgh"))
+    boxel: typing.Tuple[int, int, int] = attr.ib(
+        validator=attr.validators.deep_iterable(
+            member_validator=attr.validators.instance_of(int),
+            iterable_validator=attr.validators.instance_of(tuple),
+        )
+    )
+    """ position of the boxel within the sector, counted in boxels """
+    number: int = attr.ib(validator=attr.validators.instance_of(int))
+    """ number of the system within its boxel """
+
+    @classmethod
+    def parse(cls, name: str) -> typing.Optional["ProceduralName"]:
+        """
+        Decode a system *name*, typos such as ``0`` for ``O`` corrected.
+
+        Returns:
+            the decoded name, or None if it isn't procedural.
+        """
+        decoded = _decode(name)
+        if decoded is None:
+            return None
+        sector, mass_code, index, number = decoded
+        return cls(
+            sector=sector,
+            mass_code=mass_code,
+            boxel=(
+                index % _BOXELS_PER_ROW,
+                index // _BOXELS_PER_ROW % _BOXELS_PER_ROW,
+                index // _BOXELS_PER_ROW ** 2,
+            ),
+            number=number,
+        )
+
+    def __str__(self) -> str:
+        x, y, z = self.boxel
+        n1, index = divmod(x + y * _BOXELS_PER_ROW + z * _BOXELS_PER_ROW ** 2, 26 ** 3)
+        l3, index = divmod(index, 26 ** 2)
+        l2, l1 = divmod(index, 26)
+        number = f"{n1}-{self.number}" if n1 else str(self.number)
+        return f"{self.sector} {chr(65 + l1)}{chr(65 + l2)}-{chr(65 + l3)} {self.mass_code}{number}"
+
+    @property
+    def width(self) -> int:
+        """ width of the boxel, in light years """
+        return _width(self.mass_code)
+
+    @property
+    def hand_authored(self) -> bool:
+        """ whether the sector is hand authored, those aren't aligned to the sector grid """
+        return self.sector.endswith(" SECTOR")
+
+    def offset(self) -> Vector:
+        """ the boxel's corner, relative to the sector's origin """
+        x, y, z = self.boxel
+        return Vector(x, y, z) * self.width
+
+
+@attr.dataclass(frozen=True)
+class PositionEstimate:
+    """
+    Where a system is thought to be: within *error* light years of *position*.
+    """
+
+    name: str = attr.ib(validator=attr.validators.instance_of(str))
+    position: Vector = attr.ib(validator=attr.validators.instance_of(Vector))
+    error: float = attr.ib(validator=attr.validators.instance_of((int, float)))
+
+
+def _align(corner: Vector, grid: int) -> Vector:
+    """ the corner of the *grid* sized cube, counted from the galaxy's origin, holding *corner* """
+    return Vector(
+        *(
+            floor((value - origin) / grid) * grid + origin
+            for value, origin in zip(
+                (corner.x, corner.y, corner.z),
+                (GALAXY_ORIGIN.x, GALAXY_ORIGIN.y, GALAXY_ORIGIN.z),
+            )
+        )
+    )
+
+
+class ProceduralEstimator:
+    """
+    Estimates the positions of procedurally named systems in sectors it knows the origin of.
+
+    Sector origins are taught with :meth:`learn`, or looked up through *lookup* the first time a
+    sector is asked about.
+
+    Examples:
+        >>> estimator = ProceduralEstimator()
+        >>> estimator.learn("Eorld Pri QI-Z d1-4302", Vector(-320.0, -49.46875, 19636.6875))
+        True
+        >>> estimate = estimator.estimate("Eorld Pri QI-Z d1-4000")
+        >>> estimate.position, round(estimate.error, 2)
+        (Vector(x=-345.0, y=-65.0, z=19615.0), 69.28)
+    """
+
+    __slots__ = ["_lookup", "_origins", "_unresolved"]
+
+    MAX_LOOKUP_SYSTEMS = 32
+    """ systems from *lookup* tried per sector at most """
+
+    def __init__(self, lookup: typing.Optional[SectorLookup] = None):
+        self._lookup = lookup
+        # sector name -> mass code -> origin of that mass code's boxels
+        self._origins: typing.Dict[str, typing.Dict[str, Vector]] = {}
+        self._unresolved: typing.Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._origins)
+
+    def learn(self, name: str, position: Vector) -> bool:
+        """
+        Learn the origin of a sector from a system in it, at *position*.
+
+        Returns:
+            whether *name* was procedural, and so taught anything.
+        """
+        parsed = ProceduralName.parse(name)
+        if parsed is None:
+            return False
+        # grid-aligned sectors have one origin, hand authored ones an origin per boxel size.
+        grid = parsed.width if parsed.hand_authored else SECTOR_SIZE
+        origins = self._origins.setdefault(parsed.sector, {})
+        origins[parsed.mass_code if parsed.hand_authored else ""] = _align(
+            position - parsed.offset(), grid
+        )
+        self._unresolved.discard(parsed.sector)
+        return True
+
+    def forget_unresolved(self):
+        """ Ask *lookup* again about sectors it didn't know before """
+        self._unresolved.clear()
+
+    def _origin(self, sector: str, mass_code: str) -> typing.Optional[typing.Tuple[Vector, float]]:
+        """
+        The origin of the *mass_code* boxels of *sector*, and how far off that may be.
+        """
+        origins = self._origins.get(sector)
+        if origins is None and self._lookup is not None and sector not in self._unresolved:
+            for count, (name, position) in enumerate(self._lookup(sector)):
+                if count >= self.MAX_LOOKUP_SYSTEMS:
+                    break
+                # the lookup may well yield systems of other sectors sharing a prefix
+                self.learn(name, position)
+                origins = self._origins.get(sector)
+                if origins is not None:
+                    break
+            if origins is None:
+                self._unresolved.add(sector)
+        if not origins:
+            return None
+        if "" in origins:
+            return origins[""], 0.0
+        if mass_code in origins:
+            return origins[mass_code], 0.0
+
+        # a hand authored sector's origin, learned from another boxel size: aligning it to a
+        # coarser grid is exact, to a finer one it may be out by the difference.
+        known = min(origins)
+        width, known_width = _width(mass_code), _width(known)
+        if width >= known_width:
+            return _align(origins[known], width), 0.0
+        return origins[known], (known_width - width) * sqrt(3)
+
+    def estimate(self, name: str) -> typing.Optional[PositionEstimate]:
+        """
+        Estimate the position of system *name*.
+
+        Returns:
+            the centre of its boxel, within half a boxel diagonal (plus any uncertainty about
+            the sector) of the system, or None if the name isn't procedural or its sector
+            unknown.
+        """
+        return self.estimate_many((name,))[0]
+
+    def estimate_many(
+        self, names: typing.Iterable[str]
+    ) -> typing.List[typing.Optional[PositionEstimate]]:
+        """
+        Estimate the positions of many systems at once, see :meth:`estimate`.
+
+        Each sector is resolved only once, however many of the systems are in it.
+        """
+        decoded_names = [(name, _decode(name)) for name in names]
+        # systems sharing a sector and boxel size share an origin.
+        origins = {}
+        for _, decoded in decoded_names:
+            if decoded is not None and decoded[:2] not in origins:
+                origins[decoded[:2]] = self._origin(*decoded[:2])
+
+        estimates = []
+        for name, decoded in decoded_names:
+            origin = origins[decoded[:2]] if decoded is not None else None
+            if origin is None:
+                estimates.append(None)
+                continue
+            # plain arithmetic rather than Vectors, there may be a lot of these.
+            (corner, uncertainty), (_, mass_code, index, _) = origin, decoded
+            width = _width(mass_code)
+            half = width / 2
+            estimates.append(
+                PositionEstimate(
+                    name=name,
+                    position=Vector(
+                        corner.x + index % _BOXELS_PER_ROW * width + half,
+                        corner.y + index // _BOXELS_PER_ROW % _BOXELS_PER_ROW * width + half,
+                        corner.z + index // _BOXELS_PER_ROW ** 2 * width + half,
+                    ),
+                    error=half * sqrt(3) + uncertainty,
+                )
+            )
+        return estimates
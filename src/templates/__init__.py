@@ -16,6 +16,7 @@ from loguru import logger
 from src.packages.board import RatBoard
 from src.packages.rescue import Rescue
 from src.packages.utils.ratlib import Platforms, Status, Colors, color, bold, italic
+from .render_cache import RenderCache
 from .render_flags import RescueRenderFlags
 
 
@@ -26,8 +27,12 @@ async def render_rescue(rescue: Rescue, flags: RescueRenderFlags):
 
 
 async def render_board(board: RatBoard, **kwargs) -> str:
-    template = template_environment.get_template("board.jinja2")
-    return await (template.render_async(board=board, **kwargs))
+    key = tuple(sorted(kwargs.items()))
+    output = render_cache.rendered("board.jinja2", board, key)
+    if output is None:
+        kwargs.setdefault("flags", None)
+        output = await render_cache.render("board.jinja2", board, key=key, **kwargs)
+    return output
 
 
 async def render_quotes(rescue: Rescue) -> str:
@@ -42,6 +47,8 @@ template_environment = Environment(
     loader=PackageLoader("src", "templates"),
     autoescape=select_autoescape(default=False),
     enable_async=True,
+    # the templates don't change whilst we run, don't check them on every use
+    auto_reload=False,
 )
 # inject some objects into the environment so it can be accessed within the templates
 template_environment.globals["Colors"] = Colors
@@ -55,3 +62,12 @@ template_environment.globals["render_quotes"] = render_quotes
 template_environment.globals["Platforms"] = Platforms
 template_environment.globals["now"] = pendulum.now
 template_environment.globals["tz"] = pendulum.tz
+
+# compile the templates now, rather than when first rendering them
+for _template in template_environment.list_templates(extensions=["jinja2"]):
+    template_environment.get_template(_template)
+
+render_cache = RenderCache(template_environment)
+"""
+Renders of the board, kept until it changes
+"""
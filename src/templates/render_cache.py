@@ -0,0 +1,143 @@
+"""
+render_cache.py - Renders of the board, kept until it changes
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import functools
+import typing
+from collections import OrderedDict
+from uuid import UUID
+
+import prometheus_client
+from jinja2 import Environment
+
+from src.packages.board import RatBoard
+from src.packages.rescue import Rescue
+from .render_flags import RescueRenderFlags
+
+RENDER_HITS = prometheus_client.Counter(
+    namespace="render_cache",
+    name="hits",
+    documentation="renders answered from the render cache",
+    labelnames=["kind"],
+)
+RENDER_MISSES = prometheus_client.Counter(
+    namespace="render_cache",
+    name="misses",
+    documentation="renders the render cache had to render",
+    labelnames=["kind"],
+)
+
+_Fragment = typing.Tuple[UUID, int, RescueRenderFlags]
+""" a rescue, the board version it last changed at and the flags it was rendered with """
+
+
+def _keepable(flags: typing.Any) -> bool:
+    # quotes say how long ago they were made, renders showing them go stale by themselves.
+    return isinstance(flags, RescueRenderFlags) and not flags.show_quotes
+
+
+class RenderCache:
+    """
+    Renders of boards and their rescues, kept until the board changes.
+
+    A whole render is kept by its template, the board's version and whatever else it was
+    rendered with.  Rescues are rendered on their own and kept by the version of the board they
+    last changed at, so a board that changed only has the rescues that did rendered again.
+    Both are forgotten least recently used first.
+
+    Rescues are rendered by the environment's ``render_rescue`` global.
+    """
+
+    __slots__ = ["_environment", "_renders", "_fragments", "max_renders", "max_fragments"]
+
+    def __init__(self, environment: Environment, max_renders: int = 64,
+                 max_fragments: int = 1024):
+        self._environment = environment
+        self._renders: typing.MutableMapping[typing.Hashable, str] = OrderedDict()
+        self._fragments: typing.MutableMapping[_Fragment, str] = OrderedDict()
+        self.max_renders = max_renders
+        """ whole renders kept at most """
+        self.max_fragments = max_fragments
+        """ rendered rescues kept at most """
+
+    @staticmethod
+    def _remember(store: typing.MutableMapping, key: typing.Hashable, value: str, limit: int):
+        store[key] = value
+        while len(store) > limit:
+            store.popitem(last=False)
+
+    async def render_rescue(self, board: RatBoard, rescue: Rescue, flags: RescueRenderFlags) -> str:
+        """
+        Render *rescue*, unless it didn't change since it was last rendered with *flags*.
+        """
+        revision = board.revision(rescue)
+        if revision is None or not _keepable(flags):
+            return await self._environment.globals["render_rescue"](rescue, flags)
+
+        key = (rescue.api_id, revision, flags)
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            RENDER_HITS.labels(kind="rescue").inc()
+            self._fragments.move_to_end(key)
+            return fragment
+
+        RENDER_MISSES.labels(kind="rescue").inc()
+        fragment = await self._environment.globals["render_rescue"](rescue, flags)
+        self._remember(self._fragments, key, fragment, self.max_fragments)
+        return fragment
+
+    def rendered(
+        self, template: str, board: RatBoard, key: typing.Hashable = ()
+    ) -> typing.Optional[str]:
+        """
+        The render of *template* for *board* as it is now, by *key*, if one was kept.
+        """
+        output = self._renders.get((template, board.version, key))
+        if output is not None:
+            RENDER_HITS.labels(kind="render").inc()
+            self._renders.move_to_end((template, board.version, key))
+        return output
+
+    async def render(
+        self,
+        template: str,
+        board: RatBoard,
+        flags: typing.Optional[RescueRenderFlags],
+        key: typing.Hashable = (),
+        **context,
+    ) -> str:
+        """
+        Render *template* for *board*, and keep the render for :meth:`rendered`.
+
+        The template renders its rescues with ``render_rescue``, which renders only the
+        rescues that changed since they were last rendered.
+
+        Args:
+            template: name of the template
+            board: the board rendered
+            flags: how rescues are rendered
+            key: whatever else the render depends on, other than the board's version
+            **context: variables the template is rendered with, besides ``board`` and ``flags``
+        """
+        RENDER_MISSES.labels(kind="render").inc()
+        version = board.version
+        output = await self._environment.get_template(template).render_async(
+            board=board,
+            render_rescue=functools.partial(self.render_rescue, board),
+            flags=flags,
+            **context,
+        )
+        if _keepable(flags):
+            self._remember(self._renders, (template, version, key), output, self.max_renders)
+        return output
+
+    def clear(self):
+        """ forget every render """
+        self._renders.clear()
+        self._fragments.clear()
@@ -318,7 +318,7 @@ def test_dbm_fx() -> DatabaseManager:
 
 
 @pytest.fixture(scope="session")
-def test_dbm_pool_fx(test_dbm_fx) -> psycopg2.pool.SimpleConnectionPool:
+def test_dbm_pool_fx(test_dbm_fx) -> psycopg2.pool.ThreadedConnectionPool:
     """
     Test fixture for Database Manager's connection pool.
 
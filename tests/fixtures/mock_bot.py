@@ -8,6 +8,7 @@ class MockBot(MechaClient):
         # lets ensure the super gets called first, before we start overriding things
         super().__init__(*args, **kwargs)
         self.sent_messages = []
+        self.sent_notices = []
         self.users = {
             "unit_test[bot]": {
                 'away': True,
@@ -106,10 +107,18 @@ class MockBot(MechaClient):
             }
         }
 
-    async def message(self, target: str, message: str):
+    async def message(self, target: str, message: str, priority=None):
         self.sent_messages.append({
             "target": target,
-            "message": message
+            "message": message,
+            "priority": priority
+        })
+
+    async def notice(self, target: str, message: str, priority=None):
+        self.sent_notices.append({
+            "target": target,
+            "message": message,
+            "priority": priority
         })
 
     async def whois(self, name: str) -> dict:
@@ -35,7 +35,7 @@ class FakeConnection(Connection):
     def expect(self, request: Request, respond_with: Response):
         self.expectations.append(Expectation(tx=request, rx=respond_with))
 
-    async def execute(self, work: Request) -> Response:
+    async def execute(self, work: Request, timeout: Optional[float] = None) -> Response:
         assert self.expectations, "Request was not expected here."
         expectation = self.expectations.pop(0)
         work.state = expectation.rx.state
@@ -14,15 +14,13 @@ from loguru import logger
 pytestmark = [mark.regressions, mark.asyncio]
 
 
-async def test_on_command_double_prefix(bot_fx, monkeypatch, context_fx, async_callable_fx):
+async def test_on_command_double_prefix(bot_fx, monkeypatch, context_fx):
     """
     Verifies that when commands are prefixed with the command prefix during registration,
     they remain invokable during runtime.
     """
-    async_callable_fx.return_value = context_fx.user
-
-    # patch the whois lookup as its outside the scope of our test.
-    monkeypatch.setattr(User, "from_pydle", async_callable_fx)
+    # patch the user lookup as its outside the scope of our test.
+    monkeypatch.setattr(User, "lookup", lambda bot, nickname: context_fx.user)
 
     ctx = await Context.from_message(bot_fx, "#unit_test", context_fx.user.nickname,
 
@@ -0,0 +1,99 @@
+import json
+from importlib import resources
+from typing import List
+from uuid import uuid4
+
+import attr
+import cattr
+import pendulum
+import pytest
+
+from src.packages.fuelrats_api.v3.converters import api_converter, to_datetime
+from src.packages.fuelrats_api.v3.models.v1.nickname import Nickname
+from src.packages.fuelrats_api.v3.models.v1.rats import Rat as ApiRat, RAT_TYPE
+from src.packages.fuelrats_api.v3.models.v1.rescue import Rescue as ApiRescue
+from src.packages.fuelrats_api.v3.websocket import codec
+from src.packages.fuelrats_api.v3.websocket.protocol import Request, Response
+from .. import v3_tests
+
+pytestmark = [pytest.mark.unit, pytest.mark.api_v3]
+
+
+def _fixture(name: str):
+    return json.loads(resources.read_text(v3_tests, name))
+
+
+@pytest.fixture
+def json_backend_fx():
+    yield
+    codec.use_backend("json")
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "2020-07-05T23:02:58.000Z",
+        "2020-07-05T23:02:58.123456Z",
+        "2020-07-05T23:02:58Z",
+        "2020-07-05T23:02:58.000+02:00",
+        "2020-07-05",
+    ],
+)
+def test_to_datetime_agrees_with_pendulum(raw: str):
+    parsed = to_datetime(raw)
+
+    assert isinstance(parsed, pendulum.DateTime)
+    assert parsed == pendulum.parse(raw)
+    assert parsed.utcoffset() == pendulum.parse(raw).utcoffset()
+
+
+def test_structure_agrees_with_cattr():
+    rescues = _fixture("raw_rescue_enumerate_response.json")["data"]
+    nicknames = _fixture("raw_nickname_response.json")
+    rats = [obj for obj in nicknames["included"] if obj["type"] == RAT_TYPE]
+
+    assert api_converter.structure(rescues, List[ApiRescue]) == cattr.structure(
+        rescues, List[ApiRescue]
+    )
+    assert api_converter.structure(nicknames["data"], List[Nickname]) == cattr.structure(
+        nicknames["data"], List[Nickname]
+    )
+    assert api_converter.structure(rats, List[ApiRat]) == cattr.structure(rats, List[ApiRat])
+
+
+def test_unstructure_agrees_with_asdict():
+    rescues = cattr.structure(
+        _fixture("raw_rescue_enumerate_response.json")["data"], List[ApiRescue]
+    )
+
+    for rescue in rescues:
+        expected = cattr.unstructure(attr.asdict(rescue, recurse=True))
+        assert api_converter.unstructure(rescue) == expected
+
+
+def test_request_round_trip():
+    state = uuid4()
+    request = Request(
+        endpoint=["rescues", "read"], query={"id": f"{state}"}, body={"when": pendulum.now()}
+    )
+
+    frame = json.loads(request.serialize())
+    assert frame[0] == f"{request.state}"
+    assert frame[3]["when"].endswith("Z")
+
+    response = Response.deserialize(json.dumps([frame[0], 200, {"data": None}]))
+    assert response.state == request.state
+
+
+def test_missing_backend_falls_back_to_json(json_backend_fx, monkeypatch):
+    def not_installed(name):
+        raise ImportError(name)
+
+    monkeypatch.setattr(codec.importlib, "import_module", not_installed)
+
+    assert codec.use_backend("orjson") == "json"
+    assert codec.backend == "json"
+    assert codec.loads(codec.dumps({"pink": "fluffy"})) == {"pink": "fluffy"}
+
+    with pytest.raises(ValueError):
+        codec.use_backend("pickle")
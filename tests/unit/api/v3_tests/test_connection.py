@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import pytest
+from prometheus_client import REGISTRY
+
+from src.packages.fuelrats_api.v3.models.v1.apierror import APIException
+from src.packages.fuelrats_api.v3.websocket.client import Connection, RequestTimeout
+from src.packages.fuelrats_api.v3.websocket.protocol import Request
+
+pytestmark = [pytest.mark.unit, pytest.mark.api_v3, pytest.mark.asyncio]
+
+ERROR = {
+    "errors": [
+        {
+            "id": "a8acc8d6-af38-4256-9911-7455e33012f2",
+            "links": {},
+            "status": "404",
+            "code": 404,
+            "title": "Not Found",
+            "detail": "no such rescue",
+            "source": {},
+        }
+    ]
+}
+
+
+class FakeSocket:
+    """ a websocket whose sent frames are kept, and whose received frames are fed by the test """
+
+    def __init__(self):
+        self.sent = []
+        self.inbox = asyncio.Queue()
+
+    async def send(self, frame: str):
+        self.sent.append(json.loads(frame))
+
+    async def recv(self) -> str:
+        return await self.inbox.get()
+
+    def answer(self, state, status: int = 200, body=None):
+        self.inbox.put_nowait(json.dumps([str(state), status, body or {"data": None}]))
+
+
+@pytest.fixture
+async def socket_fx():
+    return FakeSocket()
+
+
+@pytest.fixture
+async def connection_fx(socket_fx):
+    connection = Connection(
+        socket_fx, timeout=0.5, endpoint_timeouts={"rescues.search": 0.05}, max_in_flight=2
+    )
+    yield connection
+    connection.shutdown.set()
+    for worker in (connection._rx_worker, connection._tx_worker, connection._fail_worker):
+        worker.cancel()
+
+
+async def _answer_when_sent(socket: FakeSocket, count: int = 1, status: int = 200, body=None):
+    while len(socket.sent) < count:
+        await asyncio.sleep(0)
+    socket.answer(socket.sent[count - 1][0], status, body)
+
+
+async def test_execute_forgets_answered_requests(connection_fx, socket_fx):
+    work = Request(endpoint=["rescues", "read"])
+    answer = asyncio.create_task(_answer_when_sent(socket_fx))
+
+    response = await connection_fx.execute(work)
+    await answer
+
+    assert response.state == work.state
+    assert not connection_fx._futures
+    assert REGISTRY.get_sample_value(
+        "api_request_round_trip_seconds_count", {"endpoint": "rescues.read"}
+    )
+
+
+async def test_execute_forgets_failed_requests(connection_fx, socket_fx):
+    answer = asyncio.create_task(_answer_when_sent(socket_fx, status=404, body=ERROR))
+
+    with pytest.raises(APIException):
+        await connection_fx.execute(Request(endpoint=["rescues", "read"]))
+    await answer
+
+    assert not connection_fx._futures
+
+
+async def test_execute_times_out(connection_fx, socket_fx):
+    before = REGISTRY.get_sample_value(
+        "api_request_timeouts_total", {"endpoint": "rescues.search"}
+    ) or 0
+    work = Request(endpoint=["rescues", "search"])
+
+    with pytest.raises(RequestTimeout):
+        await connection_fx.execute(work)
+
+    assert not connection_fx._futures
+    assert REGISTRY.get_sample_value(
+        "api_request_timeouts_total", {"endpoint": "rescues.search"}
+    ) == before + 1
+
+    # the late answer, even an error, doesn't take the connection down
+    socket_fx.answer(work.state, 404, ERROR)
+    for _ in range(5):
+        await asyncio.sleep(0)
+    await connection_fx.check_fail()
+
+
+async def test_timeout_per_request_and_endpoint(connection_fx):
+    assert connection_fx.timeout_for(Request(endpoint=["rescues", "search"])) == 0.05
+    assert connection_fx.timeout_for(Request(endpoint=["rats", "read"])) == 0.5
+
+    with pytest.raises(RequestTimeout):
+        await asyncio.wait_for(
+            connection_fx.execute(Request(endpoint=["rats", "read"]), timeout=0.01), timeout=0.2
+        )
+
+
+async def test_execute_waits_for_a_free_slot(connection_fx, socket_fx):
+    requests = [Request(endpoint=["rats", "read"]) for _ in range(3)]
+    calls = [asyncio.create_task(connection_fx.execute(work)) for work in requests]
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+    # only two may be in flight, the third waits its turn
+    assert len(socket_fx.sent) == 2
+    assert len(connection_fx._futures) == 2
+
+    socket_fx.answer(requests[0].state)
+    await _answer_when_sent(socket_fx, count=3)
+    socket_fx.answer(requests[1].state)
+
+    responses = await asyncio.gather(*calls)
+    assert [response.state for response in responses] == [work.state for work in requests]
+    assert not connection_fx._futures
+
+
+async def test_abandoned_requests_are_not_sent(socket_fx):
+    # a connection that never sends, so requests time out in the queue
+    connection = Connection(socket_fx, spawn_workers=False, max_in_flight=1)
+    work = Request(endpoint=["rats", "read"])
+    idle = asyncio.get_event_loop().create_future()
+    connection._rx_worker = connection._tx_worker = connection._fail_worker = idle
+
+    with pytest.raises(RequestTimeout):
+        await connection.execute(work, timeout=0.01)
+
+    connection._tx_worker = asyncio.create_task(connection.tx_worker())
+    for _ in range(5):
+        await asyncio.sleep(0)
+    connection._tx_worker.cancel()
+    assert not socket_fx.sent
+
+
+async def test_events_are_handed_over(socket_fx):
+    events = []
+
+    async def on_event(event):
+        events.append(event)
+        if len(events) == 1:
+            raise RuntimeError("handler bug")
+
+    connection = Connection(socket_fx, on_event=on_event)
+    try:
+        for _ in range(2):
+            socket_fx.inbox.put_nowait(json.dumps(["connection", 1, {}, {}]))
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+        # the failing handler didn't take the receiving worker down
+        assert [event.event for event in events] == ["connection", "connection"]
+        await connection.check_fail()
+    finally:
+        connection.shutdown.set()
+        for worker in (connection._rx_worker, connection._tx_worker, connection._fail_worker):
+            worker.cancel()
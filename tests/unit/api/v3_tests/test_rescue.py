@@ -1,12 +1,16 @@
 import json
 from importlib import resources
 from typing import Dict
-from uuid import UUID
+from uuid import UUID, uuid4
 
 import pytest
 
-from src.packages.fuelrats_api.v3.models.v1.rescue import Rescue as ApiRescue
+from src.packages.fuelrats_api.v3.models.v1.rescue import Rescue as ApiRescue, encode_delta
+from src.packages.mark_for_deletion import MarkForDeletion
+from src.packages.fuelrats_api.v3.websocket.events import RescueUpdate
+from src.packages.fuelrats_api.v3.websocket.protocol import Response
 from src.packages.rescue import Rescue as InternalRescue
+from src.packages.utils import Platforms, Status
 from .. import v3_tests
 import cattr
 pytestmark = [pytest.mark.unit, pytest.mark.api_v3]
@@ -68,3 +72,99 @@ def test_diff(rescue_sop_fx):
     # check that the attributes are as we expected.
     modified_keys = list(obj['attributes'].keys())
     assert modified_keys == ['client']
+
+
+@pytest.mark.asyncio
+async def test_rescue_events_reach_listeners(api_wss_fx):
+    received = []
+
+    async def listener(rescue):
+        received.append(rescue)
+
+    api_wss_fx.subscribe(listener)
+    resource = RAW_ENUMERATE_RESCUE_RESPONSE["data"][0]
+    event = RescueUpdate(
+        event="fuelrats.rescueupdate",
+        state=uuid4(),
+        obj_id=UUID(resource["id"]),
+        data={"data": resource},
+    )
+
+    await api_wss_fx.on_event(event)
+
+    assert [rescue.api_id for rescue in received] == [UUID(resource["id"])]
+    assert received[0].code_red
+    assert received[0].status is Status.OPEN
+
+
+@pytest.mark.asyncio
+async def test_update_rescue_sends_changes_once(api_wss_fx, monkeypatch):
+    rescue = InternalRescue(uuid4(), client="someone", system="sol", board_index=3)
+    rescue.modified.clear()
+    sent = []
+
+    async def execute(work, **_kwargs):
+        sent.append(set(work.body["data"]["attributes"]))
+        if len(sent) == 1:
+            # changed whilst the first update was on its way
+            rescue.code_red = True
+        return Response(state=work.state, status=200, body={})
+
+    monkeypatch.setattr(api_wss_fx, "execute", execute)
+    rescue.add_quote("ratsignal", "some_rat")
+    await api_wss_fx.update_rescue(rescue, impersonating=None)
+    assert rescue.modified == {"code_red"}
+
+    rescue.system = "fuelum"
+    await api_wss_fx.update_rescue(rescue, impersonating=None)
+
+    assert sent == [{"quotes"}, {"codeRed", "system"}], "the quotes were sent again"
+    assert not rescue.modified
+
+
+@pytest.mark.asyncio
+async def test_update_rescue_failure_keeps_changes(api_wss_fx, monkeypatch):
+    rescue = InternalRescue(uuid4(), client="someone", board_index=3)
+    rescue.modified.clear()
+
+    async def execute(work, **_kwargs):
+        raise TimeoutError
+
+    monkeypatch.setattr(api_wss_fx, "execute", execute)
+    rescue.add_quote("ratsignal", "some_rat")
+    with pytest.raises(TimeoutError):
+        await api_wss_fx.update_rescue(rescue, impersonating=None)
+    assert rescue.modified == {"quotes"}
+
+
+def test_encode_delta_matches_to_delta():
+    rescue = InternalRescue(client="someone", system="sol", platform=Platforms.PS, board_index=3)
+    rescue.add_quote("some message")
+    rescue.marked_for_deletion = MarkForDeletion(marked=True, reporter="some_rat", reason="x")
+    changes = set(rescue.modified) | {"client", "system", "platform", "board_index", "title"}
+    changes |= {"updated_at", "first_limpet", "rats"}
+
+    delta = encode_delta(rescue, changes)
+
+    assert delta == ApiRescue.from_internal(rescue).to_delta(changes)
+    assert delta["id"] == f"{rescue.api_id}"
+    assert delta["attributes"]["platform"] == "ps"
+    assert delta["attributes"]["outcome"] == "purge"
+    assert delta["attributes"]["commandIdentifier"] == 3
+    quote, = delta["attributes"]["quotes"]
+    assert quote["message"] == "some message"
+    assert isinstance(quote["createdAt"], str)
+    # relationships and local fields have no attribute to go in
+    assert set(delta["attributes"]) == {
+        "client", "system", "platform", "commandIdentifier", "title", "quotes", "outcome",
+        "status",
+    }
+    assert json.loads(json.dumps(delta)) == delta
+
+
+def test_encode_delta_only_changes():
+    rescue = InternalRescue(client="someone")
+    for _ in range(5):
+        rescue.add_quote("some message")
+
+    assert encode_delta(rescue, {"system"})["attributes"] == {"system": None}
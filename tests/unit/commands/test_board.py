@@ -1,3 +1,4 @@
+import asyncio
 import typing
 from uuid import uuid4
 
@@ -5,6 +6,7 @@ import hypothesis
 import pytest
 from hypothesis import strategies
 
+from src.commands import case_management
 from src.packages.commands.rat_command import trigger
 from src.packages.context import Context
 from src.packages.rat import Rat
@@ -50,6 +52,51 @@ async def test_assign_unidentified(rescue_sop_fx, bot_fx, names):
         assert name not in rescue_sop_fx.unidentified_rats, "failed to unassign unidentified rats"
 
 
+async def test_assign_identified(rescue_sop_fx, bot_fx, rat_good_fx):
+    rescue_sop_fx.platform = rat_good_fx.platform
+    await bot_fx.board.append(rescue_sop_fx)
+    ctx = await Context.from_message(
+        bot=bot_fx,
+        channel="#unkn0wndev",
+        sender="some_ov",
+        message=f"!assign {rescue_sop_fx.board_index} {rat_good_fx.name} some_unknown_rat",
+    )
+    await trigger(ctx)
+
+    assigned = rescue_sop_fx.rats[rat_good_fx.name.casefold()]
+    assert assigned.uuid == rat_good_fx.uuid, "failed to identify the rat from the cache"
+    assert "some_unknown_rat" in rescue_sop_fx.unidentified_rats
+    warnings = [
+        sent["message"] for sent in bot_fx.sent_messages if "NOT identified" in sent["message"]
+    ]
+    assert warnings == ["Warning: 'some_unknown_rat' is NOT identified."]
+
+
+async def test_assign_gives_up_on_slow_lookups(rescue_sop_fx, bot_fx, rat_good_fx, monkeypatch):
+    rescue_sop_fx.platform = rat_good_fx.platform
+    await bot_fx.board.append(rescue_sop_fx)
+    cached = bot_fx.rat_cache.get_rat_by_name
+
+    async def get_rat_by_name(name, platform=None):
+        if name == "some_slow_rat":
+            # an unreachable API
+            await asyncio.Event().wait()
+        return await cached(name, platform)
+
+    monkeypatch.setattr(bot_fx.rat_cache, "get_rat_by_name", get_rat_by_name)
+    monkeypatch.setattr(case_management, "IDENTIFY_TIMEOUT", 0.01)
+    ctx = await Context.from_message(
+        bot=bot_fx,
+        channel="#unkn0wndev",
+        sender="some_ov",
+        message=f"!assign {rescue_sop_fx.board_index} {rat_good_fx.name} some_slow_rat",
+    )
+    await trigger(ctx)
+
+    assert rescue_sop_fx.rats[rat_good_fx.name.casefold()].uuid == rat_good_fx.uuid
+    assert "some_slow_rat" in rescue_sop_fx.unidentified_rats
+
+
 async def test_clear_no_rat(rescue_sop_fx, bot_fx):
     await bot_fx.board.append(rescue_sop_fx)
     ctx = await Context.from_message(
@@ -168,6 +215,27 @@ async def test_grab_create(bot_fx, random_string_fx):
     assert len(bot_fx.board) == starting_rescue_len, "case was unexpectedly created."
 
 
+async def test_grab_lines_back(bot_fx, rescue_sop_fx):
+    await bot_fx.board.append(rescue_sop_fx)
+    for line in ("my system is col 285", "i am on emergency o2", "thanks!"):
+        bot_fx.message_history.record(rescue_sop_fx.client, line)
+
+    ctx = await Context.from_message(
+        bot_fx, "#ratchat", "some_ov", f"!grab {rescue_sop_fx.client} 2"
+    )
+    await trigger(ctx)
+    assert bot_fx.board[rescue_sop_fx.api_id].quotes[-1].message == "i am on emergency o2"
+
+    # asking for more lines than were kept grabs nothing
+    quotes = len(bot_fx.board[rescue_sop_fx.api_id].quotes)
+    ctx = await Context.from_message(
+        bot_fx, "#ratchat", "some_ov", f"!grab {rescue_sop_fx.client} 9"
+    )
+    await trigger(ctx)
+    assert len(bot_fx.board[rescue_sop_fx.api_id].quotes) == quotes
+    assert "cannot comply" in bot_fx.sent_messages[-1]["message"].casefold()
+
+
 @pytest.mark.parametrize("platform_str", ("pc", "xb", "ps"))
 async def test_platform(bot_fx, rescue_sop_fx, platform_str):
     await bot_fx.board.append(rescue_sop_fx)
@@ -9,9 +9,11 @@ Licensed under the BSD 3-Clause License.
 See LICENSE
 """
 
+import hypothesis
 import pytest
+from hypothesis import strategies
 
-from src.packages.utils import correct_system_name
+from src.packages.utils import correct_system_name, ProceduralEstimator, ProceduralName, Vector
 
 pytestmark = [pytest.mark.unit, pytest.mark.autocorrect]
 
@@ -29,3 +31,76 @@ def test_correct_system_name(system_name, expected_name):
     Test that this function correctly autocorrects system names.
     """
     assert correct_system_name(system_name) == expected_name
+
+
+@pytest.mark.parametrize("system_name, sector, mass_code, boxel, number", [
+    # boxels as encoded in these systems' id64s
+    ("Eorld Pri QI-Z d1-4302", "EORLD PRI", "d", (12, 15, 2), 4302),
+    ("Prae Flyi RO-I b29-113", "PRAE FLYI", "b", (37, 59, 31), 113),
+    ("Chua Eohn CT-F d12-2", "CHUA EOHN", "d", (4, 14, 13), 2),
+    ("COL 285 SECTOR AB-0 85-6", "COL 285 SECTOR", "b", (90, 120, 5), 6),
+    ("Scorpui Sector FB-X a1", "SCORPUI SECTOR", "a", (91, 121, 0), 1),
+])
+def test_parse_procedural_name(system_name, sector, mass_code, boxel, number):
+    """
+    Test that procedural system names are decoded into their sector, mass code and boxel.
+    """
+    parsed = ProceduralName.parse(system_name)
+    assert (parsed.sector, parsed.mass_code, parsed.boxel, parsed.number) == (
+        sector, mass_code, boxel, number
+    )
+
+
+@pytest.mark.parametrize("system_name", ["Fuelum", "Beagle Point", "HIP 12345", "AB-C d1"])
+def test_parse_named_system(system_name):
+    """
+    Test that systems that aren't procedurally named aren't decoded.
+    """
+    assert ProceduralName.parse(system_name) is None
+
+
+@pytest.mark.hypothesis
+@hypothesis.given(
+    sector=strategies.sampled_from(["Eorld Pri", "Col 285 Sector", "Synuefe Thaa"]),
+    mass_code=strategies.sampled_from("abcdefgh"),
+    position=strategies.tuples(*[strategies.floats(0, 1279.96)] * 3),
+    number=strategies.integers(0, 20000),
+)
+def test_estimate_contains_system(sector, mass_code, position, number):
+    """
+    Test that a system estimated from its name is within the error of the estimate.
+    """
+    width = 10 << "abcdefgh".index(mass_code)
+    boxel = tuple(int(value // width) for value in position)
+    name = str(ProceduralName(sector.upper(), mass_code, boxel, number))
+    assert ProceduralName.parse(name).boxel == boxel
+
+    # a sector sitting on the grid, next to Eorld Pri QI-Z d1-4302's
+    origin = Vector(-1345, -1305, 19415 + 1280)
+    estimator = ProceduralEstimator()
+    estimator.learn(name, origin + Vector(*position))
+    estimate = estimator.estimate(name.lower())
+    assert estimate.position.distance(origin + Vector(*position)) <= estimate.error + 1e-9
+
+
+def test_estimate_from_sector_lookup():
+    """
+    Test that sectors are learned from a lookup once, and that unknown ones are remembered.
+    """
+    looked_up = []
+
+    def lookup(sector):
+        looked_up.append(sector)
+        if sector == "EORLD PRI":
+            yield "Eorld Prim AB-C d1", Vector(1, 2, 3)  # some other sector
+            yield "Eorld Pri QI-Z d1-4302", Vector(-320.0, -49.46875, 19636.6875)
+
+    estimator = ProceduralEstimator(lookup)
+    first, second, unknown, named = estimator.estimate_many(
+        ["Eorld Pri QI-Z d1-4302", "EORLD PRI AA-A h0", "Chua Eohn CT-F d12-2", "Fuelum"]
+    )
+    assert first.position.distance(Vector(-320.0, -49.46875, 19636.6875)) <= first.error
+    assert second.position == Vector(-1345 + 640, -1305 + 640, 19415 + 640)
+    assert unknown is None and named is None
+    assert estimator.estimate("Chua Eohn CT-F d12-3") is None
+    assert looked_up == ["EORLD PRI", "CHUA EOHN"]
@@ -0,0 +1,162 @@
+"""
+test_board_snapshot.py - tests for the on-disk board snapshot
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from src.packages.board import RatBoard
+from src.packages.board import board as board_module
+from src.packages.board.journal import JournalEvent, OfflineJournal
+from src.packages.board.snapshot import BoardSnapshot
+from src.packages.rat import Rat
+from src.packages.rescue import Rescue
+from src.packages.utils import Platforms
+
+pytestmark = [pytest.mark.unit, pytest.mark.ratboard]
+
+
+@pytest.fixture
+def snapshot_path_fx(tmp_path) -> str:
+    return str(tmp_path / "board_snapshot.jsonl")
+
+
+@pytest.fixture
+def no_snapshot_delay_fx(monkeypatch):
+    monkeypatch.setattr(board_module, "snapshot_delay", 0.0)
+
+
+def test_snapshot_round_trip(snapshot_path_fx, rescue_plain_fx):
+    BoardSnapshot(snapshot_path_fx).save([rescue_plain_fx])
+
+    loaded = BoardSnapshot(snapshot_path_fx).load()
+    assert [rescue.api_id for rescue in loaded] == [rescue_plain_fx.api_id]
+    assert loaded[0].client == rescue_plain_fx.client
+    assert loaded[0].board_index == rescue_plain_fx.board_index
+
+
+@pytest.mark.asyncio
+async def test_snapshot_keeps_local_fields(snapshot_path_fx, rescue_plain_fx, rat_good_fx):
+    await rescue_plain_fx.add_rat(rat_good_fx)
+    await rescue_plain_fx.add_rat(Rat(None, "some_unidentified_rat", Platforms.PC))
+    rescue_plain_fx.active = False
+    BoardSnapshot(snapshot_path_fx).save([rescue_plain_fx])
+
+    loaded, = BoardSnapshot(snapshot_path_fx).load()
+    assert list(loaded.rats.values()) == [rat_good_fx]
+    assert set(loaded.unidentified_rats) == set(rescue_plain_fx.unidentified_rats)
+    assert loaded.unidentified_rats
+    assert loaded.active is False
+    assert loaded.modified == rescue_plain_fx.modified
+
+
+def test_snapshot_skips_unreadable_rescues(snapshot_path_fx):
+    rescues = [Rescue(uuid4(), client="some_client"), Rescue(uuid4(), client="other_client")]
+    BoardSnapshot(snapshot_path_fx).save(rescues)
+    with open(snapshot_path_fx, "rb") as snapshot:
+        header, first, second = snapshot.read().splitlines(keepends=True)
+    with open(snapshot_path_fx, "wb") as snapshot:
+        snapshot.writelines([header, first[: len(first) // 2] + b"\n", second])
+
+    assert [rescue.client for rescue in BoardSnapshot(snapshot_path_fx).load()] == [
+        "other_client"
+    ]
+
+
+def test_snapshot_of_other_version(snapshot_path_fx, rescue_plain_fx):
+    BoardSnapshot(snapshot_path_fx).save([rescue_plain_fx])
+    with open(snapshot_path_fx, "rb") as snapshot:
+        lines = snapshot.read().splitlines(keepends=True)
+    with open(snapshot_path_fx, "wb") as snapshot:
+        snapshot.writelines([lines[0].replace(b'"version": 2', b'"version": 1'), *lines[1:]])
+
+    assert BoardSnapshot(snapshot_path_fx).load() == []
+
+
+def test_snapshot_unreadable(snapshot_path_fx):
+    with open(snapshot_path_fx, "wb") as snapshot:
+        snapshot.write(b"not a snapshot")
+
+    assert BoardSnapshot(snapshot_path_fx).load() == []
+    assert BoardSnapshot().load() == []
+
+
+@pytest.mark.asyncio
+async def test_board_changes_are_snapshotted(snapshot_path_fx, no_snapshot_delay_fx):
+    board = RatBoard(snapshot=BoardSnapshot(snapshot_path_fx))
+    first = await board.create_rescue(client="some_client")
+    await board.create_rescue(client="other_client")
+    async with board.modify_rescue(first) as rescue:
+        rescue.system = "sol"
+    await asyncio.sleep(0.01)
+
+    loaded = {rescue.client: rescue for rescue in BoardSnapshot(snapshot_path_fx).load()}
+    assert set(loaded) == {"some_client", "other_client"}
+    assert loaded["some_client"].system == "SOL"
+
+    await board.remove_rescue(first)
+    await asyncio.sleep(0.01)
+    assert [rescue.client for rescue in BoardSnapshot(snapshot_path_fx).load()] == [
+        "other_client"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_restore(snapshot_path_fx):
+    BoardSnapshot(snapshot_path_fx).save(
+        [Rescue(uuid4(), client="some_client", board_index=0),
+         Rescue(uuid4(), client="other_client", board_index=1)]
+    )
+    board = RatBoard(snapshot=BoardSnapshot(snapshot_path_fx))
+    taken = await board.create_rescue(client="new_client")
+    assert taken.board_index == 0
+
+    assert await board.restore() == 2
+
+    assert len(board) == 3
+    assert board[0] is taken
+    assert board["other_client"].board_index == 1
+    assert board["some_client"].board_index not in (0, 1)
+
+    board.snapshot.flush()
+    await asyncio.sleep(0)
+    assert len(BoardSnapshot(snapshot_path_fx).load()) == 3
+
+
+@pytest.mark.asyncio
+async def test_reconcile(snapshot_path_fx):
+    open_rescue = Rescue(uuid4(), client="open_client", board_index=0)
+    closed_rescue = Rescue(uuid4(), client="closed_client", board_index=1)
+    offline_rescue = Rescue(uuid4(), client="offline_client", board_index=2)
+    BoardSnapshot(snapshot_path_fx).save([open_rescue, closed_rescue, offline_rescue])
+    journal = OfflineJournal()
+    journal.record(JournalEvent.CREATE, offline_rescue)
+    board = RatBoard(snapshot=BoardSnapshot(snapshot_path_fx), journal=journal)
+    await board.restore()
+
+    changed = Rescue(
+        open_rescue.api_id,
+        client="open_client",
+        system="sol",
+        board_index=0,
+        created_at=open_rescue.created_at,
+        updated_at=open_rescue.updated_at.add(minutes=1),
+    )
+    new = Rescue(uuid4(), client="new_client", board_index=5)
+    await board.reconcile([changed, new])
+
+    assert board["open_client"].system == "SOL"
+    assert "new_client" in board
+    assert "offline_client" in board, "a case not yet sent to the API was dropped"
+    assert "closed_client" not in board
+
+    board.snapshot.flush()
+    await asyncio.sleep(0)
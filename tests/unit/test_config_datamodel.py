@@ -0,0 +1,30 @@
+"""
+test_config_datamodel.py - tests for the configuration datamodels
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import attr
+import pytest
+
+from src.config.datamodel.api import FuelratsApiConfigRoot
+from src.config.datamodel.board import BoardConfigRoot
+
+pytestmark = [pytest.mark.unit]
+
+
+@pytest.mark.parametrize("delay", (0, 1, 0.5))
+def test_whole_numbers_are_numbers(delay):
+    config = BoardConfigRoot(cycle_at=15, update_delay=delay, snapshot_delay=delay)
+    assert config.update_delay == delay
+    assert attr.evolve(FuelratsApiConfigRoot(), endpoint_timeouts={"rescues:read": delay})
+
+
+@pytest.mark.parametrize("delay, error", ((-1, ValueError), ("1", TypeError), (True, TypeError)))
+def test_numbers_are_validated(delay, error):
+    with pytest.raises(error):
+        BoardConfigRoot(cycle_at=15, update_delay=delay)
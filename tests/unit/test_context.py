@@ -13,6 +13,7 @@ See LICENSE.md
 import pytest
 
 from src.packages.context.context import Context, _split_message
+from src.packages.outbound import Priority
 import hypothesis
 from hypothesis import strategies
 import itertools
@@ -59,6 +60,19 @@ async def test_reply(context_fx: Context):
     await context_fx.reply(payload)
 
     assert payload == context_fx.bot.sent_messages[0]['message']
+    assert context_fx.bot.sent_messages[0]['priority'] is Priority.NORMAL
+
+
+@pytest.mark.asyncio
+async def test_reply_notice(context_fx: Context):
+    """
+    Verifies `context.reply_notice` notices the invoking user
+    """
+    await context_fx.reply_notice("psst", priority=Priority.LOW)
+
+    assert context_fx.bot.sent_notices == [
+        {"target": context_fx.user.nickname, "message": "psst", "priority": Priority.LOW}
+    ]
 
 
 @pytest.mark.parametrize("channel, user, message, words, words_eol, prefixed",
@@ -127,3 +141,43 @@ def test_split_hypothesis(data: str):
         assert not any(char.isspace() for char in word)
 
     assert len(words_out) == data.count(" ") + 1, "failed to tokenize words as expected"
+
+
+@pytest.mark.hypothesis
+@hypothesis.given(
+    data=valid_text()
+)
+def test_words_eol_matches_joined_slices(data: str):
+    """ words_eol built lazily agrees with joining the words one slice at a time """
+    words, words_eol = _split_message(data)
+    expected = [" ".join(words[index:]) for index in range(len(words))]
+
+    assert words_eol == expected
+    assert len(words_eol) == len(expected)
+    assert words_eol[1:] == expected[1:]
+    if words:
+        assert words_eol[-1] == expected[-1]
+
+
+def test_words_eol_out_of_range():
+    _, words_eol = _split_message("")
+
+    with pytest.raises(IndexError):
+        words_eol[0]
+
+
+@pytest.mark.asyncio
+async def test_from_message_user_resolved_on_use(bot_fx, monkeypatch):
+    """ messages nothing acts on never look up their sender """
+    ctx = await Context.from_message(bot_fx, "#unit_test", "unknown_lurker", "just chatting")
+
+    # an unknown sender only matters once something asks who sent it
+    assert ctx.words == ["just", "chatting"]
+    with pytest.raises(LookupError):
+        ctx.user
+
+    ctx = await Context.from_message(bot_fx, "#unit_test", "some_rat", "hi")
+    first = ctx.user
+    monkeypatch.setattr(bot_fx, "users", {})
+    assert ctx.user is first
+    assert first.hostname == "rat.fuelrats.com"
@@ -11,10 +11,16 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE
 """
+import asyncio
+import threading
+
 import psycopg2
 import pytest
 from psycopg2 import extensions, sql
 
+from src.packages.database import DatabaseManager
+from src.packages.database.database_manager import QUERIES_IN_FLIGHT
+
 pytestmark = [pytest.mark.unit, pytest.mark.database_manager]
 
 
@@ -135,3 +141,80 @@ async def test_db_query_direct(test_dbm_fx):
 def test_validate_config_invalid(data, test_dbm_fx):
     with pytest.raises(ValueError):
         test_dbm_fx.validate_config(data={'database': data})
+
+
+class _FakeCursor:
+    def __init__(self, connection):
+        self._connection = connection
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, values):
+        self._connection.threads.add(threading.get_ident())
+        # hold the connection long enough for queries to overlap
+        self._connection.release.wait(timeout=5)
+        self.description = ("?",)
+
+    def fetchall(self):
+        return [("ok",)]
+
+
+class _FakeConnection:
+    def __init__(self, threads, release):
+        self.threads = threads
+        self.release = release
+        self.autocommit = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def set_client_encoding(self, encoding):
+        pass
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+
+class _FakePool:
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.threads = set()
+        self.release = threading.Event()
+        self.checked_out = 0
+
+    def getconn(self):
+        self.checked_out += 1
+        return _FakeConnection(self.threads, self.release)
+
+    def putconn(self, connection, close=False):
+        self.checked_out -= 1
+
+
+@pytest.mark.asyncio
+async def test_query_does_not_block_event_loop(monkeypatch):
+    """
+    Verify queries execute on the executor, leaving the event loop free while they are in flight.
+    """
+    monkeypatch.setattr(psycopg2.pool, "ThreadedConnectionPool", _FakePool)
+    manager = DatabaseManager(dbhost="localhost", dbport=5432, dbname="fake", dbuser="fake",
+                              dbpassword="fake")
+
+    queries = [
+        asyncio.create_task(manager.query(sql.SQL("SELECT 1"), ())) for _ in range(3)
+    ]
+    # the event loop keeps ticking while the queries are blocked in the driver
+    await asyncio.sleep(0.05)
+    assert QUERIES_IN_FLIGHT._value.get() == 3
+    assert threading.get_ident() not in manager._dbpool.threads
+
+    manager._dbpool.release.set()
+    assert await asyncio.gather(*queries) == [[("ok",)]] * 3
+    assert manager._dbpool.checked_out == 0
+    assert QUERIES_IN_FLIGHT._value.get() == 0
@@ -11,7 +11,10 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE.md
 """
+import gc
+
 import pendulum
+import prometheus_client
 import psycopg2
 import pytest
 from psycopg2 import sql
@@ -346,6 +349,8 @@ async def test_find_exception_handling(test_fm_fx, monkeypatch):
         raise psycopg2.ProgrammingError("Raised by Pytest - Fire in the hole!")
 
     monkeypatch.setattr(test_fm_fx, "query", boomstick)
+    # make sure the lookup actually reaches the database
+    test_fm_fx.clear_cache()
 
     with pytest.raises(psycopg2.ProgrammingError):
         result = await test_fm_fx.find('test', 'en')
@@ -394,3 +399,92 @@ async def test_mfdlist_handling(test_fm_fx, monkeypatch):
 
     with pytest.raises(psycopg2.ProgrammingError):
         result = await test_fm_fx.mfd_list()
+
+
+class _FakeFactTable:
+    """ stands in for DatabaseManager.query, serving a tiny in-memory fact table """
+
+    def __init__(self):
+        self.rows = {
+            ('stats', 'en'): ('stats', 'en', 'Fuel Rats Statistics', None, 'Shatt', None,
+                              'Shatt', False),
+        }
+        self.queries = []
+
+    async def __call__(self, query, values):
+        self.queries.append(query.string)
+        if query.string.startswith("SELECT") and not values:
+            return list(self.rows.values())
+        if query.string.startswith("SELECT"):
+            return [self.rows[values]] if values in self.rows else []
+        if query.string.startswith("INSERT"):
+            self.rows[values[:2]] = values
+        return []
+
+
+@pytest.fixture
+def cached_fm_fx(monkeypatch) -> FactManager:
+    """ A FactManager whose queries never leave the process """
+    monkeypatch.setattr(psycopg2.pool, "ThreadedConnectionPool", lambda *args, **kwargs: None)
+    manager = FactManager(fact_table="fact", fact_log="fact_log")
+    monkeypatch.setattr(manager, "query", _FakeFactTable())
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_fact_cache_serves_repeat_lookups(cached_fm_fx):
+    """
+    Verify the cache is preloaded once, and repeated lookups (hits and misses) stay in process.
+    """
+    assert await cached_fm_fx.exists('stats', 'en')
+    assert (await cached_fm_fx.find('stats', 'en')).message == 'Fuel Rats Statistics'
+    assert not await cached_fm_fx.exists('nope', 'en')
+    query_count = len(cached_fm_fx.query.queries)
+
+    for _ in range(5):
+        assert await cached_fm_fx.find('stats', 'en')
+        assert await cached_fm_fx.find('nope', 'en') is None
+
+    assert len(cached_fm_fx.query.queries) == query_count
+
+
+@pytest.mark.asyncio
+async def test_fact_cache_invalidated_by_add(cached_fm_fx):
+    """
+    Verify a remembered miss is forgotten once the fact is added.
+    """
+    assert not await cached_fm_fx.exists('test', 'en')
+
+    await cached_fm_fx.add(Fact(name='test', lang='en', message='This is a test fact.',
+                                editedby='Shatt', author='Shatt', mfd=False, edited=None,
+                                aliases=[]))
+
+    assert (await cached_fm_fx.find('test', 'en')).message == 'This is a test fact.'
+
+
+@pytest.mark.asyncio
+async def test_fact_cache_returns_copies(cached_fm_fx):
+    """
+    Verify mutating a found fact does not leak into the cache.
+    """
+    fact = await cached_fm_fx.find('stats', 'en')
+    fact.message = "scribbled on"
+
+    assert (await cached_fm_fx.find('stats', 'en')).message == 'Fuel Rats Statistics'
+
+
+@pytest.mark.asyncio
+async def test_fact_cache_size_counts_every_manager(cached_fm_fx, monkeypatch):
+    """
+    Verify a manager made later doesn't take the cache size over from the ones before it.
+    """
+    await cached_fm_fx.preload()
+    gc.collect()  # managers of earlier tests, that could otherwise be collected midway
+    size = prometheus_client.REGISTRY.get_sample_value("fact_manager_cache_size")
+    other = FactManager(fact_table="fact", fact_log="fact_log")
+    monkeypatch.setattr(other, "query", _FakeFactTable())
+
+    assert prometheus_client.REGISTRY.get_sample_value("fact_manager_cache_size") == size
+    await other.preload()
+    assert prometheus_client.REGISTRY.get_sample_value("fact_manager_cache_size") == \
+        size + len(other.query.rows)
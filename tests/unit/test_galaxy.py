@@ -10,9 +10,26 @@ See LICENSE
 """
 
 import asyncio
+import json
+import os
+from math import sqrt
+
+import hypothesis
 import pytest
+from hypothesis import strategies
 
 import aiohttp
+import prometheus_client
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.packages.galaxy import Galaxy
+from src.packages.galaxy import StarSystem
+from src.packages.galaxy import cache as galaxy_cache
+from src.packages.galaxy import galaxy as galaxy_module
+from src.packages.galaxy.landmarks import LandmarkIndex
+from src.packages.galaxy.snapshot import GalaxySnapshot, write_snapshot
+from src.packages.utils import Vector
 
 pytestmark = [pytest.mark.unit, pytest.mark.galaxy]
 
@@ -132,3 +149,353 @@ async def test_star_system_distance(galaxy_fx):
     distance_two = second.distance(first)
     assert distance_one == distance_two
     assert distance_one == 14.56
+
+
+@pytest.fixture
+async def stub_system_api_fx():
+    """
+    A local aiohttp Systems API stub, remembering which client connection served each request.
+    """
+    peers = []
+
+    async def search(request: web.Request):
+        peers.append(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(float(request.query.get("delay", 0)))
+        return web.json_response({"data": [{"name": request.query["name"]}]})
+
+    app = web.Application()
+    app.router.add_get("/mecha", search)
+    async with TestServer(app) as server:
+        server.peers = peers
+        yield server
+
+
+@pytest.mark.asyncio
+async def test_connection_reused(stub_system_api_fx):
+    """
+    Test that consecutive lookups share a single kept-alive connection.
+    """
+    galaxy = Galaxy(str(stub_system_api_fx.make_url("/")))
+    def reused():
+        return prometheus_client.REGISTRY.get_sample_value("galaxy_connections_reused_total")
+
+    before = reused()
+
+    for name in ("FUELUM", "SOL", "ANGRBONII"):
+        assert await galaxy.search_systems_by_name(name) == [name]
+
+    assert len(set(stub_system_api_fx.peers)) == 1
+    assert reused() - before == 2
+    await galaxy.close()
+
+
+@pytest.mark.asyncio
+async def test_close_and_reopen(stub_system_api_fx):
+    """
+    Test that closing a Galaxy closes its session, and that it is reopened on demand.
+    """
+    galaxy = Galaxy(str(stub_system_api_fx.make_url("/")))
+    await galaxy.search_systems_by_name("Fuelum")
+    session = galaxy._session
+
+    await galaxy.close()
+    assert session.closed
+
+    assert await galaxy.search_systems_by_name("Sol") == ["SOL"]
+    assert not galaxy._session.closed
+    await galaxy.close()
+
+
+@pytest.mark.asyncio
+async def test_rehash_retires_session(stub_system_api_fx, configuration_fx):
+    """
+    Test that a rehash lets in-flight requests finish before closing their session.
+    """
+    galaxy = Galaxy(str(stub_system_api_fx.make_url("/")))
+    request = asyncio.ensure_future(galaxy._call("mecha", {"name": "SOL", "delay": "0.05"}))
+    await asyncio.sleep(0.01)
+    session = galaxy._session
+
+    Galaxy.rehash_handler(configuration_fx)
+    assert not session.closed
+
+    assert (await request)["data"] == [{"name": "SOL"}]
+    assert session.closed
+    await galaxy.search_systems_by_name("Fuelum")
+    assert galaxy._session is not session
+    await galaxy.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_coalesced(stub_system_api_fx):
+    """
+    Test that identical lookups in flight at the same time share one request, and that later
+    ones are answered from cache.
+    """
+    galaxy = Galaxy(str(stub_system_api_fx.make_url("/")))
+
+    results = await asyncio.gather(*(galaxy.search_systems_by_name("Sol") for _ in range(5)))
+    assert results == [["SOL"]] * 5
+    assert await galaxy.search_systems_by_name("sol") == ["SOL"]
+    assert len(stub_system_api_fx.peers) == 1
+    await galaxy.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_expiry(monkeypatch, async_callable_fx):
+    """
+    Test that results expire after their TTL, and misses after the shorter negative TTL.
+    """
+    now = [0.0]
+    monkeypatch.setattr(galaxy_cache.time, "monotonic", lambda: now[0])
+    cache = galaxy_cache.LookupCache("test", maxsize=10, ttl=60, negative_ttl=5)
+
+    async def fetch_none():
+        await async_callable_fx()
+
+    async def fetch_sol():
+        await async_callable_fx()
+        return "SOL"
+
+    await cache.get("missing", fetch_none)
+    await cache.get("sol", fetch_sol)
+    now[0] = 10
+    await cache.get("missing", fetch_none)
+    await cache.get("sol", fetch_sol)
+    assert len(async_callable_fx.calls) == 3
+
+    now[0] = 61
+    await cache.get("sol", fetch_sol)
+    assert len(async_callable_fx.calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_cache_bounded():
+    """
+    Test that the least recently used result is evicted, also when shrunk by a rehash.
+    """
+    cache = galaxy_cache.LookupCache("test", maxsize=2, ttl=60, negative_ttl=5)
+
+    async def fetch(value):
+        return value
+
+    for key in ("a", "b", "a", "c"):
+        await cache.get(key, lambda: fetch(key))
+    assert list(cache._entries) == ["a", "c"]
+
+    cache.configure(maxsize=1, ttl=60, negative_ttl=5)
+    assert list(cache._entries) == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_cache_size_counts_every_cache():
+    """
+    Test that a cache made later doesn't take the lookup's size over from the ones before it.
+    """
+    first = galaxy_cache.LookupCache("sized", maxsize=10, ttl=60, negative_ttl=5)
+    second = galaxy_cache.LookupCache("sized", maxsize=10, ttl=60, negative_ttl=5)
+
+    async def fetch(value):
+        return value
+
+    await first.get("a", lambda: fetch("a"))
+    await first.get("b", lambda: fetch("b"))
+    await second.get("a", lambda: fetch("a"))
+    size = prometheus_client.REGISTRY.get_sample_value("galaxy_cache_size", {"lookup": "sized"})
+    assert size == 3
+
+
+@pytest.mark.asyncio
+async def test_cache_ignores_failures():
+    """
+    Test that a failed lookup is raised to everyone waiting on it, and not cached.
+    """
+    cache = galaxy_cache.LookupCache("test", maxsize=2, ttl=60, negative_ttl=5)
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise aiohttp.ClientError
+
+    results = await asyncio.gather(cache.get("a", fail), cache.get("a", fail),
+                                   return_exceptions=True)
+    assert all(isinstance(result, aiohttp.ClientError) for result in results)
+    assert len(cache) == 0
+
+
+LANDMARKS = [
+    StarSystem("Sol", Vector(0, 0, 0)),
+    StarSystem("Fuelum", Vector(52.0, -52.65625, 49.8125)),
+    StarSystem("Beagle Point", Vector(-1111.5625, -134.21875, 65269.75)),
+]
+
+
+@pytest.mark.asyncio
+async def test_local_nearest_landmark():
+    """
+    Test that landmarks near systems with known positions are found without asking the API.
+    """
+    galaxy = Galaxy("http://127.0.0.1:1/")  # nothing listens here
+    galaxy.load_landmarks(LANDMARKS)
+
+    angrbonii = StarSystem("Angrbonii", Vector(61.65625, -42.4375, 53.59375))
+    assert await galaxy.find_nearest_landmark(angrbonii) == (LANDMARKS[1], 14.56)
+    assert await galaxy.find_nearest_landmark(StarSystem("Sol")) == (LANDMARKS[0], 0)
+    assert galaxy.find_landmarks_within(angrbonii, 100) == [(LANDMARKS[1], 14.56),
+                                                            (LANDMARKS[0], 92.06)]
+
+
+@pytest.mark.asyncio
+async def test_local_landmark_falls_back(mock_system_api_server_fx):
+    """
+    Test that a system without a known position is looked up on the API, even with landmarks.
+    """
+    galaxy = Galaxy(mock_system_api_server_fx.url_for("/"))
+    galaxy.load_landmarks(LANDMARKS[2:])
+
+    system = await galaxy.find_system_by_name("Angrbonii")
+    assert await galaxy.find_nearest_landmark(system) == (StarSystem("Fuelum"), 14.56)
+    assert galaxy.find_landmarks_within(system, 100) is None
+
+    # once its details are known, the local index is used.
+    await galaxy.find_system_by_name("Angrbonii", full_details=True)
+    assert (await galaxy.find_nearest_landmark(system))[0] == LANDMARKS[2]
+    await galaxy.close()
+
+
+def test_landmarks_file_refresh(tmp_path, monkeypatch):
+    """
+    Test that the landmarks file is loaded on first use, and reloaded when it has changed.
+    """
+    now = [0.0]
+    monkeypatch.setattr(galaxy_module.time, "monotonic", lambda: now[0])
+    path = tmp_path / "landmarks.json"
+    path.write_text('[{"name": "Sol", "coords": {"x": 0, "y": 0, "z": 0}}]')
+    galaxy = Galaxy("http://127.0.0.1:1/")
+    galaxy.LANDMARKS_FILE, galaxy.LANDMARKS_REFRESH = str(path), 60
+
+    assert len(galaxy._landmarks()) == 1
+
+    path.write_text(json.dumps([{"name": system.name, "coords": vars(system.position)}
+                                for system in LANDMARKS]))
+    os.utime(path, (1, 1))
+    assert len(galaxy._landmarks()) == 1
+    now[0] = 61
+    assert len(galaxy._landmarks()) == 3
+
+
+@pytest.mark.hypothesis
+@hypothesis.given(
+    points=strategies.lists(
+        strategies.tuples(*[strategies.integers(-70000, 70000)] * 3), min_size=1, max_size=50
+    ),
+    target=strategies.tuples(*[strategies.integers(-70000, 70000)] * 3),
+    radius=strategies.integers(0, 100000),
+)
+def test_landmark_index_matches_linear_scan(points, target, radius):
+    """
+    Test that the landmark index agrees with comparing every landmark.
+    """
+    landmarks = [StarSystem(f"L{number}", Vector(*point)) for number, point in enumerate(points)]
+    index = LandmarkIndex(landmarks)
+    position = Vector(*target)
+    distances = sorted(round(landmark.position.distance(position), 2) for landmark in landmarks)
+
+    assert index.nearest(position)[1] == distances[0]
+    inside = sorted(
+        round(sqrt(squared), 2)
+        for squared in (sum((a - b) ** 2 for a, b in zip(point, target)) for point in points)
+        if squared <= radius ** 2
+    )
+    assert [distance for _, distance in index.within(position, radius)] == inside
+
+
+SNAPSHOT_SYSTEMS = [
+    (5031721931482, "Fuelum", 52.0, -52.65625, 49.8125),
+    (10477373803, "Sol", 0.0, 0.0, 0.0),
+    (3932277478106, "Angrbonii", 61.65625, -42.4375, 53.59375),
+    (147826004709651, "Eorld Pri QI-Z d1-4302", -320.0, -49.46875, 19636.6875),
+    (1, "SOL", 1.0, 1.0, 1.0),  # duplicate name, dropped
+]
+
+
+@pytest.fixture
+def snapshot_path_fx(tmp_path) -> str:
+    path = str(tmp_path / "galaxy.snapshot")
+    assert write_snapshot(SNAPSHOT_SYSTEMS, path) == 4
+    return path
+
+
+def test_snapshot_lookups(snapshot_path_fx):
+    """
+    Test exact and fuzzy lookups against a galaxy snapshot.
+    """
+    snapshot = GalaxySnapshot(snapshot_path_fx)
+    try:
+        assert len(snapshot) == 4
+        assert snapshot.find("fuelum") == StarSystem("Fuelum", Vector(52.0, -52.65625, 49.8125))
+        assert snapshot.find("Sol").position == Vector.zero()
+        assert snapshot.find("Fuel") is None
+        assert snapshot.search("eorld pri qi-z d1-430") == ["Eorld Pri QI-Z d1-4302"]
+        assert snapshot.search("angrboni")[0] == "Angrbonii"
+        assert snapshot.search("xyzzy") == []
+    finally:
+        snapshot.close()
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    """
+    Test that opening something that isn't a snapshot fails cleanly.
+    """
+    path = tmp_path / "not.snapshot"
+    path.write_bytes(b"certainly not a galaxy snapshot, but long enough to have a header.")
+    with pytest.raises(ValueError):
+        GalaxySnapshot(str(path))
+
+
+@pytest.mark.asyncio
+async def test_snapshot_consulted_first(snapshot_path_fx, mock_system_api_server_fx):
+    """
+    Test that Galaxy answers from its snapshot where it can, and asks the API otherwise.
+    """
+    galaxy = Galaxy(mock_system_api_server_fx.url_for("/"))
+    galaxy.SNAPSHOT_FILE = snapshot_path_fx
+    galaxy.clear_cache()
+
+    assert (await galaxy.find_system_by_name("FUELUM")).position.x == 52.0
+    assert await galaxy.search_systems_by_name("fuelum") == ["Fuelum"]
+    # spectral classes only come from the API
+    assert (await galaxy.find_system_by_name("Angrbonii", True)).spectral_class == "L"
+    # as do systems the snapshot doesn't know
+    assert (await galaxy.find_system_by_name("Beagle Point")).name == "Beagle Point"
+    await galaxy.close()
+
+
+@pytest.mark.asyncio
+async def test_estimate_positions(snapshot_path_fx, mock_system_api_server_fx):
+    """
+    Test that procedural systems are placed from their names, in sectors Galaxy knows of.
+    """
+    galaxy = Galaxy(mock_system_api_server_fx.url_for("/"))
+    galaxy.SNAPSHOT_FILE = snapshot_path_fx
+    galaxy.load_landmarks(LANDMARKS)
+
+    # Eorld Pri is known from the snapshot
+    estimate = galaxy.estimate_position("Eorld Pri QI-Z d1-4302")
+    assert estimate.position.distance(Vector(-320.0, -49.46875, 19636.6875)) <= estimate.error
+    assert galaxy.estimate_position("Fuelum") is None
+    assert galaxy.estimate_nearest_landmark(StarSystem("Chua Eohn CT-F d12-3")) is None
+
+    # Chua Eohn once one of its systems was looked up in full
+    await galaxy.find_system_by_name("Chua Eohn CT-F d12-2", full_details=True)
+    landmark, distance, error = galaxy.estimate_nearest_landmark(
+        StarSystem("Chua Eohn CT-F d12-3")
+    )
+    actual = Vector(-995.5, -162.59375, 58857.0).distance(LANDMARKS[2].position)
+    assert landmark == LANDMARKS[2] and abs(distance - actual) <= error
+
+    # systems with known positions need no estimate
+    assert galaxy.estimate_nearest_landmark(LANDMARKS[1]) == (LANDMARKS[1], 0, 0)
+    assert [estimate is not None for estimate in galaxy.estimate_positions(
+        ["Eorld Pri AA-A h0", "Synuefe AA-A h0", "Chua Eohn AA-A h0"]
+    )] == [True, False, True]
+    await galaxy.close()
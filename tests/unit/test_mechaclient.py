@@ -8,14 +8,20 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE
 """
+import asyncio
+import contextlib
+
 import pytest
 
+from src import mechaclient
 from src.packages.board import RatBoard
 from src.packages.cache.rat_cache import RatCache
 from src.packages.commands import command
 from src.packages.context.context import Context
 from src.packages.fact_manager import FactManager
+from src.packages.fuelrats_api.v3 import interface
 from src.packages.galaxy import Galaxy
+from src.packages.rescue import Rescue
 
 pytestmark = [pytest.mark.unit, pytest.mark.mechaclient]
 
@@ -211,3 +217,53 @@ async def test_mechaclient_on_message_exception(bot_fx):
 
     assert result is None
     assert bot_fx.sent_messages
+
+
+@pytest.mark.asyncio
+async def test_hydrate_board_retries(bot_fx, monkeypatch):
+    """
+    Asserts the board is reconciled once the API answers, however often fetching fails first.
+    """
+    monkeypatch.setattr(mechaclient, "HYDRATE_RETRY_DELAY", 0)
+    rescue = Rescue(client="some_client")
+
+    class FlakyAPIHandler:
+        failures = 2
+
+        async def get_rescues(self, impersonate):
+            if self.failures:
+                self.failures -= 1
+                raise asyncio.TimeoutError
+            return [rescue]
+
+    bot_fx._api_handler = FlakyAPIHandler()
+    await bot_fx.hydrate_board()
+
+    assert bot_fx.board["some_client"] is rescue
+
+
+@pytest.mark.asyncio
+async def test_connection_listeners_called_on_connect(api_wss_fx, monkeypatch):
+    """
+    Asserts the API handler tells its connection listeners every time it (re)connects.
+    """
+    connected = asyncio.Event()
+
+    async def listener():
+        connected.set()
+
+    @contextlib.asynccontextmanager
+    async def connect(**_kwargs):
+        yield None
+
+    class ClosedConnection:
+        def __init__(self, **_kwargs):
+            self.shutdown = asyncio.Event()
+            self.shutdown.set()
+
+    monkeypatch.setattr(interface.websockets, "connect", connect)
+    monkeypatch.setattr(interface, "Connection", ClosedConnection)
+    api_wss_fx.subscribe_connections(listener)
+
+    await api_wss_fx.run_task()
+    await asyncio.wait_for(connected.wait(), timeout=1)
@@ -0,0 +1,129 @@
+"""
+test_message_history.py - tests for the bounded message history
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import gc
+import sys
+
+import prometheus_client
+import pytest
+
+from src.features import message_history
+from src.features.message_history import MessageHistory
+
+pytestmark = [pytest.mark.unit, pytest.mark.message_history]
+
+
+@pytest.fixture
+def clock_fx(monkeypatch):
+    """ a monotonic clock the test moves along by hand """
+    now = [1000.0]
+    monkeypatch.setattr(message_history.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _assert_accounted(history: MessageHistory):
+    kept = [line for nick in list(history._users) for line in history._users[nick]]
+    assert history.line_count == len(kept)
+    assert history.nbytes == sum(sys.getsizeof(message) for *_, message in kept)
+
+
+def test_least_recently_active_forgotten_first():
+    history = MessageHistory(max_users=2)
+    history.record("first", "one")
+    history.record("second", "two")
+    history.record("first", "three")
+    history.record("third", "four")
+
+    assert "second" not in history
+    assert sorted(history) == ["first", "third"]
+    _assert_accounted(history)
+
+
+def test_lines_per_user():
+    history = MessageHistory(lines_per_user=3)
+    for number in range(5):
+        history.record("some_rat", f"line {number}")
+
+    assert history.lines("some_rat") == ["line 2", "line 3", "line 4"]
+    assert history.line("some_rat", back=3) == "line 2"
+    assert history.line("some_rat", back=4) is None
+    _assert_accounted(history)
+
+    history.configure(max_users=10, lines_per_user=1, ttl=60.0, memory_budget=2 ** 20)
+    assert history.lines("some_rat") == ["line 4"]
+    _assert_accounted(history)
+
+
+def test_memory_budget():
+    line = "x" * 1000
+    history = MessageHistory(memory_budget=sys.getsizeof(line) * 4)
+    for number in range(10):
+        history.record(f"nick_{number}", line)
+
+    assert len(history) == 4
+    assert history.nbytes <= history.memory_budget
+    assert "nick_9" in history and "nick_5" not in history
+    _assert_accounted(history)
+
+
+def test_ttl(clock_fx):
+    history = MessageHistory(ttl=60.0)
+    history.record("old_rat", "o7")
+    clock_fx[0] += 30
+    history.record("some_rat", "first")
+    history.record("some_rat", "second")
+    clock_fx[0] += 40
+
+    # old_rat's line expired, and so did they
+    assert "old_rat" not in history
+    assert len(history) == 1
+    assert history.lines("some_rat") == ["first", "second"]
+    _assert_accounted(history)
+
+    clock_fx[0] += 30
+    assert history.get("some_rat") is None
+    assert not list(history)
+    _assert_accounted(history)
+
+
+def test_last_in_channel():
+    history = MessageHistory()
+    history.record("Some_Rat", "in fuelrats", channel="#FuelRats")
+    history.record("some_rat", "in ratchat", channel="#ratchat")
+
+    assert history.last_in("#fuelrats", "SOME_RAT") == "in fuelrats"
+    assert history.last_in("#RatChat", "some_rat") == "in ratchat"
+    assert history.last_in("#unknown", "some_rat") is None
+    assert history["some_rat"] == "in ratchat"
+
+    del history["SOME_RAT"]
+    assert "some_rat" not in history
+    _assert_accounted(history)
+
+
+@pytest.mark.asyncio
+async def test_on_message_recorded_once(bot_fx, configuration_fx):
+    gc.collect()  # clients of earlier tests, that could otherwise be collected midway
+    lines = prometheus_client.REGISTRY.get_sample_value("message_history_lines")
+    size = prometheus_client.REGISTRY.get_sample_value("message_history_size_bytes")
+    await bot_fx.on_message("#ratchat", "some_rat", "\x02hello\x02 there")
+
+    assert bot_fx.last_user_message["some_rat"] == "hello there"
+    assert bot_fx.get_last_message("#ratchat", "some_rat") == "hello there"
+    assert bot_fx.message_history.line_count == 1
+    assert prometheus_client.REGISTRY.get_sample_value("message_history_lines") == lines + 1
+    assert prometheus_client.REGISTRY.get_sample_value(
+        "message_history_size_bytes"
+    ) == size + bot_fx.message_history.nbytes
+
+    # a client made later counts towards the metrics, rather than taking them over
+    other = type(bot_fx)(nickname="other_bot", mecha_config=configuration_fx)
+    await other.on_message("#ratchat", "some_rat", "o7")
+    assert prometheus_client.REGISTRY.get_sample_value("message_history_lines") == lines + 2
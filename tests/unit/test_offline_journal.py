@@ -0,0 +1,160 @@
+"""
+test_offline_journal.py - tests for the offline rescue journal
+
+Copyright (c) 2020 The Fuel Rats Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import pytest
+
+from src.packages.board import RatBoard
+from src.packages.board.journal import OfflineJournal, JournalEvent
+from src.packages.rescue import Rescue
+from src.packages.utils import Status
+
+pytestmark = [pytest.mark.unit, pytest.mark.ratboard]
+
+
+class _RecordingApi:
+    """ stands in for the API, remembering what it was sent """
+
+    def __init__(self, fail_for=(), known=()):
+        self.calls = []
+        self.fail_for = set(fail_for)
+        self.known = set(known)
+
+    async def create_rescue(self, rescue, impersonating=None):
+        self._call("create", rescue, impersonating)
+        self.known.add(rescue.api_id)
+        return rescue
+
+    async def update_rescue(self, rescue, impersonating=None):
+        self._call("update", rescue, impersonating)
+
+    async def get_rescue(self, key, impersonation=None):
+        return key in self.known or None
+
+    def _call(self, kind, rescue, impersonating):
+        if rescue.api_id in self.fail_for:
+            raise RuntimeError("the API is on fire")
+        self.calls.append((kind, rescue.api_id, rescue.system, rescue.status, impersonating))
+
+
+@pytest.mark.asyncio
+async def test_offline_changes_replayed_on_online():
+    """ Verifies changes made offline reach the API, coalesced, once the board goes online """
+    api = _RecordingApi()
+    board = RatBoard(api_handler=api)
+
+    rescue = await board.create_rescue(client="some_client")
+    async with board.modify_rescue(rescue) as case:
+        case.system = "sol"
+    async with board.modify_rescue(rescue) as case:
+        case.status = Status.CLOSED
+    await board.remove_rescue(rescue)
+    assert len(board.journal) == 4
+
+    await board.on_online()
+
+    assert api.calls == [("create", rescue.api_id, "SOL", Status.CLOSED, None)]
+    assert len(board.journal) == 0
+
+
+@pytest.mark.asyncio
+async def test_replay_keeps_order_and_users_apart(rescue_plain_fx):
+    """ Verifies changes by different users are replayed separately, in the order made """
+    api = _RecordingApi()
+    journal = OfflineJournal()
+    for user, system in (("some_rat", "sol"), ("some_ov", "fuelum"), ("some_ov", "ngc 1")):
+        rescue_plain_fx.system = system
+        journal.record(JournalEvent.UPDATE, rescue_plain_fx, user)
+
+    assert await journal.replay(api) == 2
+    assert [(call[2], call[4]) for call in api.calls] == [("SOL", "some_rat"), ("NGC 1", "some_ov")]
+
+
+@pytest.mark.asyncio
+async def test_failed_rescue_is_kept_for_next_replay():
+    """ Verifies a failing rescue doesn't hold up others, and is retried in full next time """
+    first, second = Rescue(client="first"), Rescue(client="second")
+    api = _RecordingApi(fail_for={first.api_id})
+    journal = OfflineJournal()
+    journal.record(JournalEvent.CREATE, first)
+    journal.record(JournalEvent.CREATE, second)
+    first.system = "sol"
+    journal.record(JournalEvent.UPDATE, first, "some_rat")
+
+    assert await journal.replay(api) == 1
+    assert len(journal) == 2
+
+    api.fail_for.clear()
+    assert await journal.replay(api) == 2
+    assert [call[:2] for call in api.calls] == [
+        ("create", second.api_id),
+        ("create", first.api_id),
+        ("update", first.api_id),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_journal_survives_restart(tmp_path, rescue_plain_fx):
+    """ Verifies a durable journal is read back, skipping acknowledged changes and torn writes """
+    path = str(tmp_path / "journal.bin")
+    other = Rescue(client="other")
+    journal = OfflineJournal(path)
+    journal.record(JournalEvent.CREATE, other)
+    journal.record(JournalEvent.CREATE, rescue_plain_fx)
+    await journal.replay(_RecordingApi(fail_for={rescue_plain_fx.api_id}))
+    journal.record(JournalEvent.UPDATE, other, "some_rat")
+    journal.close()
+    with open(path, "ab") as file:
+        file.write(b"\x00\x00\x01\x00torn")
+
+    restored = OfflineJournal(path)
+    assert [(entry.event, entry.rescue.api_id) for entry in restored.entries()] == [
+        (JournalEvent.CREATE, rescue_plain_fx.api_id),
+        (JournalEvent.UPDATE, other.api_id),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_uncertain_create_is_not_repeated(tmp_path, rescue_plain_fx):
+    """ Verifies a creation that may have reached the API is only sent as an update """
+    path = str(tmp_path / "journal.bin")
+    OfflineJournal(path).record(JournalEvent.CREATE, rescue_plain_fx)
+    api = _RecordingApi(known={rescue_plain_fx.api_id})
+
+    await OfflineJournal(path).replay(api)
+
+    assert [call[0] for call in api.calls] == ["update"]
+
+
+@pytest.mark.asyncio
+async def test_unreadable_records_are_skipped(tmp_path, rescue_plain_fx):
+    """ Verifies records that can't be read back are skipped, not the whole journal """
+    path = tmp_path / "journal.bin"
+    other = Rescue(client="other")
+    journal = OfflineJournal(str(path))
+    journal.record(JournalEvent.CREATE, other)
+    journal.record(JournalEvent.CREATE, rescue_plain_fx)
+    rescue_plain_fx.system = "sol"
+    journal.record(JournalEvent.UPDATE, rescue_plain_fx, "some_rat")
+    journal.close()
+
+    first, second, third = path.read_bytes().splitlines(keepends=True)
+    path.write_bytes(
+        first + b'{"version": 1, "kind": "entry", "rescue": {"id": "nope"}}\n' + second[:40]
+        + b"\n" + b'{"version": 0, "kind": "entry"}\n' + third
+    )
+
+    restored = OfflineJournal(str(path))
+    assert [(entry.event, entry.rescue.api_id) for entry in restored.entries()] == [
+        (JournalEvent.CREATE, other.api_id),
+        (JournalEvent.UPDATE, rescue_plain_fx.api_id),
+    ]
+    assert restored.entries()[1].rescue.system == "SOL"
+    assert restored.entries()[1].rescue.modified >= {"system"}
+    assert len(path.read_bytes().splitlines()) == 2, "the journal was compacted to what it read"
@@ -0,0 +1,182 @@
+"""
+test_outbound.py - tests for the outbound message scheduler
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import asyncio
+import time
+
+import hypothesis
+import prometheus_client
+import pytest
+from hypothesis import strategies
+
+from src.packages.outbound import OutboundScheduler, Priority, split_line
+from src.packages.outbound import scheduler
+from ..strategies import valid_text
+
+pytestmark = [pytest.mark.unit, pytest.mark.outbound]
+
+
+class _Recorder:
+    """ records what the scheduler sends, and may hold sends up until released """
+
+    def __init__(self):
+        self.sent = []
+        self.times = []
+        self.released = asyncio.Event()
+        self.released.set()
+
+    async def __call__(self, command: str, target: str, line: str):
+        await self.released.wait()
+        self.sent.append((command, target, line))
+        self.times.append(time.monotonic())
+
+
+@pytest.fixture
+def limits_fx(monkeypatch):
+    """ limits fast enough for tests to not wait on them """
+    monkeypatch.setattr(scheduler, "rate", 1000.0)
+    monkeypatch.setattr(scheduler, "burst", 100)
+    monkeypatch.setattr(scheduler, "connection_rate", 1000.0)
+    monkeypatch.setattr(scheduler, "connection_burst", 100)
+    monkeypatch.setattr(scheduler, "line_bytes", 350)
+    monkeypatch.setattr(scheduler, "coalesce_below", 80)
+    return monkeypatch
+
+
+@pytest.mark.asyncio
+async def test_urgent_lines_jump_the_queue(limits_fx):
+    recorder = _Recorder()
+    outbound = OutboundScheduler(recorder)
+    recorder.released.clear()
+    limits_fx.setattr(scheduler, "coalesce_below", 0)
+
+    facts = asyncio.ensure_future(
+        outbound.send("PRIVMSG", "#fuelrats", "fact 1\nfact 2\nfact 3", Priority.LOW)
+    )
+    await asyncio.sleep(0)
+    signal = asyncio.ensure_future(
+        outbound.send("PRIVMSG", "#fuelrats", "RATSIGNAL", Priority.URGENT)
+    )
+    await asyncio.sleep(0)
+    recorder.released.set()
+    await asyncio.gather(facts, signal)
+
+    # the first fact was already on its way
+    assert [line for *_, line in recorder.sent] == ["fact 1", "RATSIGNAL", "fact 2", "fact 3"]
+    assert not len(outbound)
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_per_target(limits_fx):
+    limits_fx.setattr(scheduler, "rate", 20.0)
+    limits_fx.setattr(scheduler, "burst", 2)
+    limits_fx.setattr(scheduler, "coalesce_below", 0)
+    recorder = _Recorder()
+    outbound = OutboundScheduler(recorder)
+
+    start = time.monotonic()
+    await asyncio.gather(
+        outbound.send("PRIVMSG", "#ratchat", "one\ntwo\nthree\nfour"),
+        outbound.send("PRIVMSG", "#fuelrats", "elsewhere"),
+    )
+
+    by_target = [target for _, target, _ in recorder.sent]
+    # the other channel doesn't wait for #ratchat's bucket to refill
+    assert by_target.index("#fuelrats") < 3
+    # two lines in a burst, then one every 50ms
+    assert recorder.times[-1] - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_waiting_short_lines_coalesced(limits_fx):
+    recorder = _Recorder()
+    outbound = OutboundScheduler(recorder)
+    recorder.released.clear()
+
+    first = asyncio.ensure_future(outbound.send("PRIVMSG", "#ratchat", "first"))
+    await asyncio.sleep(0)
+    rest = asyncio.ensure_future(
+        outbound.send("PRIVMSG", "#ratchat", "quote 1\nquote 2\n" + "x" * 100)
+    )
+    notice = asyncio.ensure_future(outbound.send("NOTICE", "#ratchat", "a notice"))
+    await asyncio.sleep(0)
+    recorder.released.set()
+    await asyncio.gather(first, rest, notice)
+
+    assert recorder.sent == [
+        ("PRIVMSG", "#ratchat", "first"),
+        ("PRIVMSG", "#ratchat", "quote 1 | quote 2"),
+        ("PRIVMSG", "#ratchat", "x" * 100),
+        ("NOTICE", "#ratchat", "a notice"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_long_lines_split(limits_fx):
+    limits_fx.setattr(scheduler, "line_bytes", 20)
+    limits_fx.setattr(scheduler, "coalesce_below", 0)
+    recorder = _Recorder()
+    outbound = OutboundScheduler(recorder)
+
+    await outbound.send("PRIVMSG", "#ratchat", "the quick brown fox jumps over the lazy rat")
+
+    assert [line for *_, line in recorder.sent] == [
+        "the quick brown fox", "jumps over the lazy", "rat"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_failure_raised(limits_fx):
+    async def broken(*_):
+        raise ConnectionResetError("gone")
+
+    outbound = OutboundScheduler(broken)
+    with pytest.raises(ConnectionResetError):
+        await outbound.send("PRIVMSG", "#ratchat", "hello")
+
+    # and the scheduler carries on afterwards
+    recorder = _Recorder()
+    outbound._send = recorder
+    await outbound.send("PRIVMSG", "#ratchat", "hello again")
+    assert recorder.sent == [("PRIVMSG", "#ratchat", "hello again")]
+
+
+@pytest.mark.asyncio
+async def test_metrics(limits_fx):
+    def latency_count():
+        return prometheus_client.REGISTRY.get_sample_value(
+            "outbound_send_latency_seconds_count", {"priority": "URGENT"}
+        ) or 0
+
+    before = latency_count()
+    outbound = OutboundScheduler(_Recorder())
+    await outbound.send("PRIVMSG", "#ratchat", "one\ntwo", Priority.URGENT)
+
+    assert latency_count() == before + 2
+    assert prometheus_client.REGISTRY.get_sample_value(
+        "outbound_queue_depth", {"priority": "URGENT"}
+    ) == 0
+
+
+@pytest.mark.hypothesis
+@hypothesis.given(line=valid_text(), limit=strategies.integers(min_value=1, max_value=64))
+def test_split_line_hypothesis(line: str, limit: int):
+    parts = split_line(line, limit)
+
+    assert all(len(part.encode("utf8")) <= limit or len(part) == 1 for part in parts)
+    # only the spaces lines were split at go missing
+    assert "".join(parts).replace(" ", "") == line.replace(" ", "")
+
+
+@pytest.mark.parametrize("line_bytes", [0, 3])
+def test_validate_config_line_bytes(line_bytes: int):
+    with pytest.raises(ValueError):
+        scheduler.validate_config({"outbound": {"line_bytes": line_bytes}})
+    scheduler.validate_config({"outbound": {"line_bytes": 4}})
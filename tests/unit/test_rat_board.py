@@ -1,13 +1,19 @@
 """
 Unittest file for the Rat_Board module.
 """
-import itertools
+import asyncio
+import collections
+import random
 from contextlib import suppress
+from uuid import uuid4
 
 import pendulum
 import pytest
 
 from src.packages.board.board import cycle_at
+from src.packages.rat import Rat
+from src.packages.rescue import Rescue
+from src.packages.utils import Status
 
 from datetime import datetime, timezone
 import time
@@ -93,9 +99,90 @@ async def test_free_case_roll_over_free(rat_board_fx):
     # create a rescue
     await rat_board_fx.create_rescue()
     # hack the counter
-    rat_board_fx._index_counter = itertools.count(cycle_at + 1)
+    rat_board_fx._index_allocator._cursor = cycle_at + 1
     # render assertion
-    assert rat_board_fx.free_case_number == 1, "board did not give us the correct board index"
+    assert rat_board_fx.acquire_case_number() == 1, "board did not give us the correct board index"
+
+
+@pytest.mark.asyncio
+async def test_free_case_reused_past_cycle(rat_board_fx):
+    """
+    Verifies the board re-uses indexes on [0, CYCLE_AT] once freed, even after it has counted
+    beyond CYCLE_AT (as such an index should be free)
+    """
+
+    # fill the board past the cycle point
+    for index in range(cycle_at + 2):
+        await rat_board_fx.create_rescue(client=f"client{index}")
+    # free up an index below it
+    await rat_board_fx.remove_rescue(1)
+    # render assertion
+    assert rat_board_fx.acquire_case_number() == 1, "board did not give us the correct board index"
+
+
+@pytest.mark.asyncio
+async def test_free_case_number_round_robin(rat_board_fx):
+    """
+    Verifies a case number that was just freed isn't handed to the next case before CYCLE_AT
+    """
+    for index in range(3):
+        await rat_board_fx.create_rescue(client=f"client{index}")
+    await rat_board_fx.remove_rescue(1)
+
+    assert (await rat_board_fx.create_rescue(client="next")).board_index == 3
+
+
+@pytest.mark.asyncio
+async def test_free_case_number_not_leaked(rat_board_fx, rescue_plain_fx):
+    """
+    Verifies case numbers reserved for rescues that never made it onto the board are given back
+    """
+    with pytest.raises(TypeError):
+        await rat_board_fx.create_rescue(no_such_argument=True)
+
+    await rat_board_fx.append(rescue_plain_fx)
+    duplicate = Rescue(uuid=rescue_plain_fx.api_id, board_index=None)
+    with pytest.raises(ValueError):
+        await rat_board_fx.append(duplicate)
+
+    rat_board_fx._index_allocator._cursor = cycle_at
+    assert rat_board_fx.acquire_case_number() == 0
+    assert rat_board_fx.acquire_case_number() == 1
+
+
+@pytest.mark.asyncio
+async def test_free_case_number_not_reissued(rat_board_fx):
+    """
+    Verifies a case number handed out but not yet appended isn't handed out again
+    """
+    first = rat_board_fx.acquire_case_number()
+    second = rat_board_fx.acquire_case_number()
+
+    assert first != second
+
+
+@pytest.mark.asyncio
+async def test_free_case_number_held_during_modification(rat_board_fx, random_string_fx):
+    """
+    Verifies a rescue being modified keeps its index, even though it is briefly off the board
+    """
+    rescue = await rat_board_fx.create_rescue(client=random_string_fx)
+
+    async with rat_board_fx.modify_rescue(rescue):
+        assert rat_board_fx.acquire_case_number() != rescue.board_index
+
+    assert rat_board_fx[rescue.board_index] is rescue
+
+
+@pytest.mark.asyncio
+async def test_free_case_number_skips_explicit_index(rat_board_fx, rescue_plain_fx):
+    """
+    Verifies indexes taken by rescues appended with an explicit index are never handed out
+    """
+    rescue_plain_fx.board_index = 1
+    await rat_board_fx.append(rescue_plain_fx)
+
+    assert [rat_board_fx.acquire_case_number() for _ in range(3)] == [0, 2, 3]
 
 
 @pytest.mark.asyncio
@@ -157,3 +244,195 @@ async def test_modify_rescue_datetime_last_case(rat_board_fx, monkeypatch):
     await rat_board_fx.create_rescue()
     assert pre_datetime_last_case < rat_board_fx.last_case_datetime
     assert rat_board_fx.last_case_datetime < pendulum.now() , "The stored value may not be in the future"
+
+
+class _SlowApiHandler:
+    """ stands in for the API, taking a while to answer every update """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.in_flight_by_rescue = collections.Counter()
+        self.updates = collections.defaultdict(list)
+
+    async def update_rescue(self, rescue, impersonating=None):
+        self.in_flight += 1
+        self.in_flight_by_rescue[rescue.api_id] += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        assert self.in_flight_by_rescue[rescue.api_id] == 1, "concurrent updates for one rescue"
+
+        sequence = int(rescue.system.split("-")[-1])
+        await asyncio.sleep(0.01)
+        self.updates[rescue.api_id].append(sequence)
+
+        self.in_flight_by_rescue[rescue.api_id] -= 1
+        self.in_flight -= 1
+
+
+@pytest.mark.asyncio
+async def test_modify_rescue_concurrent_dispatchers(rat_board_fx):
+    """
+    Simulates many dispatchers editing cases at once: edits to different cases must overlap,
+    while edits to one case must apply (and reach the API) one at a time and in order.
+    """
+    handler = _SlowApiHandler()
+    rescues = [await rat_board_fx.create_rescue(client=f"client{index}") for index in range(20)]
+    rat_board_fx._handler = handler
+    rat_board_fx._offline = False
+    sequence = iter(range(1_000_000))
+
+    async def dispatcher(seed: int):
+        picker = random.Random(seed)
+        for _ in range(10):
+            rescue = picker.choice(rescues)
+            async with rat_board_fx.modify_rescue(rescue) as case:
+                case.system = f"sol-{next(sequence)}"
+                await asyncio.sleep(0)
+                case.irc_nickname = f"nick{next(sequence)}"
+
+    await asyncio.wait_for(asyncio.gather(*(dispatcher(seed) for seed in range(50))), timeout=5)
+    await asyncio.wait_for(rat_board_fx.flush_updates(), timeout=5)
+
+    assert handler.max_in_flight > 1, "API updates for different rescues were serialised"
+    # bursts of edits to one rescue are coalesced, but its final state always gets sent
+    assert sum(len(updates) for updates in handler.updates.values()) < 500
+    for rescue in rescues:
+        updates = handler.updates[rescue.api_id]
+        assert updates == sorted(updates), "updates to a rescue arrived out of order"
+        assert updates[-1] == int(rescue.system.split("-")[-1]), "final state never sent"
+
+    # and the board's lookups still agree with the rescues
+    assert len(rat_board_fx) == 20
+    for rescue in rescues:
+        assert rat_board_fx[rescue.board_index] is rescue
+        assert rat_board_fx[rescue.irc_nickname] is rescue
+    assert len(rat_board_fx._storage_by_client) == 20
+
+
+@pytest.mark.asyncio
+async def test_modify_rescue_removed_whilst_waiting(rat_board_fx, random_string_fx):
+    """
+    Verifies a rescue closed whilst a modification waited its turn isn't resurrected
+    """
+    rescue = await rat_board_fx.create_rescue(client=random_string_fx)
+    release = asyncio.Event()
+
+    async def hold():
+        async with rat_board_fx.modify_rescue(rescue):
+            await release.wait()
+
+    async def modify_late():
+        async with rat_board_fx.modify_rescue(rescue):
+            pass
+
+    holder = asyncio.ensure_future(hold())
+    await asyncio.sleep(0)
+    remover = asyncio.ensure_future(rat_board_fx.remove_rescue(rescue))
+    await asyncio.sleep(0)
+    late = asyncio.ensure_future(modify_late())
+    await asyncio.sleep(0)
+    release.set()
+
+    await holder
+    await remover
+    with pytest.raises(KeyError):
+        await late
+    assert random_string_fx not in rat_board_fx
+
+
+def _remote_copy(rescue, **changes):
+    """ the rescue as the API would announce it, changed later than the board's copy """
+    fields = dict(
+        uuid=rescue.api_id,
+        client=rescue.client,
+        system=rescue.system,
+        irc_nickname=rescue.irc_nickname,
+        board_index=rescue.board_index,
+        created_at=rescue.created_at,
+        updated_at=rescue.updated_at.add(seconds=1),
+    )
+    fields.update(changes)
+    return Rescue(**fields)
+
+
+@pytest.mark.asyncio
+async def test_apply_remote_patches_changed_fields(rat_board_fx):
+    rescue = await rat_board_fx.create_rescue(client="some_client", system="sol")
+    rescue.modified.clear()
+    remote = _remote_copy(rescue, irc_nickname="some_client_nick", code_red=True)
+
+    assert await rat_board_fx.apply_remote(remote)
+
+    assert rat_board_fx["some_client_nick"] is rescue
+    assert rescue.code_red
+    assert rescue.system == "SOL"
+    assert rescue.updated_at == remote.updated_at
+    assert not rescue.modified, "changes made elsewhere would be sent back to the API"
+
+
+@pytest.mark.asyncio
+async def test_apply_remote_drops_stale_changes(rat_board_fx):
+    rescue = await rat_board_fx.create_rescue(client="some_client")
+    remote = _remote_copy(rescue, client="stale_client", updated_at=rescue.updated_at)
+
+    assert not await rat_board_fx.apply_remote(remote)
+    assert rescue.client == "some_client"
+
+
+@pytest.mark.asyncio
+async def test_apply_remote_keeps_pending_local_changes(rat_board_fx):
+    rescue = await rat_board_fx.create_rescue(client="some_client")
+    rat_board_fx._update_queue.schedule(rescue, None, delay=0)
+
+    assert not await rat_board_fx.apply_remote(_remote_copy(rescue, client="other_client"))
+    assert rescue.client == "some_client"
+    await rat_board_fx.flush_updates()
+
+
+@pytest.mark.asyncio
+async def test_apply_remote_adds_open_rescues(rat_board_fx):
+    taken = await rat_board_fx.create_rescue(client="some_client")
+    remote = Rescue(uuid4(), client="new_client", board_index=taken.board_index)
+
+    assert await rat_board_fx.apply_remote(remote)
+
+    assert rat_board_fx["new_client"] is remote
+    assert rat_board_fx[taken.board_index] is taken, "index collision overwrote a case"
+
+
+@pytest.mark.asyncio
+async def test_apply_remote_removes_closed_rescues(rat_board_fx):
+    rescue = await rat_board_fx.create_rescue(client="some_client")
+
+    assert await rat_board_fx.apply_remote(_remote_copy(rescue, status=Status.CLOSED))
+    assert "some_client" not in rat_board_fx
+
+    # a late change to it doesn't bring it back
+    assert not await rat_board_fx.apply_remote(_remote_copy(rescue, client="other_client"))
+    assert rescue.api_id not in rat_board_fx
+
+
+@pytest.mark.asyncio
+async def test_apply_remote_replaces_unidentified_rats(rat_board_fx):
+    rescue = await rat_board_fx.create_rescue(client="some_client")
+    await rescue.add_rat(Rat(None, "some_rat"))
+    rescue.modified.clear()
+    remote = _remote_copy(rescue, unidentified_rats={"other_rat": Rat(None, "other_rat")})
+
+    assert await rat_board_fx.apply_remote(remote)
+
+    assert set(rescue.unidentified_rats) == {"other_rat"}
+    assert not rescue.modified
+
+
+@pytest.mark.asyncio
+async def test_apply_remote_adds_reopened_rescues(rat_board_fx):
+    rescue = await rat_board_fx.create_rescue(client="some_client")
+    await rat_board_fx.remove_rescue(rescue)
+    assert not await rat_board_fx.apply_remote(
+        _remote_copy(rescue, updated_at=rescue.updated_at)
+    ), "a change from before the removal brought it back"
+
+    reopened = _remote_copy(rescue)
+    assert await rat_board_fx.apply_remote(reopened)
+    assert rat_board_fx["some_client"] is reopened
@@ -8,8 +8,11 @@ Licensed under the BSD 3-Clause License.
 
 See LICENSE.md
 """
-from uuid import uuid4
+import asyncio
+import typing
+from uuid import UUID, uuid4
 
+import prometheus_client
 import pytest
 
 from src.packages.rat.rat import Rat
@@ -95,3 +98,102 @@ async def test_singleton():
     alpha = RatCache()
     beta = RatCache()
     assert alpha is beta
+
+
+class FakeApi:
+    """ answers rat lookups from *rats*, by casefolded nickname, counting the lookups """
+
+    def __init__(self, rats: typing.Dict[str, typing.List[Rat]]):
+        self.rats = rats
+        self.lookups: typing.List[typing.Union[str, UUID]] = []
+
+    async def get_rat(self, key, impersonation):
+        self.lookups.append(key)
+        await asyncio.sleep(0)
+        if isinstance(key, UUID):
+            return [rat for rats in self.rats.values() for rat in rats if rat.uuid == key][:1]
+        return self.rats.get(key, [])
+
+
+@pytest.fixture
+def fake_api_fx(rat_cache_fx: RatCache):
+    api = FakeApi(
+        {
+            "clapton[pc]": [
+                Rat(uuid4(), "clapton", Platforms.PC),
+                Rat(uuid4(), "clapton", Platforms.XB),
+            ],
+            "some_rat": [Rat(uuid4(), "some_rat", Platforms.PS)],
+        }
+    )
+    rat_cache_fx.api_handler = api
+    yield api
+    rat_cache_fx.api_handler = None
+
+
+async def test_lookups_are_cached(rat_cache_fx, fake_api_fx):
+    first = await rat_cache_fx.get_rat_by_name("Clapton[PC]", platform=Platforms.XB)
+    again = await rat_cache_fx.get_rat_by_name("clapton[pc]", platform=Platforms.PC)
+
+    assert first.platform is Platforms.XB
+    assert again.platform is Platforms.PC
+    assert fake_api_fx.lookups == ["clapton[pc]"]
+    assert await rat_cache_fx.get_rat_by_uuid(first.uuid) is first
+    assert fake_api_fx.lookups == ["clapton[pc]"]
+
+
+async def test_missing_rats_are_remembered_briefly(rat_cache_fx, fake_api_fx, monkeypatch):
+    assert await rat_cache_fx.get_rat_by_name("nobody") is None
+    assert await rat_cache_fx.get_rat_by_name("nobody") is None
+    assert fake_api_fx.lookups == ["nobody"]
+
+    monkeypatch.setattr(RatCache, "NEGATIVE_TTL", -1.0)
+    rat_cache_fx.flush()
+    await rat_cache_fx.get_rat_by_name("nobody")
+    await rat_cache_fx.get_rat_by_name("nobody")
+    assert fake_api_fx.lookups == ["nobody"] * 3
+
+
+async def test_concurrent_lookups_are_coalesced(rat_cache_fx, fake_api_fx):
+    found = await rat_cache_fx.get_rats_by_name(
+        ["some_rat", "SOME_RAT", "clapton[pc]", "nobody"], platform=Platforms.PS
+    )
+
+    assert found["some_rat"].name == "some_rat"
+    assert found["clapton[pc]"] is None, "clapton has no rat on PS"
+    assert found["nobody"] is None
+    assert sorted(fake_api_fx.lookups) == ["clapton[pc]", "nobody", "some_rat"]
+
+    results = await asyncio.gather(*(rat_cache_fx.get_rats("Someone") for _ in range(3)))
+    assert results == [[], [], []]
+    assert fake_api_fx.lookups.count("someone") == 1
+
+
+async def test_cache_is_bounded(rat_cache_fx, fake_api_fx, monkeypatch):
+    monkeypatch.setattr(RatCache, "MAX_SIZE", 1)
+    some_rat = await rat_cache_fx.get_rat_by_name("some_rat")
+    await rat_cache_fx.get_rat_by_name("clapton[pc]")
+
+    assert some_rat.uuid not in rat_cache_fx.by_uuid
+    await rat_cache_fx.get_rat_by_name("some_rat")
+    assert fake_api_fx.lookups == ["some_rat", "clapton[pc]", "some_rat"]
+
+
+async def test_failed_lookups_are_not_cached(rat_cache_fx, fake_api_fx):
+    async def broken(key, impersonation):
+        fake_api_fx.lookups.append(key)
+        raise RuntimeError("API down")
+
+    fake_api_fx.get_rat = broken
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await rat_cache_fx.get_rat_by_name("some_rat")
+    assert fake_api_fx.lookups == ["some_rat", "some_rat"]
+
+
+async def test_cache_size(rat_cache_fx, fake_api_fx):
+    await rat_cache_fx.get_rats_by_name(["some_rat", "nobody"])
+
+    assert prometheus_client.REGISTRY.get_sample_value("rat_cache_size") == 2
+    rat_cache_fx.flush()
+    assert prometheus_client.REGISTRY.get_sample_value("rat_cache_size") == 0
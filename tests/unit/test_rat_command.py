@@ -15,11 +15,15 @@ This module is built on top of the Pydle system.
 """
 
 import pydle
+import pyparsing
 import pytest
+from hypothesis import given, strategies
+from pyparsing import Word, Suppress, alphanums, alphas, ZeroOrMore
 
 import src.packages.commands.rat_command as Commands
 from src.packages.commands.rat_command import NameCollisionException
 from src.packages.context.context import Context
+from src.packages.outbound import Priority
 
 from loguru import logger
 
@@ -82,6 +86,30 @@ class TestRatCommand(object):
 
         del Commands._registered_commands[alias.casefold()]
 
+    @pytest.mark.asyncio
+    async def test_command_reply_priority(self, bot_fx, configuration_fx):
+        """
+        Verify replies of a command registered with a reply priority go out at it by default
+        """
+
+        @Commands.command("mumble", reply_priority=Priority.LOW)
+        async def mumble(context: Context):
+            await context.reply("psst")
+            await context.reply_notice("psst")
+            await context.reply("listen!", priority=Priority.NORMAL)
+
+        ctx = await Context.from_message(
+            bot_fx, "#unittest", "unit_test", f"{configuration_fx.commands.prefix}mumble"
+        )
+        await Commands.trigger(ctx)
+
+        assert [sent["priority"] for sent in bot_fx.sent_messages] == [
+            Priority.LOW, Priority.NORMAL
+        ]
+        assert [sent["priority"] for sent in bot_fx.sent_notices] == [Priority.LOW]
+
+        del Commands._registered_commands["mumble"]
+
     @pytest.mark.parametrize("garbage", [12, None, "str"])
     def test_register_non_callable(self, garbage):
         """
@@ -284,3 +312,46 @@ class TestRatCommand(object):
         assert (
             rescue_sop_fx.marked_for_deletion.marked
         ), "SOP rescue did not become marked for deletion"
+
+
+# the per-message pyparsing grammar `parse_fact_invocation` replaced, kept as a reference
+_REFERENCE_FACT_PATTERN = (
+    Word(alphanums).setResultsName("name")
+    + pyparsing.Optional(Suppress("-") + Word(alphas).setResultsName("lang"))
+    + ZeroOrMore(Word(alphanums + "_[]|?.<>{}-=")).setResultsName("subjects")
+)
+
+
+def _reference_fact_parse(message: str):
+    try:
+        result = _REFERENCE_FACT_PATTERN.parseString(message)
+    except pyparsing.ParseException:
+        return None
+    return (
+        result.name,
+        result.lang if result.lang else "en",
+        result.subjects.asList() if result.subjects else [],
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.commands
+@pytest.mark.parametrize("message", [
+    "prep", "prep-ru", "prep - ru", "prep-ru2 x", "prep_x", "prep-5", "prep foo,bar",
+    "prep\tsome_client", "prep -", "  prep [PC]Client|afk", "#nope", "", "pc-es a b c",
+])
+def test_fact_invocation_matches_reference(message: str):
+    """
+    Verify the fact tokenizer agrees with the pyparsing grammar it replaced on known edge cases.
+    """
+    assert Commands.parse_fact_invocation(message) == _reference_fact_parse(message)
+
+
+@pytest.mark.unit
+@pytest.mark.commands
+@given(message=strategies.text(alphabet="aZ09 -_[]|?.<>{}=,#\t\u00e9"))
+def test_fact_invocation_matches_reference_fuzzed(message: str):
+    """
+    Verify the fact tokenizer agrees with the pyparsing grammar it replaced on arbitrary input.
+    """
+    assert Commands.parse_fact_invocation(message) == _reference_fact_parse(message)
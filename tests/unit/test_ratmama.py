@@ -11,46 +11,51 @@ Licensed under the BSD 3-Clause License.
 See LICENSE.md
 """
 
+import asyncio
+
+import prometheus_client
 import pytest
 
 import src.packages.ratmama as ratmama
+from src.packages.ratmama import ratmama_parser
 from src.packages.context.context import Context
+from src.packages.outbound import Priority
 from src.packages.rescue.rat_rescue import Platforms
 
 pytestmark = [pytest.mark.unit, pytest.mark.ratsignal_parse, pytest.mark.asyncio]
 
 
-@pytest.mark.parametrize("announcement, signal, cmdr, system, platform, code_red", [
+@pytest.mark.parametrize("announcement, signal, cmdr, system, platform, code_red, location", [
     ("Incoming Client: SomeClient - System: Fuelum - Platform: PC - O2: OK"
      " - Language: English (en-US)",
-     "TESTSIGNAL - CMDR SomeClient - Reported System: Fuelum (landmark)"
+     "TESTSIGNAL - CMDR SomeClient - Reported System: Fuelum"
      " - Platform: PC - O2: OK - Language: English (en-US) (Case #{}) (PC_SIGNAL)",
-     "SomeClient", "FUELUM", Platforms.PC, False),
+     "SomeClient", "FUELUM", Platforms.PC, False, "landmark"),
     ("Incoming Client: SomeOtherClient - System: LHS 3447 - Platform: XB"
      " - O2: NOT OK - Language: German (de-DE)",
-     "TESTSIGNAL - CMDR SomeOtherClient - Reported System: LHS 3447 (71.04ly from sol)"
+     "TESTSIGNAL - CMDR SomeOtherClient - Reported System: LHS 3447"
      " - Platform: XB - O2: NOT OK - Language: German (de-DE) (Case #{}) (XB_SIGNAL)",
-     "SomeOtherClient", "LHS 3447", Platforms.XB, True),
+     "SomeOtherClient", "LHS 3447", Platforms.XB, True, "71.04ly from Sol"),
 
     # These three tests specifically target an edge case where we accidentally create two cases
     # if there's a client named R@signal or Drillsignal
     ("Incoming Client: Ratsignal - System: LHS 3447 - Platform: XB"
      " - O2: OK - Language: English (en-US)",
-     "TESTSIGNAL - CMDR Ratsignal - Reported System: LHS 3447 (71.04ly from sol)"
+     "TESTSIGNAL - CMDR Ratsignal - Reported System: LHS 3447"
      " - Platform: XB - O2: OK - Language: English (en-US) (Case #{}) (XB_SIGNAL)",
-     "Ratsignal", "LHS 3447", Platforms.XB, False),
+     "Ratsignal", "LHS 3447", Platforms.XB, False, "71.04ly from Sol"),
     ("Incoming Client: Drillsignal - System: LHS 3447 - Platform: PS"
      " - O2: NOT OK - Language: English (en-US)",
-     "TESTSIGNAL - CMDR Drillsignal - Reported System: LHS 3447 (71.04ly from sol)"
+     "TESTSIGNAL - CMDR Drillsignal - Reported System: LHS 3447"
      " - Platform: PS - O2: NOT OK - Language: English (en-US) (Case #{}) (PS_SIGNAL)",
-     "Drillsignal", "LHS 3447", Platforms.PS, True),
+     "Drillsignal", "LHS 3447", Platforms.PS, True, "71.04ly from Sol"),
 
     # This is also an edge case, attempting to create a rescue for a service.
     ("Incoming Client: some_service - System: LHS 3447 - Platform: PS"
      " - O2: NOT OK - Language: English (en-US)",
-     "TESTSIGNAL - CMDR some_service - Reported System: LHS 3447 (71.04ly from sol)"
+     "TESTSIGNAL - CMDR some_service - Reported System: LHS 3447"
      " - Platform: PS - O2: NOT OK - Language: English (en-US) (Case #{}) (PS_SIGNAL)",
-     "some_service", "LHS 3447", Platforms.PS, True)
+     "some_service", "LHS 3447", Platforms.PS, True, None)
 ])
 async def test_announcer_parse(bot_fx,
                                async_callable_fx,
@@ -60,9 +65,11 @@ async def test_announcer_parse(bot_fx,
                                cmdr: str,
                                system: str,
                                platform: 'Platform',
-                               code_red: bool):
+                               code_red: bool,
+                               location: str):
     """
-    Test that a received signal is parsed and a case is created as expected.
+    Test that a received signal is parsed and a case is created as expected, and that where
+    the client's system is follows.
     """
 
     context = await Context.from_message(bot_fx, "#unit_test", "some_announcer", announcement)
@@ -87,6 +94,12 @@ async def test_announcer_parse(bot_fx,
         signal = signal.format(str(index))
         message = bot_fx.sent_messages.pop(0)["message"]
         assert message.casefold() == signal.casefold()
+
+        await ratmama_parser.flush_follow_ups()
+        assert rescue.location == location
+        assert bot_fx.sent_messages.pop(0)["message"] == (
+            f"Case #{index} ({cmdr}) - Reported System: {system} ({location})"
+        )
     else:
         assert bot_fx.sent_messages.pop(0)["message"] == \
                "Signal attempted to create rescue for a service. Dispatch: please inject this case."
@@ -127,7 +140,9 @@ async def test_announcer_reconnect(bot_fx, async_callable_fx, monkeypatch):
     rescue = context.bot.board["SomeClient"]
     index = rescue.board_index
 
-    assert async_callable_fx.was_called_with(f"SomeClient has reconnected! Case #{index} (RETURN_SIGNAL)")
+    assert async_callable_fx.was_called_with(
+        f"SomeClient has reconnected! Case #{index} (RETURN_SIGNAL)", priority=Priority.URGENT
+    )
 
 
 async def test_announcer_reconnect_with_changes(bot_fx, async_callable_fx, monkeypatch):
@@ -158,7 +173,8 @@ async def test_announcer_reconnect_with_changes(bot_fx, async_callable_fx, monke
 
     assert async_callable_fx.was_called_with(
         'Dispatch! Case #0 fields changed on rejoin, please verify:  system, platform, '
-        'O2 Status changed, rescue is now 04CODE RED!'
+        'O2 Status changed, rescue is now 04CODE RED!',
+        priority=Priority.URGENT,
     )
 
 
@@ -246,4 +262,53 @@ async def test_manual_signal_duplicate(bot_fx, async_callable_fx, monkeypatch):
     await ratmama.handle_ratsignal(context)
 
     assert async_callable_fx.was_called_with("some_recruit: You already sent a Signal! Please stand"
-                                             " by, someone will help you soon!")
+                                             " by, someone will help you soon!",
+                                             priority=Priority.URGENT)
+
+
+async def test_signal_not_held_up_by_lookups(bot_fx, monkeypatch):
+    """
+    Test that a signal is announced before its system is looked up, and that signals from the
+    same system share the lookup.
+    """
+    lookups = []
+    release = asyncio.Event()
+
+    async def slow_lookup(name, full_details=False):
+        lookups.append(name)
+        await release.wait()
+        return None
+
+    monkeypatch.setattr(bot_fx.galaxy, "find_system_by_name", slow_lookup)
+    announced = prometheus_client.REGISTRY.get_sample_value(
+        "ratsignal_latency_seconds_count", {"stage": "announced"}
+    ) or 0
+
+    for client in ("SomeClient", "OtherClient"):
+        context = await Context.from_message(
+            bot_fx, "#unit_test", "some_announcer",
+            f"Incoming Client: {client} - System: Xyzzy - Platform: PC - O2: OK"
+            f" - Language: English (en-US)"
+        )
+        await ratmama.handle_ratmama_announcement(context)
+
+    assert [sent["message"].split(" - ")[1] for sent in bot_fx.sent_messages] == [
+        "CMDR SomeClient", "CMDR OtherClient"
+    ]
+    assert prometheus_client.REGISTRY.get_sample_value(
+        "ratsignal_latency_seconds_count", {"stage": "announced"}
+    ) == announced + 2
+
+    # dispatch corrects the first case's system before the lookup is done
+    bot_fx.board["SomeClient"].system = "Fuelum"
+    release.set()
+    await ratmama_parser.flush_follow_ups()
+
+    assert lookups == ["Xyzzy"]
+    assert bot_fx.board["SomeClient"].location is None
+    assert bot_fx.board["OtherClient"].location == "not found in the galaxy DB"
+    assert bot_fx.sent_messages[2]["message"] == (
+        f"Case #{bot_fx.board['OtherClient'].board_index} (OtherClient) - Reported System: XYZZY"
+        f" (not found in the galaxy DB)"
+    )
+    assert len(bot_fx.sent_messages) == 3
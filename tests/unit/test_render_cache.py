@@ -0,0 +1,125 @@
+"""
+test_render_cache.py - tests for the board's versions and the renders kept by them
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import pytest
+
+from src.commands import case_management  # pylint: disable=unused-import  # registers !list
+from src.packages.board import RatBoard
+from src.packages.commands.rat_command import trigger
+from src.packages.context import Context
+from src.packages.utils import Platforms
+from src.templates import RescueRenderFlags, render_board, render_cache, template_environment
+
+pytestmark = [pytest.mark.unit, pytest.mark.asyncio]
+
+
+@pytest.fixture
+def rendered_fx(monkeypatch):
+    """ clears the render cache, and records the rescues the templates render """
+    rendered = []
+    render_rescue = template_environment.globals["render_rescue"]
+
+    async def counting(rescue, flags):
+        rendered.append(rescue.client)
+        return await render_rescue(rescue, flags)
+
+    render_cache.clear()
+    monkeypatch.setitem(template_environment.globals, "render_rescue", counting)
+    yield rendered
+    render_cache.clear()
+
+
+async def _uncached_list(board: RatBoard, flags: RescueRenderFlags) -> str:
+    output = await template_environment.get_template("list.jinja2").render_async(
+        rescues=list(board.values()), flags=flags
+    )
+    return output.rstrip("\n")
+
+
+async def _list(bot, words: str = "") -> str:
+    ctx = await Context.from_message(bot, "#ratchat", "some_ov", f"!list {words}".strip())
+    await trigger(ctx)
+    return bot.sent_messages.pop(-1)["message"]
+
+
+async def test_versions(rat_board_fx: RatBoard):
+    versions = [rat_board_fx.version]
+    first = await rat_board_fx.create_rescue(client="first")
+    versions.append(rat_board_fx.version)
+    second = await rat_board_fx.create_rescue(client="second")
+    versions.append(rat_board_fx.version)
+
+    async with rat_board_fx.modify_rescue(first) as rescue:
+        rescue.system = "sol"
+    versions.append(rat_board_fx.version)
+
+    assert versions == sorted(set(versions)), "every change is a new version"
+    assert rat_board_fx.revision(first) == rat_board_fx.version
+    assert rat_board_fx.revision(second) == versions[2]
+
+    await rat_board_fx.remove_rescue(first)
+    assert rat_board_fx.version > versions[-1]
+    assert rat_board_fx.revision(first) is None
+    assert RatBoard(offline=True).version != rat_board_fx.version
+
+
+async def test_list_renders_only_changed_rescues(bot_fx, rendered_fx):
+    first = await bot_fx.board.create_rescue(client="first", platform=Platforms.PC)
+    await bot_fx.board.create_rescue(client="second", platform=Platforms.XB)
+
+    outputs = [await _list(bot_fx), await _list(bot_fx)]
+    assert rendered_fx == ["first", "second"], "the unchanged board is rendered once"
+    assert outputs == [await _uncached_list(bot_fx.board, RescueRenderFlags())] * 2
+
+    async with bot_fx.board.modify_rescue(first) as rescue:
+        rescue.code_red = True
+    rendered_fx.clear()
+    output = await _list(bot_fx)
+    assert rendered_fx == ["first"]
+    assert output == await _uncached_list(bot_fx.board, RescueRenderFlags())
+    assert "CR" in output
+
+
+async def test_list_filters(bot_fx, rendered_fx):
+    await bot_fx.board.create_rescue(client="first", platform=Platforms.PC)
+
+    assert "first" in await _list(bot_fx, "pc")
+    assert await _list(bot_fx, "xb") == "No open rescues that match your filters."
+    assert await _list(bot_fx, "xb") == "No open rescues that match your filters."
+    assert "first" in await _list(bot_fx, "-s pc")
+    assert rendered_fx == ["first", "first"], "each set of flags renders the rescue once"
+
+
+async def test_quotes_are_not_kept(rat_board_fx, rendered_fx):
+    rescue = await rat_board_fx.create_rescue(client="first")
+    flags = RescueRenderFlags(show_quotes=True)
+
+    for _ in range(2):
+        await render_cache.render(
+            "list.jinja2", rat_board_fx, flags, key="quotes", rescues=[rescue]
+        )
+        assert render_cache.rendered("list.jinja2", rat_board_fx, "quotes") is None
+    assert rendered_fx == ["first", "first"]
+
+
+async def test_render_board(rat_board_fx, rendered_fx):
+    await rat_board_fx.create_rescue(client="first", platform=Platforms.PC)
+    await rat_board_fx.create_rescue(client="second", platform=Platforms.PS)
+    flags = RescueRenderFlags()
+    uncached = await template_environment.get_template("board.jinja2").render_async(
+        board=rat_board_fx, target_platform=Platforms.PC, flags=flags
+    )
+    rendered_fx.clear()
+
+    for _ in range(2):
+        assert uncached == await render_board(
+            rat_board_fx, target_platform=Platforms.PC, flags=flags
+        )
+    assert rendered_fx == ["first"]
@@ -0,0 +1,98 @@
+"""
+test_rescue_update_queue.py - tests for the rescue write-behind queue
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import asyncio
+
+import pytest
+
+from src.packages.board.update_queue import RescueUpdateQueue
+
+pytestmark = [pytest.mark.unit, pytest.mark.ratboard]
+
+
+class _Recorder:
+    def __init__(self, fail: bool = False):
+        self.sent = []
+        self.fail = fail
+
+    async def __call__(self, rescue, impersonation):
+        self.sent.append((rescue.api_id, set(rescue.modified), impersonation))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("the API is on fire")
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced(rescue_plain_fx):
+    """ Verifies a burst of modifications to one rescue is sent as a single, merged update """
+    recorder = _Recorder()
+    queue = RescueUpdateQueue(recorder)
+
+    rescue_plain_fx.system = "sol"
+    queue.schedule(rescue_plain_fx, "some_rat", delay=0.01)
+    rescue_plain_fx.code_red = True
+    queue.schedule(rescue_plain_fx, "some_rat", delay=0.01)
+    await queue.drain()
+
+    assert len(recorder.sent) == 1
+    assert {"system", "code_red"} <= recorder.sent[0][1]
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_impersonations_not_merged(rescue_plain_fx):
+    """ Verifies updates on behalf of different users are sent separately, in order """
+    recorder = _Recorder()
+    queue = RescueUpdateQueue(recorder)
+
+    for user in ("some_rat", "some_ov", "some_ov", "some_rat"):
+        queue.schedule(rescue_plain_fx, user, delay=0)
+    await queue.drain()
+
+    assert [impersonation for *_, impersonation in recorder.sent] == [
+        "some_rat", "some_ov", "some_rat"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failure_callback(rescue_plain_fx):
+    """ Verifies failed updates are reported to the failure callback """
+    failures = []
+
+    async def on_failure(rescue, error):
+        failures.append((rescue, error))
+
+    queue = RescueUpdateQueue(_Recorder(fail=True), on_failure=on_failure)
+    queue.schedule(rescue_plain_fx, None, delay=0)
+    await queue.drain()
+
+    assert len(failures) == 1
+    assert failures[0][0] is rescue_plain_fx
+    assert isinstance(failures[0][1], RuntimeError)
+
+
+@pytest.mark.asyncio
+async def test_modify_rescue_returns_before_api(rat_board_fx, random_string_fx):
+    """ Verifies modify_rescue doesn't wait on the API, and the update follows later """
+    recorder = _Recorder()
+    rescue = await rat_board_fx.create_rescue(client=random_string_fx)
+
+    class _Handler:
+        update_rescue = staticmethod(lambda rescue, impersonating: recorder(rescue, impersonating))
+
+    rat_board_fx._handler = _Handler()
+    rat_board_fx._offline = False
+
+    async with rat_board_fx.modify_rescue(rescue, impersonation="some_rat") as case:
+        case.system = "sol"
+    assert not recorder.sent
+
+    await rat_board_fx.flush_updates()
+    assert recorder.sent == [(rescue.api_id, rescue.modified, "some_rat")]
@@ -1,6 +1,7 @@
 from typing import Match
 
 import pytest
+from hypothesis import given, strategies
 
 from src.packages.context.context import Context
 from src.packages.commands import trigger
@@ -190,3 +191,85 @@ async def test_get_rule(prefixless: bool, pass_match: bool):
         assert isinstance(extra_args[0], Match)
     else:
         assert () == extra_args
+
+
+@pytest.mark.parametrize("words,words_eol,expected", [
+    (["gaah"], ["gaah"], 0),
+    (["GAAH", "there"], ["GAAH there", "there"], 1),
+    (["baah", "there"], ["baah there", "there"], 2),
+    (["bob"], ["bob"], 3),
+    (["nope"], ["nope"], None),
+])
+def test_get_rule_mixed_rules_keep_order(words, words_eol, expected):
+    """
+    Ensures the combined dispatcher returns the first matching rule, in registration order,
+    across case sensitive, case insensitive, word and full message rules.
+    """
+    rules = [
+        rule("gaah", case_sensitive=True)(object()),
+        rule("gaah there", full_message=True)(object()),
+        rule("(?P<noise>b)aah", pass_match=True)(object()),
+        rule(r"(b)o\1")(object()),
+    ]
+
+    fun, _ = get_rule(words, words_eol, prefixless=False)
+
+    assert fun is (rules[expected].underlying if expected is not None else None)
+
+
+def test_get_rule_passes_own_match():
+    """
+    Ensures pass_match rules receive a match object from their own pattern, not the combined one.
+    """
+    rule("filler")(object())
+    target = rule(r"^(\w+)-(\w+)$", pass_match=True)(object())
+
+    fun, (match,) = get_rule(["prep-ru"], ["prep-ru"], prefixless=False)
+
+    assert fun is target.underlying
+    assert match.re is target.pattern
+    assert match.groups() == ("prep", "ru")
+
+
+def test_get_rule_sees_new_rules():
+    """
+    Ensures rules registered after a lookup are still considered.
+    """
+    first = rule("gaah")(object())
+    assert get_rule(["baah"], ["baah"], prefixless=False) == (None, ())
+
+    second = rule("baah", after=first)(object())
+
+    assert get_rule(["baah"], ["baah"], prefixless=False)[0] is second.underlying
+
+
+_FUZZ_PATTERNS = [
+    ("gaah", False, False), ("(g|b)aah", False, True), (r"\bdrill(signal)?\b", False, False),
+    ("^Incoming Client:", True, True), ("[a-c]at", True, False), ("k[ei]y", False, False),
+    ("s+ay", False, False), ("(?:x|yz)-[0-9]", True, False), (".*lemon", False, True),
+    ("İ", False, False), ("$", False, False),
+]
+
+
+@given(
+    picked=strategies.lists(strategies.sampled_from(_FUZZ_PATTERNS), unique=True),
+    message=strategies.text(
+        alphabet="gGaAhbBdDrRiIlLsSkKyYeExXzZtTcC-0123 :Kſıİ",
+        min_size=1,
+    ).filter(lambda text: text.split()),
+)
+def test_get_rule_agrees_with_linear_scan(picked, message):
+    """
+    Ensures the prefix index never hides a rule a linear scan over the rules would have found.
+    """
+    clear_rules()
+    rules = [rule(regex, case_sensitive=case_sensitive, full_message=full_message)(object())
+             for regex, case_sensitive, full_message in picked]
+    words = message.split()
+    words_eol = [" ".join(words[i:]) for i in range(len(words))]
+
+    expected = next((rule_.underlying for rule_ in rules
+                     if rule_.pattern.match(words_eol[0] if rule_.full_message else words[0])),
+                    None)
+
+    assert get_rule(words, words_eol, prefixless=False)[0] is expected
@@ -0,0 +1,149 @@
+"""
+test_user_cache.py - tests for the event-invalidated user cache
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import gc
+
+import attr
+import prometheus_client
+import pytest
+
+from src.features.user_cache import UserCacheClient
+from src.packages.context import Context
+from src.packages.permissions import permissions
+from src.packages.user import User
+
+pytestmark = [pytest.mark.unit, pytest.mark.user]
+
+
+@pytest.fixture
+def restore_permissions_fx(configuration_fx):
+    yield
+    permissions.rehash_handler(configuration_fx)
+    UserCacheClient.rehash_handler(configuration_fx)
+
+
+def test_users_are_resolved_once(bot_fx):
+    user = bot_fx.user_cache.user("Some_Rat")
+
+    assert user == User.lookup(bot_fx, "some_rat")
+    assert bot_fx.user_cache.user("some_rat") is user
+    assert bot_fx.user_cache.permission("SOME_RAT") is permissions.RAT
+    assert bot_fx.user_cache.user("nobody") is None
+    assert "nobody" not in bot_fx.user_cache
+
+
+def test_cached_users_counts_every_client(bot_fx, configuration_fx):
+    gc.collect()  # clients of earlier tests, that could otherwise be collected midway
+    cached = prometheus_client.REGISTRY.get_sample_value("user_cache_users")
+    bot_fx.user_cache.user("some_rat")
+    assert prometheus_client.REGISTRY.get_sample_value("user_cache_users") == cached + 1
+
+    # a client made later counts towards the metric, rather than taking it over
+    other = type(bot_fx)(nickname="other_bot", mecha_config=configuration_fx)
+    other.user_cache.user("some_rat")
+    assert prometheus_client.REGISTRY.get_sample_value("user_cache_users") == cached + 2
+
+
+def test_unchanged_records_keep_their_user(bot_fx):
+    user = bot_fx.user_cache.user("some_rat")
+    bot_fx._sync_user("some_rat", {"hostname": "delux@delux.rat.fuelrats.com"})
+
+    assert bot_fx.user_cache.user("some_rat") is user
+
+
+@pytest.mark.parametrize("metadata", (
+        {"hostname": "delux@delux.overseer.fuelrats.com"},
+        {"account": "delux", "identified": True},
+))
+def test_changed_records_are_resolved_again(bot_fx, metadata):
+    assert bot_fx.user_cache.permission("some_rat") is permissions.RAT
+    bot_fx._sync_user("some_rat", metadata)
+
+    assert bot_fx.user_cache.user("some_rat") == User.lookup(bot_fx, "some_rat")
+    if "hostname" in metadata:
+        assert bot_fx.user_cache.permission("some_rat") is permissions.OVERSEER
+
+
+def test_nick_change(bot_fx, monkeypatch):
+    monkeypatch.setattr(bot_fx, "whois", lambda nickname: None)
+    bot_fx.user_cache.user("some_rat")
+    bot_fx._rename_user("some_rat", "some_rat[pc]")
+
+    assert "some_rat" not in bot_fx.user_cache
+    assert bot_fx.user_cache.user("some_rat") is None
+    assert bot_fx.user_cache.user("some_rat[pc]").nickname == "some_rat[pc]"
+
+
+def test_quit(bot_fx):
+    bot_fx.user_cache.user("some_rat")
+    bot_fx._destroy_user("some_rat")
+
+    assert bot_fx.user_cache.user("some_rat") is None
+
+
+@pytest.mark.asyncio
+async def test_away(bot_fx):
+    bot_fx._capabilities["away-notify"] = True
+    assert not bot_fx.user_cache.user("some_rat").away
+    await bot_fx.on_raw_away(
+        bot_fx._create_message(
+            "AWAY", "brb", source="some_rat!ratlingDelux@delux.rat.fuelrats.com"
+        )
+    )
+
+    assert bot_fx.user_cache.user("some_rat").away_message == "brb"
+
+
+@pytest.mark.asyncio
+async def test_own_vhost(bot_fx):
+    bot_fx.users[bot_fx.nickname.casefold()] = {
+        **bot_fx.users["some_rat"], "nickname": bot_fx.nickname, "hostname": "bot.irc.net"
+    }
+    assert bot_fx.user_cache.permission(bot_fx.nickname) is None
+    await bot_fx.on_raw_396(
+        bot_fx._create_message(
+            "396", bot_fx.nickname, "mecha@mecha.techrat.fuelrats.com", "is now your host"
+        )
+    )
+
+    assert bot_fx.user_cache.permission(bot_fx.nickname) is permissions.TECHRAT
+
+
+@pytest.mark.usefixtures("restore_permissions_fx")
+def test_rehash_rebuilds_permissions(bot_fx, configuration_fx):
+    user = bot_fx.user_cache.user("some_rat")
+    promoted = attr.evolve(
+        configuration_fx,
+        permissions=attr.evolve(
+            configuration_fx.permissions,
+            rat=attr.evolve(configuration_fx.permissions.rat, vhosts=[]),
+            overseer=attr.evolve(
+                configuration_fx.permissions.overseer,
+                vhosts=["overseer.fuelrats.com", "rat.fuelrats.com"],
+            ),
+        ),
+    )
+    permissions.rehash_handler(promoted)
+    UserCacheClient.rehash_handler(promoted)
+
+    assert bot_fx.user_cache.user("some_rat") is user
+    assert bot_fx.user_cache.permission("some_rat") is permissions.OVERSEER
+
+
+@pytest.mark.asyncio
+async def test_context_permission(bot_fx):
+    ctx = await Context.from_message(bot_fx, "#unit_test", "some_ov", "!snafu")
+
+    assert permissions.sender_has_permission(ctx, permissions.OVERSEER)
+    assert not permissions.sender_has_permission(ctx, permissions.TECHRAT)
+    assert ctx.user is bot_fx.user_cache.user("some_ov")
+
+    unknown = await Context.from_message(bot_fx, "#unit_test", "nobody", "!snafu")
+    assert not permissions.sender_has_permission(unknown, permissions.RECRUIT)
@@ -0,0 +1,71 @@
+"""
+build_galaxy_snapshot.py - Builds a local star system snapshot for mecha
+
+Converts a systems dump into the memory-mapped snapshot format read by
+``src.packages.galaxy.snapshot``.  Point ``system_api.snapshot_file`` at the result.
+
+The dump is either a JSON array with one system per line (such as EDSM's
+``systemsWithCoordinates.json``) or JSON lines, optionally gzipped.  Every system needs an
+``id64``, a ``name`` and ``coords``::
+
+    {"id64": 5031721931482, "name": "Fuelum", "coords": {"x": 52.0, "y": -52.65625, "z": 49.8125}}
+
+The whole dump is sorted in memory, so expect this to take a while and a few GiB of memory for
+a full galaxy dump.
+
+This script is STANDALONE and is not intended to be invoked by mecha.
+
+Usage::
+
+    python -m tools.build_galaxy_snapshot systemsWithCoordinates.json.gz galaxy.snapshot
+
+Copyright (c) 2020 The Fuel Rat Mischief,
+All rights reserved.
+
+Licensed under the BSD 3-Clause License.
+
+See LICENSE.md
+"""
+import argparse
+import gzip
+import json
+import time
+import typing
+
+from src.packages.galaxy.snapshot import write_snapshot, SystemTuple
+
+
+def read_dump(path: str) -> typing.Iterator[SystemTuple]:
+    """
+    Stream the systems in a dump, skipping lines that aren't a system.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf8") as dump:
+        for line in dump:
+            line = line.strip().rstrip(",")
+            if not line.startswith("{"):
+                continue  # array brackets, blank lines
+            try:
+                entry = json.loads(line)
+                coords = entry["coords"]
+                yield int(entry["id64"]), entry["name"], coords["x"], coords["y"], coords["z"]
+            except (ValueError, KeyError, TypeError):
+                print(f"skipping malformed entry {line[:80]!r}")
+
+
+def handle_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build a local galaxy snapshot for mecha.")
+    parser.add_argument("dump", help="systems dump to read, JSON array or JSON lines, may be .gz")
+    parser.add_argument("output", help="snapshot file to write")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = handle_args(argv)
+    start = time.perf_counter()
+    count = write_snapshot(read_dump(args.dump), args.output)
+    print(f"wrote {count} systems to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()